@@ -15,7 +15,9 @@ from app.agents.tools.analyze_diagram import analyze_diagram
 from app.agents.tools.plan_deployment import plan_deployment
 from app.agents.tools.generate_reactflow_diagram import generate_reactflow_diagram
 from app.agents.tools.analyze_image_for_architecture import analyze_image_for_architecture
-from app.agents.landing_zone_team import LandingZoneTeam
+from app.agents.landing_zone_team import get_landing_zone_team
+from app.core.cancellation import checkpoint
+from app.core.json_extract import extract_json
 from typing import Any as TypingAny, cast
 try:
     from agent_framework import ChatAgent, ChatMessage, TextContent, UriContent
@@ -184,7 +186,7 @@ class AzureArchitectAgent:
 
         
     async def chat_team(self, message: str, parallel_pass: bool = False) -> str:
-        team = LandingZoneTeam(self)
+        team = get_landing_zone_team(self)
         if parallel_pass:
             return await team.run_with_parallel_pass(message)
         return await team.run_sequential(message)
@@ -317,6 +319,7 @@ class AzureArchitectAgent:
         'Diagram Data' block. It returns a dict with a `bicep_code` entry so
         the existing /api/iac flow continues to work.
         """
+        checkpoint()  # a cancelled run starts no further generation or MCP session
         try:
             # Normalize architecture_description into diagram dict
             # Ensure service_configs is always defined to avoid unbound variable
@@ -336,24 +339,7 @@ class AzureArchitectAgent:
                 marker = "Diagram Data:"
                 if marker in raw_text:
                     idx = raw_text.index(marker) + len(marker)
-                    rest = raw_text[idx:]
-                    brace_start = rest.find('{')
-                    if brace_start != -1:
-                        depth = 0
-                        end = -1
-                        for i, ch in enumerate(rest[brace_start:]):
-                            if ch == '{': depth += 1
-                            elif ch == '}':
-                                depth -= 1
-                                if depth == 0:
-                                    end = brace_start + i + 1
-                                    break
-                        if end != -1:
-                            json_blob = rest[brace_start:end]
-                            try:
-                                diagram = json.loads(json_blob)
-                            except Exception:
-                                diagram = None
+                    diagram = extract_json(raw_text[idx:])
                 if diagram is None:
                     try:
                         diagram = json.loads(raw_text)
@@ -415,23 +401,7 @@ class AzureArchitectAgent:
                         run_kwargs["tools"] = docs_tool
                     resp = await self.chat_agent.run(prompt, **run_kwargs)
                     text = getattr(resp, "result", str(resp))
-                    # Attempt robust JSON extraction
-                    def _extract_json(txt: str):
-                        start = txt.find('{')
-                        if start == -1: return None
-                        depth = 0
-                        for i, ch in enumerate(txt[start:]):
-                            if ch == '{': depth += 1
-                            elif ch == '}':
-                                depth -= 1
-                                if depth == 0:
-                                    end = start + i + 1
-                                    try:
-                                        return json.loads(txt[start:end])
-                                    except Exception:
-                                        return None
-                        return None
-                    parsed = _extract_json(text) or (json.loads(text) if text.strip().startswith('{') else None)
+                    parsed = extract_json(text, lambda value: isinstance(value, dict) and "bicep_code" in value)
                     if parsed and isinstance(parsed, dict) and parsed.get("bicep_code"):
                         return {"bicep_code": parsed.get("bicep_code", ""), "parameters": parsed.get("parameters", {})}
                     else:
@@ -448,6 +418,7 @@ class AzureArchitectAgent:
 
     async def generate_terraform_code(self, architecture_description: Union[str, Dict[str, Any]], include_monitoring: bool = True, include_security: bool = True, provider: str = "azurerm") -> Dict[str, Any]:
         """Generate Terraform HCL using AI-only approach."""
+        checkpoint()
         if not self.chat_agent:
             raise RuntimeError("Agent not initialized")
 
@@ -492,23 +463,19 @@ class AzureArchitectAgent:
             text = getattr(response, "result", str(response))
 
             # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    result = json.loads(text[start:end])
-                    # Ensure expected structure
-                    return {
-                        "terraform_code": result.get("terraform_code", ""),
-                        "parameters": result.get("parameters", {"provider": provider})
-                    }
-            except Exception as parse_error:
-                logger.warning(f"Failed to parse Terraform JSON response: {parse_error}")
-                # Return text as-is if JSON parsing fails
+            result = extract_json(text, lambda value: isinstance(value, dict) and "terraform_code" in value)
+            if result is not None:
+                # Ensure expected structure
                 return {
-                    "terraform_code": text,
-                    "parameters": {"provider": provider}
+                    "terraform_code": result.get("terraform_code", ""),
+                    "parameters": result.get("parameters", {"provider": provider})
                 }
+            logger.warning("Failed to parse Terraform JSON response")
+            # Return text as-is if JSON parsing fails
+            return {
+                "terraform_code": text,
+                "parameters": {"provider": provider}
+            }
 
         except Exception as e:
             logger.error(f"Error in generate_terraform_code: {e}")
@@ -521,11 +488,29 @@ class AzureArchitectAgent:
         Uses the Azure Bicep MCP server to ground the LLM in current schemas,
         reducing hallucinations and improving template correctness.
         
+        Successful results are cached by diagram content and region, and
+        concurrent identical requests share one generation.
+
         Returns {'bicep_code': str, 'parameters': dict}
         """
+        checkpoint()
         if not self.chat_agent:
             raise RuntimeError("Agent not initialized")
 
+        from app.iac_generators.cache import diagram_fingerprint, iac_cache, resolve_model_id
+        cache_key = diagram_fingerprint(
+            diagram,
+            target_format="bicep-mcp",
+            flags={"region": region},
+            model_id=resolve_model_id(self),
+        )
+        return await iac_cache.get_or_generate(
+            cache_key,
+            lambda: self._generate_bicep_via_mcp_uncached(diagram, region),
+            cacheable=lambda result: bool(result.get("bicep_code")),
+        )
+
+    async def _generate_bicep_via_mcp_uncached(self, diagram: dict, region: str) -> dict:
         try:
             # Import and get MCP tool
             from app.deps import get_mcp_bicep_tool
@@ -574,26 +559,7 @@ class AzureArchitectAgent:
             resp = await self.chat_agent.run(prompt, tools=tools_to_use)
             text = getattr(resp, "result", str(resp))
 
-            # Robust JSON extraction (same as standard method)
-            def _extract_json(txt: str):
-                start = txt.find('{')
-                if start == -1: 
-                    return None
-                depth = 0
-                for i, ch in enumerate(txt[start:]):
-                    if ch == '{': 
-                        depth += 1
-                    elif ch == '}':
-                        depth -= 1
-                        if depth == 0:
-                            end = start + i + 1
-                            try: 
-                                return json.loads(txt[start:end])
-                            except Exception: 
-                                return None
-                return None
-
-            parsed = _extract_json(text) or (json.loads(text) if text.strip().startswith('{') else None)
+            parsed = extract_json(text, lambda value: isinstance(value, dict) and "bicep_code" in value)
             if not parsed or "bicep_code" not in parsed:
                 raise ValueError("MCP-enhanced Bicep generation failed - no valid bicep_code returned")
                 
@@ -635,19 +601,16 @@ class AzureArchitectAgent:
             text = getattr(resp, "result", str(resp))
             
             # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    validation_result = json.loads(text[start:end])
-                    # Ensure expected structure
-                    return {
-                        "valid": validation_result.get("valid", False),
-                        "errors": validation_result.get("errors", []),
-                        "warnings": validation_result.get("warnings", [])
-                    }
-            except Exception:
-                pass
+            validation_result = extract_json(
+                text, lambda value: isinstance(value, dict) and ("valid" in value or "is_valid" in value)
+            )
+            if validation_result is not None:
+                # Ensure expected structure
+                return {
+                    "valid": validation_result.get("valid", validation_result.get("is_valid", False)),
+                    "errors": validation_result.get("errors", []),
+                    "warnings": validation_result.get("warnings", [])
+                }
                 
             return {"valid": False, "errors": ["Unable to parse MCP validation response"]}
             
@@ -663,6 +626,7 @@ class AzureArchitectAgent:
         resource types, and examples from the Terraform Registry before
         generating IaC code.
         """
+        checkpoint()
         if not self.chat_agent:
             logger.warning("Agent not initialized, falling back to standard generation")
             return await self.generate_terraform_code({"diagram": diagram, "provider": provider})
@@ -691,19 +655,15 @@ class AzureArchitectAgent:
             text = getattr(resp, "result", str(resp))
             
             # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    parsed = json.loads(text[start:end])
-                    return {
-                        "terraform_code": parsed.get("terraform_code", ""),
-                        "variables": parsed.get("variables", {}),
-                        "outputs": parsed.get("outputs", {}),
-                        "provider": provider
-                    }
-            except Exception as parse_err:
-                logger.warning(f"Failed to parse MCP Terraform response: {parse_err}")
+            parsed = extract_json(text, lambda value: isinstance(value, dict) and "terraform_code" in value)
+            if parsed is not None:
+                return {
+                    "terraform_code": parsed.get("terraform_code", ""),
+                    "variables": parsed.get("variables", {}),
+                    "outputs": parsed.get("outputs", {}),
+                    "provider": provider
+                }
+            logger.warning("Failed to parse MCP Terraform response")
                 
             # If JSON parsing fails, extract text content
             logger.info("JSON parsing failed, attempting text extraction")
@@ -750,19 +710,16 @@ class AzureArchitectAgent:
             text = getattr(resp, "result", str(resp))
             
             # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    validation_result = json.loads(text[start:end])
-                    # Ensure expected structure
-                    return {
-                        "valid": validation_result.get("valid", False),
-                        "errors": validation_result.get("errors", []),
-                        "warnings": validation_result.get("warnings", [])
-                    }
-            except Exception:
-                pass
+            validation_result = extract_json(
+                text, lambda value: isinstance(value, dict) and ("valid" in value or "is_valid" in value)
+            )
+            if validation_result is not None:
+                # Ensure expected structure
+                return {
+                    "valid": validation_result.get("valid", validation_result.get("is_valid", False)),
+                    "errors": validation_result.get("errors", []),
+                    "warnings": validation_result.get("warnings", [])
+                }
                 
             return {"valid": False, "errors": ["Unable to parse MCP validation response"]}
             
@@ -798,13 +755,11 @@ class AzureArchitectAgent:
             text = getattr(resp, "result", str(resp))
             
             # Extract JSON from response
-            try:
-                start = text.find('{')
-                end = text.rfind('}') + 1
-                if start >= 0 and end > start:
-                    return json.loads(text[start:end])
-            except Exception:
-                pass
+            provider_info = extract_json(
+                text, lambda value: isinstance(value, dict) and ("provider" in value or "resources" in value)
+            )
+            if provider_info is not None:
+                return provider_info
                 
             return {"error": "Unable to parse provider info response"}
             
@@ -0,0 +1,327 @@
+# app/agents/checkpoints.py
+"""Stage checkpoints for landing zone team runs.
+
+A traced team run records each completed stage (the hash of its input, its
+output, the diagram parsed from it and its telemetry), the IaC bundle and
+the diagram derived from that bundle. `LandingZoneTeam.resume_run` replays
+the run, and any stage whose input hash matches its checkpoint is restored
+instead of calling the model. A run that fails late therefore costs one
+stage to recover rather than the whole pipeline, even after a restart.
+
+The store is chosen with `TEAM_CHECKPOINT_BACKEND`:
+
+* ``sqlite``  a local SQLite file at `TEAM_CHECKPOINT_PATH` (the default);
+* ``blob``    JSON blobs in `TEAM_CHECKPOINT_CONTAINER` of the storage account;
+* ``memory``  this process only;
+* ``none``    checkpointing off.
+
+Checkpoints older than `TEAM_CHECKPOINT_TTL_HOURS` are pruned as new runs start.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_BACKENDS = ("sqlite", "blob", "memory", "none")
+
+# Run-level record; stages are stored under "stage:<step id>".
+RUN_KEY = "run"
+# Outcome of a finished run (written by the run queue).
+RESULT_KEY = "result"
+# The final design IaC is generated from; IaC artifacts are stored under "iac:<format>".
+DESIGN_KEY = "design"
+# Who started a run: owner client and conversation (written by the run queue).
+ORIGIN_KEY = "origin"
+
+Records = Dict[str, Dict[str, Any]]
+RunListing = List[Tuple[str, Dict[str, Any], float]]   # (run_id, run record, saved_at), newest first
+
+
+class CheckpointNotFoundError(KeyError):
+    """No checkpointed run with the requested id."""
+
+
+def input_hash(*parts: Any) -> str:
+    """Hash everything that shapes a stage's output."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """Records of team runs, keyed by run id and record key."""
+
+    enabled = True
+
+    def __init__(self, ttl_seconds: Optional[float] = None, prune_interval: float = 600.0) -> None:
+        self.ttl_seconds = settings.TEAM_CHECKPOINT_TTL_HOURS * 3600 if ttl_seconds is None else ttl_seconds
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self.saves = 0
+        self.restores = 0
+        self.errors = 0
+
+    async def save(self, run_id: str, key: str, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def load(self, run_id: str) -> Records:
+        raise NotImplementedError
+
+    async def delete(self, run_id: str) -> None:
+        raise NotImplementedError
+
+    async def runs(self, limit: int = 50) -> RunListing:
+        """The most recently written run records."""
+        raise NotImplementedError
+
+    async def prune(self, older_than: float) -> int:
+        """Drop runs last written before `older_than` (epoch seconds)."""
+        raise NotImplementedError
+
+    async def maybe_prune(self) -> int:
+        """Prune expired runs, at most once per `prune_interval`."""
+        now = time.time()
+        if not self.ttl_seconds or now - self._last_prune < self.prune_interval:
+            return 0
+        self._last_prune = now
+        try:
+            return await self.prune(now - self.ttl_seconds)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Failed to prune team checkpoints: %s", exc)
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "saves": self.saves,
+            "restores": self.restores,
+            "errors": self.errors,
+        }
+
+
+class NullCheckpointStore(CheckpointStore):
+    """Checkpointing disabled: nothing is kept and nothing can be resumed."""
+
+    enabled = False
+
+    async def save(self, run_id: str, key: str, record: Dict[str, Any]) -> None:
+        pass
+
+    async def load(self, run_id: str) -> Records:
+        return {}
+
+    async def delete(self, run_id: str) -> None:
+        pass
+
+    async def runs(self, limit: int = 50) -> RunListing:
+        return []
+
+    async def prune(self, older_than: float) -> int:
+        return 0
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """Keeps checkpoints in this process; records are stored as JSON so they behave like the durable stores."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._runs: Dict[str, Dict[str, str]] = {}
+        self._updated: Dict[str, float] = {}
+
+    async def save(self, run_id: str, key: str, record: Dict[str, Any]) -> None:
+        self._runs.setdefault(run_id, {})[key] = json.dumps(record, default=str)
+        self._updated[run_id] = time.time()
+        self.saves += 1
+
+    async def load(self, run_id: str) -> Records:
+        return {key: json.loads(data) for key, data in self._runs.get(run_id, {}).items()}
+
+    async def delete(self, run_id: str) -> None:
+        self._runs.pop(run_id, None)
+        self._updated.pop(run_id, None)
+
+    async def runs(self, limit: int = 50) -> RunListing:
+        newest = sorted(self._updated.items(), key=lambda item: item[1], reverse=True)
+        return [
+            (run_id, json.loads(self._runs[run_id][RUN_KEY]), updated)
+            for run_id, updated in newest if RUN_KEY in self._runs[run_id]
+        ][:limit]
+
+    async def prune(self, older_than: float) -> int:
+        expired = [run_id for run_id, updated in self._updated.items() if updated < older_than]
+        for run_id in expired:
+            await self.delete(run_id)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "runs": len(self._runs)}
+
+
+class SqliteCheckpointStore(CheckpointStore):
+    """One row per record in a local SQLite file; queries run in a worker thread."""
+
+    def __init__(self, path: str, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS team_checkpoints ("
+                " run_id TEXT NOT NULL, key TEXT NOT NULL, saved_at REAL NOT NULL, record TEXT NOT NULL,"
+                " PRIMARY KEY (run_id, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS team_checkpoints_saved_at ON team_checkpoints (saved_at)")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+
+    async def save(self, run_id: str, key: str, record: Dict[str, Any]) -> None:
+        data = json.dumps(record, default=str)
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO team_checkpoints (run_id, key, saved_at, record) VALUES (?, ?, ?, ?)",
+            (run_id, key, time.time(), data),
+        )
+        self.saves += 1
+
+    async def load(self, run_id: str) -> Records:
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT key, record FROM team_checkpoints WHERE run_id = ?", (run_id,)
+        )
+        return {key: json.loads(data) for key, data in rows}
+
+    async def delete(self, run_id: str) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM team_checkpoints WHERE run_id = ?", (run_id,))
+
+    async def runs(self, limit: int = 50) -> RunListing:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT run_id, record, saved_at FROM team_checkpoints WHERE key = ? ORDER BY saved_at DESC LIMIT ?",
+            (RUN_KEY, limit),
+        )
+        return [(run_id, json.loads(data), saved_at) for run_id, data, saved_at in rows]
+
+    async def prune(self, older_than: float) -> int:
+        # A run expires as a whole once its newest record is older than the cutoff.
+        rows = await asyncio.to_thread(
+            self._execute,
+            "DELETE FROM team_checkpoints WHERE run_id IN ("
+            " SELECT run_id FROM team_checkpoints GROUP BY run_id HAVING MAX(saved_at) < ?) RETURNING run_id",
+            (older_than,),
+        )
+        return len({run_id for (run_id,) in rows})
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class BlobCheckpointStore(CheckpointStore):
+    """One JSON blob per record (`<run id>/<key>.json`) in an Azure Storage container."""
+
+    def __init__(self, container: str, account_name: Optional[str] = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.container = container
+        self.account_name = account_name or settings.AZURE_STORAGE_ACCOUNT_NAME
+        self._client = None
+
+    async def _container(self):
+        if self._client is None:
+            from azure.identity.aio import DefaultAzureCredential
+            from azure.storage.blob.aio import BlobServiceClient
+
+            service = BlobServiceClient(
+                account_url=f"https://{self.account_name}.blob.core.windows.net",
+                credential=DefaultAzureCredential(),
+            )
+            client = service.get_container_client(self.container)
+            if not await client.exists():
+                await client.create_container()
+            self._client = client
+        return self._client
+
+    async def save(self, run_id: str, key: str, record: Dict[str, Any]) -> None:
+        container = await self._container()
+        data = json.dumps(record, default=str)
+        await container.upload_blob(f"{run_id}/{key}.json", data, overwrite=True)
+        self.saves += 1
+
+    async def load(self, run_id: str) -> Records:
+        container = await self._container()
+        records: Records = {}
+        async for blob in container.list_blobs(name_starts_with=f"{run_id}/"):
+            key = blob.name[len(run_id) + 1:].removesuffix(".json")
+            download = await container.download_blob(blob.name)
+            records[key] = json.loads(await download.readall())
+        return records
+
+    async def delete(self, run_id: str) -> None:
+        container = await self._container()
+        names = [blob.name async for blob in container.list_blobs(name_starts_with=f"{run_id}/")]
+        if names:
+            await container.delete_blobs(*names)
+
+    async def runs(self, limit: int = 50) -> RunListing:
+        container = await self._container()
+        found = [
+            (blob.last_modified.timestamp(), blob.name)
+            async for blob in container.list_blobs()
+            if blob.name.endswith(f"/{RUN_KEY}.json")
+        ]
+        listing: RunListing = []
+        for modified, name in sorted(found, reverse=True)[:limit]:
+            download = await container.download_blob(name)
+            listing.append((name.split("/", 1)[0], json.loads(await download.readall()), modified))
+        return listing
+
+    async def prune(self, older_than: float) -> int:
+        container = await self._container()
+        newest: Dict[str, float] = {}
+        async for blob in container.list_blobs():
+            run_id = blob.name.split("/", 1)[0]
+            newest[run_id] = max(newest.get(run_id, 0.0), blob.last_modified.timestamp())
+        expired = [run_id for run_id, modified in newest.items() if modified < older_than]
+        for run_id in expired:
+            await self.delete(run_id)
+        return len(expired)
+
+
+def build_checkpoint_store(backend: Optional[str] = None) -> CheckpointStore:
+    backend = backend or settings.TEAM_CHECKPOINT_BACKEND
+    if backend == "sqlite":
+        return SqliteCheckpointStore(settings.TEAM_CHECKPOINT_PATH)
+    if backend == "blob":
+        return BlobCheckpointStore(settings.TEAM_CHECKPOINT_CONTAINER)
+    if backend == "memory":
+        return MemoryCheckpointStore()
+    if backend == "none":
+        return NullCheckpointStore()
+    raise ValueError(f"Unknown checkpoint backend: {backend} (expected one of {', '.join(CHECKPOINT_BACKENDS)})")
+
+
+checkpoint_store = build_checkpoint_store()
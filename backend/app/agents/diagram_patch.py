@@ -0,0 +1,405 @@
+# app/agents/diagram_patch.py
+"""Patch-based review protocol for the landing zone team.
+
+In patch mode reviewers do not rewrite the architecture. They answer with a
+few remediation notes and a `Diagram Patch` section holding RFC 6902 JSON
+Patch operations against the current `Diagram JSON`. The backend applies the
+operations deterministically, validates the result, and hands the next stage
+a compact state (draft once, current diagram, notes digest) instead of the
+previous reviewer's full prose.
+"""
+
+import copy
+import dataclasses
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DIAGRAM_PATCH_REGEX = re.compile(
+    r"Diagram Patch\s*```(?:json)?\s*(.*?)\s*```",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_DIAGRAM_SECTION_REGEX = re.compile(r"Diagram JSON\s*```json\s*\{.*?\}\s*```", re.IGNORECASE | re.DOTALL)
+
+MAX_NOTES_PER_REVIEW = 12
+MAX_NOTE_CHARS = 300
+
+PATCH_PROTOCOL_GUIDANCE = (
+    "PATCH MODE: do not rewrite the architecture and do not repeat the `Diagram JSON`.\n"
+    "Reply with at most 8 short remediation bullets (one line each), then a section titled `Diagram Patch` "
+    "followed by a fenced ```json block holding a JSON Patch (RFC 6902) array of operations against the "
+    "current Diagram JSON you were given, e.g.\n"
+    "[{\"op\": \"add\", \"path\": \"/services/-\", \"value\": {\"id\": \"...\", \"title\": \"...\", \"groupIds\": [\"...\"]}},\n"
+    " {\"op\": \"replace\", \"path\": \"/services/2/description\", \"value\": \"...\"}]\n"
+    "Use `[]` when the diagram needs no changes. Paths must match the diagram exactly as shown; "
+    "keep every service referenced by `connections` and every group referenced by `parentId`/`groupIds`."
+)
+
+_EMPTY_DIAGRAM: Dict[str, Any] = {"services": [], "groups": [], "connections": []}
+
+
+class PatchError(ValueError):
+    """Raised when a JSON Patch cannot be applied."""
+
+
+# -- RFC 6902 ---------------------------------------------------------------
+
+def _parse_pointer(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _list_index(container: list, token: str, *, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    limit = len(container) if allow_end else len(container) - 1
+    if index > limit:
+        raise PatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(document: Any, tokens: Sequence[str]) -> Any:
+    current = document
+    for token in tokens:
+        if isinstance(current, dict):
+            if token not in current:
+                raise PatchError(f"Path segment not found: {token!r}")
+            current = current[token]
+        elif isinstance(current, list):
+            current = current[_list_index(current, token, allow_end=False)]
+        else:
+            raise PatchError(f"Cannot descend into scalar at {token!r}")
+    return current
+
+
+def _add(document: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent = _resolve(document, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, dict):
+        parent[last] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, last, allow_end=True), value)
+    else:
+        raise PatchError(f"Cannot add to scalar at {last!r}")
+    return document
+
+
+def _remove(document: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise PatchError("Cannot remove the document root")
+    parent = _resolve(document, tokens[:-1])
+    last = tokens[-1]
+    if isinstance(parent, dict):
+        if last not in parent:
+            raise PatchError(f"Path segment not found: {last!r}")
+        del parent[last]
+    elif isinstance(parent, list):
+        del parent[_list_index(parent, last, allow_end=False)]
+    else:
+        raise PatchError(f"Cannot remove from scalar at {last!r}")
+    return document
+
+
+def apply_patch(document: Any, operations: Sequence[Dict[str, Any]]) -> Any:
+    """Apply RFC 6902 operations atomically, returning a new document."""
+    if not isinstance(operations, (list, tuple)):
+        raise PatchError("A JSON Patch must be a list of operations")
+    result = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise PatchError(f"Malformed patch operation: {operation!r}")
+        op = operation["op"]
+        tokens = _parse_pointer(operation["path"])
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f"'{op}' operation requires a value")
+        if op == "add":
+            result = _add(result, tokens, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            result = _remove(result, tokens)
+        elif op == "replace":
+            _resolve(result, tokens)
+            if tokens:
+                result = _remove(result, tokens)
+            result = _add(result, tokens, copy.deepcopy(operation["value"]))
+        elif op in ("move", "copy"):
+            if "from" not in operation:
+                raise PatchError(f"'{op}' operation requires 'from'")
+            source = _parse_pointer(operation["from"])
+            if op == "move" and tokens[: len(source)] == source and tokens != source:
+                raise PatchError("Cannot move a value into one of its children")
+            value = copy.deepcopy(_resolve(result, source))
+            if op == "move":
+                result = _remove(result, source)
+            result = _add(result, tokens, value)
+        elif op == "test":
+            if _resolve(result, tokens) != operation["value"]:
+                raise PatchError(f"Test failed at {operation['path']!r}")
+        else:
+            raise PatchError(f"Unsupported patch operation: {op!r}")
+    return result
+
+
+# -- rebasing ---------------------------------------------------------------
+
+def _identity(item: Any) -> Any:
+    """What an array element is, independent of its index."""
+    if isinstance(item, dict):
+        if isinstance(item.get("id"), str):
+            return ("id", item["id"])
+        if "from" in item and "to" in item:
+            return ("connection", item.get("from"), item.get("to"), item.get("label"))
+        return None
+    return ("value", json.dumps(item, sort_keys=True))
+
+
+def _rebase_pointer(pointer: str, base: Any, target: Any) -> str:
+    """Translate array indexes in `pointer` from `base` to the same elements in `target`."""
+    tokens = _parse_pointer(pointer)
+    rebased: List[str] = []
+    for position, token in enumerate(tokens):
+        last = position == len(tokens) - 1
+        if isinstance(base, list):
+            if not isinstance(target, list):
+                raise PatchError(f"Conflicting change at {pointer!r}")
+            index = _list_index(base, token, allow_end=True)
+            if index == len(base):
+                rebased.append("-" if token == "-" else str(len(target)))
+                break
+            identity = _identity(base[index])
+            matches = [i for i, item in enumerate(target) if identity is not None and _identity(item) == identity]
+            if not matches:
+                raise PatchError(f"Conflicting change at {pointer!r}: the element was changed by another reviewer")
+            rebased.append(str(matches[0]))
+            if not last:
+                base, target = base[index], target[matches[0]]
+        else:
+            rebased.append(token)
+            if not last:
+                if not isinstance(base, dict) or not isinstance(target, dict) or token not in base or token not in target:
+                    raise PatchError(f"Conflicting change at {pointer!r}")
+                base, target = base[token], target[token]
+    return "/" + "/".join(t.replace("~", "~0").replace("/", "~1") for t in rebased) if rebased else ""
+
+
+def rebase_patch(base: Any, target: Any, operations: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rewrite `operations`, written against `base`, to act on the same elements of `target`.
+
+    Array indexes are resolved through each element's `id` (or its endpoints
+    for connections), so a parallel reviewer's removal or insertion does not
+    shift another reviewer's edits onto the wrong service. Raises PatchError
+    when an operation targets an element another reviewer removed.
+    """
+    replay, current = base, target
+    rebased: List[Dict[str, Any]] = []
+    for operation in operations:
+        if not isinstance(operation, dict) or "path" not in operation:
+            raise PatchError(f"Malformed patch operation: {operation!r}")
+        translated = dict(operation)
+        for key in ("path", "from"):
+            if isinstance(operation.get(key), str):
+                translated[key] = _rebase_pointer(operation[key], replay, current)
+        replay = apply_patch(replay, [operation])
+        current = apply_patch(current, [translated])
+        rebased.append(translated)
+    return rebased
+
+
+# -- diagram validation -----------------------------------------------------
+
+def validate_diagram(diagram: Any) -> List[str]:
+    """Return structural problems in a `Diagram JSON` payload (empty when valid)."""
+    if not isinstance(diagram, dict):
+        return ["diagram must be an object"]
+    problems: List[str] = []
+    ids: Dict[str, set] = {}
+    for key in ("services", "groups"):
+        items = diagram.get(key, [])
+        if not isinstance(items, list):
+            problems.append(f"{key} must be a list")
+            ids[key] = set()
+            continue
+        seen: set = set()
+        for index, item in enumerate(items):
+            item_id = item.get("id") if isinstance(item, dict) else None
+            if not isinstance(item_id, str) or not item_id:
+                problems.append(f"{key}[{index}] is missing an id")
+            elif item_id in seen:
+                problems.append(f"duplicate {key[:-1]} id {item_id!r}")
+            else:
+                seen.add(item_id)
+        ids[key] = seen
+
+    known = ids["services"] | ids["groups"]
+    for index, group in enumerate(diagram.get("groups") or []):
+        parent = group.get("parentId") if isinstance(group, dict) else None
+        if parent and parent not in ids["groups"]:
+            problems.append(f"groups[{index}] parentId {parent!r} is not a group")
+    connections = diagram.get("connections", [])
+    if not isinstance(connections, list):
+        problems.append("connections must be a list")
+        connections = []
+    for index, connection in enumerate(connections):
+        if not isinstance(connection, dict):
+            problems.append(f"connections[{index}] must be an object")
+            continue
+        for end in ("from", "to"):
+            if connection.get(end) not in known:
+                problems.append(f"connections[{index}].{end} {connection.get(end)!r} is unknown")
+    return problems
+
+
+# -- reviewer output --------------------------------------------------------
+
+@dataclass
+class ReviewChangeSet:
+    notes: List[str] = field(default_factory=list)
+    operations: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+
+def parse_review(text: str) -> ReviewChangeSet:
+    """Split a patch-mode reviewer reply into remediation notes and patch operations."""
+    text = text or ""
+    match = DIAGRAM_PATCH_REGEX.search(text)
+    prose = text[: match.start()] if match else _DIAGRAM_SECTION_REGEX.sub("", text)
+
+    notes = [
+        line.strip().lstrip("-*• ").strip()[:MAX_NOTE_CHARS]
+        for line in prose.splitlines()
+        if line.strip().startswith(("-", "*", "•"))
+    ]
+    if not notes and prose.strip():
+        notes = [" ".join(prose.split())[:MAX_NOTE_CHARS]]
+    changeset = ReviewChangeSet(notes=[n for n in notes if n][:MAX_NOTES_PER_REVIEW])
+
+    if not match:
+        changeset.error = "no Diagram Patch section"
+        return changeset
+    try:
+        payload = json.loads(match.group(1))
+    except json.JSONDecodeError as exc:
+        changeset.error = f"unparseable Diagram Patch: {exc}"
+        return changeset
+    if isinstance(payload, dict):
+        payload = payload.get("patch", payload.get("operations"))
+    if not isinstance(payload, list):
+        changeset.error = "Diagram Patch is not a list of operations"
+        return changeset
+    changeset.operations = payload
+    return changeset
+
+
+# -- review state -----------------------------------------------------------
+
+@dataclass
+class ReviewEntry:
+    stage: str
+    agent: str
+    operations: List[Dict[str, Any]]
+    notes: List[str]
+    rejected: Optional[str] = None
+    base: Optional[Dict[str, Any]] = field(default=None, repr=False)  # the diagram the reviewer saw
+
+
+@dataclass
+class ReviewState:
+    """Compact state threaded between patch-mode stages."""
+
+    draft: str
+    diagram: Dict[str, Any]
+    history: List[ReviewEntry] = field(default_factory=list)
+
+    @classmethod
+    def from_draft(cls, draft: str, diagram: Optional[Dict[str, Any]]) -> "ReviewState":
+        narrative = _DIAGRAM_SECTION_REGEX.sub("", draft or "").strip()
+        return cls(draft=narrative, diagram=copy.deepcopy(diagram) if isinstance(diagram, dict) else copy.deepcopy(_EMPTY_DIAGRAM))
+
+    @classmethod
+    def merge(cls, states: Sequence["ReviewState"]) -> "ReviewState":
+        """Combine the states of several upstream stages by replaying their changes in order.
+
+        Changes from later branches are rebased onto the merged diagram by element id first.
+        """
+        merged = cls(draft=states[0].draft, diagram=copy.deepcopy(states[0].diagram), history=list(states[0].history))
+        for state in states[1:]:
+            applied = {entry.stage for entry in merged.history}
+            for entry in state.history:
+                if entry.stage not in applied:
+                    merged = merged._with_entry(entry)
+        return merged
+
+    def apply(self, stage: str, agent: str, changeset: ReviewChangeSet) -> "ReviewState":
+        entry = ReviewEntry(
+            stage=stage, agent=agent, operations=changeset.operations or [], notes=changeset.notes, base=self.diagram,
+        )
+        if changeset.operations is None:
+            entry.rejected = changeset.error
+        return self._with_entry(entry)
+
+    def _with_entry(self, entry: ReviewEntry) -> "ReviewState":
+        diagram = self.diagram
+        if entry.operations and not entry.rejected:
+            try:
+                operations = entry.operations
+                if entry.base is not None and entry.base != self.diagram:
+                    operations = rebase_patch(entry.base, self.diagram, operations)
+                candidate = apply_patch(self.diagram, operations)
+                introduced = set(validate_diagram(candidate)) - set(validate_diagram(self.diagram))
+                if introduced:
+                    raise PatchError("; ".join(sorted(introduced)[:3]))
+                diagram = candidate
+            except PatchError as exc:
+                logger.info("Rejected diagram patch from %s: %s", entry.agent, exc)
+                entry = dataclasses.replace(entry, rejected=str(exc))
+        return ReviewState(draft=self.draft, diagram=diagram, history=self.history + [entry])
+
+    def notes_digest(self) -> str:
+        lines: List[str] = []
+        for entry in self.history:
+            if not entry.notes and not entry.rejected:
+                continue
+            lines.append(f"{entry.agent}:")
+            lines.extend(f"- {note}" for note in entry.notes)
+            if entry.rejected:
+                lines.append(f"- (diagram patch not applied: {entry.rejected})")
+        return "\n".join(lines) or "(no remediation notes yet)"
+
+    def diagram_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.diagram, indent=indent)
+
+    def reviewer_prompt(self) -> str:
+        return (
+            f"Architecture draft:\n{self.draft}\n\n"
+            f"Remediation notes so far:\n{self.notes_digest()}\n\n"
+            f"Current Diagram JSON:\n```json\n{self.diagram_json()}\n```"
+        )
+
+    def editor_prompt(self) -> str:
+        return (
+            f"Architecture draft:\n{self.draft}\n\n"
+            f"Reviewer remediation notes:\n{self.notes_digest()}\n\n"
+            f"Merged and validated Diagram JSON:\n```json\n{self.diagram_json()}\n```\n\n"
+            "Write the final answer from the draft and notes. The backend appends this Diagram JSON to your answer, "
+            "so describe it in prose but do not repeat the JSON block."
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "reviews": len(self.history),
+            "patches_applied": sum(1 for e in self.history if e.operations and not e.rejected),
+            "patches_rejected": sum(1 for e in self.history if e.rejected),
+            "operations": sum(len(e.operations) for e in self.history if not e.rejected),
+        }
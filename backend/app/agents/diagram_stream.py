@@ -0,0 +1,139 @@
+# app/agents/diagram_stream.py
+"""Incremental parser for the `Diagram JSON` block in streamed agent output.
+
+Agents end their answer with a `Diagram JSON` fenced block. Instead of
+waiting for the full reply, `DiagramStreamParser` consumes text deltas as
+they arrive, finds the block, and reports every object in `services`,
+`groups` and `connections` the moment its closing brace streams in. Once the
+block closes, `result` holds the parsed diagram so no final re-parse is
+needed.
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.json_extract import loads_lenient
+
+logger = logging.getLogger(__name__)
+
+DIAGRAM_COLLECTIONS = ("services", "groups", "connections")
+
+_BLOCK_START_REGEX = re.compile(r"Diagram JSON\s*```json\s*", re.IGNORECASE)
+# Longest prose tail kept between deltas so a header split across chunks is still found.
+_HEADER_TAIL = 64
+
+PartialItem = Tuple[str, int, Dict[str, Any]]
+
+
+class DiagramStreamParser:
+    """Feed text deltas; get back completed diagram items as they close."""
+
+    def __init__(self) -> None:
+        self.result: Optional[Dict[str, Any]] = None
+        self.raw_json: Optional[str] = None
+        self._prose = ""
+        self._reset_block()
+
+    def _reset_block(self) -> None:
+        self._in_block = False
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = -1
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._item_start = -1
+        self._item_counts: Dict[str, int] = {key: 0 for key in DIAGRAM_COLLECTIONS}
+
+    def feed(self, delta: str) -> List[PartialItem]:
+        """Consume a chunk and return `(collection, index, item)` for every item it completed."""
+        items: List[PartialItem] = []
+        if not delta:
+            return items
+        if not self._in_block:
+            self._prose += delta
+            match = _BLOCK_START_REGEX.search(self._prose)
+            if not match:
+                self._prose = self._prose[-_HEADER_TAIL:]
+                return items
+            self._in_block = True
+            delta = self._prose[match.end():]
+            self._prose = ""
+        self._buf += delta
+        rest = self._scan(items)
+        if rest:
+            # Text after a closed block (or after a bogus fence) may hold another block.
+            items.extend(self.feed(rest))
+        return items
+
+    def _scan(self, items: List[PartialItem]) -> Optional[str]:
+        """Advance over the buffered block; return unconsumed text once the block ends."""
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = buf[self._string_start + 1:i]
+            elif not self._stack:
+                if ch == "{":
+                    # Drop anything (whitespace) between the fence and the object.
+                    buf = self._buf = buf[i:]
+                    i = 0
+                    self._stack.append("{")
+                elif not ch.isspace():
+                    logger.debug("Diagram JSON fence not followed by an object; ignoring block")
+                    self._reset_block()
+                    return buf[i:]
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and len(self._stack) == 1:
+                self._key = self._last_string
+            elif ch in "{[":
+                if ch == "{" and self._stack == ["{", "["] and self._key in DIAGRAM_COLLECTIONS:
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if ch == "}" and self._item_start >= 0 and self._stack == ["{", "["]:
+                    self._emit(buf[self._item_start:i + 1], items)
+                    self._item_start = -1
+                elif not self._stack:
+                    self._complete(buf[:i + 1])
+                    self._reset_block()
+                    return buf[i + 1:]
+            i += 1
+        self._pos = i
+        return None
+
+    def _emit(self, text: str, items: List[PartialItem]) -> None:
+        key = self._key or ""
+        try:
+            item = loads_lenient(text)
+        except ValueError:
+            logger.debug("Skipping unparseable streamed %s item", key)
+            return
+        if isinstance(item, dict):
+            index = self._item_counts[key]
+            self._item_counts[key] += 1
+            items.append((key, index, item))
+
+    def _complete(self, text: str) -> None:
+        try:
+            parsed = loads_lenient(text)
+        except ValueError as exc:
+            logger.warning("Streamed Diagram JSON did not parse: %s", exc)
+            return
+        if isinstance(parsed, dict):
+            self.result = parsed
+            self.raw_json = text.strip()
@@ -1,15 +1,39 @@
 # app/agents/teams/landing_zone_team.py
 import asyncio
+import contextlib
+import hashlib
 import inspect
 import json
 import logging
 import re
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from agent_framework import ChatMessage, Role, SequentialBuilder, ConcurrentBuilder, WorkflowOutputEvent
 
+from app.agents.checkpoints import (
+    DESIGN_KEY, RUN_KEY, CheckpointNotFoundError, CheckpointStore, Records, checkpoint_store, input_hash,
+)
+from app.agents.diagram_patch import PATCH_PROTOCOL_GUIDANCE, ReviewState, parse_review
+from app.agents.diagram_stream import DiagramStreamParser
+from app.agents.pipeline import (
+    PARALLEL_PIPELINE,
+    SEQUENTIAL_PIPELINE,
+    PipelineGraph,
+    Stage,
+    get_pipeline,
+    keep_draft,
+    run_pipeline,
+)
+from app.core.cancellation import checkpoint
+from app.core.config import settings
+from app.core.json_extract import extract_json, loads_lenient
+from app.iac_generators.cache import resolve_model_id
+from app.iac_generators.diagram import diagram_from_iac
+from app.obs.coalescer import DeltaCoalescer, stream_stats
+from app.obs.timings import FIRST_RESULT, result_timings
 from app.obs.tracing import tracer, TraceEvent
+from app.obs.usage import StepMeter, model_calls, usage_ledger
 
 logger = logging.getLogger(__name__)
 
@@ -158,41 +182,119 @@ def _data_storage_instr():
         "and backup/restore strategies. Provide any Diagram JSON updates needed to represent data storage components."
     )
 
+# Bump when the team's roles change in ways the instruction text does not capture
+# (e.g. tool wiring). Instruction edits are picked up by the fingerprint automatically.
+TEAM_INSTRUCTIONS_VERSION = "1"
+
+
+def team_instructions() -> Dict[str, str]:
+    """Instruction set for every team member, keyed by agent name."""
+    return {
+        "Architect": _writer_instr(),
+        "SecurityReviewer": _security_instr(),
+        "IdentityGovernanceReviewer": _identity_instr(),
+        "NamingEnforcer": _naming_instr(),
+        "ReliabilityReviewer": _reliability_instr(),
+        "NetworkingReviewer": _networking_instr(),
+        "CostPerfOptimizer": _cost_perf_instr(),
+        "ComplianceReviewer": _compliance_instr(),
+        "ObservabilityReviewer": _observability_instr(),
+        "DataStorageReviewer": _data_storage_instr(),
+        "FinalEditor": _final_editor_instr(),
+        "PatchProtocol": PATCH_PROTOCOL_GUIDANCE,
+    }
+
+
+def instructions_fingerprint(instructions: Optional[Dict[str, str]] = None) -> str:
+    """Stable hash of the instruction set plus the explicit version tag."""
+    payload = json.dumps(
+        {"version": TEAM_INSTRUCTIONS_VERSION, "instructions": instructions or team_instructions()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _prompt_text(input_messages) -> Any:
+    """The text of a stage's input, for hashing."""
+    if isinstance(input_messages, (list, tuple)):
+        return [getattr(m, "text", None) or str(m) for m in input_messages]
+    return input_messages
+
+
+IAC_FORMATS = ("bicep", "terraform")
+
+
+def parse_iac_formats(value: Any = None) -> Tuple[str, ...]:
+    """IaC formats to generate during a run.
+
+    Accepts "none", "both", a format name, a comma-separated string or a
+    list; None means `TEAM_IAC_FORMATS`. Raises ValueError for unknown names.
+    """
+    if value is None:
+        value = settings.TEAM_IAC_FORMATS
+    if isinstance(value, str):
+        value = value.split(",")
+    names = {str(name).strip().lower() for name in value} - {""}
+    if "both" in names:
+        return IAC_FORMATS
+    unknown = names - set(IAC_FORMATS) - {"none"}
+    if unknown:
+        raise ValueError(f"Unknown IaC format(s): {', '.join(sorted(unknown))} (expected none, both, bicep or terraform)")
+    return tuple(fmt for fmt in IAC_FORMATS if fmt in names)
+
+
+def _has_code(artifact: Any) -> bool:
+    return isinstance(artifact, dict) and any(
+        isinstance(artifact.get(key), str) and artifact[key].strip() for key in ("bicep_code", "terraform_code", "content")
+    )
+
+
+def _split_agent_source(agent_source) -> Tuple[Any, Any]:
+    """Return (chat_client, architect_agent) for either an AzureArchitectAgent or a raw chat client."""
+    if hasattr(agent_source, "agent_client"):
+        return agent_source.agent_client, agent_source
+    return agent_source, None
+
+
 class LandingZoneTeam:
-    def __init__(self, agent_source):
+    def __init__(
+        self,
+        agent_source,
+        instructions: Optional[Dict[str, str]] = None,
+        checkpoints: Optional[CheckpointStore] = None,
+    ):
         """
         Initialize the landing zone team.
 
         `agent_source` can be either the high-level AzureArchitectAgent or the raw chat client.
         When the full agent is supplied we retain a reference so we can invoke its IaC generators.
+        Traced runs are checkpointed to `checkpoints` (the configured store by default).
+        Prefer `get_landing_zone_team` so agents and workflows are built once per client.
         """
-        self.architect_agent = None
-        if hasattr(agent_source, "agent_client"):
-            # We received the AzureArchitectAgent wrapper.
-            self.architect_agent = agent_source
-            chat_client = agent_source.agent_client
-        else:
-            chat_client = agent_source
+        chat_client, self.architect_agent = _split_agent_source(agent_source)
 
         if not hasattr(chat_client, "create_agent"):
             raise ValueError("Agent client must provide a create_agent method for team orchestration")
 
         self.chat_client = chat_client
+        self.instructions = instructions or team_instructions()
+        self.instructions_version = instructions_fingerprint(self.instructions)
+        instr = self.instructions
 
         # Base writer
-        self.writer = _agent(self.chat_client, "Architect", _writer_instr())
+        self.writer = _agent(self.chat_client, "Architect", instr["Architect"])
 
         # Sequential reviewers
-        self.security = _agent(self.chat_client, "SecurityReviewer", _security_instr())
-        self.identity = _agent(self.chat_client, "IdentityGovernanceReviewer", _identity_instr())
-        self.naming   = _agent(self.chat_client, "NamingEnforcer", _naming_instr())
-        self.reliab   = _agent(self.chat_client, "ReliabilityReviewer", _reliability_instr())
-        self.networking = _agent(self.chat_client, "NetworkingReviewer", _networking_instr())
-        self.cost     = _agent(self.chat_client, "CostPerfOptimizer", _cost_perf_instr())
-        self.comp     = _agent(self.chat_client, "ComplianceReviewer", _compliance_instr())
-        self.observability = _agent(self.chat_client, "ObservabilityReviewer", _observability_instr())
-        self.data_storage = _agent(self.chat_client, "DataStorageReviewer", _data_storage_instr())
-        self.final    = _agent(self.chat_client, "FinalEditor", _final_editor_instr())
+        self.security = _agent(self.chat_client, "SecurityReviewer", instr["SecurityReviewer"])
+        self.identity = _agent(self.chat_client, "IdentityGovernanceReviewer", instr["IdentityGovernanceReviewer"])
+        self.naming   = _agent(self.chat_client, "NamingEnforcer", instr["NamingEnforcer"])
+        self.reliab   = _agent(self.chat_client, "ReliabilityReviewer", instr["ReliabilityReviewer"])
+        self.networking = _agent(self.chat_client, "NetworkingReviewer", instr["NetworkingReviewer"])
+        self.cost     = _agent(self.chat_client, "CostPerfOptimizer", instr["CostPerfOptimizer"])
+        self.comp     = _agent(self.chat_client, "ComplianceReviewer", instr["ComplianceReviewer"])
+        self.observability = _agent(self.chat_client, "ObservabilityReviewer", instr["ObservabilityReviewer"])
+        self.data_storage = _agent(self.chat_client, "DataStorageReviewer", instr["DataStorageReviewer"])
+        self.final    = _agent(self.chat_client, "FinalEditor", instr["FinalEditor"])
 
         # Build the default sequential pipeline (writer -> reviewers -> final)
         # Sequential pipeline: writer -> security -> identity -> naming -> reliability -> cost -> compliance -> final
@@ -220,11 +322,21 @@ class LandingZoneTeam:
             .build()
         )
 
+        # Compiled workflows refuse concurrent executions, so shared teams serialize
+        # workflow runs. The traced runs drive the agents directly and need no lock.
+        self._seq_lock = asyncio.Lock()
+        self._concurrent_lock = asyncio.Lock()
+        self._patch_agents: Dict[str, Any] = {}
+        self.checkpoints = checkpoints or checkpoint_store
+        self._restored: Dict[str, Records] = {}   # run_id -> checkpoints of a run being resumed
+        self._artifact_tasks: Dict[Tuple[str, str], asyncio.Task] = {}   # on-demand IaC in flight
+
     async def run_sequential(self, user_prompt: str) -> str:
         last_output: Optional[List[ChatMessage]] = None
-        async for ev in self.seq_workflow.run_stream(user_prompt):
-            if isinstance(ev, WorkflowOutputEvent):
-                last_output = ev.data
+        async with self._seq_lock:
+            async for ev in self.seq_workflow.run_stream(user_prompt):
+                if isinstance(ev, WorkflowOutputEvent):
+                    last_output = ev.data
         if not last_output:
             return "No output."
         return "\n".join([m.text for m in last_output if m.role in (Role.ASSISTANT,)])
@@ -236,18 +348,19 @@ class LandingZoneTeam:
 
         # Fan-out reviewers on the draft, collect all reviewer outputs
         collected_messages = []
-        async for ev in self.concurrent_workflow.run_stream(messages):
-            if isinstance(ev, WorkflowOutputEvent):
-                data = ev.data
-                # ev.data may be a list of ChatMessage, a response object with .messages, or a single message-like object
-                if isinstance(data, list):
-                    collected_messages.extend(data)
-                else:
-                    messages_attr = getattr(data, "messages", None)
-                    if messages_attr is not None:
-                        collected_messages.extend(list(messages_attr))
-                        continue
-                    collected_messages.append(data)
+        async with self._concurrent_lock:
+            async for ev in self.concurrent_workflow.run_stream(messages):
+                if isinstance(ev, WorkflowOutputEvent):
+                    data = ev.data
+                    # ev.data may be a list of ChatMessage, a response object with .messages, or a single message-like object
+                    if isinstance(data, list):
+                        collected_messages.extend(data)
+                    else:
+                        messages_attr = getattr(data, "messages", None)
+                        if messages_attr is not None:
+                            collected_messages.extend(list(messages_attr))
+                            continue
+                        collected_messages.append(data)
 
         # If reviewers produced no output, fall back to the draft's last assistant text
         if not collected_messages:
@@ -269,8 +382,8 @@ class LandingZoneTeam:
             return None, None
         raw_json = match.group(1).strip()
         try:
-            return json.loads(raw_json), raw_json
-        except json.JSONDecodeError as exc:
+            return loads_lenient(raw_json), raw_json
+        except ValueError as exc:
             logger.warning("LandingZoneTeam failed to parse Diagram JSON: %s", exc)
             return None, raw_json
 
@@ -279,13 +392,19 @@ class LandingZoneTeam:
         diagram: Optional[Dict[str, Any]],
         narrative: str,
         region: str = "westeurope",
+        on_artifact: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+        formats: Tuple[str, ...] = IAC_FORMATS,
     ) -> Dict[str, Any]:
-        """Produce Bicep and Terraform artifacts using the AzureArchitectAgent when available."""
+        """Produce the requested IaC `formats` using the AzureArchitectAgent when available.
+
+        `on_artifact(kind, artifact)` is awaited for each one as soon as it is generated.
+        """
         bundle: Dict[str, Any] = {"bicep": None, "terraform": None}
         agent = self.architect_agent
         if not agent:
             logger.debug("LandingZoneTeam has no architect agent reference; skipping IaC generation.")
             return bundle
+        checkpoint()
 
         diagram_payload: Dict[str, Any] | None = None
         if isinstance(diagram, dict):
@@ -321,11 +440,16 @@ class LandingZoneTeam:
                 logger.exception("LandingZoneTeam failed to generate Terraform")
                 return None
 
-        tasks = [
-            asyncio.create_task(_generate_bicep()),
-            asyncio.create_task(_generate_terraform()),
-        ]
-        bicep_result, terraform_result = await asyncio.gather(*tasks)
+        async def _deliver(kind: str, generate: Callable[[], Awaitable[Optional[Dict[str, Any]]]]):
+            result = await generate()
+            if on_artifact is not None and result and isinstance(result, dict):
+                await on_artifact(kind, result)
+            return result
+
+        generators = {"bicep": _generate_bicep, "terraform": _generate_terraform}
+        tasks = [asyncio.create_task(_deliver(fmt, generators[fmt])) for fmt in formats]
+        results = dict(zip(formats, await asyncio.gather(*tasks)))
+        bicep_result, terraform_result = results.get("bicep"), results.get("terraform")
 
         if bicep_result and isinstance(bicep_result, dict):
             bundle["bicep"] = bicep_result
@@ -340,15 +464,8 @@ class LandingZoneTeam:
         return bundle
 
     async def _diagram_from_iac(
-        self, narrative: str, iac_bundle: Dict[str, Any]
+        self, narrative: str, iac_bundle: Dict[str, Any], run_id: Optional[str] = None
     ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
-        agent = self.architect_agent
-        if not agent:
-            return None, None
-        chat_agent = getattr(agent, "chat_agent", None)
-        if not chat_agent:
-            return None, None
-
         bicep_template = None
         terraform_template = None
         bicep_payload = iac_bundle.get("bicep") if isinstance(iac_bundle, dict) else None
@@ -369,6 +486,16 @@ class LandingZoneTeam:
 
         if not source_snippet:
             return None, None
+        checkpoint()
+
+        # Read the diagram straight off the template; the model is only the fallback.
+        parsed = diagram_from_iac(bicep_template, terraform_template)
+        if parsed:
+            return parsed, json.dumps(parsed, indent=2)
+        logger.info("IaC diagram parser found no resources; asking the model instead")
+        chat_agent = getattr(self.architect_agent, "chat_agent", None) if self.architect_agent else None
+        if not chat_agent:
+            return None, None
 
         prompt = (
             "You are an Azure architecture cartographer. Convert the following IaC template into the structured "
@@ -379,6 +506,8 @@ class LandingZoneTeam:
             "Return ONLY the JSON object (no commentary) that conforms to the schema."
         )
 
+        if run_id:
+            model_calls.record(run_id, "iac_diagram")
         try:
             response = await chat_agent.run(prompt)
             text = getattr(response, "result", None)
@@ -387,13 +516,7 @@ class LandingZoneTeam:
             if not isinstance(text, str):
                 return None, None
 
-            # Extract JSON payload from response
-            start = text.find("{")
-            end = text.rfind("}") + 1
-            if start == -1 or end <= start:
-                return None, None
-            json_blob = text[start:end]
-            parsed = json.loads(json_blob)
+            parsed = extract_json(text)
             if not isinstance(parsed, dict):
                 return None, None
             raw_json = json.dumps(parsed, indent=2)
@@ -409,23 +532,50 @@ class LandingZoneTeam:
             return DIAGRAM_SECTION_REGEX.sub(payload, report, count=1)
         return f"{report.rstrip()}\n\n{payload}"
     
-    async def _run_agent_streamed(self, run_id: str, step_idx: int, total: int, agent, input_messages, meta=None) -> str:
-        start_ts = time.time()
+    async def _run_agent_streamed(
+        self, run_id: str, step_idx: int, total: int, agent, input_messages, meta=None,
+        diagram_parser: Optional[DiagramStreamParser] = None,
+    ) -> str:
+        """Stream one agent turn as trace events.
+
+        Diagram items are emitted as `diagram_partial` events as soon as they
+        close in the stream; pass `diagram_parser` to read the parsed diagram back.
+        """
+        checkpoint()
+        parser = diagram_parser if diagram_parser is not None else DiagramStreamParser()
         name = getattr(agent, "name", "Agent")
         step_id = str(step_idx)
+        instructions = getattr(getattr(agent, "chat_options", None), "instructions", None)
+        model = resolve_model_id(self.chat_client)
+        stage_key = f"stage:{step_id}"
+        digest = input_hash(name, instructions, model, _prompt_text(input_messages))
+        restored = self._restored_record(run_id, stage_key, digest)
+        if restored is not None:
+            return await self._replay_stage(run_id, step_idx, total, name, meta, restored, parser)
+        meter = StepMeter(name, step_id, prompt=input_messages, instructions=instructions, model=model)
 
         await tracer.emit(TraceEvent(
             run_id=run_id, step_id=step_id, agent=name, phase="start",
             ts=time.time(), meta=meta or {}, progress={"current": step_idx, "total": total},
-            telemetry={"tokens_in": 0, "tokens_out": 0, "latency_ms": 0}
+            telemetry=meter.usage.telemetry()
         ))
 
         out_text: list[str] = []
         last_response_text: str | None = None
-        tokens_out = 0
+
+        async def _emit_delta(text: str) -> None:
+            await tracer.emit(TraceEvent(
+                run_id=run_id, step_id=step_id, agent=name, phase="delta",
+                ts=time.time(), meta=meta or {}, progress={"current": step_idx, "total": total},
+                telemetry=meter.usage.telemetry(),
+                message_delta=text
+            ))
+
+        deltas = DeltaCoalescer(_emit_delta)
 
         try:
             async for chunk in agent.run_stream(input_messages):
+                meter.observe_update(chunk)
                 text_payloads: list[str] = []
 
                 delta = getattr(chunk, "delta", None)
@@ -437,6 +587,12 @@ class LandingZoneTeam:
                         if isinstance(candidate, str) and candidate.strip():
                             text_payloads.append(candidate)
 
+                # AgentRunResponseUpdate carries its text directly
+                if not text_payloads and not delta:
+                    candidate = getattr(chunk, "text", None)
+                    if isinstance(candidate, str) and candidate:
+                        text_payloads.append(candidate)
+
                 # Some clients stream ChatMessage objects via messages attribute
                 messages_attr = getattr(chunk, "messages", None)
                 if messages_attr:
@@ -478,18 +634,29 @@ class LandingZoneTeam:
 
                 for text in text_payloads:
                     out_text.append(text)
-                    tokens_out += len(text.split())  # lightweight proxy
-                    await tracer.emit(TraceEvent(
-                        run_id=run_id, step_id=step_id, agent=name, phase="delta",
-                        ts=time.time(), meta=meta or {}, progress={"current": step_idx, "total": total},
-                        telemetry={"tokens_in": 0, "tokens_out": tokens_out, "latency_ms": int((time.time()-start_ts)*1000)},
-                        message_delta=text
-                    ))
+                    meter.observe_text(text)
+                    await deltas.add(text)
+                    items = parser.feed(text)
+                    if items:
+                        # Deltas go out before the diagram items parsed from them.
+                        await deltas.flush()
+                        await self._emit_diagram_partials(run_id, step_id, name, meta, step_idx, total, items)
+            await deltas.aclose()
+        except asyncio.CancelledError:
+            deltas.discard()
+            # Tokens streamed before the cancel were still billed.
+            usage_ledger.record(run_id, meter.finish("".join(out_text)))
+            raise
         except Exception as e:
+            with contextlib.suppress(Exception):
+                await deltas.aclose()
+            stream_stats.record(run_id, deltas)
+            usage = meter.finish()
+            usage_ledger.record(run_id, usage)
             await tracer.emit(TraceEvent(
                 run_id=run_id, step_id=step_id, agent=name, phase="error",
                 ts=time.time(), meta=meta or {}, progress={"current": step_idx, "total": total},
-                telemetry={"tokens_in": 0, "tokens_out": tokens_out, "latency_ms": int((time.time()-start_ts)*1000)},
+                telemetry=usage.telemetry(),
                 error=str(e)
             ))
             raise
@@ -522,95 +689,423 @@ class LandingZoneTeam:
                 except Exception:
                     # Ignore fallback failures- streaming result already handled
                     pass
+        if final and not out_text:
+            # Non-streamed reply: parse it once so callers still get the diagram
+            await self._emit_diagram_partials(run_id, step_id, name, meta, step_idx, total, parser.feed(final))
+        usage = meter.finish(final)
+        usage_ledger.record(run_id, usage)
+        await self._save_checkpoint(run_id, stage_key, {
+            "agent": name,
+            "input_hash": digest,
+            "output": final,
+            "diagram": parser.result,
+            "telemetry": usage.telemetry(),
+        })
         await tracer.emit(TraceEvent(
             run_id=run_id, step_id=step_id, agent=name, phase="end",
             ts=time.time(), meta=meta or {}, progress={"current": step_idx, "total": total},
-            telemetry={"tokens_in": 0, "tokens_out": tokens_out, "latency_ms": int((time.time()-start_ts)*1000)},
+            telemetry={**usage.telemetry(), "stream": stream_stats.record(run_id, deltas)},
             summary=f"{name} completed"
         ))
         return final
 
-    async def run_sequential_traced(
-        self, user_prompt: str, run_id: Optional[str] = None
+    async def _replay_stage(self, run_id, step_idx, total, name, meta, record, parser: DiagramStreamParser) -> str:
+        """Re-emit a checkpointed stage's events and output without calling the model."""
+        step_id = str(step_idx)
+        meta = {**(meta or {}), "resumed": True}
+        progress = {"current": step_idx, "total": total}
+        await tracer.emit(TraceEvent(
+            run_id=run_id, step_id=step_id, agent=name, phase="start",
+            ts=time.time(), meta=meta, progress=progress, telemetry={},
+        ))
+        output = record["output"]
+        await self._emit_diagram_partials(run_id, step_id, name, meta, step_idx, total, parser.feed(output))
+        await tracer.emit(TraceEvent(
+            run_id=run_id, step_id=step_id, agent=name, phase="end",
+            ts=time.time(), meta=meta, progress=progress, telemetry=record.get("telemetry") or {},
+            summary=f"{name} restored from checkpoint",
+        ))
+        return output
+
+    async def _save_checkpoint(self, run_id: str, key: str, record: Dict[str, Any]) -> None:
+        # Losing a checkpoint only costs a rerun of that stage on resume; never fail the run for it.
+        try:
+            await self.checkpoints.save(run_id, key, record)
+        except Exception as exc:
+            self.checkpoints.errors += 1
+            logger.warning("Failed to checkpoint %s of run %s: %s", key, run_id, exc)
+
+    def _restored_record(self, run_id: str, key: str, digest: str) -> Optional[Dict[str, Any]]:
+        record = self._restored.get(run_id, {}).get(key)
+        if record is None or record.get("input_hash") != digest:
+            return None
+        self.checkpoints.restores += 1
+        return record
+
+    async def _checkpointed(
+        self,
+        run_id: str,
+        key: str,
+        digest: str,
+        produce: Callable[[], Awaitable[Any]],
+        keep: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Reuse the value checkpointed under `key` if its input is unchanged; otherwise produce and checkpoint it.
+
+        Values rejected by `keep` (e.g. a failed generation) are returned but not checkpointed.
+        """
+        record = self._restored_record(run_id, key, digest)
+        if record is not None:
+            return record["value"]
+        value = await produce()
+        if keep is None or keep(value):
+            await self._save_checkpoint(run_id, key, {"input_hash": digest, "value": value})
+        return value
+
+    async def _deliver(self, run_id: str, kind: str, started: float, payload: Dict[str, Any]) -> None:
+        """Publish one piece of the run's result (`FIRST_RESULT` or an artifact) the moment it is ready."""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        result_timings.record(run_id, kind, elapsed_ms)
+        await tracer.emit(TraceEvent(
+            run_id=run_id, step_id=kind, agent="LandingZoneTeam",
+            phase="result" if kind == FIRST_RESULT else "artifact",
+            ts=time.time(), meta={}, progress={}, telemetry={"elapsed_ms": round(elapsed_ms, 1)},
+            payload={"kind": kind, **payload},
+        ))
+
+    def _eager_iac_calls(self) -> int:
+        """IaC model calls a run made when every format and the diagram pass always ran."""
+        if self.architect_agent is None:
+            return 0
+        return len(IAC_FORMATS) + (1 if getattr(self.architect_agent, "chat_agent", None) else 0)
+
+    async def _iac_bundle(
+        self,
+        run_id: str,
+        design_hash: str,
+        diagram: Optional[Dict[str, Any]],
+        narrative: str,
+        formats: Tuple[str, ...],
+        on_artifact: Callable[[str, Dict[str, Any]], Awaitable[None]],
+    ) -> Dict[str, Any]:
+        """Restore or generate `formats`; each artifact is checkpointed against the design it came from."""
+        bundle: Dict[str, Any] = {fmt: None for fmt in IAC_FORMATS}
+        missing = []
+        for fmt in formats:
+            record = self._restored_record(run_id, f"iac:{fmt}", design_hash)
+            if record is None:
+                missing.append(fmt)
+                continue
+            bundle[fmt] = record["value"]
+            await on_artifact(fmt, record["value"])
+        if not missing:
+            return bundle
+
+        async def _generated(kind: str, artifact: Dict[str, Any]) -> None:
+            if _has_code(artifact):
+                await self._save_checkpoint(run_id, f"iac:{kind}", {"input_hash": design_hash, "value": artifact})
+            await on_artifact(kind, artifact)
+
+        model_calls.record(run_id, "iac", len(missing))
+        generated = await self._generate_iac_bundle(diagram, narrative, on_artifact=_generated, formats=tuple(missing))
+        bundle.update({fmt: generated[fmt] for fmt in missing})
+        return bundle
+
+    async def iac_artifact(self, run_id: str, fmt: str) -> Tuple[Dict[str, Any], bool]:
+        """The `fmt` artifact of a finished run and whether it was generated by this call.
+
+        Formats the run did not generate are produced on first access from the
+        run's final design and checkpointed, so later calls (on any worker
+        sharing the store) reuse them; concurrent first calls share one
+        generation. Raises `CheckpointNotFoundError` if the run's design was never
+        checkpointed and RuntimeError if the artifact cannot be generated.
+        """
+        if fmt not in IAC_FORMATS:
+            raise ValueError(f"Unknown IaC format: {fmt}")
+        records = await self.checkpoints.load(run_id)
+        design = records.get(DESIGN_KEY)
+        if design is None:
+            raise CheckpointNotFoundError(run_id)
+        record = records.get(f"iac:{fmt}")
+        if record is not None and record.get("input_hash") == design["input_hash"]:
+            self.checkpoints.restores += 1
+            return record["value"], False
+        key = (run_id, fmt)
+        task = self._artifact_tasks.get(key)
+        if task is None:
+            task = self._artifact_tasks[key] = asyncio.create_task(self._generate_artifact(run_id, fmt, design))
+            task.add_done_callback(lambda _: self._artifact_tasks.pop(key, None))
+        return await asyncio.shield(task), True
+
+    async def _generate_artifact(self, run_id: str, fmt: str, design: Dict[str, Any]) -> Dict[str, Any]:
+        if self.architect_agent is None:
+            raise RuntimeError("IaC generation needs the architect agent")
+        model_calls.record(run_id, "iac_on_demand")
+        bundle = await self._generate_iac_bundle(design["diagram"], design["message"], formats=(fmt,))
+        artifact = bundle[fmt]
+        if not _has_code(artifact):
+            raise RuntimeError(f"{fmt} generation failed")
+        await self._save_checkpoint(run_id, f"iac:{fmt}", {"input_hash": design["input_hash"], "value": artifact})
+        return artifact
+
+    def _patch_agent(self, attr: str):
+        """Patch-protocol variant of a reviewer, built on first use."""
+        agent = self._patch_agents.get(attr)
+        if agent is None:
+            name = getattr(getattr(self, attr), "name", None) or attr
+            base = self.instructions.get(name, "")
+            agent = _agent(self.chat_client, name, f"{base}\n{self.instructions['PatchProtocol']}")
+            self._patch_agents[attr] = agent
+        return agent
+
+    async def _run_patch_pipeline(self, graph: PipelineGraph, user_prompt: str, run_id: str) -> Tuple[str, ReviewState]:
+        """Run `graph` with reviewers emitting diagram patches instead of full rewrites."""
+        states: Dict[str, ReviewState] = {}
+        final_name = graph.final_stage.name
+
+        async def _run_stage(stage: Stage, step_idx: int, total: int, stage_input: Any) -> str:
+            meta = {**stage.meta, "review_protocol": "patch"}
+            if not stage.inputs:
+                parser = DiagramStreamParser()
+                text = await self._run_agent_streamed(
+                    run_id, step_idx, total, getattr(self, stage.agent), stage_input, meta=meta, diagram_parser=parser
+                )
+                states[stage.name] = ReviewState.from_draft(text, parser.result)
+                return text
+            base = ReviewState.merge([states[name] for name in stage.inputs])
+            if stage.name == final_name:
+                states[stage.name] = base
+                return await self._run_agent_streamed(
+                    run_id, step_idx, total, getattr(self, stage.agent), base.editor_prompt(), meta=meta
+                )
+            agent = self._patch_agent(stage.agent)
+            text = await self._run_agent_streamed(run_id, step_idx, total, agent, base.reviewer_prompt(), meta=meta)
+            states[stage.name] = base.apply(stage.name, agent.name, parse_review(text))
+            return text
+
+        async def _on_deadline(stage: Stage, step_idx: int, total: int, stage_input: Any) -> str:
+            # Keep the merged state the stage was given: its diagram and the draft so far.
+            base = states[stage.name] = ReviewState.merge([states[name] for name in stage.inputs])
+            await self._emit_stage_skipped(run_id, stage, step_idx, total)
+            return base.draft if stage.name == final_name else await keep_draft(stage, step_idx, total, stage_input)
+
+        outputs = await run_pipeline(
+            graph, _run_stage, user_prompt, budget_slack=settings.TEAM_STAGE_BUDGET_SLACK, on_deadline=_on_deadline
+        )
+        state = states[final_name]
+        final_text = self._inject_diagram_section(outputs.get(final_name) or "", state.diagram_json())
+        logger.info("LandingZoneTeam patch review for run %s: %s", run_id, state.stats())
+        return final_text, state
+
+    async def _emit_stage_skipped(self, run_id: str, stage: Stage, step_idx: int, total: int) -> None:
+        """Close a stage that ran out of its deadline budget; the run continues with the last good draft."""
+        name = getattr(getattr(self, stage.agent, None), "name", None) or stage.agent
+        await tracer.emit(TraceEvent(
+            run_id=run_id, step_id=str(step_idx), agent=name, phase="end",
+            ts=time.time(), meta={**stage.meta, "degraded": "deadline"}, progress={"current": step_idx, "total": total},
+            telemetry={}, summary=f"{name} skipped: stage deadline exceeded",
+        ))
+
+    @staticmethod
+    async def _emit_diagram_partials(run_id, step_id, name, meta, step_idx, total, items) -> None:
+        for collection, index, item in items:
+            await tracer.emit(TraceEvent(
+                run_id=run_id, step_id=step_id, agent=name, phase="diagram_partial",
+                ts=time.time(), meta=meta or {}, progress={"current": step_idx, "total": total},
+                telemetry={}, payload={"collection": collection, "index": index, "item": item},
+            ))
+
+    async def run_pipeline_traced(
+        self,
+        graph: PipelineGraph,
+        user_prompt: str,
+        run_id: Optional[str] = None,
+        review_protocol: str = "rewrite",
+        iac_formats: Optional[Tuple[str, ...]] = None,
     ) -> Tuple[str, Optional[Dict[str, Any]], Optional[str], Dict[str, Any], str]:
+        """Run `graph` with tracing; independent stages execute concurrently.
+
+        With `review_protocol="patch"` reviewers return JSON Patch change sets
+        that are applied and validated here rather than rewriting the design.
+        Under a cancelled `cancel_scope` no further stage, IaC or MCP call starts.
+        Each stage and the IaC results are checkpointed so `resume_run` can
+        finish the run after a failure. Only `iac_formats` (default
+        `TEAM_IAC_FORMATS`) are generated here; `iac_artifact` produces the
+        others on first access.
+        """
         run_id = run_id or tracer.new_run()
         tracer.ensure_run(run_id)
-        # Sequential pipeline now: Architect + Security + Identity + Naming + Reliability + Cost + Compliance + FinalEditor
-        pipeline = [
-            self.writer,
-            self.security,
-            self.identity,
-            self.naming,
-            self.reliab,
-            self.cost,
-            self.comp,
-            self.final,
-        ]
-        messages = user_prompt
-        outputs = []
-        waf_map = [
-            "-",
-            "Security",
-            "Identity & Governance",
-            "Operational Excellence",
-            "Reliability",
-            "Cost Optimization",
-            "Compliance",
-            "-",
-        ]
-
-        for i, ag in enumerate(pipeline, start=1):
-            out = await self._run_agent_streamed(
-                run_id,
-                i,
-                len(pipeline),
-                ag,
-                messages,
-                meta={"waf_pillar": waf_map[i - 1]},
+        if run_id not in self._restored:
+            await self.checkpoints.maybe_prune()
+        run_record = {
+            "pipeline": graph.name,
+            "prompt": user_prompt,
+            "review_protocol": review_protocol,
+            "iac_formats": list(parse_iac_formats(iac_formats)),
+            "instructions_version": self.instructions_version,
+        }
+        await self._save_checkpoint(run_id, RUN_KEY, {**run_record, "status": "running"})
+        try:
+            result = await self._run_pipeline_traced(
+                graph, user_prompt, run_id, review_protocol, tuple(run_record["iac_formats"])
+            )
+        except asyncio.CancelledError:
+            await self._save_checkpoint(run_id, RUN_KEY, {**run_record, "status": "cancelled"})
+            raise
+        except Exception as exc:
+            await self._save_checkpoint(run_id, RUN_KEY, {**run_record, "status": "failed", "error": str(exc)})
+            raise
+        await self._save_checkpoint(run_id, RUN_KEY, {**run_record, "status": "completed"})
+        return result
+
+    async def checkpointed_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """The checkpointed run record (pipeline, prompt, status), or None."""
+        return (await self.checkpoints.load(run_id)).get(RUN_KEY)
+
+    async def resume_run(self, run_id: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[str], Dict[str, Any], str]:
+        """Finish a checkpointed run under its original id.
+
+        Stages whose input is unchanged since their checkpoint are restored
+        rather than rerun, as are the IaC bundle and the diagram derived from
+        it. Raises `CheckpointNotFoundError` if the run has no checkpoints.
+        """
+        records = await self.checkpoints.load(run_id)
+        run = records.get(RUN_KEY)
+        if run is None:
+            raise CheckpointNotFoundError(run_id)
+        self._restored[run_id] = records
+        try:
+            return await self.run_pipeline_traced(
+                get_pipeline(run["pipeline"]), run["prompt"], run_id=run_id, review_protocol=run["review_protocol"],
+                iac_formats=tuple(run.get("iac_formats", IAC_FORMATS)),
             )
-            messages = out  # pass to next
-            outputs.append(out)
+        finally:
+            self._restored.pop(run_id, None)
 
-        final_text = outputs[-1] if outputs else "No output."
-        diagram_dict, raw_json = self._extract_diagram_payload(final_text)
-        iac_bundle = await self._generate_iac_bundle(diagram_dict, final_text)
-        derived_diagram, derived_raw = await self._diagram_from_iac(final_text, iac_bundle)
+    async def _run_pipeline_traced(
+        self, graph: PipelineGraph, user_prompt: str, run_id: str, review_protocol: str, iac_formats: Tuple[str, ...]
+    ) -> Tuple[str, Optional[Dict[str, Any]], Optional[str], Dict[str, Any], str]:
+        started = time.perf_counter()
+        if review_protocol == "patch":
+            final_text, state = await self._run_patch_pipeline(graph, user_prompt, run_id)
+            diagram_dict, raw_json = state.diagram, state.diagram_json()
+        else:
+            final_name = graph.final_stage.name
+            final_parser = DiagramStreamParser()
+
+            async def _run_stage(stage: Stage, step_idx: int, total: int, stage_input: Any) -> str:
+                agent = getattr(self, stage.agent)
+                parser = final_parser if stage.name == final_name else None
+                return await self._run_agent_streamed(
+                    run_id, step_idx, total, agent, stage_input, meta=dict(stage.meta), diagram_parser=parser
+                )
+
+            async def _on_deadline(stage: Stage, step_idx: int, total: int, stage_input: Any) -> str:
+                await self._emit_stage_skipped(run_id, stage, step_idx, total)
+                return await keep_draft(stage, step_idx, total, stage_input)
+
+            outputs = await run_pipeline(
+                graph, _run_stage, user_prompt, budget_slack=settings.TEAM_STAGE_BUDGET_SLACK, on_deadline=_on_deadline
+            )
+            final_text = outputs.get(final_name) or "No output."
+            if final_parser.result is not None:
+                # The block was already parsed while the final editor streamed it.
+                diagram_dict, raw_json = final_parser.result, final_parser.raw_json
+            else:
+                diagram_dict, raw_json = self._extract_diagram_payload(final_text)
+        # The design is usable now; IaC and the diagram derived from it follow as artifacts.
+        design_hash = input_hash(diagram_dict, final_text)
+        await self._save_checkpoint(run_id, DESIGN_KEY, {
+            "input_hash": design_hash, "message": final_text, "diagram": diagram_dict,
+        })
+        if self.architect_agent is None:
+            iac_formats = ()
+        pending = [*iac_formats, "iac_diagram"] if iac_formats else []
+        await self._deliver(run_id, FIRST_RESULT, started, {
+            "message": final_text, "diagram": diagram_dict, "diagram_raw": raw_json, "pending": pending,
+        })
+
+        async def _on_artifact(kind: str, artifact: Dict[str, Any]) -> None:
+            await self._deliver(run_id, kind, started, {"artifact": artifact})
+
+        model_calls.start_run(run_id, self._eager_iac_calls())
+        iac_bundle = await self._iac_bundle(run_id, design_hash, diagram_dict, final_text, iac_formats, _on_artifact)
+        derived_diagram, derived_raw = await self._checkpointed(
+            run_id, "iac_diagram", input_hash(final_text, iac_bundle),
+            lambda: self._diagram_from_iac(final_text, iac_bundle, run_id),
+            keep=lambda derived: derived[0] is not None,
+        )
         if derived_diagram:
             diagram_dict = derived_diagram
             raw_json = derived_raw
             if raw_json:
                 final_text = self._inject_diagram_section(final_text, raw_json)
+            await self._deliver(run_id, "iac_diagram", started, {
+                "message": final_text, "diagram": diagram_dict, "diagram_raw": raw_json,
+            })
         return final_text, diagram_dict, raw_json, iac_bundle, run_id
 
+    async def run_sequential_traced(
+        self, user_prompt: str, run_id: Optional[str] = None
+    ) -> Tuple[str, Optional[Dict[str, Any]], Optional[str], Dict[str, Any], str]:
+        # Architect -> Security -> Identity -> Naming -> Reliability -> Cost -> Compliance -> FinalEditor
+        return await self.run_pipeline_traced(SEQUENTIAL_PIPELINE, user_prompt, run_id)
+
     async def run_parallel_pass_traced(
         self, user_prompt: str, run_id: Optional[str] = None
     ) -> Tuple[str, Optional[Dict[str, Any]], Optional[str], Dict[str, Any], str]:
-        run_id = run_id or tracer.new_run()
-        tracer.ensure_run(run_id)
-        # First draft
-        # total steps: draft (1) + 5 parallel reviewers (2..6) + final (7)
-        total_steps = 7
-        draft = await self._run_agent_streamed(run_id, 1, total_steps, self.writer, user_prompt, meta={"waf_pillar": "-"})
-
-        # Fan-out reviewers (reliability, cost, networking, observability, data/storage)
-        async def _run_reviewer(idx, ag, meta):
-            return await self._run_agent_streamed(run_id, idx, total_steps, ag, draft, meta=meta)
-
-        results = await asyncio.gather(
-            _run_reviewer(2, self.reliab, {"parallel_group": "fanout-1", "waf_pillar": "Reliability"}),
-            _run_reviewer(3, self.cost,   {"parallel_group": "fanout-1", "waf_pillar": "Cost Optimization"}),
-            _run_reviewer(4, self.networking, {"parallel_group": "fanout-1", "waf_pillar": "Networking"}),
-            _run_reviewer(5, self.observability, {"parallel_group": "fanout-1", "waf_pillar": "Observability"}),
-            _run_reviewer(6, self.data_storage, {"parallel_group": "fanout-1", "waf_pillar": "Data & Storage"}),
-        )
-        merged_input = "\n\n---\n\n".join(results)
-        final = await self._run_agent_streamed(run_id, total_steps, total_steps, self.final, merged_input, meta={"aggregator": "FinalEditor"})
-        diagram_dict, raw_json = self._extract_diagram_payload(final)
-        iac_bundle = await self._generate_iac_bundle(diagram_dict, final)
-        derived_diagram, derived_raw = await self._diagram_from_iac(final, iac_bundle)
-        if derived_diagram:
-            diagram_dict = derived_diagram
-            raw_json = derived_raw
-            if raw_json:
-                final = self._inject_diagram_section(final, raw_json)
-        return final, diagram_dict, raw_json, iac_bundle, run_id
+        # Draft (1) + 5 parallel reviewers (2..6) + final (7)
+        return await self.run_pipeline_traced(PARALLEL_PIPELINE, user_prompt, run_id)
+
+
+class LandingZoneTeamRegistry:
+    """Process-wide cache of built teams, keyed by chat client, architect agent and instruction version.
+
+    Building a team issues one `create_agent` call per member (which may
+    provision a server-side agent) and compiles two workflows, so teams are
+    built once and shared by concurrent runs. The architect agent is part of
+    the key because it decides the team's IaC generation; a shared team is
+    never re-pointed at another caller's architect.
+    """
+
+    def __init__(self) -> None:
+        self._teams: Dict[Tuple[int, int, str], LandingZoneTeam] = {}
+        self._builds = 0
+        self._reuses = 0
+
+    def get(self, agent_source) -> LandingZoneTeam:
+        chat_client, architect_agent = _split_agent_source(agent_source)
+        version = instructions_fingerprint()
+        key = (id(chat_client), id(architect_agent) if architect_agent is not None else 0, version)
+        team = self._teams.get(key)
+        if team is not None and team.chat_client is chat_client and team.architect_agent is architect_agent:
+            self._reuses += 1
+            return team
+
+        team = LandingZoneTeam(agent_source)
+        # Drop the team this one replaces and any built with an older instruction set
+        for stale_key in [k for k in self._teams if k[:2] == key[:2] or k[2] != version]:
+            self._teams.pop(stale_key, None)
+        self._teams[key] = team
+        self._builds += 1
+        logger.info("Built LandingZoneTeam (instructions %s) for client %s", version, type(chat_client).__name__)
+        return team
+
+    def invalidate(self) -> None:
+        self._teams.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "teams": len(self._teams),
+            "builds": self._builds,
+            "reuses": self._reuses,
+            "instructions_version": instructions_fingerprint(),
+        }
+
+
+team_registry = LandingZoneTeamRegistry()
+
+
+def get_landing_zone_team(agent_source) -> LandingZoneTeam:
+    """Return the shared team for `agent_source`, building it on first use."""
+    return team_registry.get(agent_source)
@@ -0,0 +1,219 @@
+# app/agents/pipeline.py
+"""Dependency-graph scheduler for the landing zone team.
+
+A pipeline is a set of stages, each naming the team member that runs it and
+the upstream stages whose output it consumes. Stages with no inputs read the
+user prompt; stages with several inputs are merge points and receive the
+upstream outputs joined in declaration order. The scheduler starts every
+stage as soon as its inputs are available, so independent reviewers run
+concurrently while chained reviewers keep their ordering.
+
+When the caller runs under a request deadline (`app.core.deadlines`), each
+stage is bounded by a share of the time still left, sized by how many stages
+remain on its longest downstream chain, so one straggler cannot consume the
+budget of the stages after it. A stage that runs out of its own budget is
+degraded rather than failing the run: it keeps the last good draft (its
+input) and the stages after it carry on. Only a stage with no draft to fall
+back on, or the run's own deadline, fails the run.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.deadlines import DeadlineExceeded, deadline_scope, remaining, stage_budget
+
+logger = logging.getLogger(__name__)
+
+MERGE_SEPARATOR = "\n\n---\n\n"
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    agent: str                       # attribute on LandingZoneTeam, e.g. "security"
+    inputs: Tuple[str, ...] = ()     # upstream stage names; empty means the user prompt
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class PipelineGraph:
+    name: str
+    stages: Tuple[Stage, ...]
+
+    def ordered(self) -> List[Stage]:
+        """Topological order, ties broken by declaration order so step numbers are stable."""
+        by_name = {stage.name: stage for stage in self.stages}
+        if len(by_name) != len(self.stages):
+            raise ValueError(f"Pipeline '{self.name}' has duplicate stage names")
+        for stage in self.stages:
+            missing = [i for i in stage.inputs if i not in by_name]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {', '.join(missing)}")
+
+        ordered: List[Stage] = []
+        placed: set[str] = set()
+        while len(ordered) < len(self.stages):
+            ready = [
+                s for s in self.stages
+                if s.name not in placed and all(i in placed for i in s.inputs)
+            ]
+            if not ready:
+                raise ValueError(f"Pipeline '{self.name}' contains a dependency cycle")
+            for stage in ready:
+                ordered.append(stage)
+                placed.add(stage.name)
+        return ordered
+
+    def remaining_depth(self) -> Dict[str, int]:
+        """Stages on the longest chain from each stage to the end, the stage itself included."""
+        depth: Dict[str, int] = {}
+        for stage in reversed(self.ordered()):
+            downstream = [depth[s.name] for s in self.stages if stage.name in s.inputs]
+            depth[stage.name] = 1 + max(downstream, default=0)
+        return depth
+
+    @property
+    def final_stage(self) -> Stage:
+        return self.ordered()[-1]
+
+
+StageRunner = Callable[[Stage, int, int, Any], Awaitable[str]]
+StageFallback = Callable[[Stage, int, int, Any], Awaitable[str]]
+
+
+async def keep_draft(stage: Stage, step: int, total: int, stage_input: Any) -> str:
+    """Default degradation for a stage that missed its deadline: pass its input through."""
+    return stage_input if isinstance(stage_input, str) else str(stage_input)
+
+
+def compose_input(stage: Stage, outputs: Dict[str, str], user_prompt: Any) -> Any:
+    """Build a stage's input from the user prompt or its upstream outputs."""
+    if not stage.inputs:
+        return user_prompt
+    if len(stage.inputs) == 1:
+        return outputs[stage.inputs[0]]
+    return MERGE_SEPARATOR.join(outputs[name] for name in stage.inputs)
+
+
+async def run_pipeline(
+    graph: PipelineGraph,
+    run_stage: StageRunner,
+    user_prompt: Any,
+    compose: Optional[Callable[[Stage, Dict[str, str], Any], Any]] = None,
+    budget_slack: float = 1.0,
+    on_deadline: StageFallback = keep_draft,
+) -> Dict[str, str]:
+    """Execute `graph`, calling `run_stage(stage, step, total, input)` for each stage.
+
+    Ready stages are launched in step order, so their `start` trace events are
+    emitted in a stable order even when they then run concurrently. If any
+    stage fails, the remaining stages are cancelled and the error propagates.
+    Under a request deadline each stage gets `budget_slack` times its fair
+    share of the remaining time; a stage with inputs that overruns it is
+    replaced by `on_deadline(stage, step, total, input)`. Returns the output
+    of every stage keyed by stage name.
+    """
+    compose = compose or compose_input
+    ordered = graph.ordered()
+    total = len(ordered)
+    steps = {stage.name: idx for idx, stage in enumerate(ordered, start=1)}
+    pending: Dict[str, Stage] = {stage.name: stage for stage in ordered}
+    running: Dict["asyncio.Task[str]", Stage] = {}
+    outputs: Dict[str, str] = {}
+    depth = graph.remaining_depth()
+
+    async def _bounded(stage: Stage, stage_input: Any) -> str:
+        try:
+            async with deadline_scope(stage_budget(depth[stage.name], budget_slack), label=f"stage '{stage.name}'"):
+                return await run_stage(stage, steps[stage.name], total, stage_input)
+        except DeadlineExceeded as exc:
+            left = remaining()
+            if not stage.inputs or (left is not None and left <= 0):
+                raise  # nothing to fall back on, or the whole run is out of time
+            logger.warning("Pipeline '%s': %s; keeping the last good draft", graph.name, exc)
+            return await on_deadline(stage, steps[stage.name], total, stage_input)
+
+    def _launch_ready() -> None:
+        for stage in ordered:
+            if stage.name in pending and all(i in outputs for i in stage.inputs):
+                del pending[stage.name]
+                stage_input = compose(stage, outputs, user_prompt)
+                task = asyncio.create_task(_bounded(stage, stage_input))
+                running[task] = stage
+
+    try:
+        while pending or running:
+            _launch_ready()
+            if not running:
+                raise RuntimeError(f"Pipeline '{graph.name}' stalled with unresolved stages: {', '.join(pending)}")
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: steps[running[t].name]):
+                stage = running.pop(task)
+                outputs[stage.name] = task.result()
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    return outputs
+
+
+# -- presets -------------------------------------------------------------
+
+SEQUENTIAL_PIPELINE = PipelineGraph(
+    name="sequential",
+    stages=(
+        Stage("writer", "writer", meta={"waf_pillar": "-"}),
+        Stage("security", "security", ("writer",), {"waf_pillar": "Security"}),
+        Stage("identity", "identity", ("security",), {"waf_pillar": "Identity & Governance"}),
+        Stage("naming", "naming", ("identity",), {"waf_pillar": "Operational Excellence"}),
+        Stage("reliability", "reliab", ("naming",), {"waf_pillar": "Reliability"}),
+        Stage("cost", "cost", ("reliability",), {"waf_pillar": "Cost Optimization"}),
+        Stage("compliance", "comp", ("cost",), {"waf_pillar": "Compliance"}),
+        Stage("final", "final", ("compliance",), {"waf_pillar": "-"}),
+    ),
+)
+
+_FANOUT = ("reliability", "cost", "networking", "observability", "data_storage")
+
+PARALLEL_PIPELINE = PipelineGraph(
+    name="parallel",
+    stages=(
+        Stage("writer", "writer", meta={"waf_pillar": "-"}),
+        Stage("reliability", "reliab", ("writer",), {"parallel_group": "fanout-1", "waf_pillar": "Reliability"}),
+        Stage("cost", "cost", ("writer",), {"parallel_group": "fanout-1", "waf_pillar": "Cost Optimization"}),
+        Stage("networking", "networking", ("writer",), {"parallel_group": "fanout-1", "waf_pillar": "Networking"}),
+        Stage("observability", "observability", ("writer",), {"parallel_group": "fanout-1", "waf_pillar": "Observability"}),
+        Stage("data_storage", "data_storage", ("writer",), {"parallel_group": "fanout-1", "waf_pillar": "Data & Storage"}),
+        Stage("final", "final", _FANOUT, {"aggregator": "FinalEditor"}),
+    ),
+)
+
+_REVIEWS = ("identity", "naming", "reliability", "cost", "compliance")
+
+# Security reworks the draft first (later reviewers should see the hardened
+# design); the remaining reviewers only read that draft and run side by side.
+REVIEW_DAG_PIPELINE = PipelineGraph(
+    name="dag",
+    stages=(
+        Stage("writer", "writer", meta={"waf_pillar": "-"}),
+        Stage("security", "security", ("writer",), {"waf_pillar": "Security"}),
+        Stage("identity", "identity", ("security",), {"parallel_group": "review", "waf_pillar": "Identity & Governance"}),
+        Stage("naming", "naming", ("security",), {"parallel_group": "review", "waf_pillar": "Operational Excellence"}),
+        Stage("reliability", "reliab", ("security",), {"parallel_group": "review", "waf_pillar": "Reliability"}),
+        Stage("cost", "cost", ("security",), {"parallel_group": "review", "waf_pillar": "Cost Optimization"}),
+        Stage("compliance", "comp", ("security",), {"parallel_group": "review", "waf_pillar": "Compliance"}),
+        Stage("final", "final", _REVIEWS, {"aggregator": "FinalEditor"}),
+    ),
+)
+
+PIPELINE_PRESETS: Dict[str, PipelineGraph] = {
+    graph.name: graph for graph in (SEQUENTIAL_PIPELINE, PARALLEL_PIPELINE, REVIEW_DAG_PIPELINE)
+}
+
+
+def get_pipeline(mode: Optional[str]) -> PipelineGraph:
+    """Resolve a preset by name, defaulting to the sequential review chain."""
+    return PIPELINE_PRESETS.get((mode or "sequential").lower(), SEQUENTIAL_PIPELINE)
@@ -0,0 +1,442 @@
+# app/agents/team_runs.py
+"""Background execution of landing zone team runs.
+
+Team runs are submitted to `team_runs`, a bounded queue drained by
+`TEAM_RUN_WORKERS` worker tasks, rather than executed by the WebSocket or
+request that asked for them. A run therefore outlives the tab that started
+it: sockets and `GET /runs/{id}/events` only subscribe to its trace events,
+and its outcome (final text, diagram, IaC bundle, usage) is persisted in the
+checkpoint store for `GET /runs/{id}/result`.
+
+With `TEAM_RUN_EXECUTOR=process` runs execute in a pool of worker processes
+so the API process's event loop only serves requests. A child streams its
+trace events back and receives cancel requests through the broker, so this
+needs a cross-process `BROKER_BACKEND`; with the in-memory broker runs stay
+inline. A child runs under whatever is left of the run's deadline when it
+starts, so its stage budgets are sized exactly as they would be inline.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.agents.checkpoints import ORIGIN_KEY, RESULT_KEY, RUN_KEY, CheckpointStore, checkpoint_store
+from app.agents.landing_zone_team import parse_iac_formats
+from app.agents.pipeline import get_pipeline
+from app.core.broker import Broker
+from app.core.cancellation import RunCancelled, cancel_scope, run_cancellations
+from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded, deadline_scope, remaining
+from app.core.llm_gateway import Priority, llm_gateway
+from app.obs.coalescer import stream_stats
+from app.obs.timings import result_timings
+from app.obs.tracing import TraceEvent, Tracer, tracer
+from app.obs.usage import model_calls, usage_ledger
+
+logger = logging.getLogger(__name__)
+
+RUN_EXECUTORS = ("inline", "process")
+FINISHED_STATUSES = ("completed", "failed", "timed_out", "cancelled")
+SUMMARY_FIELDS = (
+    "run_id", "status", "pipeline", "review_protocol", "iac_formats", "resume", "conversation_id", "project_id", "error",
+    "submitted_at", "started_at", "finished_at",
+)
+
+
+class RunQueueFullError(Exception):
+    """`TEAM_RUN_QUEUE_SIZE` runs are already waiting for a worker."""
+
+
+@dataclass
+class TeamRun:
+    """A submitted run and, once finished, its outcome."""
+
+    run_id: str
+    prompt: str
+    pipeline: str = "sequential"
+    review_protocol: str = "rewrite"
+    iac_formats: List[str] = field(default_factory=list)   # generated during the run; others on first access
+    resume: bool = False
+    owner: Optional[str] = None
+    conversation_id: Optional[str] = None
+    project_id: Optional[str] = None
+    status: str = "queued"   # queued | running | completed | failed | timed_out | cancelled
+    error: Optional[str] = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = field(default=None, repr=False)
+    team: Any = field(default=None, repr=False)
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def summary(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in SUMMARY_FIELDS}
+
+    def outcome(self) -> Dict[str, Any]:
+        """What is persisted under `RESULT_KEY` once the run finishes."""
+        return {**self.summary(), **(self.result or {})}
+
+
+async def build_team_from_settings():
+    """Team for a run-queue child process, built from the process's own settings."""
+    from app.agents.landing_zone_team import get_landing_zone_team
+    from app.core.azure_client import AzureClientManager
+
+    clients = AzureClientManager()
+    await clients.initialize()
+    return get_landing_zone_team(clients.get_azure_architect_agent())
+
+
+def _result(run_id: str, outputs) -> Dict[str, Any]:
+    final_text, diagram, diagram_raw, iac_bundle, _ = outputs
+    return {
+        "message": final_text,
+        "diagram": diagram,
+        "diagram_raw": diagram_raw,
+        "iac": iac_bundle,
+        "usage": usage_ledger.run_totals(run_id),
+        "stream": stream_stats.run(run_id),
+        "timings": result_timings.run(run_id),
+        "model_calls": model_calls.run(run_id),
+    }
+
+
+async def _execute(team, run: Dict[str, Any]):
+    if run["resume"]:
+        return await team.resume_run(run["run_id"])
+    return await team.run_pipeline_traced(
+        get_pipeline(run["pipeline"]), run["prompt"], run_id=run["run_id"], review_protocol=run["review_protocol"],
+        iac_formats=run["iac_formats"],
+    )
+
+
+class TeamRunQueue:
+    """Bounded queue of team runs, the workers draining it and a registry of this process's recent runs."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        executor: Optional[str] = None,
+        history: Optional[int] = None,
+        store: Optional[CheckpointStore] = None,
+        run_tracer: Optional[Tracer] = None,
+        process_team_factory: Callable[[], Awaitable[Any]] = build_team_from_settings,
+    ) -> None:
+        self.workers = workers or settings.TEAM_RUN_WORKERS
+        self.queue_size = queue_size or settings.TEAM_RUN_QUEUE_SIZE
+        self.executor = executor or settings.TEAM_RUN_EXECUTOR
+        if self.executor not in RUN_EXECUTORS:
+            raise ValueError(f"Unknown team run executor: {self.executor}")
+        self.history = history or settings.TEAM_RUN_HISTORY
+        self.store = store or checkpoint_store
+        self.tracer = run_tracer or tracer
+        self.process_team_factory = process_team_factory
+        self._runs: "OrderedDict[str, TeamRun]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.submitted = 0
+        self.rejected = 0
+        self.finished: Dict[str, int] = {status: 0 for status in FINISHED_STATUSES}
+
+    async def start(self, broker: Optional[Broker] = None) -> None:
+        """Start the workers (and the process pool when configured)."""
+        if self.executor == "process":
+            if broker is None or broker.local_only:
+                logger.warning("TEAM_RUN_EXECUTOR=process needs a cross-process broker; running team runs inline")
+                self.executor = "inline"
+            elif self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._ensure_workers()
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers, self._queue = [], None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _ensure_workers(self) -> None:
+        # Workers belong to the running loop; a fresh loop (tests, a restarted app) gets fresh ones.
+        loop = asyncio.get_running_loop()
+        if self._queue is not None and self._workers and self._workers[0].get_loop() is loop:
+            return
+        self._queue = asyncio.Queue(self.queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def submit(
+        self,
+        team,
+        prompt: str,
+        pipeline: str = "sequential",
+        review_protocol: str = "rewrite",
+        iac_formats: Optional[List[str]] = None,
+        run_id: Optional[str] = None,
+        resume: bool = False,
+        owner: Optional[str] = None,
+        detached: bool = True,
+        conversation_id: Optional[str] = None,
+        project_id: Optional[str] = None,
+    ) -> TeamRun:
+        """Queue a run (or the resumption of `run_id`); raises `RunQueueFullError` when the queue is full.
+
+        A `detached` run keeps going when its owner disconnects. Unknown
+        `iac_formats` raise ValueError.
+        """
+        formats = list(parse_iac_formats(iac_formats))
+        self._ensure_workers()
+        if self._queue.full():
+            self.rejected += 1
+            raise RunQueueFullError(f"{self.queue_size} team runs already queued")
+        if resume:
+            self.tracer.reopen(run_id)
+        else:
+            run_id = run_id or self.tracer.new_run()
+            self.tracer.ensure_run(run_id)
+        run = TeamRun(
+            run_id=run_id, prompt=prompt, pipeline=pipeline, review_protocol=review_protocol,
+            iac_formats=formats, resume=resume,
+            owner=owner, conversation_id=conversation_id, project_id=project_id, team=team,
+        )
+        run_cancellations.register(run_id, owner=owner, detached=detached)
+        usage_ledger.bind_run(run_id, conversation_id=conversation_id, project_id=project_id)
+        self._runs[run_id] = run
+        self._runs.move_to_end(run_id)
+        self._trim()
+        self._queue.put_nowait(run)
+        self.submitted += 1
+        return run
+
+    def _trim(self) -> None:
+        finished = [run_id for run_id, run in self._runs.items() if run.finished]
+        for run_id in finished[: max(0, len(self._runs) - self.history)]:
+            del self._runs[run_id]
+
+    async def _work(self) -> None:
+        while True:
+            run = await self._queue.get()
+            try:
+                await self._run(run)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Team run %s crashed its worker", run.run_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, run: TeamRun) -> None:
+        if not run.resume:
+            await self._record_origin(run)
+        token = run_cancellations.get(run.run_id)
+        run.status, run.started_at = "running", time.time()
+        try:
+            with llm_gateway.priority(Priority.TEAM):
+                async with cancel_scope(token), deadline_scope(settings.TEAM_RUN_DEADLINE_SECONDS, label="team run"):
+                    if self._pool is not None:
+                        run.result = await self._run_in_process(run)
+                    else:
+                        run.result = _result(run.run_id, await _execute(run.team, self._job(run)))
+            run.status = "completed"
+        except RunCancelled as exc:
+            run.status, run.error = "cancelled", exc.reason
+        except asyncio.CancelledError:
+            run.status, run.error = "cancelled", "server shutting down"
+            raise
+        except DeadlineExceeded as exc:
+            run.status, run.error = "timed_out", str(exc)
+        except Exception as exc:
+            logger.error("Team run %s failed: %s", run.run_id, exc)
+            run.status, run.error = "failed", str(exc)
+        finally:
+            await self._finish(run)
+
+    async def _record_origin(self, run: TeamRun) -> None:
+        try:
+            await self.store.save(run.run_id, ORIGIN_KEY, {"owner": run.owner, "conversation_id": run.conversation_id})
+        except Exception as exc:
+            logger.warning("Failed to record the origin of team run %s: %s", run.run_id, exc)
+
+    async def _finish(self, run: TeamRun) -> None:
+        run.finished_at = time.time()
+        run.team = None
+        run_cancellations.release(run.run_id)
+        self.finished[run.status] += 1
+        try:
+            if run.status == "cancelled":
+                await self.tracer.emit(TraceEvent(
+                    run_id=run.run_id, step_id="run", agent="LandingZoneTeam", phase="cancelled",
+                    ts=time.time(), meta={}, progress={}, telemetry={}, error=run.error,
+                ))
+            await self.tracer.finish(run.run_id)
+            await self.store.save(run.run_id, RESULT_KEY, run.outcome())
+        except Exception as exc:
+            logger.warning("Failed to record the outcome of team run %s: %s", run.run_id, exc)
+        finally:
+            run.done.set()
+
+    @staticmethod
+    def _job(run: TeamRun) -> Dict[str, Any]:
+        return {
+            "run_id": run.run_id,
+            "prompt": run.prompt,
+            "pipeline": run.pipeline,
+            "review_protocol": run.review_protocol,
+            "iac_formats": run.iac_formats,
+            "resume": run.resume,
+        }
+
+    async def _run_in_process(self, run: TeamRun) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        job = {**self._job(run), "deadline": remaining()}
+        child = loop.run_in_executor(self._pool, _run_in_child, self.process_team_factory, job)
+        try:
+            outcome = await asyncio.shield(child)
+        except asyncio.CancelledError:
+            # This token is already cancelled here, so the request goes out over the broker to the child.
+            token = run_cancellations.get(run.run_id)
+            run_cancellations.request_cancel(run.run_id, token.reason if token and token.cancelled else "cancelled")
+            try:
+                await asyncio.wait_for(asyncio.shield(child), settings.WS_SEND_TIMEOUT_SECONDS)
+            except Exception:
+                pass
+            raise
+        if outcome["status"] == "cancelled":
+            raise RunCancelled(outcome["error"])
+        if outcome["status"] == "timed_out":
+            raise DeadlineExceeded(outcome["error"])
+        if outcome["status"] != "completed":
+            raise RuntimeError(outcome["error"])
+        return outcome["result"]
+
+    async def wait(self, run_id: str) -> TeamRun:
+        """Wait for a run of this process to finish; cancelling the wait leaves the run running."""
+        run = self._runs[run_id]
+        await run.done.wait()
+        return run
+
+    def get(self, run_id: str) -> Optional[TeamRun]:
+        return self._runs.get(run_id)
+
+    def list(self) -> List[TeamRun]:
+        """This process's recent runs, newest first."""
+        return list(reversed(self._runs.values()))
+
+    async def lookup(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Summary of a run from this process or, failing that, from the store."""
+        run = self._runs.get(run_id)
+        if run is not None:
+            return run.summary()
+        records = await self.store.load(run_id)
+        return _persisted_summary(run_id, records.get(RUN_KEY), records.get(RESULT_KEY))
+
+    async def may_resume(self, run_id: str, client_id: str, conversation_id: Optional[str]) -> bool:
+        """Whether `client_id` started `run_id` or asks from the run's conversation.
+
+        Runs started without an owner or a conversation (e.g. `POST /runs`
+        without one) can be resumed by anyone.
+        """
+        origin = (await self.store.load(run_id)).get(ORIGIN_KEY) or {}
+        owner, conversation = origin.get("owner"), origin.get("conversation_id")
+        if owner is None and conversation is None:
+            return True
+        return client_id == owner or (conversation is not None and conversation == conversation_id)
+
+    async def result(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """The persisted outcome of a finished run, or None."""
+        run = self._runs.get(run_id)
+        if run is not None and run.finished:
+            return run.outcome()
+        return (await self.store.load(run_id)).get(RESULT_KEY)
+
+    async def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Recent runs of this process plus those persisted by other processes, newest first."""
+        summaries = [run.summary() for run in self.list()[:limit]]
+        seen = {summary["run_id"] for summary in summaries}
+        for run_id, record, _ in await self.store.runs(limit):
+            if run_id not in seen and len(summaries) < limit:
+                summaries.append(_persisted_summary(run_id, record, None))
+        return summaries
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": "process" if self._pool is not None else "inline",
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": sum(1 for run in self._runs.values() if run.status == "running"),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            **self.finished,
+        }
+
+
+def _persisted_summary(run_id: str, record: Optional[Dict[str, Any]], outcome: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if outcome is not None:
+        return {name: outcome.get(name) for name in SUMMARY_FIELDS}
+    if record is None:
+        return None
+    # Written by the team as the run progressed; "running" here may mean the process died (see resume_run).
+    return {
+        "run_id": run_id,
+        "status": record.get("status"),
+        "pipeline": record.get("pipeline"),
+        "review_protocol": record.get("review_protocol"),
+        "iac_formats": record.get("iac_formats"),
+        "error": record.get("error"),
+    }
+
+
+# -- child processes ---------------------------------------------------------
+
+_child_loop: Optional[asyncio.AbstractEventLoop] = None
+_child_team = None
+
+
+def _run_in_child(team_factory: Callable[[], Awaitable[Any]], job: Dict[str, Any]) -> Dict[str, Any]:
+    """Entry point in a pool process; its loop, broker connection and team persist across runs."""
+    global _child_loop
+    if _child_loop is None:
+        _child_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_child_loop)
+    return _child_loop.run_until_complete(_child_run(team_factory, job))
+
+
+async def _child_run(team_factory: Callable[[], Awaitable[Any]], job: Dict[str, Any]) -> Dict[str, Any]:
+    global _child_team
+    if _child_team is None:
+        from app.core.broker import broker
+
+        await broker.start()
+        await tracer.connect_broker(broker)
+        await run_cancellations.connect_broker(broker)
+        _child_team = await team_factory()
+    run_id = job["run_id"]
+    tracer.ensure_run(run_id)
+    token = run_cancellations.register(run_id)
+    try:
+        with llm_gateway.priority(Priority.TEAM):
+            async with cancel_scope(token), deadline_scope(job.get("deadline"), label="team run"):
+                outputs = await _execute(_child_team, job)
+        return {"status": "completed", "result": _result(run_id, outputs)}
+    except RunCancelled as exc:
+        return {"status": "cancelled", "error": exc.reason}
+    except DeadlineExceeded as exc:
+        return {"status": "timed_out", "error": str(exc)}
+    except Exception as exc:
+        return {"status": "failed", "error": str(exc)}
+    finally:
+        run_cancellations.release(run_id)
+
+
+team_runs = TeamRunQueue()
@@ -10,6 +10,8 @@ from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel, Field
 
 from app.core.azure_client import AzureClientManager
+from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded, deadline_scope
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -85,11 +87,12 @@ async def send_message(
         agent = azure_clients.get_azure_architect_agent()
 
         # Send message to agent with contextual summary/history
-        response_text = await agent.chat(
-            chat_request.message,
-            conversation_history=conversation_history,
-            context=chat_request.context or None,
-        )
+        async with deadline_scope(settings.CHAT_DEADLINE_SECONDS, label="chat request"):
+            response_text = await agent.chat(
+                chat_request.message,
+                conversation_history=conversation_history,
+                context=chat_request.context or None,
+            )
         
         # Create response
         now = datetime.utcnow()
@@ -117,6 +120,9 @@ async def send_message(
         logger.info(f"Processed chat message for conversation {conversation_id}")
         return chat_response
         
+    except DeadlineExceeded as e:
+        logger.warning(f"Chat message timed out: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to process chat message: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
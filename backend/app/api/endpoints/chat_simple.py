@@ -5,11 +5,14 @@ import os
 from pathlib import Path
 from typing import List, Dict, Any
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+from app.core.llm_gateway import llm_gateway
+from app.core.model_client import get_model_client
+
 # Load environment variables from the correct path
 backend_dir = Path(__file__).parent.parent.parent.parent  # Go up to backend directory
 env_path = backend_dir / ".env"
@@ -18,27 +21,6 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize OpenAI client
-openai_client = None
-use_openai = os.getenv("USE_OPENAI_FALLBACK")
-api_key = os.getenv("OPENAI_API_KEY")
-
-logger.info(f"🔍 Debug - ENV file path: {env_path}")
-logger.info(f"🔍 Debug - ENV file exists: {env_path.exists()}")
-logger.info(f"🔍 Debug - USE_OPENAI_FALLBACK: '{use_openai}'")
-logger.info(f"🔍 Debug - OPENAI_API_KEY exists: {bool(api_key)}")
-if api_key:
-    logger.info(f"🔍 Debug - API_KEY starts with: {api_key[:10]}...")
-
-if use_openai == "true" and api_key:
-    try:
-        openai_client = OpenAI(api_key=api_key)
-        logger.info("✅ OpenAI client initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize OpenAI client: {e}")
-else:
-    logger.warning(f"⚠️ OpenAI client not initialized - USE_OPENAI_FALLBACK: '{use_openai}', API_KEY exists: {bool(api_key)}")
-
 
 class ChatMessage(BaseModel):
     """Chat message model."""
@@ -63,7 +45,10 @@ class ChatResponse(BaseModel):
 
 
 @router.post("/", response_model=ChatResponse)
-async def chat_completion(request: ChatRequest) -> ChatResponse:
+async def chat_completion(
+    request: ChatRequest,
+    openai_client: AsyncOpenAI | None = Depends(get_model_client),
+) -> ChatResponse:
     """Process chat completion request."""
     try:
         logger.info(f"Received chat request: message='{request.message}', history_length={len(request.conversation_history)}")
@@ -149,9 +134,12 @@ Be helpful, accurate, and concise in your responses."""
             
             logger.info(f"Sending {len(messages)} messages to OpenAI")
             
-            # Call OpenAI API
-            response = openai_client.chat.completions.create(
-                model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            # Call OpenAI API on the shared async client
+            model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+            response = await llm_gateway.call(
+                model,
+                openai_client.chat.completions.create,
+                model=model,
                 messages=messages,
                 max_tokens=1000,
                 temperature=0.7
@@ -5,18 +5,16 @@ import base64
 import logging
 import json
 import re
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional, Literal
 import os
-import asyncio
 from dotenv import load_dotenv
-try:
-    # Prefer the async client when available so we don't block the event loop
-    from openai import AsyncOpenAI
-except Exception:
-    AsyncOpenAI = None
-import openai
+from app.core.json_extract import extract_json, find_json_spans
+from app.core.llm_gateway import llm_gateway
+from app.core.model_client import get_model_client
+
+from openai import AsyncOpenAI
 
 # Load environment variables
 load_dotenv()
@@ -24,100 +22,28 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# NOTE: We intentionally avoid creating a top-level OpenAI client here so that
-# env changes during startup won't leave a stale client. The endpoint will
-# create an AsyncOpenAI client per-request when needed (safe for async FastAPI).
+# NOTE: Model calls use the app-scoped pooled client owned by AzureClientManager
+# (see app.core.model_client); no client is created per request.
 
 
 def find_all_balanced_jsons(s: str) -> List[str]:
     """Return all balanced-brace substrings that look like JSON objects found in s."""
-    results = []
-    if not s:
-        return results
-    starts = [m.start() for m in re.finditer(r"\{", s)]
-    for start_idx in starts:
-        depth = 0
-        for i, ch in enumerate(s[start_idx:], start=start_idx):
-            if ch == '{':
-                depth += 1
-            elif ch == '}':
-                depth -= 1
-                if depth == 0:
-                    cand = s[start_idx:i+1]
-                    results.append(cand)
-                    break
-    return results
+    return [s[start:end] for start, end in find_json_spans(s)]
 
 
 def extract_json_from_text(text: Optional[str]) -> Optional[dict]:
     """Attempt to extract a JSON object from free-form assistant text.
 
-    Strategy:
-    - If fenced ```json blocks exist, scan their contents for balanced JSON candidates.
-    - Otherwise, scan the whole text for balanced JSON candidates.
-    - Try candidates from largest->smallest, attempt json.loads, then simple repairs.
-    - Return the first successfully decoded dict, or None.
+    Delegates to the shared single-pass extractor: fenced ```json blocks are
+    preferred, candidates are tried largest first, and trailing-comma / quote
+    repairs are applied before giving up.
     """
     if not text:
         return None
-
-    candidates: List[str] = []
-
-    # Prefer explicit fenced blocks first
-    fenced = re.findall(r"```(?:json)?\s*([\s\S]*?)\s*```", text, re.IGNORECASE)
-    if fenced:
-        for block in fenced:
-            block = block.strip()
-            logger.info('Found fenced JSON block preview: %s', block[:200])
-            candidates.extend(find_all_balanced_jsons(block) or [block])
-    else:
-        # No fences: try stripping triple-backticks then scanning
-        stripped = re.sub(r"```[a-zA-Z0-9_+-]*", "", text)
-        stripped = stripped.replace('```', '').strip()
-        logger.info('No fenced block - using stripped text preview: %s', (stripped or '')[:200])
-        candidates.extend(find_all_balanced_jsons(stripped))
-        # Also scan the original text as a fallback
-        candidates.extend(find_all_balanced_jsons(text))
-
-    # Deduplicate while preserving order
-    seen = set()
-    uniq_candidates = []
-    for c in candidates:
-        if c and c not in seen:
-            seen.add(c)
-            uniq_candidates.append(c)
-
-    # Sort by length (largest first) - prefer full objects
-    uniq_candidates.sort(key=len, reverse=True)
-
-    for idx, cand in enumerate(uniq_candidates):
-        preview = (cand or '')[:400]
-        logger.info('Trying JSON candidate #%d (len=%d): %s', idx + 1, len(cand or ''), preview)
-        try:
-            parsed = json.loads(cand)
-            logger.info('Parsed JSON candidate #%d successfully', idx + 1)
-            return parsed
-        except Exception as e:
-            logger.debug('Failed to json.loads candidate #%d: %s', idx + 1, str(e))
-            # Attempt simple repairs
-            # 1) Remove trailing commas before } or ]
-            repaired = re.sub(r",\s*(\}|\])", r"\1", cand)
-            try:
-                parsed = json.loads(repaired)
-                logger.info('Parsed repaired JSON candidate #%d successfully', idx + 1)
-                return parsed
-            except Exception:
-                pass
-            # 2) Replace single quotes with double quotes (best-effort)
-            try:
-                swapped = cand.replace("'", '"')
-                parsed = json.loads(swapped)
-                logger.info('Parsed single-quote-replaced candidate #%d successfully', idx + 1)
-                return parsed
-            except Exception:
-                pass
-
-    return None
+    parsed = extract_json(text)
+    if parsed is None:
+        logger.info('No parsable JSON object found in model output (len=%d)', len(text))
+    return parsed
 
 
 def normalize_connections(analysis_json: dict) -> List[dict]:
@@ -454,7 +380,11 @@ def build_group_structures(
     return list(groups.values())
 
 @router.post("/analyze-diagram", response_model=ImageAnalysisResponse)
-async def analyze_diagram(request: ImageAnalysisRequest, force_model: bool = False):
+async def analyze_diagram(
+    request: ImageAnalysisRequest,
+    force_model: bool = False,
+    model_client: Optional[AsyncOpenAI] = Depends(get_model_client),
+):
     """
     Analyze an uploaded architecture diagram using OpenAI Vision API
     """
@@ -493,96 +423,45 @@ async def analyze_diagram(request: ImageAnalysisRequest, force_model: bool = Fal
             """
 
 
-        # Call OpenAI Vision API using the async client if available. We send the
-        # image as an inline data:<mime>;base64,... URL in the user message text
-        # so that both async OpenAI clients and simple fallbacks can process it.
+        # Call the OpenAI Vision API on the app's shared async client. The image
+        # is sent as an inline data:<mime>;base64,... URL.
         response = None
         try:
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            if AsyncOpenAI is not None and openai_api_key:
-                logger.info("Using AsyncOpenAI client for vision analysis")
-                async_client = AsyncOpenAI(api_key=openai_api_key)
-                try:
-                    # Use proper OpenAI vision message format with separate image content
-                    messages = [
-                        {"role": "system", "content": system_prompt},
-                        {
-                            "role": "user", 
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": "Please analyze this Azure architecture diagram and identify all services and their connections."
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": image_data,
-                                        "detail": "low"  # Use "low" to reduce token usage
-                                    }
-                                }
-                            ]
-                        }
-                    ]
-                    # Cast to Any to avoid strict static type mismatch with the SDK
-                    from typing import Any
-                    messages_any: Any = messages
-                    response = await async_client.chat.completions.create(
-                        model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-                        messages=messages_any,
-                        max_tokens=1500,
-                        temperature=0.1
-                    )
-                finally:
-                    # Close the async client to free resources if supported.
-                    # The close helper may be sync or async depending on the SDK,
-                    # so call it and await only if it returns a coroutine.
-                    aclose = getattr(async_client, 'aclose', None) or getattr(async_client, 'close', None)
-                    if callable(aclose):
-                        try:
-                            maybe_coro = aclose()
-                            if asyncio.iscoroutine(maybe_coro):
-                                await maybe_coro
-                        except Exception:
-                            pass
-            else:
-                # Fall back to the synchronous OpenAI client if present (best-effort)
-                logger.info("AsyncOpenAI not available or OPENAI_API_KEY missing — trying sync client fallback")
-                try:
-                    # Some environments provide openai.OpenAI which may be sync
-                    sync_client = getattr(openai, 'OpenAI', None)
-                    if sync_client and os.getenv("OPENAI_API_KEY"):
-                        client = sync_client(api_key=os.getenv("OPENAI_API_KEY"))
-                        messages = [
-                            {"role": "system", "content": system_prompt},
+            if model_client is not None:
+                logger.info("Using shared AsyncOpenAI client for vision analysis")
+                # Use proper OpenAI vision message format with separate image content
+                messages = [
+                    {"role": "system", "content": system_prompt},
+                    {
+                        "role": "user", 
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": "Please analyze this Azure architecture diagram and identify all services and their connections."
+                            },
                             {
-                                "role": "user", 
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": "Please analyze this Azure architecture diagram and identify all services and their connections."
-                                    },
-                                    {
-                                        "type": "image_url",
-                                        "image_url": {
-                                            "url": image_data,
-                                            "detail": "low"
-                                        }
-                                    }
-                                ]
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": image_data,
+                                    "detail": "low"  # Use "low" to reduce token usage
+                                }
                             }
                         ]
-                        # Cast messages to Any for compatibility with different SDK shapes
-                        from typing import Any
-                        messages_any: Any = messages
-                        response = client.chat.completions.create(
-                            model=os.getenv("OPENAI_MODEL", "gpt-4o"),
-                            messages=messages_any,
-                            max_tokens=1500,
-                            temperature=0.1
-                        )
-                except Exception as e:
-                    logger.warning("Sync OpenAI client call failed: %s", e)
-                    response = None
+                    }
+                ]
+                # Cast to Any to avoid strict static type mismatch with the SDK
+                messages_any: Any = messages
+                vision_model = os.getenv("OPENAI_MODEL", "gpt-4o")
+                response = await llm_gateway.call(
+                    vision_model,
+                    model_client.chat.completions.create,
+                    model=vision_model,
+                    messages=messages_any,
+                    max_tokens=1500,
+                    temperature=0.1
+                )
+            else:
+                logger.info("No model client configured — skipping vision model call")
         except Exception as e:
             logger.error("Failed to call OpenAI (vision) client: %s", e)
             response = None
@@ -16,6 +16,9 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 
 from app.core.azure_client import AzureClientManager
+from app.core.config import settings
+from app.core.deadlines import DeadlineExceeded, deadline_scope
+from app.core.llm_gateway import Priority, llm_gateway
 from app.iac_generators import generate_bicep_code, generate_terraform_code
 from app.iac_generators.validation import validate_iac_with_cli
 from app.iac_generators.enrichment import enrich_diagram_with_governance
@@ -78,21 +81,24 @@ async def generate_iac(
         diagram, preflight = enrich_diagram_with_governance(diagram)
         target = (request_data.target_format or 'bicep').lower()
 
-        if target == 'bicep':
-            result = await generate_bicep_code(agent, diagram, use_model=request_data.use_model)
-            code_key = 'bicep_code'
-        elif target == 'terraform':
-            opts = {
-                'provider_version': request_data.provider_version,
-                'required_providers': request_data.required_providers,
-                'variables': request_data.variables,
-                'remote_backend': request_data.remote_backend,
-                'workspace': request_data.workspace,
-            }
-            result = await generate_terraform_code(agent, diagram, options=opts, use_model=request_data.use_model)
-            code_key = 'terraform_code'
-        else:
-            raise HTTPException(status_code=400, detail='Unsupported target format')
+        # IaC generation yields the model to interactive chat and team runs.
+        with llm_gateway.priority(Priority.BACKGROUND):
+            async with deadline_scope(settings.IAC_DEADLINE_SECONDS, label='IaC generation'):
+                if target == 'bicep':
+                    result = await generate_bicep_code(agent, diagram, use_model=request_data.use_model)
+                    code_key = 'bicep_code'
+                elif target == 'terraform':
+                    opts = {
+                        'provider_version': request_data.provider_version,
+                        'required_providers': request_data.required_providers,
+                        'variables': request_data.variables,
+                        'remote_backend': request_data.remote_backend,
+                        'workspace': request_data.workspace,
+                    }
+                    result = await generate_terraform_code(agent, diagram, options=opts, use_model=request_data.use_model)
+                    code_key = 'terraform_code'
+                else:
+                    raise HTTPException(status_code=400, detail='Unsupported target format')
 
         content = ''
         parameters: Dict[str, Any] = {}
@@ -172,6 +178,9 @@ async def generate_iac(
 
     except HTTPException:
         raise
+    except DeadlineExceeded as e:
+        logger.warning('IaC generation timed out: %s', e)
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.exception('Failed to generate IaC: %s', e)
         raise HTTPException(status_code=500, detail=f'Failed to generate IaC: {str(e)}')
@@ -10,6 +10,9 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 
 from app.core.azure_client import AzureClientManager
+from app.core.config import settings
+from app.core.deadlines import deadline_scope
+from app.core.llm_gateway import Priority, llm_gateway
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -64,11 +67,13 @@ async def generate_iac_mcp(
     try:
         agent = azure_clients.get_azure_architect_agent()
         
-        # Generate Bicep using MCP enhancement
-        result = await agent.generate_bicep_via_mcp(
-            diagram=request_data.diagram,
-            region=request_data.region
-        )
+        # Generate Bicep using MCP enhancement (background lane: yields to chat and team runs)
+        with llm_gateway.priority(Priority.BACKGROUND):
+            async with deadline_scope(settings.IAC_DEADLINE_SECONDS, label="MCP IaC request"):
+                result = await agent.generate_bicep_via_mcp(
+                    diagram=request_data.diagram,
+                    region=request_data.region
+                )
         
         bicep_code = result.get("bicep_code", "")
         parameters = result.get("parameters", {})
@@ -77,7 +82,9 @@ async def generate_iac_mcp(
         validation = {}
         if request_data.validate_output and bicep_code:
             try:
-                validation = await agent.validate_bicep_with_mcp(bicep_code)
+                with llm_gateway.priority(Priority.BACKGROUND):
+                    async with deadline_scope(settings.IAC_DEADLINE_SECONDS, label="MCP IaC request"):
+                        validation = await agent.validate_bicep_with_mcp(bicep_code)
             except Exception as e:
                 logger.warning(f"MCP validation failed: {e}")
                 validation = {"valid": False, "errors": [f"Validation error: {str(e)}"]}
@@ -107,7 +114,9 @@ async def validate_bicep_mcp(
     """Validate Bicep code using MCP tools."""
     try:
         agent = azure_clients.get_azure_architect_agent()
-        validation = await agent.validate_bicep_with_mcp(bicep_code)
+        with llm_gateway.priority(Priority.BACKGROUND):
+            async with deadline_scope(settings.IAC_DEADLINE_SECONDS, label="MCP IaC request"):
+                validation = await agent.validate_bicep_with_mcp(bicep_code)
         return validation
         
     except Exception as e:
@@ -128,11 +137,13 @@ async def generate_terraform_mcp(
     try:
         agent = azure_clients.get_azure_architect_agent()
         
-        # Generate Terraform using MCP enhancement
-        result = await agent.generate_terraform_via_mcp(
-            diagram=request_data.diagram,
-            provider=request_data.provider
-        )
+        # Generate Terraform using MCP enhancement (background lane)
+        with llm_gateway.priority(Priority.BACKGROUND):
+            async with deadline_scope(settings.IAC_DEADLINE_SECONDS, label="MCP IaC request"):
+                result = await agent.generate_terraform_via_mcp(
+                    diagram=request_data.diagram,
+                    provider=request_data.provider
+                )
         
         terraform_code = result.get("terraform_code", "")
         variables = result.get("variables", {})
@@ -143,10 +154,12 @@ async def generate_terraform_mcp(
         validation = {}
         if request_data.validate_output and terraform_code:
             try:
-                validation = await agent.validate_terraform_with_mcp(
-                    terraform_code, 
-                    provider=request_data.provider
-                )
+                with llm_gateway.priority(Priority.BACKGROUND):
+                    async with deadline_scope(settings.IAC_DEADLINE_SECONDS, label="MCP IaC request"):
+                        validation = await agent.validate_terraform_with_mcp(
+                            terraform_code,
+                            provider=request_data.provider
+                        )
             except Exception as e:
                 logger.warning(f"MCP Terraform validation failed: {e}")
                 validation = {"valid": False, "errors": [f"Validation error: {str(e)}"]}
@@ -179,7 +192,9 @@ async def validate_terraform_mcp(
     """Validate Terraform code using MCP tools."""
     try:
         agent = azure_clients.get_azure_architect_agent()
-        validation = await agent.validate_terraform_with_mcp(terraform_code, provider=provider)
+        with llm_gateway.priority(Priority.BACKGROUND):
+            async with deadline_scope(settings.IAC_DEADLINE_SECONDS, label="MCP IaC request"):
+                validation = await agent.validate_terraform_with_mcp(terraform_code, provider=provider)
         return validation
         
     except Exception as e:
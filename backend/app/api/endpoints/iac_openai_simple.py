@@ -8,13 +8,13 @@ from __future__ import annotations
 import os, json, logging
 from datetime import datetime
 from typing import Any, Dict
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from openai import AsyncOpenAI
 from pydantic import BaseModel
 
-try:
-    from openai import OpenAI
-except Exception:
-    OpenAI = None  # type: ignore
+from app.core.json_extract import extract_json
+from app.core.llm_gateway import Priority, llm_gateway
+from app.core.model_client import get_model_client
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -37,12 +37,14 @@ class IaCResponse(BaseModel):
 
 
 @router.post("/generate", response_model=IaCResponse)
-async def generate_iac_simple(req: IaCGenerateRequest) -> IaCResponse:
-    api_key = os.getenv("OPENAI_API_KEY")
+async def generate_iac_simple(
+    req: IaCGenerateRequest,
+    client: AsyncOpenAI | None = Depends(get_model_client),
+) -> IaCResponse:
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     
-    if not api_key or not OpenAI:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured or OpenAI package not available")
+    if client is None:
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured or model client not initialized")
 
     diagram = req.diagram_data if isinstance(req.diagram_data, dict) else {}
     target = (req.target_format or 'bicep').lower()
@@ -61,8 +63,6 @@ async def generate_iac_simple(req: IaCGenerateRequest) -> IaCResponse:
     parameters: Dict[str, Any] = {}
     
     try:
-        client = OpenAI(api_key=api_key)
-        
         if target == 'bicep':
             instruction = (
                 "You are an Azure IaC generator. Given the JSON under 'diagram', generate a comprehensive Bicep template. "
@@ -83,7 +83,10 @@ async def generate_iac_simple(req: IaCGenerateRequest) -> IaCResponse:
             {"role": "system", "content": instruction},
             {"role": "user", "content": json.dumps(payload)}
         ]
-        resp = client.chat.completions.create(model=model, messages=messages, temperature=0.2)
+        resp = await llm_gateway.call(
+            model, client.chat.completions.create,
+            priority=Priority.BACKGROUND, model=model, messages=messages, temperature=0.2,
+        )
         text = resp.choices[0].message.content if resp.choices else ""
         
         if not text:
@@ -92,28 +95,7 @@ async def generate_iac_simple(req: IaCGenerateRequest) -> IaCResponse:
         logger.debug("Raw OpenAI response: %s", text[:2000])
 
         # Try parse JSON
-        def extract_json(txt: str):
-            start = txt.find("{")
-            if start == -1: return None
-            depth = 0
-            for i, ch in enumerate(txt[start:]):
-                if ch == '{': depth += 1
-                elif ch == '}':
-                    depth -= 1
-                    if depth == 0:
-                        end = start + i + 1
-                        try:
-                            return json.loads(txt[start:end])
-                        except Exception:
-                            return None
-            return None
-            
-        parsed = extract_json(text)
-        if not parsed:
-            try:
-                parsed = json.loads(text) if text.strip().startswith('{') else None
-            except:
-                parsed = None
+        parsed = extract_json(text, lambda value: isinstance(value, dict) and bool(value.get(code_key)))
                 
         if parsed and isinstance(parsed, dict) and parsed.get(code_key):
             content = parsed.get(code_key, "")
@@ -0,0 +1,86 @@
+"""Operational metrics endpoints for monitoring."""
+
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from app.core.broker import broker
+from app.core.cancellation import run_cancellations
+from app.core.llm_gateway import llm_gateway
+from app.iac_generators.cache import iac_cache
+from app.obs.coalescer import stream_stats
+from app.obs.timings import result_timings
+from app.obs.tracing import tracer
+from app.obs.usage import model_calls
+
+router = APIRouter()
+
+
+@router.get("/iac-cache")
+async def iac_cache_metrics() -> Dict[str, Any]:
+    """Hit/miss/coalesce counters for the IaC result cache."""
+    return iac_cache.stats()
+
+
+@router.get("/teams")
+async def team_registry_metrics() -> Dict[str, Any]:
+    """Build/reuse counters for the shared LandingZoneTeam registry."""
+    from app.agents.landing_zone_team import team_registry
+    return team_registry.stats()
+
+
+@router.get("/checkpoints")
+async def checkpoint_metrics() -> Dict[str, Any]:
+    """Team run checkpoint saves, stage restores on resume and store errors."""
+    from app.agents.checkpoints import checkpoint_store
+    return checkpoint_store.stats()
+
+
+@router.get("/llm")
+async def llm_gateway_metrics() -> Dict[str, Any]:
+    """Per-model concurrency limits, queue depth by priority lane and throttle counts."""
+    return llm_gateway.stats()
+
+
+@router.get("/tracer")
+async def tracer_metrics() -> Dict[str, Any]:
+    """Buffered runs/events, live listeners and eviction counters for the run tracer."""
+    return tracer.stats()
+
+
+@router.get("/streams")
+async def stream_metrics() -> Dict[str, Any]:
+    """Chunks in vs frames out and delivery CPU for coalesced token streams."""
+    return stream_stats.stats()
+
+
+@router.get("/results")
+async def result_timing_metrics() -> Dict[str, Any]:
+    """Time from team run start to the first usable result and to the complete result."""
+    return result_timings.stats()
+
+
+@router.get("/model-calls")
+async def model_call_metrics() -> Dict[str, Any]:
+    """Average model calls per team run, against always generating every IaC artifact eagerly."""
+    return model_calls.stats()
+
+
+@router.get("/broker")
+async def broker_metrics() -> Dict[str, Any]:
+    """Pub/sub backend, connection state and publish/deliver counters."""
+    return broker.stats()
+
+
+@router.get("/runs")
+async def run_metrics() -> Dict[str, Any]:
+    """Cancellable runs in flight on this worker, how many were cancelled and the team run queue."""
+    from app.agents.team_runs import team_runs
+    return {**run_cancellations.stats(), "queue": team_runs.stats()}
+
+
+@router.get("/websockets")
+async def websocket_metrics() -> Dict[str, Any]:
+    """Open connections and conversation broadcast delivered/dropped counts."""
+    from app.websockets.handlers import manager
+    return manager.stats()
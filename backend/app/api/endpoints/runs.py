@@ -1,13 +1,189 @@
 # app/api/endpoints/runs.py
-from fastapi import APIRouter
+"""Landing zone team runs: submission, registry, results and event streams.
+
+`POST /runs` queues a team run on the background run queue and returns at
+once; `GET /runs`, `GET /runs/{run_id}` and `GET /runs/{run_id}/result`
+report on runs of this worker and, through the checkpoint store, of other
+workers and earlier processes. IaC formats the run did not generate
+(`iac_formats`) are produced on first `GET /runs/{run_id}/artifacts/{format}`.
+
+The event stream of a run carries its trace events.
+
+Every event carries the run's sequence number as its SSE `id`. When a proxy
+drops the connection, EventSource reconnects with `Last-Event-ID` and the
+stream resumes from the run log, replaying only what the client missed.
+Idle streams get a keep-alive comment every `SSE_HEARTBEAT_SECONDS`. A
+finished run ends with an `end` event, after which the server closes the
+stream.
+
+A consumer that owns the run's result (a script, not a browser tab that
+EventSource will reconnect) can pass `cancel_on_disconnect=true` so closing
+the stream cancels the run; `POST /runs/{run_id}/cancel` cancels explicitly.
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator, List, Optional, Union
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.agents.checkpoints import CheckpointNotFoundError
+from app.agents.landing_zone_team import IAC_FORMATS, get_landing_zone_team
+from app.agents.pipeline import get_pipeline
+from app.agents.team_runs import RunQueueFullError, team_runs
+from app.core.azure_client import AzureClientManager
+from app.core.cancellation import run_cancellations
+from app.core.config import settings
 from app.obs.tracing import tracer
 
 router = APIRouter()
 
+
+class RunRequest(BaseModel):
+    message: str
+    mode: str = "sequential"
+    review_protocol: Optional[str] = None
+    iac_formats: Optional[Union[str, List[str]]] = None   # none | both | bicep | terraform
+    conversation_id: Optional[str] = None
+    project_id: Optional[str] = None
+
+
+def get_azure_clients(request: Request) -> AzureClientManager:
+    """Dependency to get Azure clients from app state."""
+    return request.app.state.azure_clients
+
+
+def _resume_point(header: Optional[str], query: Optional[str]) -> Optional[int]:
+    for value in (header, query):
+        if value is not None and value.strip().isdigit():
+            return int(value)
+    return None
+
+
+async def _event_source(run_id: str, after: Optional[int], cancel_on_disconnect: bool = False) -> AsyncIterator[str]:
+    queue = tracer.attach(run_id, after=after, with_ids=True)
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        while True:
+            try:
+                async with asyncio.timeout(settings.SSE_HEARTBEAT_SECONDS):
+                    item = await queue.get()
+            except TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            seq, data = item
+            yield f"id: {seq}\ndata: {data}\n\n"
+        # The stream also ends when a lagging listener is disconnected; then the
+        # client should reconnect and resume, so only a finished run gets `end`.
+        if tracer.is_finished(run_id):
+            end = {"run_id": run_id, "last_event_id": tracer.last_seq(run_id)}
+            yield f"event: end\ndata: {json.dumps(end)}\n\n"
+    except (GeneratorExit, asyncio.CancelledError):
+        # The client went away (not a lag disconnect, which ends the loop above).
+        if cancel_on_disconnect and not tracer.is_finished(run_id):
+            run_cancellations.request_cancel(run_id, "event stream closed")
+        raise
+    finally:
+        tracer.detach(run_id, queue)
+
+
 @router.get("/runs/{run_id}/events")
-async def stream_run(run_id: str):
-    async def event_source():
-        async for item in tracer.stream(run_id):
-            yield f"data: {item}\n\n"   # SSE format
-    return StreamingResponse(event_source(), media_type="text/event-stream")
+async def stream_run(
+    run_id: str,
+    last_event_id: Optional[str] = Header(default=None),
+    resume_after: Optional[str] = Query(default=None, alias="last_event_id"),
+    cancel_on_disconnect: bool = Query(default=False),
+):
+    """Stream (or resume) a run's trace events; 404 when the run is unknown or evicted."""
+    if not tracer.has_run(run_id):
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    return StreamingResponse(
+        _event_source(run_id, _resume_point(last_event_id, resume_after), cancel_on_disconnect),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/runs/{run_id}/cancel", status_code=202)
+async def cancel_run(run_id: str):
+    """Ask the worker executing `run_id` to cancel it; 409 once the run has finished."""
+    if not tracer.has_run(run_id):
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    if tracer.is_finished(run_id):
+        raise HTTPException(status_code=409, detail=f"Run {run_id} already finished")
+    local = run_cancellations.request_cancel(run_id, "cancelled via API")
+    return {"run_id": run_id, "cancel_requested": True, "local": local}
+
+
+@router.post("/runs", status_code=202)
+async def submit_run(body: RunRequest, azure_clients: AzureClientManager = Depends(get_azure_clients)):
+    """Queue a team run; follow it at /runs/{run_id}/events and fetch its outcome from /runs/{run_id}/result."""
+    if not body.message.strip():
+        raise HTTPException(status_code=400, detail="Message is required")
+    team = get_landing_zone_team(azure_clients.get_azure_architect_agent())
+    try:
+        run = team_runs.submit(
+            team,
+            body.message.strip(),
+            pipeline=get_pipeline(body.mode).name,
+            review_protocol=body.review_protocol or settings.TEAM_REVIEW_PROTOCOL,
+            iac_formats=body.iac_formats,
+            conversation_id=body.conversation_id,
+            project_id=body.project_id,
+        )
+    except RunQueueFullError as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return run.summary()
+
+
+@router.get("/runs")
+async def list_runs(limit: int = Query(default=50, ge=1, le=500)):
+    """Recent team runs, newest first."""
+    return {"runs": await team_runs.recent(limit), "queue": team_runs.stats()}
+
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """Status of a team run; 404 when it is unknown."""
+    summary = await team_runs.lookup(run_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    return summary
+
+
+@router.get("/runs/{run_id}/result")
+async def get_run_result(run_id: str):
+    """Outcome of a finished team run; 409 while it is still queued or running."""
+    result = await team_runs.result(run_id)
+    if result is not None:
+        return result
+    summary = await team_runs.lookup(run_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    raise HTTPException(status_code=409, detail=f"Run {run_id} is {summary['status']}")
+
+
+@router.get("/runs/{run_id}/artifacts/{iac_format}")
+async def get_run_artifact(
+    run_id: str, iac_format: str, azure_clients: AzureClientManager = Depends(get_azure_clients)
+):
+    """A finished run's Bicep or Terraform, generated from its final design on first access and cached."""
+    if iac_format not in IAC_FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unknown IaC format {iac_format}")
+    run = team_runs.get(run_id)
+    if run is not None and not run.finished:
+        raise HTTPException(status_code=409, detail=f"Run {run_id} is {run.status}")
+    team = get_landing_zone_team(azure_clients.get_azure_architect_agent())
+    try:
+        artifact, generated = await team.iac_artifact(run_id, iac_format)
+    except CheckpointNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} has no design to generate IaC from")
+    except RuntimeError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+    return {"run_id": run_id, "format": iac_format, "generated": generated, "artifact": artifact}
@@ -0,0 +1,34 @@
+"""Token usage queries for team runs, conversations and projects."""
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException
+
+from app.obs.usage import usage_ledger
+
+router = APIRouter()
+
+
+@router.get("/runs/{run_id}")
+async def run_usage(run_id: str) -> Dict[str, Any]:
+    """Totals plus per-step prompt/completion tokens, TTFT and tokens/sec for a run."""
+    usage = usage_ledger.run_usage(run_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return usage
+
+
+@router.get("/conversations/{conversation_id}")
+async def conversation_usage(conversation_id: str) -> Dict[str, Any]:
+    totals = usage_ledger.conversation_totals(conversation_id)
+    if totals is None:
+        raise HTTPException(status_code=404, detail="No usage recorded for conversation")
+    return {"conversation_id": conversation_id, "totals": totals}
+
+
+@router.get("/projects/{project_id}")
+async def project_usage(project_id: str) -> Dict[str, Any]:
+    totals = usage_ledger.project_totals(project_id)
+    if totals is None:
+        raise HTTPException(status_code=404, detail="No usage recorded for project")
+    return {"project_id": project_id, "totals": totals}
@@ -3,7 +3,7 @@
 from fastapi import APIRouter
 
 from app.api.endpoints import projects_simple, chat_simple, diagram_analysis
-from app.api.endpoints import deployment, iac_mcp, runs
+from app.api.endpoints import deployment, iac_mcp, runs, metrics, usage
 
 # iac endpoints depend on optional agent/azure libraries. Import lazily so the
 # main app can start in dev environments where those deps may be missing.
@@ -41,6 +41,8 @@ api_router.include_router(projects_simple.router, prefix="/projects", tags=["pro
 api_router.include_router(chat_simple.router, prefix="/chat", tags=["chat"])
 api_router.include_router(diagram_analysis.router, prefix="", tags=["diagram-analysis"])
 api_router.include_router(runs.router, prefix="", tags=["runs"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
+api_router.include_router(usage.router, prefix="/usage", tags=["usage"])
 
 # TODO: Add back full endpoints when agent framework issues are resolved
 # api_router.include_router(assets.router, prefix="/assets", tags=["assets"])
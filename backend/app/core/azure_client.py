@@ -11,6 +11,8 @@ from openai import AsyncOpenAI
 from agent_framework.openai import OpenAIAssistantsClient, OpenAIResponsesClient
 
 from app.core.config import settings
+from app.core.llm_gateway import llm_gateway
+from app.core.model_client import build_model_client
 
 logger = logging.getLogger(__name__)
 
@@ -34,8 +36,8 @@ class AzureClientManager:
         
         # Prefer explicit OpenAI fallback when configured via flag or API key.
         if settings.USE_OPENAI_FALLBACK or bool(settings.OPENAI_API_KEY):
-            # Initialize OpenAI clients
-            self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            # One pooled async client shared by the agent wrappers and every endpoint
+            self.openai_client = build_model_client()
             # Some wrappers require a model id at construction time; pass the
             # configured OPENAI_MODEL from settings to be explicit.
             self.openai_assistants_client = OpenAIAssistantsClient(
@@ -46,6 +48,9 @@ class AzureClientManager:
                 openai_client=self.openai_client,
                 model_id=settings.OPENAI_MODEL,
             )
+            # Every agent call on these clients goes through the shared model gateway.
+            llm_gateway.attach(self.openai_assistants_client, settings.OPENAI_MODEL)
+            llm_gateway.attach(self.openai_responses_client, settings.OPENAI_MODEL, hedge=True)
             
             # Initialize Azure Architect Agent with OpenAI client
             from app.agents.azure_architect_agent import AzureArchitectAgent
@@ -76,6 +81,7 @@ class AzureClientManager:
                 model_deployment_name=settings.AZURE_AI_MODEL_DEPLOYMENT_NAME,
                 credential=self.credential
             )
+            llm_gateway.attach(self.agent_client, settings.AZURE_AI_MODEL_DEPLOYMENT_NAME)
             
             # Initialize Azure Architect Agent with Azure clients
             from app.agents.azure_architect_agent import AzureArchitectAgent
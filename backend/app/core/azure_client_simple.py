@@ -6,6 +6,8 @@ from typing import Optional
 from openai import AsyncOpenAI
 
 from app.core.config import settings
+from app.core.llm_gateway import llm_gateway
+from app.core.model_client import build_model_client
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +25,7 @@ class AzureClientManager:
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is required")
             
-        self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.openai_client = build_model_client()
         logger.info("OpenAI client initialized successfully")
         
     async def cleanup(self) -> None:
@@ -46,8 +48,11 @@ class AzureClientManager:
         if not self.openai_client:
             raise RuntimeError("OpenAI client not initialized")
             
-        response = await self.openai_client.chat.completions.create(
-            model=model or settings.OPENAI_MODEL,
+        model = model or settings.OPENAI_MODEL
+        response = await llm_gateway.call(
+            model,
+            self.openai_client.chat.completions.create,
+            model=model,
             messages=messages,
             temperature=0.7,
             max_tokens=1000
@@ -0,0 +1,458 @@
+"""Pub/sub broker shared by the run tracer and websocket broadcasts.
+
+A single uvicorn worker uses `InMemoryBroker`. With several workers, choose a
+cross-process backend through `BROKER_BACKEND`:
+
+* ``memory``  in-process only (the default);
+* ``unix``    a small pub/sub hub on a Unix socket (`BROKER_SOCKET_PATH`). The
+              worker that takes the hub lock hosts it. If that worker exits,
+              another one takes over when the clients reconnect;
+* ``redis``   any Redis-protocol server at `BROKER_URL`.
+
+The hub implements the Redis pub/sub subset of the wire protocol
+(SUBSCRIBE, UNSUBSCRIBE, PUBLISH, PING), so ``unix`` and ``redis`` share one
+client. Delivery is at most once: a message published while a subscriber is
+reconnecting is not redelivered.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlsplit
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str], Awaitable[None]]
+
+BROKER_BACKENDS = ("memory", "unix", "redis")
+
+
+def channel(name: str) -> str:
+    """Namespace a channel name with `BROKER_CHANNEL_PREFIX`."""
+    return f"{settings.BROKER_CHANNEL_PREFIX}:{name}"
+
+
+class Broker:
+    """Publish/subscribe interface; `local_only` brokers never reach other processes."""
+
+    local_only = False
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def publish(self, channel: str, message: str) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        raise NotImplementedError
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self).__name__}
+
+
+class InMemoryBroker(Broker):
+    """Delivers to handlers in this process only."""
+
+    local_only = True
+
+    def __init__(self) -> None:
+        self._handlers: Dict[str, List[Handler]] = {}
+        self.published = 0
+
+    async def publish(self, channel: str, message: str) -> None:
+        self.published += 1
+        for handler in list(self._handlers.get(channel, ())):
+            try:
+                await handler(message)
+            except Exception:
+                logger.exception("Broker handler for %s failed", channel)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        handlers = self._handlers.get(channel, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self._handlers.pop(channel, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "channels": len(self._handlers), "published": self.published}
+
+
+# --- Redis wire protocol ---------------------------------------------------------
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+def _bulk(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def encode_command(*parts: str) -> bytes:
+    return b"*%d\r\n" % len(parts) + b"".join(_bulk(part) for part in parts)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Read one reply; error replies are returned (not raised) as `RespError`."""
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("broker connection closed")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        return RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        size = int(body)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        return data[:-2].decode("utf-8")
+    if kind == b"*":
+        size = int(body)
+        if size < 0:
+            return None
+        return [await read_reply(reader) for _ in range(size)]
+    raise ConnectionError(f"unexpected broker reply: {line[:40]!r}")
+
+
+class RespBroker(Broker):
+    """Pub/sub client for a Redis-protocol server (`redis://` or `unix://` URL).
+
+    Publishing uses one pipelined connection whose replies are drained in the
+    background. Subscriptions use a second connection that is re-established,
+    and its channels re-subscribed, whenever it drops.
+    """
+
+    def __init__(self, url: str, connect_timeout: float = 5.0) -> None:
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._confirm: Dict[str, asyncio.Future] = {}
+        self._pub: Optional[asyncio.StreamWriter] = None
+        self._pub_lock = asyncio.Lock()
+        self._pub_reader: Optional[asyncio.Task] = None
+        self._sub: Optional[asyncio.StreamWriter] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._closed = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        parts = urlsplit(self.url)
+        if parts.scheme == "unix":
+            reader, writer = await asyncio.open_unix_connection(unquote(parts.path))
+        else:
+            reader, writer = await asyncio.open_connection(parts.hostname or "localhost", parts.port or 6379)
+        if parts.password:
+            auth = [unquote(parts.username), unquote(parts.password)] if parts.username else [unquote(parts.password)]
+            writer.write(encode_command("AUTH", *auth))
+            reply = await read_reply(reader)
+            if isinstance(reply, RespError):
+                writer.close()
+                raise ConnectionError(f"broker AUTH failed: {reply}")
+        return reader, writer
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.wait_for(self._open(), self.connect_timeout)
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._closed = False
+            self._listener = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Broker at %s not reachable yet; retrying in the background", self.url)
+
+    async def close(self) -> None:
+        self._closed = True
+        for task in (self._listener, self._pub_reader):
+            if task is not None:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._listener = self._pub_reader = None
+        for writer in (self._sub, self._pub):
+            if writer is not None:
+                writer.close()
+                # Let already-written publishes reach the server before the loop goes away.
+                with contextlib.suppress(OSError, ConnectionError):
+                    await writer.wait_closed()
+        self._sub = self._pub = None
+        self._connected.clear()
+
+    async def _listen(self) -> None:
+        delay = 0.1
+        while not self._closed:
+            try:
+                reader, writer = await self._connect()
+                self._sub = writer
+                if self._handlers:
+                    writer.write(encode_command("SUBSCRIBE", *self._handlers))
+                    await writer.drain()
+                self._connected.set()
+                delay = 0.1
+                while True:
+                    reply = await read_reply(reader)
+                    if not isinstance(reply, list) or not reply:
+                        continue
+                    if reply[0] == "message":
+                        await self._dispatch(reply[1], reply[2])
+                    elif reply[0] == "subscribe":
+                        future = self._confirm.pop(reply[1], None)
+                        if future is not None and not future.done():
+                            future.set_result(None)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+                self._sub = None
+                self._connected.clear()
+                if self._closed:
+                    break
+                self.reconnects += 1
+                logger.warning("Broker subscriber connection to %s lost (%s); reconnecting", self.url, exc)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+    async def _dispatch(self, channel: str, message: str) -> None:
+        for handler in list(self._handlers.get(channel, ())):
+            self.delivered += 1
+            try:
+                await handler(message)
+            except Exception:
+                logger.exception("Broker handler for %s failed", channel)
+
+    async def subscribe(self, channel: str, handler: Handler) -> None:
+        """Register `handler`; returns once the server has confirmed a new channel."""
+        new = channel not in self._handlers
+        self._handlers.setdefault(channel, []).append(handler)
+        writer = self._sub
+        if not new or writer is None:
+            return   # subscribed when the listener (re)connects
+        future = self._confirm[channel] = asyncio.get_running_loop().create_future()
+        writer.write(encode_command("SUBSCRIBE", channel))
+        await writer.drain()
+        try:
+            await asyncio.wait_for(future, self.connect_timeout)
+        except asyncio.TimeoutError:
+            self._confirm.pop(channel, None)
+            logger.warning("Broker did not confirm subscription to %s", channel)
+
+    async def unsubscribe(self, channel: str, handler: Handler) -> None:
+        handlers = self._handlers.get(channel, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if handlers:
+            return
+        self._handlers.pop(channel, None)
+        if self._sub is not None:
+            self._sub.write(encode_command("UNSUBSCRIBE", channel))
+            await self._sub.drain()
+
+    async def _publisher(self) -> asyncio.StreamWriter:
+        if self._pub is not None and not self._pub.is_closing():
+            return self._pub
+        async with self._pub_lock:
+            if self._pub is None or self._pub.is_closing():
+                reader, writer = await self._connect()
+                self._pub = writer
+                self._pub_reader = asyncio.create_task(self._drain_replies(reader, writer))
+            return self._pub
+
+    async def _drain_replies(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                reply = await read_reply(reader)
+                if isinstance(reply, RespError):
+                    logger.warning("Broker rejected publish: %s", reply)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError):
+            if self._pub is writer:
+                self._pub = None
+            writer.close()
+
+    async def publish(self, channel: str, message: str) -> None:
+        """Publish without waiting for delivery; a broken connection is retried once."""
+        frame = encode_command("PUBLISH", channel, message)
+        for attempt in range(2):
+            try:
+                writer = await self._publisher()
+                writer.write(frame)
+                await writer.drain()
+                self.published += 1
+                return
+            except (OSError, ConnectionError, asyncio.TimeoutError) as exc:
+                self._pub = None
+                if attempt:
+                    self.dropped += 1
+                    logger.warning("Broker publish to %s dropped: %s", channel, exc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "url": self.url,
+            "connected": self._connected.is_set(),
+            "channels": len(self._handlers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
+
+# --- Unix socket hub -------------------------------------------------------------
+
+class BrokerHub:
+    """Minimal Redis-protocol pub/sub server used by the `unix` backend."""
+
+    def __init__(self, max_backlog_bytes: int = 8 * 1024 * 1024) -> None:
+        self.max_backlog_bytes = max_backlog_bytes
+        self._channels: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def serve_unix(self, path: str) -> None:
+        self._server = await asyncio.start_unix_server(self._client, path=path)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writers in self._channels.values():
+                for writer in writers:
+                    writer.close()
+            self._channels.clear()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _deliver(self, channel: str, message: str) -> int:
+        frame = encode_command("message", channel, message)
+        receivers = list(self._channels.get(channel, ()))
+        for peer in receivers:
+            if peer.transport.get_write_buffer_size() > self.max_backlog_bytes:
+                # A stalled subscriber is cut off; it reconnects and resumes live.
+                logger.warning("Broker hub disconnected a subscriber with %d bytes backlog", peer.transport.get_write_buffer_size())
+                peer.close()
+                continue
+            peer.write(frame)
+        return len(receivers)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscribed: Set[str] = set()
+        try:
+            while True:
+                command = await read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    writer.write(b"-ERR expected a command array\r\n")
+                    break
+                name = str(command[0]).upper()
+                if name == "PUBLISH" and len(command) == 3:
+                    writer.write(b":%d\r\n" % self._deliver(command[1], command[2]))
+                elif name in ("SUBSCRIBE", "UNSUBSCRIBE"):
+                    for channel in command[1:]:
+                        if name == "SUBSCRIBE":
+                            self._channels.setdefault(channel, set()).add(writer)
+                            subscribed.add(channel)
+                        else:
+                            self._channels.get(channel, set()).discard(writer)
+                            subscribed.discard(channel)
+                        writer.write(b"*3\r\n" + _bulk(name.lower()) + _bulk(channel) + b":%d\r\n" % len(subscribed))
+                elif name == "PING":
+                    writer.write(b"+PONG\r\n")
+                else:
+                    writer.write(b"-ERR unknown command '%s'\r\n" % name.encode())
+                await writer.drain()
+        except (OSError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                peers = self._channels.get(channel)
+                if peers is not None:
+                    peers.discard(writer)
+                    if not peers:
+                        self._channels.pop(channel, None)
+            writer.close()
+
+
+class UnixSocketBroker(RespBroker):
+    """`RespBroker` over a Unix socket, hosting the hub itself when none is running."""
+
+    def __init__(self, path: str, connect_timeout: float = 5.0) -> None:
+        super().__init__(f"unix://{path}", connect_timeout)
+        self.path = path
+        self.hub: Optional[BrokerHub] = None
+        self._lock_fd: Optional[int] = None
+        self._host_lock = asyncio.Lock()
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        try:
+            return await super()._connect()
+        except (FileNotFoundError, ConnectionRefusedError):
+            async with self._host_lock:
+                await self._take_over_hub()
+            return await super()._connect()
+
+    async def _take_over_hub(self) -> None:
+        """Host the hub if no live process holds the hub lock (released when its holder exits)."""
+        if self.hub is not None:
+            return
+        import fcntl
+
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            await asyncio.sleep(0.05)   # the holder is hosting (or about to); let it bind
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)   # stale socket left by a host that exited
+        hub = BrokerHub()
+        await hub.serve_unix(self.path)
+        self.hub, self._lock_fd = hub, fd
+        logger.info("Hosting broker hub on %s (pid %d)", self.path, os.getpid())
+
+    async def close(self) -> None:
+        await super().close()
+        if self.hub is not None:
+            await self.hub.close()
+            self.hub = None
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "backend": "unix", "hosting_hub": self.hub is not None}
+
+
+def build_broker(backend: Optional[str] = None) -> Broker:
+    backend = backend or settings.BROKER_BACKEND
+    if backend == "memory":
+        return InMemoryBroker()
+    if backend == "unix":
+        return UnixSocketBroker(settings.BROKER_SOCKET_PATH)
+    if backend == "redis":
+        return RespBroker(settings.BROKER_URL)
+    raise ValueError(f"Unknown broker backend: {backend} (expected one of {', '.join(BROKER_BACKENDS)})")
+
+
+broker = build_broker()
@@ -0,0 +1,159 @@
+"""Run cancellation that reaches every model call underneath.
+
+A run opens `cancel_scope(token)` once, the way endpoints open a deadline
+scope. The token lives in a context variable, so pipeline stages, IaC
+generation and MCP calls spawned inside the scope all see it. Cancelling the
+token (client disconnect, `cancel_run`, an event-stream consumer going away)
+cancels the task that opened the scope, which aborts in-flight streams. Model
+calls also check the token before they start (`checkpoint()`), so code that
+catches the cancellation cannot go on to make another paid call.
+
+`run_cancellations` maps run ids to their tokens and owners so transports
+that did not start a run can still stop it, on any worker once connected to
+the broker.
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from app.core.broker import Broker, channel
+
+logger = logging.getLogger(__name__)
+
+
+class RunCancelled(asyncio.CancelledError):
+    """The run was cancelled through its token; `reason` says who asked."""
+
+    def __init__(self, reason: str = "cancelled") -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancellationToken:
+    """Cancellation flag for one run plus the scope tasks it interrupts."""
+
+    def __init__(self, run_id: Optional[str] = None, owner: Optional[str] = None, detached: bool = False) -> None:
+        self.run_id = run_id
+        self.owner = owner
+        self.detached = detached   # keeps running when its owner disconnects
+        self.reason: Optional[str] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._interrupted: Set[asyncio.Task] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the run; False if it was already cancelled."""
+        if self.cancelled:
+            return False
+        self.reason = reason
+        logger.info("Cancelling run %s: %s", self.run_id, reason)
+        for task in self._tasks:
+            if not task.done():
+                task.cancel(reason)
+                self._interrupted.add(task)
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        if self.reason is not None:
+            raise RunCancelled(self.reason)
+
+
+_current: ContextVar[Optional[CancellationToken]] = ContextVar("run_cancellation", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current.get()
+
+
+def checkpoint() -> None:
+    """Raise `RunCancelled` if the current run has been cancelled."""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+@asynccontextmanager
+async def cancel_scope(token: CancellationToken) -> AsyncIterator[CancellationToken]:
+    """Run the block under `token`; its cancellation surfaces as `RunCancelled`."""
+    task = asyncio.current_task()
+    reset = _current.set(token)
+    token._tasks.add(task)
+    try:
+        token.raise_if_cancelled()
+        yield token
+    except asyncio.CancelledError as exc:
+        # Undo only the cancel the token requested; an outer cancel still propagates as is.
+        if task in token._interrupted and task.uncancel() == 0 and not isinstance(exc, RunCancelled):
+            raise RunCancelled(token.reason) from None
+        raise
+    finally:
+        token._tasks.discard(task)
+        token._interrupted.discard(task)
+        _current.reset(reset)
+
+
+class RunCancellations:
+    """Tokens of in-flight runs, by run id."""
+
+    def __init__(self) -> None:
+        self._tokens: Dict[str, CancellationToken] = {}
+        self._publishing: Set[asyncio.Task] = set()
+        self.broker: Optional[Broker] = None
+        self.cancelled = 0
+
+    async def connect_broker(self, broker: Broker) -> None:
+        """Let cancel requests reach runs executing on other workers."""
+        self.broker = broker
+        if not broker.local_only:
+            await broker.subscribe(channel("cancellations"), self._on_broker_message)
+
+    async def _on_broker_message(self, message: str) -> None:
+        request = json.loads(message)
+        self.cancel(request["run_id"], request.get("reason", "cancelled"))
+
+    def register(self, run_id: str, owner: Optional[str] = None, detached: bool = False) -> CancellationToken:
+        token = self._tokens[run_id] = CancellationToken(run_id, owner, detached)
+        return token
+
+    def release(self, run_id: str) -> None:
+        self._tokens.pop(run_id, None)
+
+    def get(self, run_id: str) -> Optional[CancellationToken]:
+        return self._tokens.get(run_id)
+
+    def owned_by(self, owner: str) -> List[CancellationToken]:
+        return [token for token in self._tokens.values() if token.owner == owner]
+
+    def cancel(self, run_id: str, reason: str = "cancelled", owner: Optional[str] = None) -> bool:
+        """Cancel `run_id` (only if started by `owner`, when given); False if unknown or already cancelled."""
+        token = self._tokens.get(run_id)
+        if token is None or (owner is not None and token.owner != owner):
+            return False
+        if not token.cancel(reason):
+            return False
+        self.cancelled += 1
+        return True
+
+    def request_cancel(self, run_id: str, reason: str = "cancelled") -> bool:
+        """Cancel `run_id` wherever it runs; True if it was running on this worker."""
+        if self.cancel(run_id, reason):
+            return True
+        if self.broker is not None and not self.broker.local_only:
+            message = json.dumps({"run_id": run_id, "reason": reason})
+            task = asyncio.create_task(self.broker.publish(channel("cancellations"), message))
+            self._publishing.add(task)
+            task.add_done_callback(self._publishing.discard)
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._tokens), "cancelled": self.cancelled}
+
+
+run_cancellations = RunCancellations()
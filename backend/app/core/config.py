@@ -67,12 +67,109 @@ class Settings(BaseSettings):
     
     # Chat and WebSocket
     CHAT_MAX_HISTORY: int = Field(default=50, description="Max chat history messages")
-    WEBSOCKET_PING_INTERVAL: int = Field(default=30, description="WebSocket ping interval")
+    WEBSOCKET_PING_INTERVAL: int = Field(default=30, description="Seconds between server heartbeat pings to WebSocket clients (0 disables)")
+    WS_IDLE_TIMEOUT_SECONDS: float = Field(
+        default=90.0,
+        description="Close a WebSocket that sends nothing (not even a heartbeat pong) for this long (0 disables)",
+    )
+    WS_SEND_TIMEOUT_SECONDS: float = Field(default=5.0, description="Per-frame send timeout for a client's outbound writer; a client that misses it is disconnected")
+    WS_OUTBOUND_QUEUE_SIZE: int = Field(default=256, description="Frames buffered per WebSocket client before the slow-client policy applies")
+    WS_SLOW_CLIENT_POLICY: str = Field(
+        default="drop_deltas",
+        description="Full client queue: 'drop_deltas' (drop progress frames, then disconnect) or 'disconnect'",
+    )
+    WS_MAX_CONCURRENT_TASKS: int = Field(default=4, description="Chat/team/analysis requests a WebSocket client may have in flight")
+    WS_BINARY_FRAMES_ENABLED: bool = Field(
+        default=True,
+        description="Accept the azviz.msgpack.v1 subprotocol (MessagePack frames; needs the msgpack package)",
+    )
+    TRACE_BUFFER_EVENTS: int = Field(default=2000, description="Trace events kept per run for replay to late subscribers")
+    TRACE_SUBSCRIBER_QUEUE_SIZE: int = Field(default=1000, description="Max queued trace events per listener")
+    TRACE_OVERFLOW_POLICY: str = Field(
+        default="coalesce",
+        description="Slow trace listener policy: 'coalesce' (merge deltas), 'drop_oldest' or 'disconnect'",
+    )
+    TRACE_RUN_TTL_SECONDS: float = Field(default=900.0, description="How long a finished run's trace log is kept")
+    TRACE_IDLE_RUN_TTL_SECONDS: float = Field(default=3600.0, description="Evict unfinished runs idle this long")
+    TRACE_MAX_RUNS: int = Field(default=500, description="Max run trace logs kept in memory")
+    STREAM_COALESCE_WINDOW_MS: float = Field(
+        default=30.0, description="Merge streamed text deltas into one frame per window (0 sends every chunk)"
+    )
+    STREAM_COALESCE_MAX_BYTES: int = Field(default=2048, description="Flush a coalesced delta frame once it reaches this size")
+    SSE_HEARTBEAT_SECONDS: float = Field(default=15.0, description="Keep-alive comment interval on idle run event streams")
+    SSE_RETRY_MS: int = Field(default=3000, description="Reconnect delay advertised to EventSource clients")
+    BROKER_BACKEND: str = Field(
+        default="memory",
+        description="Pub/sub for trace events and broadcasts: 'memory' (one worker), 'unix' or 'redis' (multi-worker)",
+    )
+    BROKER_URL: str = Field(default="redis://localhost:6379/0", description="Redis-protocol server for the 'redis' broker")
+    BROKER_SOCKET_PATH: str = Field(default="/tmp/azure-visualizer-broker.sock", description="Hub socket for the 'unix' broker")
+    BROKER_CHANNEL_PREFIX: str = Field(default="azviz", description="Prefix for broker channel names")
+    TEAM_REVIEW_PROTOCOL: str = Field(
+        default="rewrite",
+        description="Landing zone reviewer protocol: 'rewrite' (full text) or 'patch' (diagram JSON Patch + notes)",
+    )
+    TEAM_IAC_FORMATS: str = Field(
+        default="none",
+        description="IaC formats generated during a team run unless the client asks for some ('none', 'both' or a comma list); others are generated on first access",
+    )
+    TEAM_CHECKPOINT_BACKEND: str = Field(
+        default="sqlite",
+        description="Where team run stage checkpoints go: 'sqlite' (local file), 'blob', 'memory' or 'none'",
+    )
+    TEAM_CHECKPOINT_PATH: str = Field(default="data/team_checkpoints.sqlite3", description="SQLite file for the 'sqlite' checkpoint store")
+    TEAM_CHECKPOINT_CONTAINER: str = Field(default="checkpoints", description="Blob container for the 'blob' checkpoint store")
+    TEAM_CHECKPOINT_TTL_HOURS: float = Field(default=24.0, description="Keep run checkpoints (for resume_run) this long")
+    TEAM_RUN_WORKERS: int = Field(default=4, description="Team runs executed concurrently; further runs wait in the queue")
+    TEAM_RUN_QUEUE_SIZE: int = Field(default=50, description="Queued team runs beyond which new runs are rejected")
+    TEAM_RUN_EXECUTOR: str = Field(
+        default="inline",
+        description="Run team pipelines on the API event loop ('inline') or in worker processes ('process', needs a cross-process broker)",
+    )
+    TEAM_RUN_HISTORY: int = Field(default=200, description="Finished team runs kept in memory for GET /runs")
+    
+    # Shared model client (httpx pool under AsyncOpenAI)
+    MODEL_HTTP2: bool = Field(default=True, description="Use HTTP/2 for model calls when the h2 package is installed")
+    MODEL_HTTP_MAX_CONNECTIONS: int = Field(default=100, description="Max open connections to the model endpoint")
+    MODEL_HTTP_MAX_KEEPALIVE: int = Field(default=20, description="Idle keep-alive connections kept in the pool")
+    MODEL_HTTP_KEEPALIVE_EXPIRY: float = Field(default=30.0, description="Seconds an idle pooled connection is kept")
+    MODEL_HTTP_TIMEOUT_SECONDS: float = Field(default=120.0, description="Read/write timeout for model calls")
+    MODEL_HTTP_CONNECT_TIMEOUT_SECONDS: float = Field(default=10.0, description="Connect timeout for model calls")
+    MODEL_CLIENT_MAX_RETRIES: int = Field(default=2, description="SDK-level retries for transient model errors")
+    
+    # Outbound model gateway
+    LLM_GATEWAY_ENABLED: bool = Field(default=True, description="Route model calls through the rate/concurrency governor")
+    LLM_GATEWAY_REQUESTS_PER_MINUTE: int = Field(default=300, description="Token bucket refill per model (0 = no rate cap)")
+    LLM_GATEWAY_BURST: int = Field(default=20, description="Token bucket size per model")
+    LLM_GATEWAY_MODEL_RPM: str | None = Field(
+        default=None,
+        description="Per-model RPM overrides, e.g. 'gpt-4o=600,gpt-4.1-mini=1200'",
+    )
+    LLM_GATEWAY_INITIAL_CONCURRENCY: int = Field(default=8, description="Starting concurrent calls per model")
+    LLM_GATEWAY_MIN_CONCURRENCY: int = Field(default=1, description="AIMD floor for concurrent calls per model")
+    LLM_GATEWAY_MAX_CONCURRENCY: int = Field(default=32, description="AIMD ceiling for concurrent calls per model")
+    LLM_GATEWAY_BACKOFF_SECONDS: float = Field(default=2.0, description="Pause after a 429 without Retry-After")
+    LLM_GATEWAY_MAX_RETRIES: int = Field(default=2, description="429 retries for direct gateway calls")
+    LLM_HEDGE_ENABLED: bool = Field(default=False, description="Re-send slow stateless model calls once; first response wins")
+    LLM_HEDGE_PERCENTILE: float = Field(default=95.0, description="Observed first-token latency percentile that triggers a hedge")
+    LLM_HEDGE_MIN_SAMPLES: int = Field(default=20, description="Latency samples needed per model before hedging starts")
+    LLM_HEDGE_MIN_DELAY_MS: int = Field(default=500, description="Never hedge sooner than this")
+    
+    # Request deadlines (seconds; 0 disables, the default)
+    CHAT_DEADLINE_SECONDS: float = Field(default=0.0, description="Overall deadline for a chat request")
+    TEAM_RUN_DEADLINE_SECONDS: float = Field(default=0.0, description="Overall deadline for a landing zone team run")
+    TEAM_STAGE_BUDGET_SLACK: float = Field(
+        default=2.0,
+        description="Each team stage may use this multiple of its fair share of the remaining run budget",
+    )
+    IAC_DEADLINE_SECONDS: float = Field(default=0.0, description="Overall deadline for IaC generation/validation requests")
     
     # IaC Generation
     DEFAULT_AZURE_REGION: str = Field(default="westeurope", description="Default Azure region")
     BICEP_OUTPUT_FORMAT: str = Field(default="json", description="Bicep output format")
     TERRAFORM_VERSION: str = Field(default="1.5.0", description="Terraform version")
+    IAC_CACHE_MAX_ENTRIES: int = Field(default=256, description="Max generated IaC results kept in memory")
+    IAC_CACHE_DIR: str | None = Field(default=None, description="Optional directory for the on-disk IaC result cache")
     
     # MCP Integration
     AZURE_MCP_BICEP_URL: str = Field(
@@ -0,0 +1,59 @@
+"""Request deadlines that propagate to every model call underneath.
+
+An endpoint opens `deadline_scope(seconds)` once; nested scopes (per-stage
+budgets, per-call limits) can only tighten it, never extend it. The expiry
+lives in a context variable so tasks spawned inside the scope see the same
+remaining budget, and the block is cancelled with `DeadlineExceeded` when it
+runs out.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+
+_expires_at: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request's time budget ran out before the work finished."""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current scope, or None when no deadline is set."""
+    expires = _expires_at.get()
+    if expires is None:
+        return None
+    return max(0.0, expires - time.monotonic())
+
+
+def stage_budget(stages_left: int, slack: float = 1.0) -> Optional[float]:
+    """Budget for one of `stages_left` sequential stages: a (slackened) fair share of what remains."""
+    left = remaining()
+    if left is None:
+        return None
+    return min(left, slack * left / max(1, stages_left))
+
+
+@asynccontextmanager
+async def deadline_scope(seconds: Optional[float], label: str = "request") -> AsyncIterator[None]:
+    """Bound the enclosed block by `seconds` (None or <= 0 leaves any outer deadline as is)."""
+    if seconds is None or seconds <= 0:
+        yield
+        return
+    now = time.monotonic()
+    expires = now + seconds
+    outer = _expires_at.get()
+    if outer is not None:
+        expires = min(expires, outer)
+    token = _expires_at.set(expires)
+    try:
+        async with asyncio.timeout(max(0.0, expires - now)) as scope:
+            yield
+    except TimeoutError:
+        if scope.expired():
+            raise DeadlineExceeded(f"{label} exceeded its {seconds:.1f}s deadline") from None
+        raise
+    finally:
+        _expires_at.reset(token)
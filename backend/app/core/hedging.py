@@ -0,0 +1,225 @@
+"""Hedged model requests for tail-latency control.
+
+`LatencyTracker` keeps a sliding window of time-to-first-token per model
+(and per streaming/non-streaming call shape). When hedging is enabled and a
+call has not produced its first update within the configured percentile of
+that window, `HedgingChatMiddleware` sends the same request once more; the
+first attempt to respond wins and the other is cancelled.
+
+Hedging is skipped for stateful calls (server-side threads/conversations),
+before enough samples have been observed, and while the model's gateway
+queue is backed up, since a duplicate request would only add load there.
+"""
+
+import asyncio
+import contextlib
+import copy
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from agent_framework import ChatContext, ChatMiddleware
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_EXHAUSTED = object()
+
+
+class LatencyTracker:
+    """Sliding-window first-token latency per key, plus hedge counters."""
+
+    def __init__(self, window: int = 200) -> None:
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self.hedged: Dict[str, int] = {}
+        self.hedge_wins: Dict[str, int] = {}
+
+    def observe(self, key: str, seconds: float) -> None:
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, pct: float, min_samples: int = 1) -> Optional[float]:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def record_hedge(self, key: str, won: bool) -> None:
+        self.hedged[key] = self.hedged.get(key, 0) + 1
+        if won:
+            self.hedge_wins[key] = self.hedge_wins.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            key: {
+                "samples": len(samples),
+                "p50_ms": int((self.percentile(key, 50) or 0) * 1000),
+                "p95_ms": int((self.percentile(key, 95) or 0) * 1000),
+                "hedged": self.hedged.get(key, 0),
+                "hedge_wins": self.hedge_wins.get(key, 0),
+            }
+            for key, samples in self._samples.items()
+        }
+
+
+latency_tracker = LatencyTracker()
+
+
+async def _cancel(tasks) -> None:
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def race_with_hedge(
+    start: Callable[[], Awaitable[Any]],
+    delay: Optional[float],
+    on_hedge: Optional[Callable[[bool], None]] = None,
+    discard: Optional[Callable[[Any], Awaitable[None]]] = None,
+) -> Any:
+    """Run `start()`; if it is still pending after `delay`, run it again and take the first success.
+
+    The losing attempt is cancelled, or handed to `discard` if it had already
+    finished. `on_hedge(hedge_won)` is called once a hedge was sent and settled.
+    """
+    primary = asyncio.create_task(start())
+    if delay is None:
+        return await primary
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+    except BaseException:
+        await _cancel([primary])
+        raise
+    if done:
+        return primary.result()
+
+    hedge = asyncio.create_task(start())
+    pending = {primary, hedge}
+    first_error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winners = [t for t in (primary, hedge) if t in done and not t.cancelled() and t.exception() is None]
+            if winners:
+                winner = winners[0]
+                for other in done:
+                    if other is not winner and discard is not None and not other.cancelled() and other.exception() is None:
+                        await discard(other.result())
+                if on_hedge is not None:
+                    on_hedge(winner is hedge)
+                return winner.result()
+            for task in done:
+                if not task.cancelled():
+                    first_error = first_error or task.exception()
+        raise first_error or asyncio.CancelledError()
+    finally:
+        await _cancel(list(pending))
+
+
+def _trial_context(context: ChatContext) -> ChatContext:
+    """A context of its own for one attempt, so racing attempts never see each other's mutations.
+
+    Messages are deep-copied. Options get fresh containers (tool list, metadata),
+    while the tools themselves are shared, since they may hold live sessions.
+    """
+    options = copy.copy(context.chat_options)
+    for name, value in vars(options).items():
+        if isinstance(value, (list, dict, set)):
+            setattr(options, name, copy.copy(value))
+    return ChatContext(
+        chat_client=context.chat_client,
+        messages=copy.deepcopy(list(context.messages)),
+        chat_options=options,
+        is_streaming=context.is_streaming,
+        metadata=dict(context.metadata),
+        kwargs=dict(context.kwargs),
+    )
+
+
+class HedgingChatMiddleware(ChatMiddleware):
+    """Duplicates slow, stateless model calls once and keeps whichever answers first."""
+
+    def __init__(
+        self,
+        model: Optional[str],
+        tracker: LatencyTracker = latency_tracker,
+        saturated: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        self.model = model or "default"
+        self.tracker = tracker
+        self.saturated = saturated
+
+    def _key(self, streaming: bool) -> str:
+        return f"{self.model}:{'stream' if streaming else 'response'}"
+
+    def hedge_delay(self, context: ChatContext) -> Optional[float]:
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        if getattr(context.chat_options, "conversation_id", None):
+            return None  # a second request would race on the same server-side thread
+        if self.saturated is not None and self.saturated():
+            return None
+        observed = self.tracker.percentile(
+            self._key(context.is_streaming), settings.LLM_HEDGE_PERCENTILE, settings.LLM_HEDGE_MIN_SAMPLES
+        )
+        if observed is None:
+            return None
+        return max(observed, settings.LLM_HEDGE_MIN_DELAY_MS / 1000)
+
+    def _on_hedge(self, key: str) -> Callable[[bool], None]:
+        def record(won: bool) -> None:
+            self.tracker.record_hedge(key, won)
+            logger.info("Hedged %s request; %s attempt won", key, "hedge" if won else "primary")
+        return record
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        key = self._key(context.is_streaming)
+        delay = self.hedge_delay(context)
+
+        if not context.is_streaming:
+            async def attempt() -> Tuple[Any, float]:
+                started = time.monotonic()
+                trial = _trial_context(context)
+                await next(trial)
+                return trial.result, time.monotonic() - started
+
+            result, elapsed = await race_with_hedge(attempt, delay, self._on_hedge(key))
+            self.tracker.observe(key, elapsed)
+            context.result = result
+            return
+
+        async def open_stream() -> Tuple[AsyncIterator[Any], Any, float]:
+            started = time.monotonic()
+            trial = _trial_context(context)
+            await next(trial)
+            iterator = trial.result.__aiter__()
+            try:
+                first = await iterator.__anext__()
+            except StopAsyncIteration:
+                first = _EXHAUSTED
+            return iterator, first, time.monotonic() - started
+
+        async def close_stream(opened: Tuple[AsyncIterator[Any], Any, float]) -> None:
+            aclose = getattr(opened[0], "aclose", None)
+            if aclose is not None:
+                with contextlib.suppress(Exception):
+                    await aclose()
+
+        tracker = self.tracker
+        on_hedge = self._on_hedge(key)
+
+        async def hedged() -> AsyncIterator[Any]:
+            iterator, first, ttft = await race_with_hedge(open_stream, delay, on_hedge, close_stream)
+            tracker.observe(key, ttft)
+            if first is _EXHAUSTED:
+                return
+            yield first
+            async for update in iterator:
+                yield update
+
+        context.result = hedged()
@@ -0,0 +1,219 @@
+"""Single-pass JSON extraction for free-form model output.
+
+Model replies mix prose, fenced code blocks and one or more JSON objects.
+`find_json_spans` walks the text once, tracking brace depth plus string and
+escape state (so braces inside JSON strings are ignored), and reports every
+balanced object span it closes. `extract_json` tries those spans largest
+first, fenced blocks before bare text, with trailing-comma and quote repairs.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FENCE = "```"
+
+_STRUCTURAL = re.compile(r'[{}"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_BRACES = re.compile(r"[{}]")
+
+
+def find_json_spans(text: str, track_strings: bool = True) -> List[Tuple[int, int]]:
+    """Return (start, end) offsets of every balanced `{...}` span in one pass.
+
+    String state is only tracked inside an open object, so stray quotes and
+    apostrophes in surrounding prose do not confuse the scanner. An unmatched
+    `{` in prose simply never closes; spans nested inside it are still found.
+    `track_strings=False` gives the plain brace-matching view, used as a
+    fallback when a quote in prose swallowed part of the real payload.
+    """
+    spans: List[Tuple[int, int]] = []
+    if not text:
+        return spans
+    stack: List[int] = []
+    structural = _STRUCTURAL if track_strings else _BRACES
+    i = text.find("{")
+    while i != -1:
+        ch = text[i]
+        if ch == "{":
+            stack.append(i)
+        elif ch == "}":
+            spans.append((stack.pop(), i + 1))
+        else:  # opening quote of a string inside an object
+            j = i + 1
+            while True:
+                match = _STRING_SPECIAL.search(text, j)
+                if match is None:
+                    # Unterminated string: drop the open objects and resume after the quote.
+                    stack.clear()
+                    break
+                if match.group() == "\\":
+                    j = match.end() + 1
+                    continue
+                i = match.start()
+                break
+        if stack:
+            match = structural.search(text, i + 1)
+            i = match.start() if match else -1
+        else:
+            i = text.find("{", i + 1)
+    return spans
+
+
+def find_fenced_blocks(text: str) -> List[Tuple[int, int]]:
+    """Return (start, end) offsets of the contents of ``` fenced blocks."""
+    blocks: List[Tuple[int, int]] = []
+    if not text:
+        return blocks
+    pos = text.find(FENCE)
+    while pos != -1:
+        body_start = text.find("\n", pos + len(FENCE))
+        close = text.find(FENCE, pos + len(FENCE))
+        if close == -1:
+            break
+        if body_start == -1 or body_start > close:
+            # Single-line fence: skip an optional language tag.
+            body_start = pos + len(FENCE)
+            while body_start < close and not text[body_start].isspace() and text[body_start] not in "{[":
+                body_start += 1
+        blocks.append((body_start, close))
+        pos = text.find(FENCE, close + len(FENCE))
+    return blocks
+
+
+def iter_json_candidates(text: Optional[str]) -> Iterator[str]:
+    """Yield distinct JSON object candidates, largest first.
+
+    Spans inside fenced blocks come first; spans from the whole text follow as
+    a fallback (fences can also appear inside JSON strings, e.g. code samples),
+    and plain brace matching is only computed if all of those fail.
+    """
+    if not text:
+        return
+    seen: set[str] = set()
+    fenced_spans: List[Tuple[int, int]] = []
+    for start, end in find_fenced_blocks(text):
+        spans = [(start + s, start + e) for s, e in find_json_spans(text[start:end])]
+        # A fenced block without braces may still be bare JSON (e.g. an array).
+        fenced_spans.extend(spans or [(start, end)])
+
+    def _by_size(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        return sorted(spans, key=lambda span: span[1] - span[0], reverse=True)
+
+    groups = (
+        lambda: fenced_spans,
+        lambda: find_json_spans(text),
+        lambda: find_json_spans(text, track_strings=False),
+    )
+    for group in groups:
+        for start, end in _by_size(group()):
+            candidate = text[start:end].strip()
+            if candidate and candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+
+def _strip_trailing_commas(candidate: str) -> str:
+    """Remove commas that directly precede `}` or `]`, ignoring string contents."""
+    out: List[str] = []
+    in_string = escaped = False
+    pending_comma: Optional[int] = None
+    for ch in candidate:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch in "}]" and pending_comma is not None:
+            del out[pending_comma]
+        if ch == ",":
+            pending_comma = len(out)
+        elif not ch.isspace():
+            pending_comma = None
+        if ch == '"':
+            in_string = True
+        out.append(ch)
+    return "".join(out)
+
+
+def _single_to_double_quotes(candidate: str) -> str:
+    """Rewrite single-quoted strings as JSON strings; apostrophes in "..." are kept."""
+    out: List[str] = []
+    quote: Optional[str] = None
+    escaped = False
+    for ch in candidate:
+        if quote is None:
+            if ch in "'\"":
+                quote = ch
+                out.append('"')
+            else:
+                out.append(ch)
+            continue
+        if escaped:
+            escaped = False
+            if quote == "'" and ch == "'":
+                out[-1] = "'"  # an escaped single quote is not a valid JSON escape
+            else:
+                out.append(ch)
+        elif ch == "\\":
+            escaped = True
+            out.append(ch)
+        elif ch == quote:
+            quote = None
+            out.append('"')
+        elif ch == '"' and quote == "'":
+            out.append('\\"')
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def repair_json(candidate: str) -> Iterator[str]:
+    """Yield progressively repaired variants of a candidate that failed to parse."""
+    without_commas = _strip_trailing_commas(candidate)
+    if without_commas != candidate:
+        yield without_commas
+    if "'" in candidate:
+        swapped = _single_to_double_quotes(without_commas)
+        if swapped != without_commas:
+            yield swapped
+
+
+def loads_lenient(candidate: str) -> Any:
+    """`json.loads` with the repairs above; raises ValueError when nothing parses."""
+    try:
+        return json.loads(candidate)
+    except ValueError as exc:
+        error = exc
+    for repaired in repair_json(candidate):
+        try:
+            return json.loads(repaired)
+        except ValueError:
+            continue
+    raise error
+
+
+def extract_json(
+    text: Optional[str],
+    predicate: Optional[Callable[[Any], bool]] = None,
+) -> Optional[Any]:
+    """Return the first (largest) JSON value in `text` accepted by `predicate`.
+
+    Without a predicate, the first candidate that parses to a dict is returned.
+    """
+    accept = predicate or (lambda value: isinstance(value, dict))
+    for candidate in iter_json_candidates(text):
+        try:
+            parsed = loads_lenient(candidate)
+        except ValueError:
+            continue
+        if accept(parsed):
+            return parsed
+    return None
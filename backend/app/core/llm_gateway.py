@@ -0,0 +1,434 @@
+"""Central governor for outbound model calls.
+
+Every request to a model goes through `llm_gateway`, either implicitly via
+`GatewayChatMiddleware` (attached to the agent_framework chat clients, so
+`ChatAgent.run` / `run_stream` are covered) or explicitly via
+`llm_gateway.call` / `llm_gateway.slot` for raw `AsyncOpenAI` calls.
+Stateless clients can additionally be hedged (see `app.core.hedging`).
+
+Each model/deployment gets its own `ModelGovernor`:
+
+* a token bucket (requests per minute plus burst) caps the request rate;
+* an AIMD concurrency limit grows by roughly one slot per window of
+  successful calls and halves on a 429, pausing new calls for the
+  provider's `Retry-After`;
+* waiters are served strictly by priority lane (interactive chat, then team
+  runs, then background IaC/validation) and FIFO within a lane.
+
+Calls made under a cancelled run (`app.core.cancellation`) are refused
+before they take a slot.
+
+The lane comes from a context variable, so an endpoint sets it once with
+`with llm_gateway.priority(Priority.BACKGROUND): ...` and every call made
+underneath (including tasks it spawns) inherits it.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from agent_framework import ChatContext, ChatMiddleware
+
+from app.core.cancellation import checkpoint
+from app.core.config import settings
+from app.core.hedging import HedgingChatMiddleware, latency_tracker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Priority lanes; lower values are served first."""
+
+    INTERACTIVE = 0
+    TEAM = 1
+    BACKGROUND = 2
+
+
+_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """True when `exc` (or an exception it wraps) is a provider 429."""
+    seen = set()
+    current: Optional[BaseException] = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        status = getattr(current, "status_code", None) or getattr(getattr(current, "response", None), "status_code", None)
+        if status == 429 or type(current).__name__ == "RateLimitError":
+            return True
+        current = getattr(current, "inner_exception", None) or current.__cause__ or current.__context__
+    return False
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Read `retry-after-ms` / `retry-after` from the response attached to a 429, if any."""
+    current: Optional[BaseException] = exc
+    seen = set()
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        headers = getattr(getattr(current, "response", None), "headers", None)
+        if headers is not None:
+            for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+                value = headers.get(header)
+                if value is None:
+                    continue
+                try:
+                    return max(0.0, float(value) * scale)
+                except (TypeError, ValueError):
+                    continue  # HTTP-date form; fall back to the default backoff
+        current = getattr(current, "inner_exception", None) or current.__cause__ or current.__context__
+    return None
+
+
+def _parse_model_rpm(raw: Optional[str]) -> Dict[str, int]:
+    """Parse `LLM_GATEWAY_MODEL_RPM` ("gpt-4o=600,gpt-4.1-mini=1200")."""
+    limits: Dict[str, int] = {}
+    for part in (raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if not sep:
+            continue
+        try:
+            limits[name.strip()] = int(value)
+        except ValueError:
+            logger.warning("Ignoring invalid LLM_GATEWAY_MODEL_RPM entry: %s", part)
+    return limits
+
+
+class ModelGovernor:
+    """Rate, concurrency and priority control for one model/deployment."""
+
+    def __init__(
+        self,
+        model: str,
+        requests_per_minute: int,
+        burst: int,
+        initial_concurrency: int,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        default_backoff: float = 2.0,
+    ) -> None:
+        self.model = model
+        self.rate = max(0, requests_per_minute) / 60.0  # tokens per second; 0 disables the bucket
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.default_backoff = default_backoff
+        self.tokens = float(self.burst)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._queued: Dict[Priority, int] = {p: 0 for p in Priority}
+        self.acquired = 0
+        self.throttled = 0
+        self.failures = 0
+        self.wait_ms_total = 0.0
+        self.max_wait_ms = 0.0
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _arm(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.001), self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant slots to the highest-priority waiters while limits allow."""
+        while self._waiters:
+            _, _, future = self._waiters[0]
+            if future.done():  # cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= int(self.limit):
+                return  # release() dispatches again
+            now = time.monotonic()
+            if now < self.paused_until:
+                self._arm(self.paused_until - now)
+                return
+            self._refill(now)
+            if self.rate and self.tokens < 1:
+                self._arm((1 - self.tokens) / self.rate)
+                return
+            heapq.heappop(self._waiters)
+            if self.rate:
+                self.tokens -= 1
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE) -> None:
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        self._queued[priority] += 1
+        started = time.perf_counter()
+        try:
+            self._dispatch()
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # granted just as the caller gave up
+            raise
+        finally:
+            self._queued[priority] -= 1
+        waited = (time.perf_counter() - started) * 1000
+        self.acquired += 1
+        self.wait_ms_total += waited
+        self.max_wait_ms = max(self.max_wait_ms, waited)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    def release(self) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        self._dispatch()
+
+    def on_success(self) -> None:
+        # Additive increase: about one extra slot per `limit` successful calls.
+        self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        # Multiplicative decrease, and hold every lane until the provider's window reopens.
+        self.throttled += 1
+        self.limit = max(self.min_concurrency, self.limit / 2)
+        delay = retry_after if retry_after is not None else self.default_backoff
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        logger.warning(
+            "Model %s throttled; concurrency limit now %d, pausing %.2fs", self.model, int(self.limit), delay
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill(time.monotonic())
+        return {
+            "model": self.model,
+            "concurrency_limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": {p.name.lower(): self._queued[p] for p in Priority},
+            "queue_depth": self.queue_depth,
+            "tokens": round(self.tokens, 2) if self.rate else None,
+            "paused_for_ms": max(0, int((self.paused_until - time.monotonic()) * 1000)),
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "avg_wait_ms": round(self.wait_ms_total / self.acquired, 2) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+        }
+
+
+class LLMGateway:
+    """Process-wide registry of per-model governors."""
+
+    def __init__(self) -> None:
+        self._governors: Dict[str, ModelGovernor] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.LLM_GATEWAY_ENABLED
+
+    def governor(self, model: Optional[str]) -> ModelGovernor:
+        key = model or "default"
+        governor = self._governors.get(key)
+        if governor is None:
+            rpm = _parse_model_rpm(settings.LLM_GATEWAY_MODEL_RPM).get(key, settings.LLM_GATEWAY_REQUESTS_PER_MINUTE)
+            governor = self._governors[key] = ModelGovernor(
+                key,
+                requests_per_minute=rpm,
+                burst=settings.LLM_GATEWAY_BURST,
+                initial_concurrency=settings.LLM_GATEWAY_INITIAL_CONCURRENCY,
+                max_concurrency=settings.LLM_GATEWAY_MAX_CONCURRENCY,
+                min_concurrency=settings.LLM_GATEWAY_MIN_CONCURRENCY,
+                default_backoff=settings.LLM_GATEWAY_BACKOFF_SECONDS,
+            )
+        return governor
+
+    @contextmanager
+    def priority(self, lane: Priority) -> Iterator[None]:
+        """Run the enclosed block (and tasks it creates) in `lane`."""
+        token = _priority.set(lane)
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    @asynccontextmanager
+    async def slot(self, model: Optional[str], priority: Optional[Priority] = None) -> AsyncIterator[None]:
+        """Hold one concurrency slot for `model` for the duration of the block."""
+        if not self.enabled:
+            yield
+            return
+        governor = self.governor(model)
+        await governor.acquire(current_priority() if priority is None else priority)
+        try:
+            yield
+        except Exception as exc:
+            if is_rate_limited(exc):
+                governor.on_throttle(retry_after_seconds(exc))
+            else:
+                governor.failures += 1
+            raise
+        else:
+            governor.on_success()
+        finally:
+            governor.release()
+
+    async def call(
+        self,
+        model: Optional[str],
+        func: Callable[..., Awaitable[T]],
+        /,
+        *args: Any,
+        priority: Optional[Priority] = None,
+        **kwargs: Any,
+    ) -> T:
+        """Await `func(*args, **kwargs)` inside a slot, retrying 429s up to LLM_GATEWAY_MAX_RETRIES."""
+        attempt = 0
+        while True:
+            checkpoint()
+            try:
+                async with self.slot(model, priority):
+                    return await func(*args, **kwargs)
+            except Exception as exc:
+                if not self.enabled or not is_rate_limited(exc) or attempt >= settings.LLM_GATEWAY_MAX_RETRIES:
+                    raise
+                attempt += 1  # the governor's pause spaces out the retry
+
+    def attach(self, chat_client: Any, model: Optional[str] = None, hedge: bool = False) -> Any:
+        """Add the gateway middleware to an agent_framework chat client (idempotent).
+
+        `hedge=True` also installs `HedgingChatMiddleware` ahead of the gateway,
+        so a hedged duplicate takes its own slot. Only use it for stateless
+        clients; duplicating a run on a server-side thread is not safe.
+        """
+        if chat_client is None:
+            return chat_client
+        existing = getattr(chat_client, "middleware", None)
+        middleware = list(existing) if isinstance(existing, (list, tuple)) else ([existing] if existing else [])
+        if any(isinstance(m, GatewayChatMiddleware) for m in middleware):
+            return chat_client
+        if model is None:
+            from app.iac_generators.cache import resolve_model_id
+            model = resolve_model_id(chat_client)
+        if hedge:
+            middleware.append(HedgingChatMiddleware(model, saturated=lambda: self.governor(model).queue_depth > 0))
+        middleware.append(GatewayChatMiddleware(self, model))
+        chat_client.middleware = middleware
+        return chat_client
+
+    def stats(self) -> Dict[str, Any]:
+        models = {name: governor.stats() for name, governor in self._governors.items()}
+        return {
+            "enabled": self.enabled,
+            "queue_depth": sum(m["queue_depth"] for m in models.values()),
+            "in_flight": sum(m["in_flight"] for m in models.values()),
+            "models": models,
+            "hedging": {"enabled": settings.LLM_HEDGE_ENABLED, "latency": latency_tracker.stats()},
+        }
+
+
+class _GovernedStream:
+    """Streaming response that holds a gateway slot from the first pull until it ends.
+
+    A plain async iterator rather than an async generator: the slot is taken
+    and released by `__anext__` itself, on exhaustion, on error, on `aclose()`
+    or as soon as an abandoned stream is dropped, instead of whenever the
+    event loop gets around to finalizing a suspended generator.
+    """
+
+    def __init__(self, gateway: LLMGateway, model: Optional[str], context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        self._gateway = gateway
+        self._model = model
+        self._context = context
+        self._next = next
+        self._stream: Any = None
+        self._governor: Optional[ModelGovernor] = None
+        self._finished = False
+
+    def __aiter__(self) -> "_GovernedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._finished:
+            raise StopAsyncIteration
+        try:
+            if self._stream is None:
+                if self._gateway.enabled:
+                    governor = self._gateway.governor(self._model)
+                    await governor.acquire(current_priority())
+                    self._governor = governor
+                await self._next(self._context)
+                self._stream = self._context.result
+                if self._stream is None:
+                    raise StopAsyncIteration
+            return await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._release(completed=True)
+            raise
+        except BaseException as exc:
+            self._release(exc)
+            raise
+
+    def _release(self, exc: Optional[BaseException] = None, completed: bool = False) -> None:
+        """Give the slot back; only a drained stream counts as a success, an abandoned one is neutral."""
+        self._finished = True
+        governor, self._governor = self._governor, None
+        if governor is None:
+            return
+        if completed:
+            governor.on_success()
+        elif isinstance(exc, Exception):
+            if is_rate_limited(exc):
+                governor.on_throttle(retry_after_seconds(exc))
+            else:
+                governor.failures += 1
+        governor.release()
+
+    async def aclose(self) -> None:
+        stream = self._stream
+        self._release()
+        if stream is not None and hasattr(stream, "aclose"):
+            await stream.aclose()
+
+    def __del__(self) -> None:
+        if self._governor is not None:
+            self._release()
+
+
+class GatewayChatMiddleware(ChatMiddleware):
+    """Routes chat client calls through the gateway; streams hold their slot until drained or closed."""
+
+    def __init__(self, gateway: LLMGateway, model: Optional[str]) -> None:
+        self.gateway = gateway
+        self.model = model
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        checkpoint()   # no new model call (including tool-loop follow-ups) once the run is cancelled
+        if not context.is_streaming:
+            async with self.gateway.slot(self.model):
+                await next(context)
+            return
+
+        context.result = _GovernedStream(self.gateway, self.model, context, next)
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,63 @@
+"""App-scoped async model client with a tuned connection pool.
+
+`AzureClientManager` builds one `AsyncOpenAI` on startup through
+`build_model_client` and closes it on shutdown. Every endpoint, websocket
+handler and agent client shares it, so TLS sessions and HTTP/2 connections
+are reused instead of being set up per request, and no synchronous client
+ever blocks the event loop.
+"""
+
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    if not settings.MODEL_HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.info("h2 not installed; model client falls back to HTTP/1.1 keep-alive")
+        return False
+    return True
+
+
+def build_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Pooled httpx client used under the OpenAI SDK."""
+    return httpx.AsyncClient(
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings.MODEL_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.MODEL_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.MODEL_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.MODEL_HTTP_TIMEOUT_SECONDS, connect=settings.MODEL_HTTP_CONNECT_TIMEOUT_SECONDS),
+        transport=transport,
+    )
+
+
+def build_model_client(
+    api_key: Optional[str] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> AsyncOpenAI:
+    """The shared `AsyncOpenAI`; `transport` is for tests."""
+    return AsyncOpenAI(
+        api_key=api_key or settings.OPENAI_API_KEY,
+        http_client=build_http_client(transport),
+        max_retries=settings.MODEL_CLIENT_MAX_RETRIES,
+    )
+
+
+def get_model_client(connection: HTTPConnection) -> Optional[AsyncOpenAI]:
+    """FastAPI dependency (HTTP or websocket): the app's shared model client, if configured."""
+    manager = getattr(connection.app.state, "azure_clients", None)
+    if manager is None:
+        return None
+    return manager.get_openai_client()
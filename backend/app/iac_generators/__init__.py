@@ -4,10 +4,12 @@ Modules:
 - bicep: AI-first bicep generation wrapper
 - terraform: AI-first terraform generation wrapper
 - validation: CLI validation helpers
+- diagram: deterministic Bicep/Terraform-to-diagram parser
 """
 
 from .bicep import generate_bicep_code
 from .terraform import generate_terraform_code
 from .validation import validate_iac_with_cli
+from .diagram import diagram_from_iac
 
-__all__ = ["generate_bicep_code", "generate_terraform_code", "validate_iac_with_cli"]
+__all__ = ["generate_bicep_code", "generate_terraform_code", "validate_iac_with_cli", "diagram_from_iac"]
@@ -8,7 +8,9 @@ logger = logging.getLogger(__name__)
 async def generate_bicep_code(agent_client: Any, diagram: Dict[str, Any], use_model: bool = False) -> Dict[str, Any]:
     """Generate Bicep using AI with MCP enhancement when available.
 
-    Returns a dict with keys: 'bicep_code' and 'parameters'.
+    The MCP path is cached by diagram content in `generate_bicep_via_mcp`
+    itself, so it is not cached again here. Returns a dict with keys:
+    'bicep_code' and 'parameters'.
     """
     # Try MCP-enhanced generation first if available
     try:
@@ -0,0 +1,260 @@
+"""Content-addressed result cache for AI-generated IaC.
+
+Generation calls are keyed by a canonical hash of the diagram (ordering
+insensitive over nodes/edges/services/groups/connections and ignoring
+canvas-only state such as positions and the viewport), the target format,
+the generation flags and the model id. Results live in a bounded in-memory
+LRU with an optional on-disk tier, and concurrent identical requests share a
+single in-flight generation.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Canvas-only keys that never influence the generated template.
+VOLATILE_KEYS = frozenset({
+    "position",
+    "positionAbsolute",
+    "viewport",
+    "selected",
+    "dragging",
+    "resizing",
+    "measured",
+    "width",
+    "height",
+    "zIndex",
+})
+
+# Collections whose ordering is not meaningful for IaC generation.
+UNORDERED_KEYS = frozenset({"nodes", "edges", "services", "groups", "connections"})
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def canonicalize_diagram(value: Any, _key: Optional[str] = None) -> Any:
+    """Return a canonical, ordering-insensitive copy of a diagram payload."""
+    if isinstance(value, dict):
+        return {
+            k: canonicalize_diagram(v, k)
+            for k, v in sorted(value.items(), key=lambda item: str(item[0]))
+            if k not in VOLATILE_KEYS
+        }
+    if isinstance(value, (list, tuple)):
+        items = [canonicalize_diagram(v) for v in value]
+        if _key in UNORDERED_KEYS:
+            items.sort(key=_dumps)
+        return items
+    return value
+
+
+def diagram_fingerprint(
+    diagram: Any,
+    target_format: str,
+    flags: Optional[Dict[str, Any]] = None,
+    model_id: Optional[str] = None,
+) -> str:
+    """Hash a diagram together with everything else that shapes the output."""
+    payload = {
+        "diagram": canonicalize_diagram(diagram or {}),
+        "format": target_format,
+        "flags": {k: v for k, v in (flags or {}).items() if v is not None},
+        "model": model_id or "",
+    }
+    return hashlib.sha256(_dumps(payload).encode("utf-8")).hexdigest()
+
+
+def resolve_model_id(agent: Any) -> str:
+    """Best-effort lookup of the model/deployment an agent generates with."""
+    holders = [agent, getattr(agent, "agent_client", None), getattr(agent, "chat_client", None)]
+    for holder in holders:
+        if holder is None:
+            continue
+        for attr in ("model_id", "model_deployment_name", "ai_model_id"):
+            candidate = getattr(holder, attr, None)
+            if isinstance(candidate, str) and candidate:
+                return candidate
+    if settings.USE_OPENAI_FALLBACK or settings.OPENAI_API_KEY:
+        return settings.OPENAI_MODEL
+    return settings.AZURE_AI_MODEL_DEPLOYMENT_NAME
+
+
+class _InFlight:
+    """A shared generation task plus the number of callers awaiting it."""
+
+    def __init__(self, task: "asyncio.Task[Dict[str, Any]]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class IaCResultCache:
+    """Bounded LRU (plus optional disk tier) with single-flight generation."""
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[str] = None) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.disk_dir = disk_dir or None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, _InFlight] = {}
+        self._counters: Dict[str, int] = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    # -- memory tier -----------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, value: Dict[str, Any]) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # -- disk tier -------------------------------------------------------
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_read(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                value = json.load(fh)
+            return value if isinstance(value, dict) else None
+        except Exception as exc:
+            logger.warning("Ignoring unreadable IaC cache entry %s: %s", path, exc)
+            return None
+
+    def _disk_write(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._disk_path(key)
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(value, fh)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            logger.warning("Failed to persist IaC cache entry %s: %s", key, exc)
+
+    # -- public API ------------------------------------------------------
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a cached result, consulting the disk tier on a memory miss."""
+        value = self._memory_get(key)
+        if value is not None:
+            self._counters["hits"] += 1
+            return copy.deepcopy(value)
+        if self.disk_dir:
+            value = await asyncio.to_thread(self._disk_read, key)
+            if value is not None:
+                self._counters["disk_hits"] += 1
+                self._memory_put(key, value)
+                return copy.deepcopy(value)
+        return None
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        stored = copy.deepcopy(value)
+        self._memory_put(key, stored)
+        self._counters["stores"] += 1
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_write, key, stored)
+
+    async def get_or_generate(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Dict[str, Any]]],
+        cacheable: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> Dict[str, Any]:
+        """Return the cached result for `key` or run `factory` exactly once for all callers.
+
+        Results rejected by `cacheable` (e.g. failed generations) are returned to
+        every waiting caller but not stored.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._counters["coalesced"] += 1
+        else:
+            self._counters["misses"] += 1
+
+            async def _run() -> Dict[str, Any]:
+                try:
+                    result = await factory()
+                    if isinstance(result, dict) and (cacheable is None or cacheable(result)):
+                        await self.put(key, result)
+                    return result
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self._counters["errors"] += 1
+                    raise
+                finally:
+                    self._inflight.pop(key, None)
+
+            inflight = _InFlight(asyncio.create_task(_run()))
+            self._inflight[key] = inflight
+
+        inflight.waiters += 1
+        try:
+            result = await asyncio.shield(inflight.task)
+        except asyncio.CancelledError:
+            # Only abandon the shared generation once nobody is waiting for it.
+            if inflight.waiters <= 1 and not inflight.task.done():
+                inflight.task.cancel()
+            raise
+        finally:
+            inflight.waiters -= 1
+        return copy.deepcopy(result)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters["hits"] + self._counters["disk_hits"] + self._counters["misses"] + self._counters["coalesced"]
+        served = self._counters["hits"] + self._counters["disk_hits"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "inflight": len(self._inflight),
+            "disk_enabled": bool(self.disk_dir),
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global cache shared by the IaC generators and the architect agent
+iac_cache = IaCResultCache(
+    max_entries=settings.IAC_CACHE_MAX_ENTRIES,
+    disk_dir=settings.IAC_CACHE_DIR,
+)
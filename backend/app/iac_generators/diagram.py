@@ -0,0 +1,546 @@
+"""Deterministic IaC-to-diagram parser.
+
+Reads the `resource`/`module` declarations of a Bicep template or the
+`resource`/`module` blocks of a Terraform configuration and builds the
+structured diagram JSON (`services`, `groups`, `connections`, `layout`) the
+canvas consumes, without a model round-trip:
+
+- resource types map to the Azure icon catalog titles and categories;
+- resource groups, virtual networks, subnets and management groups become
+  groups, and resources referencing them are placed inside them;
+- symbolic references, `dependsOn`/`depends_on`, `parent` and `scope`
+  become connections;
+- child and extension resources without an icon of their own (site config,
+  role assignments, diagnostic settings, ...) fold into the resource they
+  belong to, so their references still connect the right nodes.
+
+`diagram_from_iac` returns None when nothing could be parsed; callers fall
+back to the model in that case.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# ARM resource type (lower case) -> (icon catalog title, icon category).
+RESOURCE_TYPES: Dict[str, Tuple[str, str]] = {
+    "microsoft.web/sites": ("App Services", "web"),
+    "microsoft.web/sites#functionapp": ("Function Apps", "iot"),
+    "microsoft.web/serverfarms": ("App Service Plans", "web"),
+    "microsoft.app/containerapps": ("Worker Container App", "other"),
+    "microsoft.app/managedenvironments": ("Container Apps Environments", "other"),
+    "microsoft.compute/virtualmachines": ("Virtual Machine", "compute"),
+    "microsoft.containerservice/managedclusters": ("Kubernetes Services", "containers"),
+    "microsoft.containerinstance/containergroups": ("Container Instances", "containers"),
+    "microsoft.containerregistry/registries": ("Container Registries", "containers"),
+    "microsoft.sql/servers": ("SQL Database", "databases"),
+    "microsoft.sql/servers/databases": ("Azure SQL", "databases"),
+    "microsoft.documentdb/databaseaccounts": ("Azure Cosmos Db", "databases"),
+    "microsoft.cache/redis": ("Cache Redis", "databases"),
+    "microsoft.dbformysql/flexibleservers": ("Azure Database Mysql Server", "databases"),
+    "microsoft.dbforpostgresql/flexibleservers": ("Azure Database Postgresql Server", "databases"),
+    "microsoft.storage/storageaccounts": ("Storage Accounts", "storage"),
+    "microsoft.network/networksecuritygroups": ("Network Security Groups", "networking"),
+    "microsoft.network/publicipaddresses": ("Public Ip Addresses", "networking"),
+    "microsoft.network/loadbalancers": ("Load Balancers", "networking"),
+    "microsoft.network/applicationgateways": ("Application Gateways", "networking"),
+    "microsoft.network/trafficmanagerprofiles": ("Traffic Manager Profiles", "networking"),
+    "microsoft.network/networkinterfaces": ("Network Interfaces", "networking"),
+    "microsoft.network/azurefirewalls": ("Firewalls", "networking"),
+    "microsoft.network/bastionhosts": ("Bastions", "networking"),
+    "microsoft.network/privateendpoints": ("Private Endpoints", "other"),
+    "microsoft.network/privatednszones": ("Dns Zones", "networking"),
+    "microsoft.network/routetables": ("Route Tables", "networking"),
+    "microsoft.keyvault/vaults": ("Key Vaults", "security"),
+    "microsoft.managedidentity/userassignedidentities": ("Managed Identities", "identity"),
+    "microsoft.servicebus/namespaces": ("Azure Service Bus", "integration"),
+    "microsoft.eventgrid/topics": ("Event Grid Topics", "integration"),
+    "microsoft.eventhub/namespaces": ("Event Hubs", "iot"),
+    "microsoft.logic/workflows": ("Logic Apps", "integration"),
+    "microsoft.insights/components": ("Application Insights", "monitor"),
+    "microsoft.operationalinsights/workspaces": ("Log Analytics Workspaces", "analytics"),
+    "microsoft.cognitiveservices/accounts": ("Cognitive Services", "ai + machine learning"),
+    "microsoft.cognitiveservices/accounts#openai": ("Azure Openai", "ai + machine learning"),
+    "microsoft.machinelearningservices/workspaces": ("Machine Learning", "ai + machine learning"),
+    "microsoft.search/searchservices": ("Cognitive Search", "web"),
+    "microsoft.apimanagement/service": ("Api Management Services", "integration"),
+    "microsoft.cdn/profiles": ("Azure Front Door And CDN Profiles", "web"),
+    "microsoft.devices/iothubs": ("IoT Hub", "iot"),
+    "microsoft.datafactory/factories": ("Data Factories", "databases"),
+    "microsoft.synapse/workspaces": ("Azure Synapse Analytics", "databases"),
+}
+
+# ARM resource type (lower case) -> (group type, icon catalog title).
+GROUP_TYPES: Dict[str, Tuple[str, str]] = {
+    "microsoft.management/managementgroups": ("managementGroup", "Management Groups"),
+    "microsoft.resources/resourcegroups": ("resourceGroup", "Resource Groups"),
+    "microsoft.network/virtualnetworks": ("virtualNetwork", "Virtual Networks"),
+    "microsoft.network/virtualnetworks/subnets": ("subnet", "Subnet"),
+}
+
+# Which group types may contain a group of a given type; services may sit in any.
+_GROUP_CONTAINERS: Dict[str, Tuple[str, ...]] = {
+    "managementGroup": ("managementGroup",),
+    "resourceGroup": ("managementGroup",),
+    "virtualNetwork": ("resourceGroup",),
+    "subnet": ("virtualNetwork",),
+}
+_DEPTH = {"managementGroup": 0, "resourceGroup": 1, "virtualNetwork": 2, "subnet": 3}
+
+# Terraform azurerm resource type -> ARM resource type (lower case).
+TERRAFORM_TYPES: Dict[str, str] = {
+    "azurerm_management_group": "microsoft.management/managementgroups",
+    "azurerm_resource_group": "microsoft.resources/resourcegroups",
+    "azurerm_virtual_network": "microsoft.network/virtualnetworks",
+    "azurerm_subnet": "microsoft.network/virtualnetworks/subnets",
+    "azurerm_network_security_group": "microsoft.network/networksecuritygroups",
+    "azurerm_public_ip": "microsoft.network/publicipaddresses",
+    "azurerm_lb": "microsoft.network/loadbalancers",
+    "azurerm_application_gateway": "microsoft.network/applicationgateways",
+    "azurerm_traffic_manager_profile": "microsoft.network/trafficmanagerprofiles",
+    "azurerm_network_interface": "microsoft.network/networkinterfaces",
+    "azurerm_firewall": "microsoft.network/azurefirewalls",
+    "azurerm_bastion_host": "microsoft.network/bastionhosts",
+    "azurerm_private_endpoint": "microsoft.network/privateendpoints",
+    "azurerm_private_dns_zone": "microsoft.network/privatednszones",
+    "azurerm_route_table": "microsoft.network/routetables",
+    "azurerm_service_plan": "microsoft.web/serverfarms",
+    "azurerm_app_service_plan": "microsoft.web/serverfarms",
+    "azurerm_linux_web_app": "microsoft.web/sites",
+    "azurerm_windows_web_app": "microsoft.web/sites",
+    "azurerm_app_service": "microsoft.web/sites",
+    "azurerm_linux_function_app": "microsoft.web/sites#functionapp",
+    "azurerm_windows_function_app": "microsoft.web/sites#functionapp",
+    "azurerm_function_app": "microsoft.web/sites#functionapp",
+    "azurerm_container_app": "microsoft.app/containerapps",
+    "azurerm_container_app_environment": "microsoft.app/managedenvironments",
+    "azurerm_linux_virtual_machine": "microsoft.compute/virtualmachines",
+    "azurerm_windows_virtual_machine": "microsoft.compute/virtualmachines",
+    "azurerm_virtual_machine": "microsoft.compute/virtualmachines",
+    "azurerm_kubernetes_cluster": "microsoft.containerservice/managedclusters",
+    "azurerm_container_group": "microsoft.containerinstance/containergroups",
+    "azurerm_container_registry": "microsoft.containerregistry/registries",
+    "azurerm_mssql_server": "microsoft.sql/servers",
+    "azurerm_sql_server": "microsoft.sql/servers",
+    "azurerm_mssql_database": "microsoft.sql/servers/databases",
+    "azurerm_sql_database": "microsoft.sql/servers/databases",
+    "azurerm_cosmosdb_account": "microsoft.documentdb/databaseaccounts",
+    "azurerm_redis_cache": "microsoft.cache/redis",
+    "azurerm_mysql_flexible_server": "microsoft.dbformysql/flexibleservers",
+    "azurerm_postgresql_flexible_server": "microsoft.dbforpostgresql/flexibleservers",
+    "azurerm_storage_account": "microsoft.storage/storageaccounts",
+    "azurerm_key_vault": "microsoft.keyvault/vaults",
+    "azurerm_user_assigned_identity": "microsoft.managedidentity/userassignedidentities",
+    "azurerm_servicebus_namespace": "microsoft.servicebus/namespaces",
+    "azurerm_eventgrid_topic": "microsoft.eventgrid/topics",
+    "azurerm_eventhub_namespace": "microsoft.eventhub/namespaces",
+    "azurerm_logic_app_workflow": "microsoft.logic/workflows",
+    "azurerm_application_insights": "microsoft.insights/components",
+    "azurerm_log_analytics_workspace": "microsoft.operationalinsights/workspaces",
+    "azurerm_cognitive_account": "microsoft.cognitiveservices/accounts",
+    "azurerm_machine_learning_workspace": "microsoft.machinelearningservices/workspaces",
+    "azurerm_search_service": "microsoft.search/searchservices",
+    "azurerm_api_management": "microsoft.apimanagement/service",
+    "azurerm_cdn_profile": "microsoft.cdn/profiles",
+    "azurerm_cdn_frontdoor_profile": "microsoft.cdn/profiles",
+    "azurerm_iothub": "microsoft.devices/iothubs",
+    "azurerm_data_factory": "microsoft.datafactory/factories",
+    "azurerm_synapse_workspace": "microsoft.synapse/workspaces",
+}
+
+# Attributes naming the resource an extension resource belongs to.
+_HOST_KEYS = (
+    "scope", "parent", "target_resource_id", "scope_id", "parent_id", "server_id", "key_vault_id",
+    "storage_account_name", "storage_account_id", "namespace_name", "namespace_id",
+)
+
+# Resources that only ever annotate another one, even when nothing says which.
+_EXTENSION_TYPES = re.compile(
+    r"^microsoft\.authorization/|^microsoft\.insights/diagnosticsettings$"
+    r"|_assignment$|_association$|_diagnostic_setting$|_lock$"
+)
+
+_BICEP_DECL = re.compile(
+    r"^[ \t]*(?:@[^\n]*\n[ \t]*)*(resource|module)\s+([A-Za-z_]\w*)\s+'([^']+)'\s*(existing\s*)?=\s*"
+    r"(?:if\s*\([^\n]*?\)\s*)?(\[\s*for\b[^\n]*?:\s*)?\{",
+    re.MULTILINE,
+)
+_TERRAFORM_DECL = re.compile(r'^[ \t]*(resource|module)\s+"([^"]+)"\s*(?:"([^"]+)"\s*)?\{', re.MULTILINE)
+# `<<EOF` / `<<-EOF` up to the end of its line; the body runs to a line holding just the identifier.
+_HEREDOC = re.compile(r"<<-?([A-Za-z_]\w*)[ \t]*\n")
+_LINE_KEY = re.compile(r"^\s*['\"]?([A-Za-z_][\w-]*)['\"]?\s*[:=]")
+_LITERAL_NAME_BICEP = re.compile(r"^\s*name:\s*'([^'$]+)'\s*$", re.MULTILINE)
+_LITERAL_NAME_TERRAFORM = re.compile(r'^\s*name\s*=\s*"([^"$]+)"\s*$', re.MULTILINE)
+
+
+@dataclass
+class _Resource:
+    id: str
+    symbol: str
+    type: str  # lower-case ARM type, or "module"
+    body: str
+    language: str
+    label: str
+    enclosing: Optional[str] = None  # declared inside another resource's body
+    refs: List[Tuple[str, str]] = field(default_factory=list)  # (target id, label)
+    host: Optional[str] = None
+
+
+def _strip_comments(text: str, hash_comments: bool, quotes: str, heredocs: bool = False) -> str:
+    """Blank out comments (and `heredocs` bodies), keeping string literals and offsets intact.
+
+    `quotes` are the language's string delimiters: `'` in Bicep, `"` in
+    Terraform, where an apostrophe is just a character.
+    """
+    out: List[str] = []
+    i, n = 0, len(text)
+    quote: Optional[str] = None
+    while i < n:
+        ch = text[i]
+        if quote:
+            out.append(ch)
+            if ch == "\\" and i + 1 < n:
+                out.append(text[i + 1])
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+            i += 1
+            continue
+        heredoc = _HEREDOC.match(text, i) if heredocs and ch == "<" else None
+        if heredoc:
+            terminator = re.compile(r"^[ \t]*" + re.escape(heredoc.group(1)) + r"[ \t]*$", re.MULTILINE)
+            close = terminator.search(text, heredoc.end())
+            end = n if close is None else close.start()
+            out.append(heredoc.group(0))
+            out.append("".join(c if c == "\n" else " " for c in text[heredoc.end():end]))
+            i = end
+        elif ch in quotes:
+            quote = ch
+            out.append(ch)
+            i += 1
+        elif text.startswith("//", i) or (hash_comments and ch == "#"):
+            end = text.find("\n", i)
+            end = n if end == -1 else end
+            out.append(" " * (end - i))
+            i = end
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            out.append("".join(c if c == "\n" else " " for c in text[i:end]))
+            i = end
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)
+
+
+def _block_end(text: str, start: int, quotes: str) -> int:
+    """Index just past the brace that closes the `{` at `start`, skipping `quotes`-delimited string literals."""
+    depth = 0
+    quote: Optional[str] = None
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == "\\":
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch in quotes:
+            quote = ch
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("unbalanced braces")
+
+
+def _line_key(body: str, offset: int) -> Optional[str]:
+    line_start = body.rfind("\n", 0, offset) + 1
+    match = _LINE_KEY.match(body[line_start:offset])
+    return match.group(1) if match else None
+
+
+def _bicep_kind_type(arm_type: str, body: str) -> str:
+    kind = re.search(r"^\s*kind:\s*'([^']*)'", body, re.MULTILINE)
+    if kind:
+        value = kind.group(1).lower()
+        if arm_type == "microsoft.web/sites" and "functionapp" in value:
+            return arm_type + "#functionapp"
+        if arm_type == "microsoft.cognitiveservices/accounts" and value == "openai":
+            return arm_type + "#openai"
+    return arm_type
+
+
+def _parse_bicep(text: str) -> List[_Resource]:
+    source = _strip_comments(text, hash_comments=False, quotes="'")
+    resources: List[_Resource] = []
+
+    def scan(chunk: str, enclosing: Optional[_Resource]) -> None:
+        pos = 0
+        while True:
+            match = _BICEP_DECL.search(chunk, pos)
+            if not match:
+                return
+            keyword, symbol, declared = match.group(1), match.group(2), match.group(3)
+            open_brace = match.end() - 1
+            end = _block_end(chunk, open_brace, "'")
+            body = chunk[open_brace + 1:end - 1]
+            if keyword == "module":
+                arm_type = "module"
+                default_label = declared.rsplit("/", 1)[-1].rsplit(".", 1)[0] or symbol
+            else:
+                arm_type = declared.split("@", 1)[0].lower()
+                if enclosing is not None and "/" not in arm_type and enclosing.type != "module":
+                    arm_type = f"{enclosing.type.split('#', 1)[0]}/{arm_type}"
+                arm_type = _bicep_kind_type(arm_type, body)
+                default_label = symbol
+            resource = _Resource(
+                id=symbol, symbol=symbol, type=arm_type, body=body, language="bicep",
+                label=default_label, enclosing=enclosing.id if enclosing else None,
+            )
+            resources.append(resource)
+            # Nested child resources are separate declarations; keep them out of the parent's body.
+            before = len(resources)
+            scan(body, resource)
+            for child in resources[before:]:
+                if child.enclosing == resource.id:
+                    resource.body = resource.body.replace(child.body, "")
+            name = _LITERAL_NAME_BICEP.search(resource.body)
+            if name:
+                resource.label = name.group(1)
+            pos = end
+
+    scan(source, None)
+    symbols = {resource.symbol for resource in resources}
+    if not symbols:
+        return resources
+    # `vnet::appSubnet` addresses a nested resource; a symbol followed by a lone `:` is a property key.
+    alternatives = "|".join(sorted(map(re.escape, symbols), key=len, reverse=True))
+    reference = re.compile(r"(?<![\w.$:])(" + alternatives + r")((?:::\w+)*)\b(?!\s*:(?!:))")
+    for resource in resources:
+        body = resource.body
+        depends = re.search(r"dependsOn:\s*\[([^\]]*)\]", body)
+        for match in reference.finditer(body):
+            nested = match.group(2).rsplit("::", 1)[-1] if match.group(2) else None
+            target = nested if nested in symbols else match.group(1)
+            if target == resource.symbol:
+                continue
+            in_depends = depends is not None and depends.start(1) <= match.start() < depends.end(1)
+            after = body[match.end():match.end() + 1]
+            key = "dependsOn" if in_depends else _line_key(body, match.start())
+            if key == "name":
+                continue  # names derived from other resources (`guid(vault.id, ...)`) are not relationships
+            # A bare symbol only counts where Bicep expects a resource: dependsOn, parent and scope.
+            # `sa[0].id` addresses one instance of a resource loop, like `sa.id` a single one.
+            if after not in (".", "[") and not in_depends and key not in ("parent", "scope"):
+                continue
+            resource.refs.append((target, key or "reference"))
+            if key in ("parent", "scope") and resource.host is None:
+                resource.host = target
+        if resource.enclosing:
+            resource.refs.append((resource.enclosing, "parent"))
+            resource.host = resource.host or resource.enclosing
+    return resources
+
+
+def _parse_terraform(text: str) -> List[_Resource]:
+    source = _strip_comments(text, hash_comments=True, quotes='"', heredocs=True)
+    resources: List[_Resource] = []
+    for match in _TERRAFORM_DECL.finditer(source):
+        keyword, first, second = match.group(1), match.group(2), match.group(3)
+        if keyword == "resource" and not second:
+            continue
+        open_brace = match.end() - 1
+        body = source[open_brace + 1:_block_end(source, open_brace, '"') - 1]
+        if keyword == "module":
+            resource = _Resource(id=f"module.{first}", symbol=f"module.{first}", type="module", body=body,
+                                 language="terraform", label=first)
+        else:
+            arm_type = TERRAFORM_TYPES.get(first, first)
+            resource = _Resource(id=f"{first}.{second}", symbol=f"{first}.{second}", type=arm_type, body=body,
+                                 language="terraform", label=second)
+        name = _LITERAL_NAME_TERRAFORM.search(body)
+        if name:
+            resource.label = name.group(1)
+        resources.append(resource)
+
+    addresses = {resource.symbol for resource in resources}
+    reference = re.compile(r"(?<![\w.])(module\.[A-Za-z_][\w-]*|[A-Za-z_][\w-]*\.[A-Za-z_][\w-]*)\b")
+    for resource in resources:
+        body = resource.body
+        depends = re.search(r"depends_on\s*=\s*\[([^\]]*)\]", body)
+        for match in reference.finditer(body):
+            target = match.group(1)
+            if target not in addresses or target == resource.symbol:
+                continue
+            in_depends = depends is not None and depends.start(1) <= match.start() < depends.end(1)
+            key = "depends_on" if in_depends else _line_key(body, match.start())
+            if key == "name":
+                continue
+            resource.refs.append((target, key or "reference"))
+            if key in _HOST_KEYS and resource.host is None:
+                resource.host = target
+    return resources
+
+
+def _title_from_type(resource_type: str) -> str:
+    """`microsoft.network/natgateways` has no catalog entry; `azurerm_nat_gateway` -> `Nat Gateway`."""
+    name = resource_type.rsplit("/", 1)[-1]
+    name = name[len("azurerm_"):] if name.startswith("azurerm_") else name
+    return " ".join(part.capitalize() for part in re.split(r"[_\W]+", name) if part)
+
+
+def _describe(resource: _Resource) -> str:
+    kind = "module" if resource.type == "module" else resource.type.split("#", 1)[0]
+    return f"{kind} `{resource.symbol}` from the {resource.language.capitalize()} template."
+
+
+def _build(resources: List[_Resource]) -> Optional[Dict[str, Any]]:
+    if not resources:
+        return None
+    by_id = {resource.id: resource for resource in resources}
+
+    def node_kind(resource: _Resource) -> str:
+        if resource.type in GROUP_TYPES:
+            return "group"
+        if resource.type in RESOURCE_TYPES or resource.type == "module":
+            return "service"
+        if resource.host or resource.type.count("/") > 1 or _EXTENSION_TYPES.search(resource.type):
+            return "folded"
+        return "service"
+
+    # Folded resources (no icon of their own) are represented by their host.
+    def represented(resource_id: str, seen: Optional[set] = None) -> Optional[str]:
+        resource = by_id.get(resource_id)
+        if resource is None:
+            return None
+        if node_kind(resource) != "folded":
+            return resource.id
+        seen = seen or set()
+        if resource_id in seen:
+            return None
+        seen.add(resource_id)
+        host = resource.host or next((target for target, _ in resource.refs if target in by_id), None)
+        return represented(host, seen) if host else None
+
+    kinds = {resource.id: node_kind(resource) for resource in resources}
+    groups: Dict[str, Dict[str, Any]] = {}
+    for resource in resources:
+        if kinds[resource.id] == "group":
+            group_type, _ = GROUP_TYPES[resource.type]
+            groups[resource.id] = {"id": resource.id, "label": resource.label, "type": group_type, "members": []}
+
+    # Collect every resource's references under the node that represents it.
+    node_refs: Dict[str, List[Tuple[str, str]]] = {}
+    for resource in resources:
+        source = represented(resource.id)
+        if source is None:
+            continue
+        for target, label in resource.refs:
+            node = represented(target)
+            if node is not None and node != source:
+                node_refs.setdefault(source, []).append((node, label))
+
+    def container(node_id: str) -> Optional[str]:
+        """The deepest referenced group allowed to contain `node_id`."""
+        own = groups.get(node_id, {}).get("type")
+        allowed = _GROUP_CONTAINERS.get(own) if own else tuple(_DEPTH)
+        candidates = [
+            target for target, _ in node_refs.get(node_id, [])
+            if target in groups and groups[target]["type"] in allowed
+        ]
+        enclosing = by_id[node_id].enclosing
+        if enclosing in groups and groups[enclosing]["type"] in allowed:
+            candidates.append(enclosing)
+        if not candidates:
+            return None
+        return max(candidates, key=lambda target: _DEPTH[groups[target]["type"]])
+
+    services: List[Dict[str, Any]] = []
+    connections: List[Dict[str, str]] = []
+    seen_edges: set = set()
+    for resource in resources:
+        if kinds[resource.id] != "service":
+            continue
+        if resource.type == "module":
+            title, category = resource.label, "module"
+        else:
+            title, category = RESOURCE_TYPES.get(resource.type) or (_title_from_type(resource.type), "other")
+        services.append({
+            "id": resource.id, "title": title, "category": category,
+            "description": _describe(resource), "groupIds": [],
+        })
+
+    for node_id in [*groups, *(service["id"] for service in services)]:
+        parent = container(node_id)
+        if parent is None:
+            continue
+        groups[parent]["members"].append(node_id)
+        if node_id in groups:
+            groups[node_id]["parentId"] = parent
+
+    service_ids = {service["id"] for service in services}
+    for service in services:
+        service["groupIds"] = [group_id for group_id, group in groups.items() if service["id"] in group["members"]]
+        for target, label in node_refs.get(service["id"], []):
+            if target in service_ids and (service["id"], target) not in seen_edges:
+                seen_edges.add((service["id"], target))
+                connections.append({"from": service["id"], "to": target, "label": label})
+
+    if not services and not groups:
+        return None
+
+    # Everything outside a group lands in the deployment's resource group.
+    resource_groups = [group for group in groups.values() if group["type"] == "resourceGroup"]
+    orphans = [service for service in services if not service["groupIds"]]
+    orphans += [group for group in groups.values() if group["type"] == "virtualNetwork" and "parentId" not in group]
+    if orphans:
+        if resource_groups:
+            home = resource_groups[0]
+        else:
+            home = groups["resource-group"] = {
+                "id": "resource-group", "label": "Resource Group", "type": "resourceGroup", "members": [],
+            }
+        for orphan in orphans:
+            home["members"].append(orphan["id"])
+            if "groupIds" in orphan:
+                orphan["groupIds"] = [home["id"]]
+            else:
+                orphan["parentId"] = home["id"]
+
+    return {
+        "services": services,
+        "groups": list(groups.values()),
+        "connections": connections,
+        "layout": "grid" if len(services) > 4 else "vertical",
+    }
+
+
+def parse_bicep(text: str) -> Optional[Dict[str, Any]]:
+    """Diagram for a Bicep template, or None when it declares nothing usable."""
+    return _build(_parse_bicep(text))
+
+
+def parse_terraform(text: str) -> Optional[Dict[str, Any]]:
+    """Diagram for a Terraform configuration, or None when it declares nothing usable."""
+    return _build(_parse_terraform(text))
+
+
+def diagram_from_iac(bicep: Optional[str] = None, terraform: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Parse the Bicep template, else the Terraform configuration; None if neither parses."""
+    for text, parse in ((bicep, parse_bicep), (terraform, parse_terraform)):
+        if not isinstance(text, str) or not text.strip():
+            continue
+        try:
+            diagram = parse(text)
+        except ValueError:
+            diagram = None
+        if diagram:
+            return diagram
+    return None
@@ -2,6 +2,8 @@ import json
 import logging
 from typing import Any, Dict, Optional
 
+from .cache import diagram_fingerprint, iac_cache, resolve_model_id
+
 logger = logging.getLogger(__name__)
 
 
@@ -11,8 +13,23 @@ async def generate_terraform_code(agent_client: Any, diagram: Dict[str, Any], op
     Prefers MCP-enhanced generation for better schema grounding,
     falls back to standard agent generation.
 
+    Results are cached by diagram content, provider and options.
     Returns a dict with keys: 'terraform_code' and 'parameters'.
     """
+    cache_key = diagram_fingerprint(
+        diagram,
+        target_format='terraform',
+        flags={'include_monitoring': True, 'include_security': True, **(options or {})},
+        model_id=resolve_model_id(agent_client),
+    )
+    return await iac_cache.get_or_generate(
+        cache_key,
+        lambda: _generate_terraform_uncached(agent_client, diagram, options),
+        cacheable=lambda result: bool(result.get('terraform_code')),
+    )
+
+
+async def _generate_terraform_uncached(agent_client: Any, diagram: Dict[str, Any], options: Dict[str, Any] | None) -> Dict[str, Any]:
     provider = (options or {}).get('provider', 'azurerm')
     
     # Try MCP-enhanced generation first (schema grounded)
@@ -0,0 +1,172 @@
+# app/obs/coalescer.py
+"""Batch streamed text deltas into frames.
+
+Model streams arrive a few characters at a time; sending each chunk as its own
+trace event or websocket message costs a serialize/queue/send round per token.
+`DeltaCoalescer` buffers chunks and hands them to its sink as one frame when
+the time window (`STREAM_COALESCE_WINDOW_MS`) closes or the buffered text
+reaches `STREAM_COALESCE_MAX_BYTES`. Producers call `flush()` before emitting
+any other kind of event so ordering across phases is kept.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.core.config import settings
+
+Sink = Callable[[str], Awaitable[None]]
+
+
+class DeltaCoalescer:
+    """Merge text chunks into frames on a time/size window; frames are delivered in order."""
+
+    def __init__(self, sink: Sink, window_ms: Optional[float] = None, max_bytes: Optional[int] = None) -> None:
+        self._sink = sink
+        window_ms = settings.STREAM_COALESCE_WINDOW_MS if window_ms is None else window_ms
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_bytes = max_bytes or settings.STREAM_COALESCE_MAX_BYTES
+        self._parts: List[str] = []
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_tasks: Set[asyncio.Task] = set()
+        self._error: Optional[BaseException] = None
+        self.chunks = 0
+        self.frames = 0
+        self.bytes = 0
+        self.cpu_seconds = 0.0
+        self._first: Optional[float] = None
+        self._last: Optional[float] = None
+
+    async def add(self, text: str) -> None:
+        """Buffer a chunk, flushing when the frame is full (or immediately when batching is off)."""
+        self._raise_timer_error()
+        if not text:
+            return
+        size = len(text.encode("utf-8"))
+        self.chunks += 1
+        self.bytes += size
+        if self._first is None:
+            self._first = time.monotonic()
+        self._parts.append(text)
+        self._size += size
+        if self.window <= 0 or self._size >= self.max_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._on_window)
+
+    async def flush(self) -> None:
+        """Send whatever is buffered as one frame."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._parts:
+                return
+            text = "".join(self._parts)
+            self._parts.clear()
+            self._size = 0
+            started = time.thread_time()
+            try:
+                await self._sink(text)
+            finally:
+                self.cpu_seconds += time.thread_time() - started
+                self.frames += 1
+                self._last = time.monotonic()
+
+    async def aclose(self) -> None:
+        """Flush the tail and wait for any window flush still in progress."""
+        await self.flush()
+        if self._timer_tasks:
+            await asyncio.gather(*self._timer_tasks, return_exceptions=True)
+        self._raise_timer_error()
+
+    def discard(self) -> None:
+        """Drop buffered text without sending it (the stream was cancelled)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._parts.clear()
+        self._size = 0
+
+    def _on_window(self) -> None:
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._timer_tasks.add(task)
+        task.add_done_callback(self._window_done)
+
+    def _window_done(self, task: asyncio.Task) -> None:
+        self._timer_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None and self._error is None:
+            self._error = task.exception()
+
+    def _raise_timer_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def stats(self) -> Dict[str, Any]:
+        """Chunk vs frame rates and the CPU spent delivering frames."""
+        elapsed = (self._last - self._first) if self._first is not None and self._last is not None else 0.0
+        per_frame = self.cpu_seconds / self.frames if self.frames else 0.0
+        return {
+            "chunks": self.chunks,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "frame_reduction": round(1 - self.frames / self.chunks, 3) if self.chunks else 0.0,
+            "chunks_per_sec": round(self.chunks / elapsed, 1) if elapsed > 0 else None,
+            "frames_per_sec": round(self.frames / elapsed, 1) if elapsed > 0 else None,
+            "cpu_ms": round(self.cpu_seconds * 1000, 3),
+            # Per-frame delivery cost times the frames that were merged away.
+            "cpu_ms_saved_est": round(per_frame * (self.chunks - self.frames) * 1000, 3),
+        }
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"streams": 0, "chunks": 0, "frames": 0, "bytes": 0, "cpu_ms": 0.0, "cpu_ms_saved_est": 0.0}
+
+
+def _add(totals: Dict[str, Any], stats: Dict[str, Any]) -> None:
+    totals["streams"] += 1
+    for key in ("chunks", "frames", "bytes"):
+        totals[key] += stats[key]
+    for key in ("cpu_ms", "cpu_ms_saved_est"):
+        totals[key] = round(totals[key] + stats[key], 3)
+    totals["frame_reduction"] = round(1 - totals["frames"] / totals["chunks"], 3) if totals["chunks"] else 0.0
+
+
+class StreamStats:
+    """Coalescer results per run (most recent `max_runs`) and process-wide."""
+
+    def __init__(self, max_runs: int = 1000) -> None:
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._totals = _empty_totals()
+
+    def record(self, run_id: Optional[str], coalescer: DeltaCoalescer) -> Dict[str, Any]:
+        stats = coalescer.stats()
+        _add(self._totals, stats)
+        if run_id:
+            run = self._runs.get(run_id)
+            if run is None:
+                run = self._runs[run_id] = _empty_totals()
+                while len(self._runs) > self.max_runs:
+                    self._runs.popitem(last=False)
+            _add(run, stats)
+        return stats
+
+    def run(self, run_id: str) -> Dict[str, Any]:
+        return self._runs.get(run_id) or _empty_totals()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": len(self._runs),
+            "window_ms": settings.STREAM_COALESCE_WINDOW_MS,
+            "max_bytes": settings.STREAM_COALESCE_MAX_BYTES,
+            **self._totals,
+        }
+
+
+stream_stats = StreamStats()
@@ -0,0 +1,61 @@
+# app/obs/timings.py
+"""When each part of a team run's result became available.
+
+A team run delivers its result in pieces: the final architecture text and
+diagram as soon as the final editor finishes, then the Bicep template, the
+Terraform configuration and the diagram derived from the IaC, each when it
+is ready. `result_timings` records, per run, how long after the run started
+each piece arrived, so time to first usable result can be compared with
+time to the complete result.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+FIRST_RESULT = "final"
+
+
+def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ResultTimings:
+    """Milliseconds from run start to each delivered result piece, per run (most recent `max_runs`)."""
+
+    def __init__(self, max_runs: int = 1000) -> None:
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+    def record(self, run_id: str, kind: str, elapsed_ms: float) -> None:
+        run = self._runs.get(run_id)
+        if run is None:
+            run = self._runs[run_id] = {}
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        run.setdefault(kind, round(elapsed_ms, 1))
+
+    def run(self, run_id: str) -> Dict[str, Any]:
+        """`first_result_ms`, `complete_ms` (the last piece) and each piece's time."""
+        pieces = self._runs.get(run_id) or {}
+        return {
+            "first_result_ms": pieces.get(FIRST_RESULT),
+            "complete_ms": max(pieces.values()) if pieces else None,
+            "pieces": dict(pieces),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        first = [pieces[FIRST_RESULT] for pieces in self._runs.values() if FIRST_RESULT in pieces]
+        complete = [max(pieces.values()) for pieces in self._runs.values() if pieces]
+        return {
+            "runs": len(self._runs),
+            "first_result_ms_p50": _percentile(first, 0.5),
+            "first_result_ms_p95": _percentile(first, 0.95),
+            "complete_ms_p50": _percentile(complete, 0.5),
+            "complete_ms_p95": _percentile(complete, 0.95),
+        }
+
+
+result_timings = ResultTimings()
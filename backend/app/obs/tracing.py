@@ -1,14 +1,57 @@
 # app/obs/tracing.py
-import time, json, asyncio, uuid
+"""Per-run trace event log with bounded fan-out.
+
+Every run keeps a ring buffer of its serialized events, so a listener that
+attaches late (a reconnecting tab, `subscribe_run`) first receives the
+buffered history and then live events. Each listener gets a bounded queue;
+when a slow listener falls behind, the configured overflow policy applies:
+
+* ``coalesce``    fold a new `delta` into the newest queued delta of the same
+                  step (lossless for text, so memory is bounded by the run's
+                  output rather than its event count), dropping the oldest
+                  entry only when nothing merges;
+* ``drop_oldest`` drop the oldest queued event;
+* ``disconnect``  end that listener's stream; it can re-attach and replay.
+
+`result` and `artifact` events are never the ones dropped, from a listener
+queue or from the run buffer: a listener that falls behind still receives
+every piece of the run's result (a disconnected one, on replay).
+
+Events are numbered per run (`seq`, starting at 1); `attach(after=...)`
+replays only what a resuming listener has not seen, which is how SSE clients
+pick up from `Last-Event-ID`.
+
+With a cross-process broker (`connect_broker`), every event and run end is
+also published, and each worker mirrors the other workers' runs into its own
+logs. A listener attached on any worker therefore sees, and can replay, a run
+executing on another.
+
+Finished runs are evicted after `TRACE_RUN_TTL_SECONDS`, abandoned ones after
+`TRACE_IDLE_RUN_TTL_SECONDS`, and at most `TRACE_MAX_RUNS` are kept.
+"""
+
+import time, json, asyncio, uuid, logging
+from collections import deque
 from dataclasses import dataclass, asdict
-from typing import Optional, Dict, Any, AsyncIterator, List
+from typing import Optional, Dict, Any, AsyncIterator, Deque, List, Tuple, Union
+
+from app.core.broker import Broker, channel
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("coalesce", "drop_oldest", "disconnect")
+
+# Phases that carry the run's result; overflow drops other events instead.
+RESULT_PHASES = ("result", "artifact")
+
 
 @dataclass
 class TraceEvent:
     run_id: str
     step_id: str
     agent: str
-    phase: str           # start|delta|end|error
+    phase: str           # start|delta|diagram_partial|end|error|cancelled|result|artifact
     ts: float
     meta: Dict[str, Any]
     progress: Dict[str, int]
@@ -16,54 +59,325 @@ class TraceEvent:
     message_delta: Optional[str] = None
     summary: Optional[str] = None
     error: Optional[str] = None
+    payload: Optional[Dict[str, Any]] = None   # structured data, e.g. a streamed diagram item
+
+
+class _Entry:
+    """A serialized event; merged deltas keep their text chunks and re-serialize once, on read.
+
+    One emitted entry is shared by the run buffer and every listener queue;
+    `_coalesce` copies it before the first merge (copies are never shared).
+    """
+
+    __slots__ = ("seq", "step_id", "phase", "data", "delta", "prefix", "shared")
+
+    def __init__(self, seq: int, step_id: str, phase: str, data: str, delta: Optional[str] = None) -> None:
+        self.seq = seq
+        self.step_id = step_id
+        self.phase = phase
+        self.data = data
+        self.delta = delta
+        self.prefix: Optional[List[Tuple[int, str]]] = None   # (seq, text) of earlier deltas folded into this one
+        self.shared = True
+
+    def copy(self) -> "_Entry":
+        entry = _Entry(self.seq, self.step_id, self.phase, self.data, self.delta)
+        entry.prefix = list(self.prefix) if self.prefix else None
+        entry.shared = False
+        return entry
+
+    def since(self, after: int) -> "_Entry":
+        """Copy without the folded chunks a resuming listener already has."""
+        entry = self.copy()
+        if entry.prefix:
+            entry.prefix = [chunk for chunk in entry.prefix if chunk[0] > after] or None
+        return entry
+
+    def merge(self, later: "_Entry") -> None:
+        """Fold a later delta of the same step into this one (text concatenated, latest fields kept)."""
+        if self.prefix is None:
+            self.prefix = []
+        self.prefix.append((self.seq, self.delta or ""))
+        if later.prefix:
+            self.prefix.extend(later.prefix)
+        self.seq, self.data, self.delta = later.seq, later.data, later.delta
+
+    def render(self) -> str:
+        if not self.prefix:
+            return self.data
+        event = json.loads(self.data)
+        event["message_delta"] = "".join(text for _, text in self.prefix) + (self.delta or "")
+        return json.dumps(event)
+
+
+def _coalesce(entries: Deque[Optional[_Entry]], incoming: _Entry) -> bool:
+    """Fold a delta into the newest queued event of its step, if that one is a delta too.
+
+    Per-step order is preserved; relative order across concurrently streaming
+    steps may tighten, which listeners already tolerate.
+    """
+    if incoming.phase != "delta":
+        return False
+    for index in range(len(entries) - 1, -1, -1):
+        entry = entries[index]
+        if entry is not None and entry.step_id == incoming.step_id:
+            if entry.phase != "delta":
+                return False
+            if entry.shared:
+                entry = entries[index] = entry.copy()
+            entry.merge(incoming)
+            return True
+    return False
+
+
+def _drop_oldest(entries: Deque[Optional[_Entry]]) -> bool:
+    """Remove the oldest entry that is not part of the result; False if there is none."""
+    for index, entry in enumerate(entries):
+        if entry is None or entry.phase not in RESULT_PHASES:
+            del entries[index]
+            return True
+    return False
+
+
+class TraceQueue(asyncio.Queue):
+    """Bounded listener queue; `get()` yields JSON strings and None at end of stream.
+
+    With `with_ids`, items are `(seq, json)` pairs instead; with `with_phases`,
+    `(phase, json)` pairs. `limit` is enforced by `offer`, which may exceed it
+    only for result events and the end-of-stream marker.
+    """
+
+    def __init__(self, limit: int, policy: str, with_ids: bool = False, with_phases: bool = False) -> None:
+        super().__init__()
+        self.limit = limit
+        self.policy = policy
+        self.with_ids = with_ids
+        self.with_phases = with_phases
+        self.closed = False
+        self.dropped = 0
+        self.coalesced = 0
+
+    def _get(self) -> Union[str, Tuple[int, str], None]:
+        entry = self._queue.popleft()
+        if entry is None:
+            return None
+        if self.with_ids:
+            return entry.seq, entry.render()
+        return (entry.phase, entry.render()) if self.with_phases else entry.render()
+
+    def offer(self, entry: _Entry) -> None:
+        """Enqueue without blocking the producer, applying the overflow policy when full."""
+        if self.closed:
+            return
+        if self.qsize() >= self.limit:
+            if self.policy == "disconnect":
+                self.close(drop_pending=True)
+                return
+            if self.policy == "coalesce" and _coalesce(self._queue, entry):
+                self.coalesced += 1
+                return
+            if _drop_oldest(self._queue):
+                self.dropped += 1
+            elif entry.phase not in RESULT_PHASES:
+                self.dropped += 1   # only results are queued: the newcomer gives way
+                return
+        self.put_nowait(entry)
+
+    def close(self, drop_pending: bool = False) -> None:
+        """End the stream; the listener sees None after any still-queued events."""
+        if self.closed:
+            return
+        self.closed = True
+        if drop_pending:
+            self._queue.clear()
+        self.put_nowait(None)
+
+
+class _RunLog:
+    __slots__ = ("events", "subscribers", "finished", "seq", "created_at", "updated_at")
+
+    def __init__(self) -> None:
+        self.events: Deque[_Entry] = deque()
+        self.subscribers: List[TraceQueue] = []
+        self.finished = False
+        self.seq = 0
+        self.created_at = self.updated_at = time.monotonic()
+
 
 class Tracer:
     """Fan-out to multiple listeners (SSE, WebSocket, logs, OTEL)."""
 
-    def __init__(self):
-        # Each run_id fans out to zero or more subscriber queues
-        self._subscribers: Dict[str, List[asyncio.Queue[Optional[str]]]] = {}
+    def __init__(
+        self,
+        buffer_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        overflow: Optional[str] = None,
+        run_ttl: Optional[float] = None,
+        idle_ttl: Optional[float] = None,
+        max_runs: Optional[int] = None,
+    ):
+        self.buffer_size = buffer_size or settings.TRACE_BUFFER_EVENTS
+        self.queue_size = queue_size or settings.TRACE_SUBSCRIBER_QUEUE_SIZE
+        self.overflow = overflow or settings.TRACE_OVERFLOW_POLICY
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown trace overflow policy: {self.overflow}")
+        self.run_ttl = run_ttl if run_ttl is not None else settings.TRACE_RUN_TTL_SECONDS
+        self.idle_ttl = idle_ttl if idle_ttl is not None else settings.TRACE_IDLE_RUN_TTL_SECONDS
+        self.max_runs = max_runs or settings.TRACE_MAX_RUNS
+        self._runs: Dict[str, _RunLog] = {}
+        self.evicted = 0
+        self.buffer_coalesced = 0
+        self.broker: Optional[Broker] = None
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.mirrored_events = 0
+
+    async def connect_broker(self, broker: Broker) -> None:
+        """Replicate run logs through `broker` (a no-op for in-process brokers)."""
+        self.broker = broker
+        if not broker.local_only:
+            await broker.subscribe(channel("trace"), self._on_broker_message)
+
+    @property
+    def _replicating(self) -> bool:
+        return self.broker is not None and not self.broker.local_only
+
+    async def _publish(self, kind: str, run_id: str, entry: Optional[_Entry] = None) -> None:
+        header: Dict[str, Any] = {"origin": self.worker_id, "kind": kind, "run_id": run_id}
+        data = ""
+        if entry is not None:
+            header.update(seq=entry.seq, step_id=entry.step_id, phase=entry.phase, delta=entry.delta)
+            data = entry.data
+        # The event JSON is appended verbatim rather than re-encoded inside the header.
+        await self.broker.publish(channel("trace"), f"{json.dumps(header)}\n{data}")
+
+    async def _on_broker_message(self, message: str) -> None:
+        head, _, data = message.partition("\n")
+        header = json.loads(head)
+        if header["origin"] == self.worker_id:
+            return
+        run_id = header["run_id"]
+        if header["kind"] == "finish":
+            self._finish(run_id)
+            return
+        log = self._run(run_id)
+        log.seq = max(log.seq, header["seq"])
+        self._append(run_id, log, _Entry(header["seq"], header["step_id"], header["phase"], data, header["delta"]))
+        self.mirrored_events += 1
 
     def new_run(self) -> str:
+        self.evict_expired()
         return f"lz-{time.strftime('%Y-%m-%d-%H%M%SZ', time.gmtime())}-{uuid.uuid4().hex[:4]}"
 
+    def _run(self, run_id: str) -> _RunLog:
+        log = self._runs.get(run_id)
+        if log is None:
+            log = self._runs[run_id] = _RunLog()
+        return log
+
     def ensure_run(self, run_id: str) -> None:
         """Ensure an entry exists for the run so producers can emit before listeners attach."""
-        self._subscribers.setdefault(run_id, [])
+        self._run(run_id)
+
+    def reopen(self, run_id: str) -> None:
+        """Accept events for a finished run again, e.g. while it is resumed from checkpoints."""
+        log = self._run(run_id)
+        log.finished = False
+        log.updated_at = time.monotonic()
+
+    def has_run(self, run_id: str) -> bool:
+        return run_id in self._runs
+
+    def is_finished(self, run_id: str) -> bool:
+        log = self._runs.get(run_id)
+        return log is not None and log.finished
+
+    def last_seq(self, run_id: str) -> int:
+        log = self._runs.get(run_id)
+        return log.seq if log else 0
 
-    def attach(self, run_id: str) -> asyncio.Queue[Optional[str]]:
-        queue: asyncio.Queue[Optional[str]] = asyncio.Queue()
-        self._subscribers.setdefault(run_id, []).append(queue)
+    def attach(
+        self,
+        run_id: str,
+        replay: bool = True,
+        after: Optional[int] = None,
+        with_ids: bool = False,
+        with_phases: bool = False,
+    ) -> TraceQueue:
+        """Subscribe to a run; the queue starts with the buffered history unless `replay` is False.
+
+        `after` limits the replay to events numbered above it (a resume point).
+        """
+        log = self._run(run_id)
+        # Room for the whole replay (already bounded by buffer_size) plus live events.
+        queue = TraceQueue(max(self.queue_size, len(log.events) if replay else 0), self.overflow, with_ids, with_phases)
+        if replay:
+            for entry in log.events:
+                if after is None:
+                    queue.offer(entry)
+                elif entry.seq > after:
+                    queue.offer(entry.since(after))
+        if log.finished:
+            queue.close()
+        else:
+            log.subscribers.append(queue)
         return queue
 
-    def detach(self, run_id: str, queue: asyncio.Queue[Optional[str]]) -> None:
-        subscribers = self._subscribers.get(run_id)
-        if not subscribers:
+    def detach(self, run_id: str, queue: TraceQueue) -> None:
+        log = self._runs.get(run_id)
+        if log is None:
             return
         try:
-            subscribers.remove(queue)
+            log.subscribers.remove(queue)
         except ValueError:
             pass
-        if not subscribers:
-            self._subscribers.pop(run_id, None)
+
+    def _buffer(self, log: _RunLog, entry: _Entry) -> None:
+        if len(log.events) >= self.buffer_size:
+            if _coalesce(log.events, entry):
+                self.buffer_coalesced += 1
+                return
+            if not _drop_oldest(log.events) and entry.phase not in RESULT_PHASES:
+                return
+        log.events.append(entry)
+
+    def _append(self, run_id: str, log: _RunLog, entry: _Entry) -> None:
+        log.updated_at = time.monotonic()
+        for queue in list(log.subscribers):
+            queue.offer(entry)
+            if queue.closed:
+                log.subscribers.remove(queue)
+                logger.info("Trace listener for %s fell behind and was disconnected", run_id)
+        self._buffer(log, entry)
 
     async def emit(self, ev: TraceEvent):
-        subscribers = self._subscribers.get(ev.run_id, [])
-        if subscribers:
-            payload = json.dumps(asdict(ev))
-            for queue in list(subscribers):
-                await queue.put(payload)
-        # Always log too
-        print("[TRACE]", ev.agent, ev.phase, ev.step_id)
+        log = self._run(ev.run_id)
+        log.seq += 1
+        entry = _Entry(log.seq, ev.step_id, ev.phase, json.dumps(asdict(ev)), ev.message_delta)
+        self._append(ev.run_id, log, entry)
+        logger.debug("[TRACE] %s %s %s", ev.agent, ev.phase, ev.step_id)
+        if self._replicating:
+            await self._publish("event", ev.run_id, entry)
 
     async def finish(self, run_id: str) -> None:
         """Signal all listeners that the run is complete."""
-        subscribers = self._subscribers.get(run_id, [])
-        for queue in list(subscribers):
-            await queue.put(None)
+        if self._replicating and run_id in self._runs:
+            await self._publish("finish", run_id)
+        self._finish(run_id)
 
-    async def stream(self, run_id: str) -> AsyncIterator[str]:
-        queue = self.attach(run_id)
+    def _finish(self, run_id: str) -> None:
+        log = self._runs.get(run_id)
+        if log is None:
+            return
+        log.finished = True
+        log.updated_at = time.monotonic()
+        for queue in log.subscribers:
+            queue.close()
+        log.subscribers.clear()
+        self.evict_expired()
+
+    async def stream(self, run_id: str) -> AsyncIterator[Tuple[str, str]]:
+        """Yield a run's `(phase, json)` events, replay first, until it finishes."""
+        queue = self.attach(run_id, with_phases=True)
         try:
             while True:
                 data = await queue.get()
@@ -73,4 +387,39 @@ class Tracer:
         finally:
             self.detach(run_id, queue)
 
+    def evict_expired(self, now: Optional[float] = None) -> int:
+        """Drop finished runs past their TTL, abandoned runs past the idle TTL, and the oldest beyond max_runs."""
+        now = time.monotonic() if now is None else now
+        expired = [
+            run_id for run_id, log in self._runs.items()
+            if (log.finished and now - log.updated_at > self.run_ttl)
+            or (not log.finished and not log.subscribers and now - log.updated_at > self.idle_ttl)
+        ]
+        overflow = len(self._runs) - len(expired) - self.max_runs
+        if overflow > 0:
+            survivors = sorted(
+                (log.updated_at, not log.finished, run_id)
+                for run_id, log in self._runs.items() if run_id not in expired
+            )
+            expired.extend(run_id for _, _, run_id in survivors[:overflow])
+        for run_id in expired:
+            log = self._runs.pop(run_id)
+            for queue in log.subscribers:
+                queue.close()
+        self.evicted += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        queues = [q for log in self._runs.values() for q in log.subscribers]
+        return {
+            "runs": len(self._runs),
+            "buffered_events": sum(len(log.events) for log in self._runs.values()),
+            "subscribers": len(queues),
+            "queued_events": sum(q.qsize() for q in queues),
+            "overflow_policy": self.overflow,
+            "evicted_runs": self.evicted,
+            "buffer_coalesced": self.buffer_coalesced,
+            "mirrored_events": self.mirrored_events,
+        }
+
 tracer = Tracer()
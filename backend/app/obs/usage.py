@@ -0,0 +1,310 @@
+# app/obs/usage.py
+"""Token accounting for agent steps.
+
+Usage is taken from the chat client's response metadata (`UsageContent`
+updates, or an OpenAI-style `usage` object on the raw chunk) when the
+provider reports it. Otherwise prompt and completion tokens are estimated
+with tiktoken when it is installed, or a characters/4 heuristic when not.
+
+Step records are aggregated per run, conversation and project in the
+process-wide `usage_ledger`.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_ENCODINGS: Dict[str, Any] = {}
+_TIKTOKEN_MISSING = False
+
+
+def _encoding_for(model: Optional[str]):
+    global _TIKTOKEN_MISSING
+    if _TIKTOKEN_MISSING:
+        return None
+    key = model or ""
+    if key in _ENCODINGS:
+        return _ENCODINGS[key]
+    try:
+        import tiktoken  # optional dependency
+    except ImportError:
+        _TIKTOKEN_MISSING = True
+        logger.info("tiktoken not installed; estimating token counts from text length")
+        return None
+    try:
+        encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    _ENCODINGS[key] = encoding
+    return encoding
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    """Tokenizer-based count when tiktoken is available, else ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = _encoding_for(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, math.ceil(len(text) / 4))
+
+
+def message_text(messages: Any) -> str:
+    """Flatten a prompt (str, ChatMessage or list of either) into plain text."""
+    if messages is None:
+        return ""
+    if isinstance(messages, str):
+        return messages
+    if isinstance(messages, (list, tuple)):
+        return "\n".join(message_text(m) for m in messages)
+    text = getattr(messages, "text", None) or getattr(messages, "content", None)
+    return text if isinstance(text, str) else ""
+
+
+def usage_from_update(update: Any) -> Optional[Dict[str, int]]:
+    """Extract reported token usage from a streaming update, if the provider sent any."""
+    prompt = completion = None
+    for content in getattr(update, "contents", None) or []:
+        details = getattr(content, "details", None)
+        if details is None or getattr(content, "type", None) != "usage":
+            continue
+        prompt = (prompt or 0) + (getattr(details, "input_token_count", None) or 0)
+        completion = (completion or 0) + (getattr(details, "output_token_count", None) or 0)
+    if prompt is None:
+        usage = getattr(getattr(update, "raw_representation", None), "usage", None)
+        if usage is not None:
+            prompt = getattr(usage, "prompt_tokens", None)
+            completion = getattr(usage, "completion_tokens", None)
+    if prompt is None and completion is None:
+        return None
+    return {"prompt_tokens": int(prompt or 0), "completion_tokens": int(completion or 0)}
+
+
+@dataclass
+class StepUsage:
+    """Token and timing figures for one agent step."""
+
+    agent: str
+    step_id: str
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    source: str = "estimated"        # reported | estimated
+    ttft_ms: Optional[int] = None
+    latency_ms: int = 0
+    started_at: float = field(default_factory=time.time)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def tokens_per_sec(self) -> float:
+        # Generation throughput, measured from the first token when we saw one.
+        generating_ms = self.latency_ms - (self.ttft_ms or 0)
+        if self.completion_tokens <= 0 or generating_ms <= 0:
+            return 0.0
+        return round(self.completion_tokens / (generating_ms / 1000), 2)
+
+    def telemetry(self) -> Dict[str, Any]:
+        """Shape used in TraceEvent.telemetry."""
+        return {
+            "tokens_in": self.prompt_tokens,
+            "tokens_out": self.completion_tokens,
+            "latency_ms": self.latency_ms,
+            "ttft_ms": self.ttft_ms,
+            "tokens_per_sec": self.tokens_per_sec,
+            "usage_source": self.source,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.update(total_tokens=self.total_tokens, tokens_per_sec=self.tokens_per_sec)
+        return data
+
+
+class StepMeter:
+    """Tracks one streamed agent step: first-token time, output text and reported usage."""
+
+    def __init__(self, agent: str, step_id: str, prompt: Any = None, instructions: Optional[str] = None,
+                 model: Optional[str] = None) -> None:
+        self.usage = StepUsage(agent=agent, step_id=step_id, model=model)
+        self._start = time.perf_counter()
+        self._prompt_text = "\n".join(t for t in (instructions, message_text(prompt)) if t)
+        self._output: List[str] = []
+        self._output_chars = 0
+        self._reported: Optional[Dict[str, int]] = None
+        self.usage.prompt_tokens = count_tokens(self._prompt_text, model)
+
+    def _elapsed_ms(self) -> int:
+        return int((time.perf_counter() - self._start) * 1000)
+
+    def observe_update(self, update: Any) -> None:
+        reported = usage_from_update(update)
+        if reported:
+            if self._reported is None:
+                self._reported = {"prompt_tokens": 0, "completion_tokens": 0}
+            for key, value in reported.items():
+                self._reported[key] += value
+
+    def observe_text(self, text: str) -> None:
+        if self.usage.ttft_ms is None:
+            self.usage.ttft_ms = self._elapsed_ms()
+        self._output.append(text)
+        self._output_chars += len(text)
+        self.usage.latency_ms = self._elapsed_ms()
+        if self._reported is None:
+            # Cheap running estimate for live telemetry; finish() counts exactly once.
+            self.usage.completion_tokens = math.ceil(self._output_chars / 4)
+
+    def finish(self, final_text: Optional[str] = None) -> StepUsage:
+        usage = self.usage
+        usage.latency_ms = self._elapsed_ms()
+        if self._reported is not None:
+            usage.prompt_tokens = self._reported["prompt_tokens"] or usage.prompt_tokens
+            usage.completion_tokens = self._reported["completion_tokens"] or usage.completion_tokens
+            usage.source = "reported"
+        else:
+            usage.completion_tokens = count_tokens("".join(self._output) or final_text, usage.model)
+        return usage
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "steps": 0, "latency_ms": 0, "by_agent": {}}
+
+
+def _add(totals: Dict[str, Any], step: StepUsage) -> None:
+    for bucket in (totals, totals["by_agent"].setdefault(step.agent, {
+        "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "steps": 0, "latency_ms": 0,
+    })):
+        bucket["prompt_tokens"] += step.prompt_tokens
+        bucket["completion_tokens"] += step.completion_tokens
+        bucket["total_tokens"] += step.total_tokens
+        bucket["steps"] += 1
+        bucket["latency_ms"] += step.latency_ms
+
+
+class UsageLedger:
+    """Aggregates step usage per run, conversation and project.
+
+    Per-step detail is kept for the most recent `max_runs` runs; conversation
+    and project totals are running sums.
+    """
+
+    def __init__(self, max_runs: int = 1000) -> None:
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._conversations: Dict[str, Dict[str, Any]] = {}
+        self._projects: Dict[str, Dict[str, Any]] = {}
+
+    def bind_run(self, run_id: str, conversation_id: Optional[str] = None, project_id: Optional[str] = None) -> None:
+        run = self._run(run_id)
+        run["conversation_id"] = conversation_id or run.get("conversation_id")
+        run["project_id"] = project_id or run.get("project_id")
+
+    def _run(self, run_id: str) -> Dict[str, Any]:
+        run = self._runs.get(run_id)
+        if run is None:
+            run = {"run_id": run_id, "conversation_id": None, "project_id": None, "steps": [], "totals": _empty_totals()}
+            self._runs[run_id] = run
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        return run
+
+    def record(self, run_id: str, step: StepUsage) -> None:
+        run = self._run(run_id)
+        run["steps"].append(step)
+        _add(run["totals"], step)
+        if run["conversation_id"]:
+            _add(self._conversations.setdefault(run["conversation_id"], _empty_totals()), step)
+        if run["project_id"]:
+            _add(self._projects.setdefault(run["project_id"], _empty_totals()), step)
+
+    def run_usage(self, run_id: str) -> Optional[Dict[str, Any]]:
+        run = self._runs.get(run_id)
+        if run is None:
+            return None
+        return {
+            "run_id": run_id,
+            "conversation_id": run["conversation_id"],
+            "project_id": run["project_id"],
+            "totals": run["totals"],
+            "steps": [step.to_dict() for step in run["steps"]],
+        }
+
+    def run_totals(self, run_id: str) -> Dict[str, Any]:
+        run = self._runs.get(run_id)
+        return run["totals"] if run else _empty_totals()
+
+    def conversation_totals(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return self._conversations.get(conversation_id)
+
+    def project_totals(self, project_id: str) -> Optional[Dict[str, Any]]:
+        return self._projects.get(project_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"runs": len(self._runs), "conversations": len(self._conversations), "projects": len(self._projects)}
+
+
+usage_ledger = UsageLedger()
+
+
+class ModelCallStats:
+    """Model calls per team run by purpose, next to what always generating every IaC artifact would cost.
+
+    Stage calls come from the usage ledger. IaC calls are recorded here as
+    ``iac`` (generated during the run), ``iac_diagram`` (the IaC-to-diagram
+    pass) and ``iac_on_demand`` (generated later, on first access). A run's
+    ``eager_baseline`` is the IaC calls it would have made when every format
+    and the diagram pass always ran.
+    """
+
+    PURPOSES = ("iac", "iac_diagram", "iac_on_demand")
+
+    def __init__(self, ledger: UsageLedger, max_runs: int = 1000) -> None:
+        self.ledger = ledger
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+
+    def _run(self, run_id: str) -> Dict[str, int]:
+        run = self._runs.get(run_id)
+        if run is None:
+            run = self._runs[run_id] = {"eager_baseline": 0, **{purpose: 0 for purpose in self.PURPOSES}}
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        return run
+
+    def start_run(self, run_id: str, eager_baseline: int) -> None:
+        self._run(run_id)["eager_baseline"] = eager_baseline
+
+    def record(self, run_id: str, purpose: str, calls: int = 1) -> None:
+        self._run(run_id)[purpose] += calls
+
+    def run(self, run_id: str) -> Dict[str, int]:
+        run = self._runs.get(run_id) or {"eager_baseline": 0, **{purpose: 0 for purpose in self.PURPOSES}}
+        stages = self.ledger.run_totals(run_id)["steps"]
+        return {
+            "stages": stages,
+            **{purpose: run[purpose] for purpose in self.PURPOSES},
+            "total": stages + sum(run[purpose] for purpose in self.PURPOSES),
+            "all_eager": stages + run["eager_baseline"],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        runs = [self.run(run_id) for run_id in self._runs]
+        if not runs:
+            return {"runs": 0, "avg_model_calls": None, "avg_model_calls_all_eager": None}
+        return {
+            "runs": len(runs),
+            "avg_model_calls": round(sum(run["total"] for run in runs) / len(runs), 2),
+            "avg_model_calls_all_eager": round(sum(run["all_eager"] for run in runs) / len(runs), 2),
+            **{f"avg_{purpose}": round(sum(run[purpose] for run in runs) / len(runs), 2) for purpose in self.PURPOSES},
+        }
+
+
+model_calls = ModelCallStats(usage_ledger)
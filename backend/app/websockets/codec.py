@@ -0,0 +1,119 @@
+"""Wire encodings for WebSocket frames.
+
+JSON text frames are the default. A client can ask for compact binary frames
+by offering the `azviz.msgpack.v1` subprotocol when it connects (browsers:
+``new WebSocket(url, ["azviz.msgpack.v1"])``). Binary frames are MessagePack
+with field-id interning: every map key listed in `FIELDS` is sent as its
+index in that table, so the keys repeated on each trace delta (`run_id`,
+`agent`, `phase`, `progress`, ...) cost one byte. Unlisted keys stay strings.
+The table is append-only; changing existing ids needs a new subprotocol
+version. Client messages have only their envelope (top-level) keys
+expanded: below it they carry user data, such as diagram JSON, whose
+integer keys are data rather than field ids.
+
+permessage-deflate is negotiated by the server itself (uvicorn's
+`--ws-per-message-deflate`, on by default) whenever the client offers it,
+and composes with either encoding.
+
+MessagePack needs the optional `msgpack` package; without it the server
+accepts only JSON.
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+SUBPROTOCOLS: Dict[str, str] = {
+    "azviz.json.v1": JSON,
+    "azviz.msgpack.v1": MSGPACK,
+}
+
+# Field-id table for MessagePack frames (append only).
+FIELDS: Tuple[str, ...] = (
+    # envelope
+    "type", "conversation_id", "run_id", "client_id", "timestamp", "message", "error", "reason",
+    # trace events
+    "step_id", "agent", "phase", "ts", "meta", "progress", "current", "total", "telemetry",
+    "message_delta", "summary", "payload", "collection", "index", "item",
+    # telemetry and usage
+    "tokens_in", "tokens_out", "latency_ms", "ttft_ms", "tokens_per_sec", "usage_source", "usage",
+    "prompt_tokens", "completion_tokens", "total_tokens", "steps", "by_agent", "stream",
+    "waf_pillar", "parallel_group", "aggregator", "review_protocol",
+    # chat and results
+    "chunk", "full_message", "user_message", "assistant_message", "mode",
+    "diagram", "diagram_raw", "iac", "bicep", "terraform", "bicep_code", "terraform_code", "parameters",
+    # diagram payloads
+    "services", "groups", "connections", "layout", "id", "title", "label", "category", "description",
+    "groupIds", "parentId", "members", "from", "to",
+)
+FIELD_IDS: Dict[str, int] = {name: index for index, name in enumerate(FIELDS)}
+
+
+def msgpack_available() -> bool:
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def negotiate(websocket: WebSocket) -> Tuple[str, Optional[str]]:
+    """Pick the encoding for a connecting client: (codec, subprotocol to accept)."""
+    offered = websocket.headers.get("sec-websocket-protocol", "")
+    for name in (p.strip() for p in offered.split(",")):
+        codec = SUBPROTOCOLS.get(name)
+        if codec == JSON:
+            return JSON, name
+        if codec == MSGPACK and settings.WS_BINARY_FRAMES_ENABLED and msgpack_available():
+            return MSGPACK, name
+    return JSON, None
+
+
+def deflate_offered(websocket: WebSocket) -> bool:
+    return "permessage-deflate" in websocket.headers.get("sec-websocket-extensions", "")
+
+
+def _intern(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {FIELD_IDS.get(key, key): _intern(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_intern(item) for item in value]
+    return value
+
+
+def _field(key: Any) -> Any:
+    return FIELDS[key] if isinstance(key, int) and 0 <= key < len(FIELDS) else key
+
+
+def _expand(value: Any, nested: bool = False) -> Any:
+    if isinstance(value, dict):
+        return {_field(key): _expand(item, nested) if nested else item for key, item in value.items()}
+    if isinstance(value, list) and nested:
+        return [_expand(item, nested) for item in value]
+    return value
+
+
+def encode_msgpack(data: Dict[str, Any]) -> bytes:
+    import msgpack
+
+    return msgpack.packb(_intern(data), use_bin_type=True, default=str)
+
+
+def decode_msgpack(frame: bytes, nested: bool = False) -> Dict[str, Any]:
+    """Decode a frame, expanding its envelope keys (and, with `nested`, interned keys at every level, as in server frames)."""
+    import msgpack
+
+    return _expand(msgpack.unpackb(frame, raw=False, strict_map_key=False), nested)
+
+
+def transcode(text: str, codec: str) -> str | bytes:
+    """Re-encode a JSON text frame for a client using `codec`."""
+    if codec == MSGPACK:
+        return encode_msgpack(json.loads(text))
+    return text
@@ -2,49 +2,233 @@
 
 import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Coroutine, Set
 from datetime import datetime
 import asyncio
 import contextlib
-from app.obs.tracing import tracer, TraceEvent
-from app.agents.landing_zone_team import LandingZoneTeam
+import time
+from app.obs.tracing import RESULT_PHASES, tracer, TraceEvent
+from app.obs.coalescer import DeltaCoalescer, stream_stats
+from app.obs.usage import usage_ledger
+from app.agents.landing_zone_team import get_landing_zone_team
+from app.agents.pipeline import get_pipeline
+from app.agents.team_runs import RunQueueFullError, team_runs
 from fastapi import WebSocket, WebSocketDisconnect
 from app.core.azure_client import AzureClientManager
+from app.core.broker import Broker, channel
+from app.core.cancellation import run_cancellations
+from app.websockets.codec import JSON, MSGPACK, decode_msgpack, deflate_offered, encode_msgpack, negotiate, transcode
+from app.websockets.outbound import Outbound
+from app.core.config import settings
 from app.agents.tools.analyze_diagram import analyze_diagram
 
 logger = logging.getLogger(__name__)
 
 
+# Progress frames a slow client may miss: the final message repeats their content.
+DROPPABLE_MESSAGE_TYPES = {"stream_chunk"}
+
+# Close code for clients that stopped answering heartbeats (1001: going away).
+IDLE_CLOSE_CODE = 1001
+
+
+def encode_message(data: dict) -> str:
+    """JSON text frame, encoded the way `WebSocket.send_json` does."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _result_message(raw: str, conversation_id: str | None) -> Dict[str, Any]:
+    """`team_final` (design text and diagram) or `team_artifact` (one IaC artifact) for a result trace event."""
+    event = json.loads(raw)
+    payload = dict(event["payload"])
+    kind = payload.pop("kind")
+    message = {
+        "type": "team_final" if event["phase"] == "result" else "team_artifact",
+        "conversation_id": conversation_id,
+        "run_id": event["run_id"],
+        **({} if event["phase"] == "result" else {"kind": kind}),
+        **payload,
+        "elapsed_ms": event["telemetry"].get("elapsed_ms"),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    if event["phase"] == "result":
+        message["iac"] = None   # arrives as team_artifact messages
+    return message
+
+
 class ConnectionManager:
     """Manages WebSocket connections."""
     
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.outbound: Dict[str, Outbound] = {}
+        self.codecs: Dict[str, str] = {}   # client_id -> negotiated frame encoding
+        self.deflate_offered: Set[str] = set()
         self.conversation_connections: Dict[str, list] = {}
+        self.client_conversations: Dict[str, Set[str]] = {}   # client_id -> joined conversations
+        self.last_seen: Dict[str, float] = {}   # client_id -> monotonic time of its latest message
+        self.broker: Broker | None = None
+        self.tasks: Dict[str, Set[asyncio.Task]] = {}   # client_id -> in-flight request handlers
+        self.forwarders: Dict[str, Set[asyncio.Task]] = {}   # client_id -> subscribe_run forwarders
+        self.tasks_rejected = 0
+        self.tasks_cancelled = 0
+        self.heartbeats_sent = 0
+        self.idle_closed = 0
+        self.sends_timed_out = 0
+        self._heartbeat: asyncio.Task | None = None
+        self.broadcasts = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def connect_broker(self, broker: Broker):
+        """Fan conversation broadcasts out through `broker` so clients on other workers get them."""
+        self.broker = broker
+        if not broker.local_only:
+            await broker.subscribe(channel("conversations"), self._on_broadcast)
+
+    async def _on_broadcast(self, message: str):
+        envelope = json.loads(message)
+        await self._broadcast_local(
+            envelope["conversation_id"], envelope["text"], envelope.get("exclude"), envelope.get("droppable", False)
+        )
     
     async def connect(self, websocket: WebSocket, client_id: str):
-        """Accept a WebSocket connection."""
-        await websocket.accept()
+        """Accept a WebSocket connection, agreeing on its frame encoding."""
+        codec, subprotocol = negotiate(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        self.register(client_id, websocket, codec)
+        if deflate_offered(websocket):
+            self.deflate_offered.add(client_id)
+        logger.info(f"Client {client_id} connected ({codec})")
+
+    def register(self, client_id: str, websocket: WebSocket, codec: str = JSON):
+        """Track an accepted socket and start its outbound writer."""
+        previous = self.outbound.pop(client_id, None)
+        if previous is not None:
+            previous.close()
         self.active_connections[client_id] = websocket
-        logger.info(f"Client {client_id} connected")
+        self.codecs[client_id] = codec
+        self.last_seen[client_id] = time.monotonic()
+        self.outbound[client_id] = Outbound(client_id, websocket, on_close=self._on_outbound_closed)
     
     def disconnect(self, client_id: str):
-        """Remove a WebSocket connection."""
+        """Remove a WebSocket connection from every registry and cancel the work it left in flight."""
+        outbound = self.outbound.pop(client_id, None)
+        if outbound is not None:
+            outbound.close()
+        self.codecs.pop(client_id, None)
+        self.deflate_offered.discard(client_id)
+        self.last_seen.pop(client_id, None)
+        for conversation_id in self.client_conversations.pop(client_id, set()):
+            self._leave(conversation_id, client_id)
+        for token in run_cancellations.owned_by(client_id):
+            if not token.detached:
+                run_cancellations.cancel(token.run_id, "client disconnected")
+        for task in self.tasks.pop(client_id, set()) | self.forwarders.pop(client_id, set()):
+            if not task.done():
+                task.cancel()
+                self.tasks_cancelled += 1
         if client_id in self.active_connections:
             del self.active_connections[client_id]
             logger.info(f"Client {client_id} disconnected")
+
+    def spawn(self, client_id: str, coro: Coroutine) -> asyncio.Task | None:
+        """Run a request handler as a task tracked for `client_id`.
+
+        Returns None (and closes `coro`) when the client already has
+        `WS_MAX_CONCURRENT_TASKS` requests in flight.
+        """
+        tasks = self.tasks.setdefault(client_id, set())
+        if len(tasks) >= settings.WS_MAX_CONCURRENT_TASKS:
+            coro.close()
+            self.tasks_rejected += 1
+            return None
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(lambda t: self._task_done(client_id, t))
+        return task
+
+    def track_forwarder(self, client_id: str, task: asyncio.Task):
+        """Cancel `task` when `client_id` disconnects (not counted against the request cap)."""
+        forwarders = self.forwarders.setdefault(client_id, set())
+        forwarders.add(task)
+        task.add_done_callback(forwarders.discard)
+
+    def _task_done(self, client_id: str, task: asyncio.Task):
+        tasks = self.tasks.get(client_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self.tasks[client_id]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("WebSocket task for client %s failed: %s", client_id, task.exception())
+
+    def cancel_run(self, run_id: str, client_id: str) -> bool:
+        """Cancel a run started by `client_id`; False if unknown, finished or not theirs."""
+        return run_cancellations.cancel(run_id, "cancelled by client", owner=client_id)
+
+    async def flush(self, client_id: str):
+        """Wait for a client's queued frames to be sent."""
+        outbound = self.outbound.get(client_id)
+        if outbound is not None:
+            await outbound.drain(settings.WS_SEND_TIMEOUT_SECONDS)
+
+    def _on_outbound_closed(self, outbound: Outbound):
+        # The writer failed or the client was cut off for falling behind.
+        self.sends_timed_out += outbound.timed_out
+        if self.outbound.get(outbound.client_id) is not outbound:
+            return
+        self.disconnect(outbound.client_id)
     
-    async def send_personal_message(self, message: str, client_id: str):
-        """Send a message to a specific client."""
-        if client_id in self.active_connections:
-            websocket = self.active_connections[client_id]
-            await websocket.send_text(message)
+    async def receive(self, websocket: WebSocket, client_id: str) -> dict:
+        """Next message from a client, as JSON text or (for MessagePack clients) a binary frame.
+
+        Raises `WebSocketDisconnect` (and closes the socket) once the client
+        has been silent for `WS_IDLE_TIMEOUT_SECONDS`; live clients answer the
+        heartbeat pings well within that.
+        """
+        try:
+            data = await asyncio.wait_for(self._receive(websocket, client_id), settings.WS_IDLE_TIMEOUT_SECONDS or None)
+        except asyncio.TimeoutError:
+            self.idle_closed += 1
+            logger.info("Client %s idle for %ss; closing", client_id, settings.WS_IDLE_TIMEOUT_SECONDS)
+            with contextlib.suppress(Exception):
+                await asyncio.wait_for(websocket.close(code=IDLE_CLOSE_CODE), settings.WS_SEND_TIMEOUT_SECONDS)
+            raise WebSocketDisconnect(IDLE_CLOSE_CODE, "idle timeout") from None
+        if client_id in self.last_seen:
+            self.last_seen[client_id] = time.monotonic()
+        return data
+
+    async def _receive(self, websocket: WebSocket, client_id: str) -> dict:
+        if self.codecs.get(client_id) != MSGPACK:
+            return await websocket.receive_json()
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        if message.get("bytes") is not None:
+            return decode_msgpack(message["bytes"])
+        return json.loads(message["text"])
+
+    async def send_personal_message(self, message: str, client_id: str, droppable: bool = False, wait: bool = False):
+        """Queue an encoded JSON message for a specific client (transcoded to its encoding).
+
+        `wait` paces the caller while the client's queue is full.
+        """
+        outbound = self.outbound.get(client_id)
+        if outbound is None:
+            return
+        frame = transcode(message, self.codecs.get(client_id, JSON))
+        if wait:
+            await outbound.put(frame, droppable)
+        else:
+            outbound.offer(frame, droppable)
     
     async def send_json_message(self, data: dict, client_id: str):
-        """Send JSON data to a specific client."""
-        if client_id in self.active_connections:
-            websocket = self.active_connections[client_id]
-            await websocket.send_json(data)
+        """Queue JSON data for a specific client."""
+        outbound = self.outbound.get(client_id)
+        if outbound is not None:
+            frame = encode_msgpack(data) if self.codecs.get(client_id) == MSGPACK else encode_message(data)
+            outbound.offer(frame, data.get("type") in DROPPABLE_MESSAGE_TYPES)
     
     def add_to_conversation(self, conversation_id: str, client_id: str):
         """Add client to conversation for broadcasting."""
@@ -52,52 +236,263 @@ class ConnectionManager:
             self.conversation_connections[conversation_id] = []
         if client_id not in self.conversation_connections[conversation_id]:
             self.conversation_connections[conversation_id].append(client_id)
+        self.client_conversations.setdefault(client_id, set()).add(conversation_id)
+
+    def remove_from_conversation(self, conversation_id: str, client_id: str):
+        """Stop broadcasting `conversation_id` to the client."""
+        conversations = self.client_conversations.get(client_id)
+        if conversations is not None:
+            conversations.discard(conversation_id)
+            if not conversations:
+                del self.client_conversations[client_id]
+        self._leave(conversation_id, client_id)
+
+    def _leave(self, conversation_id: str, client_id: str):
+        members = self.conversation_connections.get(conversation_id)
+        if members is None:
+            return
+        if client_id in members:
+            members.remove(client_id)
+        if not members:
+            del self.conversation_connections[conversation_id]
+
+    def start_heartbeat(self):
+        """Ping every client each `WEBSOCKET_PING_INTERVAL` seconds (idempotent)."""
+        if settings.WEBSOCKET_PING_INTERVAL > 0 and (self._heartbeat is None or self._heartbeat.done()):
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop_heartbeat(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._heartbeat
+            self._heartbeat = None
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(settings.WEBSOCKET_PING_INTERVAL)
+            try:
+                self.heartbeat()
+            except Exception as exc:
+                logger.warning("WebSocket heartbeat failed: %s", exc)
+
+    def heartbeat(self) -> int:
+        """Queue a ping to every client and prune registry entries of clients that are gone.
+
+        Pings are droppable: a client whose queue is full is already behind,
+        and an unanswered ping is what eventually closes it as idle.
+        """
+        text = encode_message({"type": "ping", "timestamp": datetime.utcnow().isoformat()})
+        frames: Dict[str, str | bytes] = {JSON: text}
+        sent = 0
+        for client_id, outbound in list(self.outbound.items()):
+            codec = self.codecs.get(client_id, JSON)
+            frame = frames.get(codec)
+            if frame is None:
+                frame = frames[codec] = transcode(text, codec)
+            sent += outbound.offer(frame, droppable=True)
+        self.heartbeats_sent += sent
+        self._prune()
+        return sent
+
+    def _prune(self):
+        for client_id in [c for c in self.client_conversations if c not in self.outbound]:
+            for conversation_id in self.client_conversations.pop(client_id):
+                self._leave(conversation_id, client_id)
+        for conversation_id, members in list(self.conversation_connections.items()):
+            members[:] = [c for c in members if c in self.outbound]
+            if not members:
+                del self.conversation_connections[conversation_id]
     
-    async def broadcast_to_conversation(self, conversation_id: str, data: dict):
-        """Broadcast message to all clients in a conversation."""
-        if conversation_id in self.conversation_connections:
-            clients = self.conversation_connections[conversation_id].copy()
-            for client_id in clients:
-                try:
-                    await self.send_json_message(data, client_id)
-                except Exception as e:
-                    logger.warning(f"Failed to send to client {client_id}: {e}")
-                    # Remove disconnected client
-                    if client_id in self.conversation_connections[conversation_id]:
-                        self.conversation_connections[conversation_id].remove(client_id)
+    async def broadcast_to_conversation(
+        self, conversation_id: str, data: dict | str, exclude: str | None = None, droppable: bool | None = None
+    ) -> Dict[str, int] | None:
+        """Broadcast message to all clients in a conversation, on every worker, except `exclude`.
+
+        `data` is encoded once for all recipients (pass a string to reuse an
+        already-encoded frame) and queued on each client's outbound writer, so
+        a slow client never holds up the others. Returns this worker's
+        queued/dropped counts, or None when the message went out through a
+        cross-process broker.
+        """
+        if droppable is None:
+            droppable = isinstance(data, dict) and data.get("type") in DROPPABLE_MESSAGE_TYPES
+        text = data if isinstance(data, str) else encode_message(data)
+        if self.broker is not None and not self.broker.local_only:
+            # Every worker, this one included, delivers to its own sockets on receipt.
+            await self.broker.publish(
+                channel("conversations"),
+                json.dumps({"conversation_id": conversation_id, "exclude": exclude, "text": text, "droppable": droppable}),
+            )
+            return None
+        return await self._broadcast_local(conversation_id, text, exclude, droppable)
+
+    async def _broadcast_local(
+        self, conversation_id: str, text: str, exclude: str | None = None, droppable: bool = False
+    ) -> Dict[str, int]:
+        members = self.conversation_connections.get(conversation_id, [])
+        delivered = dropped = 0
+        frames: Dict[str, str | bytes] = {JSON: text}   # each encoding is produced once per broadcast
+        for client_id in list(members):
+            if client_id == exclude:
+                continue
+            outbound = self.outbound.get(client_id)
+            if outbound is None:
+                # Remove disconnected client
+                self.remove_from_conversation(conversation_id, client_id)
+                dropped += 1
+                continue
+            codec = self.codecs.get(client_id, JSON)
+            frame = frames.get(codec)
+            if frame is None:
+                frame = frames[codec] = transcode(text, codec)
+            if outbound.offer(frame, droppable):
+                delivered += 1
+            else:
+                dropped += 1
+        self.broadcasts += 1
+        self.delivered += delivered
+        self.dropped += dropped
+        return {"delivered": delivered, "dropped": dropped}
+
+    def stats(self, top: int = 20) -> Dict[str, Any]:
+        """Broadcast totals plus queue-depth/lag gauges (the `top` most lagging clients listed)."""
+        queues = list(self.outbound.values())
+        lagging = sorted(queues, key=lambda q: q.lag, reverse=True)[:top]
+        members = [len(m) for m in self.conversation_connections.values()]
+        now = time.monotonic()
+        return {
+            "connections": len(self.active_connections),
+            "conversations": len(self.conversation_connections),
+            "conversation_members": sum(members),
+            "largest_conversation": max(members, default=0),
+            "max_idle_s": round(max((now - t for t in self.last_seen.values()), default=0.0), 1),
+            "heartbeats_sent": self.heartbeats_sent,
+            "idle_closed": self.idle_closed,
+            "broadcasts": self.broadcasts,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "queued_frames": sum(q.depth for q in queues),
+            "max_queue_depth": max((q.depth for q in queues), default=0),
+            "max_lag_ms": round(max((q.lag for q in queues), default=0.0) * 1000, 1),
+            "frames_dropped": sum(q.dropped for q in queues),
+            "sends_timed_out": self.sends_timed_out,
+            "lagging_clients": {q.client_id: q.stats() for q in lagging if q.depth},
+            "encodings": self._encoding_stats(queues),
+            "deflate_offered": len(self.deflate_offered),
+            "tasks_in_flight": sum(len(tasks) for tasks in self.tasks.values()),
+            "forwarders": sum(len(tasks) for tasks in self.forwarders.values()),
+            "runs_in_flight": run_cancellations.stats()["in_flight"],
+            "tasks_rejected": self.tasks_rejected,
+            "tasks_cancelled": self.tasks_cancelled,
+        }
+
+
+    def _encoding_stats(self, queues: list) -> Dict[str, Dict[str, Any]]:
+        totals: Dict[str, Dict[str, Any]] = {}
+        for queue in queues:
+            entry = totals.setdefault(self.codecs.get(queue.client_id, JSON), {"clients": 0, "frames": 0, "bytes": 0})
+            entry["clients"] += 1
+            entry["frames"] += queue.sent
+            entry["bytes"] += queue.bytes_sent
+        for entry in totals.values():
+            entry["bytes_per_frame"] = round(entry["bytes"] / entry["frames"], 1) if entry["frames"] else 0.0
+        return totals
 
 
 # Global connection manager
 manager = ConnectionManager()
 
+def _trace_envelope(conversation_id: str | None) -> str:
+    # The tracer already serialized each event; splice the envelope fields in
+    # front of it rather than decoding and re-encoding every frame.
+    return f'{{"type":"trace_event","conversation_id":{json.dumps(conversation_id)},'
+
+
 # NEW: bridge TraceEvent -> WebSocket messages
-async def _forward_trace_events(run_id: str, client_id: str, conversation_id: str | None):
+async def _forward_trace_events(
+    run_id: str, client_id: str, conversation_id: str | None, broadcast: bool = True
+) -> Set[str]:
+    """Relay a run's trace events; returns the result pieces delivered to `client_id`.
+
+    Result and artifact events go to the caller as `team_final` / `team_artifact`
+    the moment the team publishes them. The caller is sent events at the pace
+    it reads; with `broadcast` the rest of the conversation gets them from a
+    separate subscription, so a slow caller never holds them up.
+    """
+    envelope = _trace_envelope(conversation_id)
+    delivered: Set[str] = set()
+    broadcaster = (
+        asyncio.create_task(_broadcast_trace_events(run_id, client_id, conversation_id))
+        if broadcast and conversation_id else None
+    )
     try:
-        async for raw in tracer.stream(run_id):
-            payload = json.loads(raw)
-            msg = {
-                "type": "trace_event",
-                "run_id": payload["run_id"],
-                "step_id": payload["step_id"],
-                "agent": payload["agent"],
-                "phase": payload["phase"],
-                "ts": payload["ts"],
-                "meta": payload.get("meta", {}),
-                "progress": payload.get("progress", {}),
-                "telemetry": payload.get("telemetry", {}),
-                "message_delta": payload.get("message_delta"),
-                "summary": payload.get("summary"),
-                "error": payload.get("error"),
-                "conversation_id": conversation_id,
-            }
-            # Send to the caller
-            await manager.send_json_message(msg, client_id)
-            # Optionally also broadcast to others in the same conversation
-            if conversation_id:
-                await manager.broadcast_to_conversation(conversation_id, msg)
+        async for phase, raw in tracer.stream(run_id):
+            if phase in RESULT_PHASES:
+                message = _result_message(raw, conversation_id)
+                await manager.send_json_message(message, client_id)
+                delivered.add(message.get("kind", "final"))
+                continue
+            # A replayed log arrives in one burst; wait for room in the caller's own queue.
+            await manager.send_personal_message(envelope + raw[1:], client_id, phase == "delta", wait=True)
+        if broadcaster is not None:
+            await broadcaster
     except asyncio.CancelledError:
         # Task cancelled when run completes; swallow cancellation so loop exits quietly
         pass
+    finally:
+        if broadcaster is not None and not broadcaster.done():
+            broadcaster.cancel()
+    return delivered
+
+
+async def _broadcast_trace_events(run_id: str, client_id: str, conversation_id: str):
+    """Offer a run's progress events to the other members of `conversation_id`, never waiting on any of them."""
+    envelope = _trace_envelope(conversation_id)
+    async for phase, raw in tracer.stream(run_id):
+        if phase not in RESULT_PHASES:
+            await manager.broadcast_to_conversation(conversation_id, envelope + raw[1:], exclude=client_id, droppable=phase == "delta")
+
+
+def _missing_results(
+    result: Dict[str, Any], delivered: Set[str], conversation_id: str | None, run_id: str
+) -> list[Dict[str, Any]]:
+    """`team_final` / `team_artifact` messages for the result pieces the client has not received."""
+    emitted = {"final", *result["timings"]["pieces"]}
+    timestamp = datetime.utcnow().isoformat()
+    messages: list[Dict[str, Any]] = []
+    if "final" not in delivered:
+        messages.append({
+            "type": "team_final",
+            "conversation_id": conversation_id,
+            "run_id": run_id,
+            "message": result["message"],
+            "diagram": result["diagram"],
+            "diagram_raw": result["diagram_raw"],
+            "iac": None,
+            "timestamp": timestamp,
+        })
+    for kind, artifact in (result["iac"] or {}).items():
+        if kind in emitted and kind not in delivered:
+            messages.append({
+                "type": "team_artifact", "conversation_id": conversation_id, "run_id": run_id,
+                "kind": kind, "artifact": artifact, "timestamp": timestamp,
+            })
+    if "iac_diagram" in emitted and "iac_diagram" not in delivered:
+        messages.append({
+            "type": "team_artifact", "conversation_id": conversation_id, "run_id": run_id,
+            "kind": "iac_diagram", "message": result["message"], "diagram": result["diagram"],
+            "diagram_raw": result["diagram_raw"], "timestamp": timestamp,
+        })
+    return messages
+
+
+async def _drain_forwarder(forwarder: asyncio.Task) -> Set[str]:
+    try:
+        return await asyncio.wait_for(asyncio.shield(forwarder), settings.WS_SEND_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        forwarder.cancel()
+        return await forwarder
 
 
 async def handle_team_stream_chat(data: dict, client_id: str, azure_clients: AzureClientManager):
@@ -108,15 +503,29 @@ async def handle_team_stream_chat(data: dict, client_id: str, azure_clients: Azu
         "type": "team_stream_chat",
         "message": "Design a secure Azure landing zone for a fintech startup",
         "conversation_id": "...",
-        "parallel": false   # optional: if true, uses fan-out/fan-in pass
+        "project_id": "...",  # optional: usage is also aggregated per project
+        "parallel": false,  # optional: if true, uses fan-out/fan-in pass
+        "mode": "dag",      # optional: sequential | parallel | dag (overrides "parallel")
+        "review_protocol": "patch",  # optional: rewrite | patch (reviewers emit diagram patches)
+        "iac_formats": ["bicep"]     # optional: none | both | bicep | terraform (default TEAM_IAC_FORMATS)
       }
+    A `{"type": "resume_run", "run_id": "...", "conversation_id": "..."}` message
+    finishes a failed or interrupted run from its checkpoints instead; only the
+    client that started the run, or one in the run's conversation, may resume it.
+    The design (text and diagram) arrives as `team_final` as soon as the final
+    editor finishes; Bicep, Terraform and the diagram derived from them follow
+    as `team_artifact` messages, and `run_completed` carries their timings.
     """
     run_id: str | None = None
     forwarder: asyncio.Task | None = None
+    resume_run_id = data.get("run_id") if data.get("type") == "resume_run" else None
     try:
         user_prompt = data.get("message", "")
         conversation_id = data.get("conversation_id")
-        use_parallel = bool(data.get("parallel", False))
+        project_id = data.get("project_id")
+        mode = data.get("mode") or ("parallel" if data.get("parallel") else "sequential")
+        pipeline = get_pipeline(mode)
+        review_protocol = data.get("review_protocol") or settings.TEAM_REVIEW_PROTOCOL
         context_payload = data.get("context") if isinstance(data.get("context"), dict) else None
 
         context_prefix = ""
@@ -137,25 +546,62 @@ async def handle_team_stream_chat(data: dict, client_id: str, azure_clients: Azu
                 if formatted_recent:
                     context_prefix += "Recent exchanges:\n" + "\n".join(formatted_recent) + "\n\n"
 
+        if not user_prompt and not resume_run_id:
+            await manager.send_json_message({
+                "type": "error",
+                "message": "Message is required"
+            }, client_id)
+            return
+
+        # Reuse the process-wide team built on the same agent_client you pass to
+        # AzureArchitectAgent internally (agents/workflows are built once per client).
+        # Passing the agent itself lets the team generate the requested IaC formats.
+        team = get_landing_zone_team(azure_clients.get_azure_architect_agent())
+
+        if resume_run_id:
+            checkpointed = await team.checkpointed_run(resume_run_id)
+            if checkpointed is not None and not await team_runs.may_resume(resume_run_id, client_id, conversation_id):
+                # Someone else's run: answered as if it did not exist.
+                logger.info("Client %s may not resume run %s", client_id, resume_run_id)
+                checkpointed = None
+            if checkpointed is None or run_cancellations.get(resume_run_id) is not None:
+                await manager.send_json_message({
+                    "type": "error",
+                    "run_id": resume_run_id,
+                    "message": "No resumable run with that id" if checkpointed is None else "Run is still in progress"
+                }, client_id)
+                return
+            pipeline = get_pipeline(checkpointed["pipeline"])
+            user_prompt = user_prompt or checkpointed["prompt"]
+
         composed_prompt = user_prompt.strip()
         if context_prefix:
             composed_prompt = f"{context_prefix}Current user request:\n{composed_prompt}".strip()
 
-        if not user_prompt:
+        # The run executes on the team run queue; we only subscribe. It is
+        # cancelled when this socket disconnects unless the client asks to
+        # `detach` it (and picks it up later through /api/runs).
+        try:
+            run = team_runs.submit(
+                team,
+                composed_prompt,
+                pipeline=pipeline.name,
+                review_protocol=review_protocol,
+                iac_formats=data.get("iac_formats"),
+                run_id=resume_run_id,
+                resume=bool(resume_run_id),
+                owner=client_id,
+                detached=bool(data.get("detach")),
+                conversation_id=conversation_id,
+                project_id=project_id,
+            )
+        except (RunQueueFullError, ValueError) as e:
             await manager.send_json_message({
                 "type": "error",
-                "message": "Message is required"
+                "message": f"Agent team is busy: {str(e)}" if isinstance(e, RunQueueFullError) else str(e)
             }, client_id)
             return
-
-        # Build the team (we reuse the same underlying client you already use)
-        # Use the same agent_client you pass to AzureArchitectAgent internally:
-        architect_agent = azure_clients.get_azure_architect_agent()
-        team = LandingZoneTeam(architect_agent.agent_client)
-
-        # Generate a run id up front so we can stream progress immediately
-        run_id = tracer.new_run()
-        tracer.ensure_run(run_id)
+        run_id = run.run_id
 
         # Start forwarding trace events to this socket (and to the conversation)
         forwarder = asyncio.create_task(_forward_trace_events(run_id, client_id, conversation_id))
@@ -165,17 +611,44 @@ async def handle_team_stream_chat(data: dict, client_id: str, azure_clients: Azu
             "type": "run_started",
             "conversation_id": conversation_id,
             "run_id": run_id,
+            "mode": pipeline.name,
+            "resumed": bool(resume_run_id),
+            "status": run.status,
         }, client_id)
 
-        if use_parallel:
-            final_text, diagram_payload, raw_diagram, iac_bundle, _ = await team.run_parallel_pass_traced(
-                composed_prompt, run_id=run_id
-            )
-        else:
-            final_text, diagram_payload, raw_diagram, iac_bundle, _ = await team.run_sequential_traced(
-                composed_prompt, run_id=run_id
-            )
+        run = await team_runs.wait(run_id)
+        # The run log is finished; let the forwarder deliver what is left so the
+        # results and artifacts reach the client before the run's final message.
+        delivered = await _drain_forwarder(forwarder)
+
+        if run.status == "cancelled":
+            # cancel_run, a disconnect (unless detached) or a cancel from the runs API
+            logger.info("team_stream_chat run %s cancelled: %s", run_id, run.error)
+            await manager.send_json_message({
+                "type": "run_cancelled",
+                "conversation_id": conversation_id,
+                "run_id": run_id,
+                "reason": run.error,
+                "usage": usage_ledger.run_totals(run_id),
+            }, client_id)
+            return
+        if run.status == "timed_out":
+            await manager.send_json_message({
+                "type": "error",
+                "run_id": run_id,
+                "message": f"Agent team timed out: {run.error}"
+            }, client_id)
+            return
+        if run.status != "completed":
+            await manager.send_json_message({
+                "type": "error",
+                "run_id": run_id,   # pass it to resume_run to continue from the last completed stage
+                "message": f"Failed to run agent team: {run.error}"
+            }, client_id)
+            return
 
+        result = run.result
+        final_text, diagram_payload = result["message"], result["diagram"]
         if isinstance(diagram_payload, dict):
             services = diagram_payload.get("services") or []
             connections = diagram_payload.get("connections") or []
@@ -187,17 +660,9 @@ async def handle_team_stream_chat(data: dict, client_id: str, azure_clients: Azu
                 len(connections),
             )
 
-        # Send final answer
-        await manager.send_json_message({
-            "type": "team_final",
-            "conversation_id": conversation_id,
-            "run_id": run_id,
-            "message": final_text,
-            "diagram": diagram_payload,
-            "diagram_raw": raw_diagram,
-            "iac": iac_bundle,
-            "timestamp": datetime.utcnow().isoformat()
-        }, client_id)
+        # The forwarder fell behind and was cut off: send every piece it did not deliver.
+        for message in _missing_results(result, delivered, conversation_id, run_id):
+            await manager.send_json_message(message, client_id)
 
         # Broadcast conversation update
         if conversation_id:
@@ -208,27 +673,26 @@ async def handle_team_stream_chat(data: dict, client_id: str, azure_clients: Azu
                 "assistant_message": final_text,
                 "diagram": diagram_payload,
                 "timestamp": datetime.utcnow().isoformat()
-            })
-
-        # Signal tracer listeners that the run has completed
-        if run_id:
-            await tracer.finish(run_id)
+            }, exclude=client_id)
 
         # Mark run complete
         await manager.send_json_message({
             "type": "run_completed",
             "conversation_id": conversation_id,
-            "run_id": run_id
+            "run_id": run_id,
+            "usage": result["usage"],
+            "stream": result["stream"],
+            "timings": result["timings"],
+            "model_calls": result["model_calls"],
         }, client_id)
 
     except Exception as e:
         logger.error(f"Error in team_stream_chat: {e}")
         await manager.send_json_message({
             "type": "error",
+            "run_id": run_id,
             "message": f"Failed to run agent team: {str(e)}"
         }, client_id)
-        if run_id:
-            await tracer.finish(run_id)
 
     finally:
         if forwarder:
@@ -242,10 +706,36 @@ async def handle_subscribe_run(data: dict, client_id: str):
     if not run_id:
         await manager.send_json_message({"type": "error", "message": "run_id is required"}, client_id)
         return
-    asyncio.create_task(_forward_trace_events(run_id, client_id, conversation_id))
+    # The run's own forwarder already broadcasts to its conversation; a subscriber only needs its own copy.
+    forwarder = _forward_trace_events(run_id, client_id, conversation_id, broadcast=False)
+    manager.track_forwarder(client_id, asyncio.create_task(forwarder))
     await manager.send_json_message({"type": "subscribed_run", "run_id": run_id}, client_id)
 
 
+async def handle_cancel_run(data: dict, client_id: str):
+    run_id = data.get("run_id")
+    if not run_id:
+        await manager.send_json_message({"type": "error", "message": "run_id is required"}, client_id)
+        return
+    # On success the run's own handler reports `run_cancelled`.
+    if not manager.cancel_run(run_id, client_id):
+        await manager.send_json_message({
+            "type": "error",
+            "run_id": run_id,
+            "message": "No cancellable run with that id"
+        }, client_id)
+
+
+async def _dispatch(client_id: str, message_type: str, coro: Coroutine):
+    """Run a long handler as a per-connection task so the socket keeps reading."""
+    if manager.spawn(client_id, coro) is None:
+        await manager.send_json_message({
+            "type": "error",
+            "request_type": message_type,
+            "message": f"Too many requests in flight (max {settings.WS_MAX_CONCURRENT_TASKS}); try again shortly"
+        }, client_id)
+
+
 async def handle_chat_websocket(websocket: WebSocket, client_id: str, azure_clients: AzureClientManager):
     """Handle WebSocket connections for chat."""
     await manager.connect(websocket, client_id)
@@ -253,21 +743,31 @@ async def handle_chat_websocket(websocket: WebSocket, client_id: str, azure_clie
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
+            data = await manager.receive(websocket, client_id)
             message_type = data.get("type")
             
+            # Quick control messages run inline, in order; model-backed requests
+            # run as tracked tasks so they never block the socket.
             if message_type == "chat_message":
-                await handle_chat_message(data, client_id, azure_clients)
+                await _dispatch(client_id, message_type, handle_chat_message(data, client_id, azure_clients))
             elif message_type == "join_conversation":
                 await handle_join_conversation(data, client_id)
+            elif message_type == "leave_conversation":
+                await handle_leave_conversation(data, client_id)
             elif message_type == "stream_chat":
-                await handle_stream_chat(data, client_id, azure_clients)
+                await _dispatch(client_id, message_type, handle_stream_chat(data, client_id, azure_clients))
             elif message_type == "analyze_diagram":
-                await handle_analyze_diagram(data, client_id, azure_clients)
-            elif message_type == "team_stream_chat":
-                await handle_team_stream_chat(data, client_id, azure_clients)
+                await _dispatch(client_id, message_type, handle_analyze_diagram(data, client_id, azure_clients))
+            elif message_type in ("team_stream_chat", "resume_run"):
+                await _dispatch(client_id, message_type, handle_team_stream_chat(data, client_id, azure_clients))
             elif message_type == "subscribe_run":
                 await handle_subscribe_run(data, client_id)
+            elif message_type == "cancel_run":
+                await handle_cancel_run(data, client_id)
+            elif message_type == "ping":
+                await manager.send_json_message({"type": "pong", "timestamp": datetime.utcnow().isoformat()}, client_id)
+            elif message_type == "pong":
+                pass   # heartbeat reply; receiving it already marked the client live
             else:
                 await manager.send_json_message({
                     "type": "error",
@@ -282,6 +782,9 @@ async def handle_chat_websocket(websocket: WebSocket, client_id: str, azure_clie
             "type": "error",
             "message": f"Server error: {str(e)}"
         }, client_id)
+        # The socket closes when this handler returns; let the error frame go out first.
+        await manager.flush(client_id)
+        manager.disconnect(client_id)
 
 
 async def handle_chat_message(data: dict, client_id: str, azure_clients: AzureClientManager):
@@ -334,7 +837,7 @@ async def handle_chat_message(data: dict, client_id: str, azure_clients: AzureCl
                 "user_message": message,
                 "assistant_message": response,
                 "timestamp": datetime.utcnow().isoformat()
-            })
+            }, exclude=client_id)
         
     except Exception as e:
         logger.error(f"Error handling chat message: {e}")
@@ -371,25 +874,35 @@ async def handle_stream_chat(data: dict, client_id: str, azure_clients: AzureCli
         context_dict = context_payload if isinstance(context_payload, dict) else None
         history_list = history_payload if isinstance(history_payload, list) else None
 
-        # Stream response from agent
-        full_response = ""
-        async for chunk in agent.stream_chat(
-            message,
-            conversation_history=history_list,
-            context=context_dict,
-        ):
-            full_response += chunk
+        async def _send_chunk(text: str) -> None:
             await manager.send_json_message({
                 "type": "stream_chunk",
-                "chunk": chunk,
+                "chunk": text,
                 "conversation_id": conversation_id
             }, client_id)
+
+        # Stream response from agent, batching chunks into frames
+        full_response = ""
+        chunks = DeltaCoalescer(_send_chunk)
+        try:
+            async for chunk in agent.stream_chat(
+                message,
+                conversation_history=history_list,
+                context=context_dict,
+            ):
+                full_response += chunk
+                await chunks.add(chunk)
+            await chunks.aclose()
+        except BaseException:
+            chunks.discard()
+            raise
         
         # Send end streaming indicator
         await manager.send_json_message({
             "type": "stream_end",
             "conversation_id": conversation_id,
             "full_message": full_response,
+            "stream": stream_stats.record(None, chunks),
             "timestamp": datetime.utcnow().isoformat()
         }, client_id)
         
@@ -401,7 +914,7 @@ async def handle_stream_chat(data: dict, client_id: str, azure_clients: AzureCli
                 "user_message": message,
                 "assistant_message": full_response,
                 "timestamp": datetime.utcnow().isoformat()
-            })
+            }, exclude=client_id)
         
     except Exception as e:
         logger.error(f"Error handling stream chat: {e}")
@@ -438,6 +951,16 @@ async def handle_join_conversation(data: dict, client_id: str):
         }, client_id)
 
 
+async def handle_leave_conversation(data: dict, client_id: str):
+    """Stop receiving a conversation's broadcasts."""
+    conversation_id = data.get("conversation_id")
+    if not conversation_id:
+        await manager.send_json_message({"type": "error", "message": "Conversation ID is required"}, client_id)
+        return
+    manager.remove_from_conversation(conversation_id, client_id)
+    await manager.send_json_message({"type": "conversation_left", "conversation_id": conversation_id}, client_id)
+
+
 async def handle_analyze_diagram(data: dict, client_id: str, azure_clients: AzureClientManager):
     """Handle diagram analysis via WebSocket."""
     try:
@@ -479,7 +1002,7 @@ async def handle_analyze_diagram(data: dict, client_id: str, azure_clients: Azur
                 "conversation_id": conversation_id,
                 "analysis": analysis,
                 "timestamp": datetime.utcnow().isoformat()
-            })
+            }, exclude=client_id)
         
     except Exception as e:
         logger.error(f"Error analyzing diagram: {e}")
@@ -496,13 +1019,15 @@ async def handle_deployment_websocket(websocket: WebSocket, client_id: str, azur
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
+            data = await manager.receive(websocket, client_id)
             message_type = data.get("type")
             
             if message_type == "monitor_deployment":
                 await handle_monitor_deployment(data, client_id, azure_clients)
             elif message_type == "get_deployment_logs":
                 await handle_get_deployment_logs(data, client_id, azure_clients)
+            elif message_type == "pong":
+                pass
             else:
                 await manager.send_json_message({
                     "type": "error",
@@ -517,6 +1042,9 @@ async def handle_deployment_websocket(websocket: WebSocket, client_id: str, azur
             "type": "error",
             "message": f"Server error: {str(e)}"
         }, client_id)
+        # The socket closes when this handler returns; let the error frame go out first.
+        await manager.flush(client_id)
+        manager.disconnect(client_id)
 
 
 async def handle_monitor_deployment(data: dict, client_id: str, azure_clients: AzureClientManager):
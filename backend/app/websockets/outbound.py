@@ -0,0 +1,182 @@
+"""Per-connection outbound queues for WebSocket clients.
+
+Every socket gets a bounded queue drained by its own writer task, so a slow
+or stuck client only ever delays itself. When a queue is full the slow-client
+policy (`WS_SLOW_CLIENT_POLICY`) applies:
+
+* ``drop_deltas``  drop the oldest queued progress frame (trace deltas, stream
+                   chunks; the final message repeats their content), or the
+                   incoming frame if it is one; disconnect once only
+                   non-droppable frames are queued;
+* ``disconnect``   disconnect as soon as the queue is full.
+
+A frame the client does not take within `WS_SEND_TIMEOUT_SECONDS` also
+disconnects it: the timed-out send may have stopped mid-frame, so nothing
+more can safely be written to that socket.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SLOW_CLIENT_POLICIES = ("drop_deltas", "disconnect")
+
+# Close code for clients cut off for falling behind (1013: try again later).
+SLOW_CLIENT_CLOSE_CODE = 1013
+
+
+class Outbound:
+    """A client's bounded send queue and the writer task that drains it."""
+
+    def __init__(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        on_close: Optional[Callable[["Outbound"], None]] = None,
+        limit: Optional[int] = None,
+        policy: Optional[str] = None,
+        send_timeout: Optional[float] = None,
+    ) -> None:
+        self.client_id = client_id
+        self.websocket = websocket
+        self.limit = limit or settings.WS_OUTBOUND_QUEUE_SIZE
+        self.policy = policy or settings.WS_SLOW_CLIENT_POLICY
+        if self.policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"Unknown slow-client policy: {self.policy}")
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        self._on_close = on_close
+        self._frames: Deque[Tuple[float, Union[str, bytes], bool]] = deque()   # (enqueued_at, frame, droppable)
+        self._ready = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+        self.closed = False
+        self._sending = False
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.timed_out = 0
+        self.last_lag = 0.0   # enqueue-to-sent time of the latest frame
+        self._writer = asyncio.create_task(self._run())
+
+    def offer(self, frame: Union[str, bytes], droppable: bool = False) -> bool:
+        """Queue a text or binary frame without blocking; False if it was dropped or the client was cut off."""
+        if self.closed:
+            return False
+        if len(self._frames) >= self.limit:
+            if self.policy == "drop_deltas" and self._drop_oldest_delta():
+                pass
+            elif self.policy == "drop_deltas" and droppable:
+                self.dropped += 1
+                return False
+            else:
+                logger.warning("Client %s fell %d frames behind; disconnecting", self.client_id, len(self._frames))
+                self.close(disconnect=True)
+                return False
+        self._frames.append((time.monotonic(), frame, droppable))
+        self._ready.set()
+        return True
+
+    async def put(self, frame: Union[str, bytes], droppable: bool = False) -> bool:
+        """Like `offer`, but wait for room instead of applying the slow-client policy.
+
+        For producers that can be paced, such as a trace forwarder replaying
+        a run log. The policy still applies if the client takes no frame for
+        a whole send timeout.
+        """
+        while len(self._frames) >= self.limit and not self.closed:
+            self._room.clear()
+            try:
+                await asyncio.wait_for(self._room.wait(), self.send_timeout)
+            except asyncio.TimeoutError:
+                break
+        return self.offer(frame, droppable)
+
+    def _drop_oldest_delta(self) -> bool:
+        for index, (_, _, droppable) in enumerate(self._frames):
+            if droppable:
+                del self._frames[index]
+                self.dropped += 1
+                return True
+        return False
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                while not self._frames:
+                    self._ready.clear()
+                    await self._ready.wait()
+                enqueued_at, frame, _ = self._frames.popleft()
+                self._room.set()
+                send = self.websocket.send_bytes(frame) if isinstance(frame, bytes) else self.websocket.send_text(frame)
+                self._sending = True
+                try:
+                    await asyncio.wait_for(send, self.send_timeout)
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    logger.warning("Send to client %s timed out after %ss; disconnecting", self.client_id, self.send_timeout)
+                    self.close(disconnect=True)
+                    return
+                finally:
+                    self._sending = False
+                self.sent += 1
+                self.bytes_sent += len(frame) if isinstance(frame, bytes) else len(frame.encode())
+                self.last_lag = time.monotonic() - enqueued_at
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.info("Writer for client %s stopped: %s", self.client_id, exc)
+            self.close()
+
+    def close(self, disconnect: bool = False) -> None:
+        """Stop the writer and drop queued frames; `disconnect` also closes the socket."""
+        if self.closed:
+            return
+        self.closed = True
+        self._frames.clear()
+        self._room.set()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if disconnect:
+            asyncio.get_running_loop().create_task(self._close_socket())
+        if self._on_close is not None:
+            self._on_close(self)
+
+    async def _close_socket(self) -> None:
+        try:
+            await asyncio.wait_for(self.websocket.close(code=SLOW_CLIENT_CLOSE_CODE), self.send_timeout)
+        except Exception:
+            pass
+
+    async def drain(self, timeout: float = 5.0) -> None:
+        """Wait until queued frames are sent (for tests and orderly shutdown)."""
+        deadline = time.monotonic() + timeout
+        while (self._frames or self._sending) and not self.closed and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+
+    @property
+    def depth(self) -> int:
+        return len(self._frames)
+
+    @property
+    def lag(self) -> float:
+        """Age of the oldest queued frame, in seconds."""
+        return time.monotonic() - self._frames[0][0] if self._frames else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "lag_ms": round(self.lag * 1000, 1),
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "timed_out": self.timed_out,
+        }
@@ -9,7 +9,9 @@ from uuid import uuid4
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from fastapi.logger import logger as fastapi_logger
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from app.core.llm_gateway import llm_gateway
+from app.core.model_client import get_model_client
 
 # Load environment variables
 backend_dir = Path(__file__).parent.parent.parent.parent
@@ -23,20 +25,6 @@ fastapi_logger.setLevel(logging.DEBUG)
 
 router = APIRouter()
 
-# Initialize OpenAI client for WebSocket
-openai_client = None
-use_openai = os.getenv("USE_OPENAI_FALLBACK")
-api_key = os.getenv("OPENAI_API_KEY")
-
-if use_openai == "true" and api_key:
-    try:
-        openai_client = OpenAI(api_key=api_key)
-        logger.info("✅ WebSocket OpenAI client initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize WebSocket OpenAI client: {e}")
-else:
-    logger.warning("⚠️ WebSocket OpenAI client not initialized")
-
 # Debug: Log when the router is created
 logger.info("WebSocket router created with OpenAI integration")
 
@@ -84,6 +72,9 @@ async def websocket_chat_endpoint(websocket: WebSocket, client_id: str):
         logger.error(f"❌ Failed to accept WebSocket connection for {client_id}: {e}")
         raise
     
+    # Shared async model client owned by the app's AzureClientManager
+    openai_client = get_model_client(websocket)
+
     try:
         while True:
             data = await websocket.receive_text()
@@ -112,8 +103,11 @@ async def websocket_chat_endpoint(websocket: WebSocket, client_id: str):
                     logger.info(f"🤖 Calling OpenAI API via WebSocket for: {user_content[:50]}...")
                     
                     # Call OpenAI API
-                    openai_response = openai_client.chat.completions.create(
-                        model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+                    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+                    openai_response = await llm_gateway.call(
+                        model,
+                        openai_client.chat.completions.create,
+                        model=model,
                         messages=messages,
                         max_tokens=1000,
                         temperature=0.7
@@ -81,11 +81,27 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         # can inspect and raise more helpful errors.
         app.state.azure_clients = azure_clients
     
+    # Cross-process pub/sub for trace events and conversation broadcasts
+    # (in-memory unless BROKER_BACKEND selects a multi-worker backend).
+    from app.core.broker import broker
+    from app.core.cancellation import run_cancellations
+    from app.obs.tracing import tracer
+    from app.websockets.handlers import manager
+    await broker.start()
+    await tracer.connect_broker(broker)
+    await manager.connect_broker(broker)
+    manager.start_heartbeat()
+    await run_cancellations.connect_broker(broker)
+    from app.agents.team_runs import team_runs
+    await team_runs.start(broker)
+
     logger.info("Backend started successfully")
     yield
     
     # Cleanup
     logger.info("Shutting down Azure Architect Backend...")
+    await manager.stop_heartbeat()
+    await team_runs.stop()
     try:
         # Cleanup MCP tools
         from app.deps import cleanup_mcp_tools
@@ -97,6 +113,11 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         await azure_clients.cleanup()
     except Exception as e:
         logger.warning(f"Error cleaning up Azure clients: {e}")
+
+    try:
+        await broker.close()
+    except Exception as e:
+        logger.warning(f"Error closing broker: {e}")
     
     logger.info("Backend shutdown complete")
 
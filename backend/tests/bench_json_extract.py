@@ -0,0 +1,78 @@
+"""Benchmark for JSON extraction on large model responses.
+
+Run from the backend directory:
+
+    python -m tests.bench_json_extract
+
+Compares the shared single-pass extractor against the previous
+restart-from-every-brace scan on synthetic 100 KB - 2 MB replies (prose,
+a fenced Diagram JSON block with Bicep snippets in strings, and notes with
+balanced and unclosed braces).
+"""
+
+import json
+import re
+import time
+from typing import List
+
+from app.core.json_extract import extract_json, find_json_spans
+
+SIZES = [100_000, 500_000, 1_000_000, 2_000_000]
+LEGACY_LIMIT = 100_000  # the quadratic scan takes minutes beyond this
+
+
+def _legacy_find_all_balanced_jsons(s: str) -> List[str]:
+    results = []
+    for start_idx in [m.start() for m in re.finditer(r"\{", s)]:
+        depth = 0
+        for i, ch in enumerate(s[start_idx:], start=start_idx):
+            if ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    results.append(s[start_idx:i + 1])
+                    break
+    return results
+
+
+def make_response(size: int) -> str:
+    services = []
+    diagram = {"services": services, "groups": [], "connections": []}
+    prose = "The workload uses {placeholders} and \"quoted\" prose between sections.\n"
+    body = json.dumps(diagram)
+    i = 0
+    while len(prose) * 2 + len(body) < size:
+        services.append({
+            "id": f"svc-{i}",
+            "title": f"Service {i}",
+            # Bicep fragment with an unclosed brace inside a JSON string
+            "description": "resource app 'Microsoft.Web/sites@2022-03-01' = { name: '${prefix}-app'",
+            "groupIds": ["rg"],
+        })
+        i += 1
+        if i % 200 == 0:
+            body = json.dumps(diagram)
+            prose += "Notes: {" + "x" * 40 + "} " * 20 + "and an unclosed {template\n"
+    body = json.dumps(diagram)
+    return f"{prose}\nDiagram JSON\n```json\n{body}\n```\n{prose}"
+
+
+def _time(fn, *args) -> float:
+    started = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    print(f"{'size':>10} {'spans ms':>10} {'extract ms':>11} {'legacy ms':>10}")
+    for size in SIZES:
+        text = make_response(size)
+        spans_ms = _time(find_json_spans, text)
+        extract_ms = _time(extract_json, text)
+        legacy = f"{_time(_legacy_find_all_balanced_jsons, text):10.1f}" if size <= LEGACY_LIMIT else f"{'skipped':>10}"
+        print(f"{len(text):>10} {spans_ms:10.1f} {extract_ms:11.1f} {legacy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark for WebSocket frame encodings on a recorded 8-agent team run.
+
+Run from the backend directory (needs the optional msgpack package):
+
+    python -m tests.bench_ws_codec
+
+Records the frames a client receives for one sequential team run (8 agents
+streaming a design with a Diagram JSON block, then `team_final` with the
+diagram and IaC), exactly as the trace forwarder produces them. It then
+reports bytes/frame and encode CPU for JSON text and MessagePack frames,
+each with and without permessage-deflate (emulated with the websockets
+server defaults: context takeover, 12-bit window, memLevel 5).
+"""
+
+import asyncio
+import json
+import time
+import zlib
+from typing import Callable, List, Tuple
+
+from agent_framework import ChatResponseUpdate, Role, TextContent
+
+from app.agents.landing_zone_team import LandingZoneTeam
+from app.agents.pipeline import SEQUENTIAL_PIPELINE
+from app.obs.tracing import tracer
+from app.websockets import handlers
+from app.websockets.codec import MSGPACK, transcode
+from app.websockets.handlers import ConnectionManager, encode_message
+from tests.conftest import FakeChatClient
+
+DIAGRAM = {
+    "services": [
+        {
+            "id": f"networking/{i:05d}-icon-service-Service-{i}",
+            "title": f"Service {i}",
+            "category": "Networking",
+            "description": "Routes spoke traffic through the hub firewall",
+            "groupIds": ["rg-hub"],
+        }
+        for i in range(24)
+    ],
+    "groups": [{"id": "rg-hub", "label": "Hub", "type": "resourceGroup", "members": [f"svc-{i}" for i in range(24)]}],
+    "connections": [{"from": f"svc-{i}", "to": f"svc-{i + 1}", "label": "HTTPS"} for i in range(23)],
+    "layout": "grid",
+}
+REPLY = (
+    "## Overview\nA hub-spoke landing zone with private endpoints, Azure Firewall and Defender for Cloud. " * 12
+    + "\nDiagram JSON\n```json\n" + json.dumps(DIAGRAM, indent=2) + "\n```\n"
+)
+CHUNK_CHARS = 24   # roughly a few tokens per streamed update
+
+
+class _StreamingClient(FakeChatClient):
+    async def _inner_get_streaming_response(self, *, messages, chat_options, **kwargs):
+        self.model_calls += 1
+        for start in range(0, len(REPLY), CHUNK_CHARS):
+            yield ChatResponseUpdate(role=Role.ASSISTANT, contents=[TextContent(text=REPLY[start:start + CHUNK_CHARS])])
+            await asyncio.sleep(0.0005)
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.frames: List[str] = []
+
+    async def send_text(self, frame: str) -> None:
+        self.frames.append(frame)
+
+
+async def record_run() -> List[str]:
+    manager, recorder = ConnectionManager(), _Recorder()
+    handlers.manager = manager
+    manager.register("rec", recorder)
+    team = LandingZoneTeam(_StreamingClient())
+    run_id = tracer.new_run()
+    final_text, diagram, raw, _, _ = await team.run_pipeline_traced(SEQUENTIAL_PIPELINE, "Design a landing zone", run_id=run_id)
+    await tracer.finish(run_id)
+    await handlers._forward_trace_events(run_id, "rec", "conv-1")
+    await manager.send_json_message({
+        "type": "team_final", "conversation_id": "conv-1", "run_id": run_id, "message": final_text,
+        "diagram": diagram, "diagram_raw": raw,
+        "iac": {"bicep": {"bicep_code": "resource hub 'Microsoft.Network/virtualNetworks@2023-04-01' = {}\n" * 60}},
+        "timestamp": "2025-01-01T00:00:00",
+    }, "rec")
+    await manager.flush("rec")
+    manager.disconnect("rec")
+    return recorder.frames
+
+
+def _deflate(frames: List[bytes]) -> Tuple[int, float]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -12, 5)
+    started = time.process_time()
+    total = sum(len(compressor.compress(f) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4 for f in frames)
+    return total, time.process_time() - started
+
+
+def _measure(name: str, encode: Callable[[str], bytes], frames: List[str]) -> None:
+    started = time.process_time()
+    encoded = [encode(frame) for frame in frames]
+    encode_cpu = time.process_time() - started
+    raw = sum(len(f) for f in encoded)
+    deflated, deflate_cpu = _deflate(encoded)
+    n = len(frames)
+    print(
+        f"{name:>9} {raw / n:10.1f} {deflated / n:12.1f} {raw / 1024:9.1f} {deflated / 1024:11.1f}"
+        f" {encode_cpu / n * 1e6:11.1f} {deflate_cpu / n * 1e6:12.1f}"
+    )
+
+
+def main() -> None:
+    frames = asyncio.run(record_run())
+    deltas = sum('"phase": "delta"' in f for f in frames)
+    print(f"{len(frames)} frames ({deltas} trace deltas) for an {len(SEQUENTIAL_PIPELINE.stages)}-agent run\n")
+    print(f"{'encoding':>9} {'B/frame':>10} {'+deflate':>12} {'total KB':>9} {'+deflate KB':>11} {'encode us':>11} {'deflate us':>12}")
+    # JSON frames are the forwarder's output; the encode column is the
+    # re-encode the server does for a JSON client (none) vs a msgpack client.
+    _measure("json", lambda f: f.encode(), frames)
+    _measure("msgpack", lambda f: transcode(f, MSGPACK), frames)
+    # For reference: encoding straight from the message dict.
+    messages = [json.loads(f) for f in frames]
+    started = time.process_time()
+    for message in messages:
+        encode_message(message)
+    print(f"\njson encode from dict: {(time.process_time() - started) / len(messages) * 1e6:.1f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
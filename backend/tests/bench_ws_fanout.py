@@ -0,0 +1,98 @@
+"""Benchmark for conversation fan-out with slow WebSocket clients.
+
+Run from the backend directory:
+
+    python -m tests.bench_ws_fanout
+
+Broadcasts a burst of frames to a 500-member conversation and reports the
+scheduled-to-sent latency seen by the fast clients, with no slow clients and
+with 5 clients that take 200 ms per send. The per-connection outbound queues
+should keep the fast clients' latency flat; the previous inline gather of
+sends is shown for comparison (every broadcast waits for the slowest client).
+"""
+
+import asyncio
+import statistics
+import time
+from typing import List
+
+from app.core.config import settings
+from app.websockets.handlers import ConnectionManager, encode_message
+
+SUBSCRIBERS = 500
+FRAMES = 20
+INTERVAL = 0.05
+FAST_DELAY = 0.0005
+SLOW_DELAY = 0.2
+
+
+class _Socket:
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.latencies: List[float] = []
+
+    async def send_text(self, text: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.latencies.append(time.perf_counter() - float(text[text.index('"t":') + 4:-1]))
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def _sockets(slow: int) -> List[_Socket]:
+    return [_Socket(SLOW_DELAY if i < slow else FAST_DELAY) for i in range(SUBSCRIBERS)]
+
+
+async def _ticks():
+    """Yield each frame's scheduled time, so latency includes any head-of-line wait."""
+    start = time.perf_counter()
+    for k in range(FRAMES):
+        due = start + k * INTERVAL
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        yield due
+
+
+def _percentiles(sockets: List[_Socket]) -> str:
+    samples = sorted(lat for s in sockets if s.delay == FAST_DELAY for lat in s.latencies)
+    if not samples:
+        return f"{'-':>9} {'-':>9}"
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"{statistics.median(samples) * 1000:9.1f} {p99 * 1000:9.1f}"
+
+
+async def _queued(slow: int) -> str:
+    manager, sockets = ConnectionManager(), _sockets(slow)
+    for i, socket in enumerate(sockets):
+        manager.register(f"c{i}", socket)
+        manager.add_to_conversation("conv", f"c{i}")
+    await manager.broadcast_to_conversation("conv", {"type": "warm_up", "t": time.perf_counter()})
+    await asyncio.sleep(0.05)
+    for socket in sockets:
+        socket.latencies.clear()
+    async for due in _ticks():
+        await manager.broadcast_to_conversation("conv", {"type": "conversation_update", "t": due})
+    await asyncio.gather(*(manager.flush(f"c{i}") for i in range(slow, SUBSCRIBERS)))
+    result = _percentiles(sockets)
+    for i in range(SUBSCRIBERS):
+        manager.disconnect(f"c{i}")
+    return result
+
+
+async def _legacy(slow: int) -> str:
+    sockets = _sockets(slow)
+    async for due in _ticks():
+        text = encode_message({"type": "conversation_update", "t": due})
+        await asyncio.gather(*(s.send_text(text) for s in sockets))
+    return _percentiles(sockets)
+
+
+async def main() -> None:
+    settings.WS_SEND_TIMEOUT_SECONDS = 1.0
+    print(f"{'mode':>8} {'slow':>5} {'p50 ms':>9} {'p99 ms':>9}")
+    for slow in (0, 5):
+        print(f"{'queued':>8} {slow:>5} {await _queued(slow)}")
+        print(f"{'legacy':>8} {slow:>5} {await _legacy(slow)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+"""Shared fixtures for backend tests."""
+
+import asyncio
+import os
+
+import pytest
+from agent_framework import (
+    BaseChatClient,
+    ChatMessage,
+    ChatResponse,
+    ChatResponseUpdate,
+    Role,
+    TextContent,
+    UsageContent,
+    UsageDetails,
+)
+
+# Keep team run checkpoints in memory rather than in a SQLite file under the repo.
+os.environ.setdefault("TEAM_CHECKPOINT_BACKEND", "memory")
+
+
+class FakeChatClient(BaseChatClient):
+    """In-process chat client that answers every prompt with a fixed reply.
+
+    Counts `create_agent` calls and model calls so tests can assert on agent
+    provisioning and on how many requests reached the "model".
+    """
+
+    def __init__(self, reply: str = "ok", delay: float = 0.0, usage: tuple[int, int] | None = None) -> None:
+        super().__init__()
+        self.reply = reply
+        self.delay = delay
+        self.usage = usage  # (prompt, completion) tokens reported after streaming
+        self.agents_created = 0
+        self.model_calls = 0
+
+    def create_agent(self, **kwargs):
+        self.agents_created += 1
+        return super().create_agent(**kwargs)
+
+    async def _inner_get_response(self, *, messages, chat_options, **kwargs):
+        self.model_calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return ChatResponse(messages=[ChatMessage(role=Role.ASSISTANT, text=self.reply)])
+
+    async def _inner_get_streaming_response(self, *, messages, chat_options, **kwargs):
+        self.model_calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        yield ChatResponseUpdate(role=Role.ASSISTANT, contents=[TextContent(text=self.reply)])
+        if self.usage:
+            details = UsageDetails(input_token_count=self.usage[0], output_token_count=self.usage[1])
+            yield ChatResponseUpdate(role=Role.ASSISTANT, contents=[UsageContent(details=details)])
+
+
+@pytest.fixture
+def fake_chat_client():
+    return FakeChatClient()
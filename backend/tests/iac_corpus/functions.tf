@@ -0,0 +1,68 @@
+resource "azurerm_resource_group" "app" {
+  name     = "rg-orders"
+  location = "westeurope"
+}
+
+resource "azurerm_storage_account" "app" {
+  name                     = "stordersfn"
+  resource_group_name      = azurerm_resource_group.app.name
+  location                 = azurerm_resource_group.app.location
+  account_tier             = "Standard"
+  account_replication_type = "LRS"
+}
+
+resource "azurerm_storage_container" "orders" {
+  name                 = "orders"
+  storage_account_name = azurerm_storage_account.app.name
+}
+
+resource "azurerm_service_plan" "app" {
+  name                = "plan-orders"
+  resource_group_name = azurerm_resource_group.app.name
+  location            = azurerm_resource_group.app.location
+  os_type             = "Linux"
+  sku_name            = "Y1"
+}
+
+resource "azurerm_application_insights" "app" {
+  name                = "appi-orders"
+  resource_group_name = azurerm_resource_group.app.name
+  location            = azurerm_resource_group.app.location
+  application_type    = "web"
+}
+
+resource "azurerm_servicebus_namespace" "app" {
+  name                = "sb-orders"
+  resource_group_name = azurerm_resource_group.app.name
+  location            = azurerm_resource_group.app.location
+  sku                 = "Standard"
+}
+
+resource "azurerm_servicebus_queue" "orders" {
+  name         = "orders"
+  namespace_id = azurerm_servicebus_namespace.app.id
+}
+
+resource "azurerm_linux_function_app" "orders" {
+  name                       = "func-orders"
+  resource_group_name        = azurerm_resource_group.app.name
+  location                   = azurerm_resource_group.app.location
+  service_plan_id            = azurerm_service_plan.app.id
+  storage_account_name       = azurerm_storage_account.app.name
+  storage_account_access_key = azurerm_storage_account.app.primary_access_key
+
+  site_config {
+    application_insights_connection_string = azurerm_application_insights.app.connection_string
+  }
+
+  app_settings = {
+    "ServiceBusConnection" = azurerm_servicebus_namespace.app.default_primary_connection_string
+    "OrdersContainer"      = "${azurerm_storage_container.orders.name}"
+  }
+}
+
+resource "azurerm_nat_gateway" "egress" {
+  name                = "nat-orders"
+  location            = azurerm_resource_group.app.location
+  resource_group_name = azurerm_resource_group.app.name
+}
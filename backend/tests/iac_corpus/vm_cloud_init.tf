@@ -0,0 +1,60 @@
+resource "azurerm_resource_group" "vm" {
+  name     = "rg-jumpbox"
+  location = "westeurope"
+}
+
+resource "azurerm_virtual_network" "vm" {
+  name                = "vnet-jumpbox"
+  resource_group_name = azurerm_resource_group.vm.name
+  location            = azurerm_resource_group.vm.location
+  address_space       = ["10.20.0.0/16"]
+}
+
+resource "azurerm_subnet" "vm" {
+  name                 = "snet-jumpbox"
+  resource_group_name  = azurerm_resource_group.vm.name
+  virtual_network_name = azurerm_virtual_network.vm.name
+  address_prefixes     = ["10.20.1.0/24"]
+}
+
+resource "azurerm_network_interface" "vm" {
+  name                = "nic-jumpbox"
+  resource_group_name = azurerm_resource_group.vm.name
+  location            = azurerm_resource_group.vm.location
+
+  ip_configuration {
+    name                          = "internal"
+    subnet_id                     = azurerm_subnet.vm.id
+    private_ip_address_allocation = "Dynamic"
+  }
+}
+
+resource "azurerm_linux_virtual_machine" "jumpbox" {
+  name                  = "vm-jumpbox"
+  resource_group_name   = azurerm_resource_group.vm.name
+  location              = azurerm_resource_group.vm.location
+  size                  = "Standard_B2s"
+  admin_username        = "azureuser"
+  network_interface_ids = [azurerm_network_interface.vm.id]
+
+  # The script's apostrophes, quotes and braces are not HCL.
+  custom_data = base64encode(<<-EOT
+    #!/bin/bash
+    echo Don't log in here for anything but ops work. > /etc/motd
+    echo "{\"role\": \"jumpbox\"}" > /etc/jumpbox.json
+  EOT
+  )
+
+  os_disk {
+    caching              = "ReadWrite"
+    storage_account_type = "Standard_LRS"
+  }
+}
+
+resource "azurerm_key_vault" "ops" {
+  name                = "kv-jumpbox-ops"
+  resource_group_name = azurerm_resource_group.vm.name
+  location            = azurerm_resource_group.vm.location
+  tenant_id           = "00000000-0000-0000-0000-000000000000"
+  sku_name            = "standard"
+}
@@ -0,0 +1,152 @@
+"""Tests for the cross-process pub/sub broker."""
+
+import asyncio
+import json
+import multiprocessing
+import shutil
+import socket
+import subprocess
+import time
+
+import pytest
+
+from app.core.broker import RespBroker, UnixSocketBroker
+from app.obs.tracing import TraceEvent, Tracer
+
+RUN_ID = "lz-broker-test"
+
+
+def _event(phase: str, delta: str | None = None) -> TraceEvent:
+    return TraceEvent(
+        run_id=RUN_ID, step_id="1", agent="writer", phase=phase, ts=time.time(),
+        meta={}, progress={}, telemetry={}, message_delta=delta,
+    )
+
+
+def _listener_worker(path: str, ready, results) -> None:
+    """Worker B: attaches to a run it is not executing and reports what arrives."""
+
+    async def main() -> None:
+        broker = UnixSocketBroker(path)
+        await broker.start()
+        tracer = Tracer()
+        await tracer.connect_broker(broker)
+        queue = tracer.attach(RUN_ID, with_ids=True)
+        ready.set()
+        received = []
+        while (item := await asyncio.wait_for(queue.get(), 20)) is not None:
+            seq, data = item
+            event = json.loads(data)
+            received.append([seq, event["phase"], event["message_delta"]])
+        results.put({"worker": "listener", "events": received, "hosted_hub": broker.hub is not None})
+        await broker.close()
+
+    asyncio.run(main())
+
+
+def _producer_worker(path: str, ready, results) -> None:
+    """Worker A: executes the run."""
+
+    async def main() -> None:
+        broker = UnixSocketBroker(path)
+        await broker.start()
+        tracer = Tracer()
+        await tracer.connect_broker(broker)
+        await tracer.emit(_event("start"))
+        for text in ("Hub ", "and ", "spokes"):
+            await tracer.emit(_event("delta", text))
+        await tracer.emit(_event("end"))
+        await tracer.finish(RUN_ID)
+        results.put({"worker": "producer", "hosted_hub": broker.hub is not None})
+        await broker.close()
+
+    assert ready.wait(20)
+    asyncio.run(main())
+
+
+def test_listener_on_one_worker_receives_a_run_executing_on_another(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    path = str(tmp_path / "broker.sock")
+    ready, results = ctx.Event(), ctx.Queue()
+    workers = [
+        ctx.Process(target=_listener_worker, args=(path, ready, results)),
+        ctx.Process(target=_producer_worker, args=(path, ready, results)),
+    ]
+    for worker in workers:
+        worker.start()
+    reports = {report["worker"]: report for report in (results.get(timeout=60) for _ in workers)}
+    for worker in workers:
+        worker.join(timeout=20)
+
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert reports["listener"]["events"] == [
+        [1, "start", None], [2, "delta", "Hub "], [3, "delta", "and "], [4, "delta", "spokes"], [5, "end", None],
+    ]
+    # Exactly one worker hosted the hub; the other reached it over the socket.
+    assert reports["listener"]["hosted_hub"] != reports["producer"]["hosted_hub"]
+
+
+class _Socket:
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+
+@pytest.mark.asyncio
+async def test_conversation_broadcast_reaches_clients_on_every_worker(tmp_path):
+    from app.websockets.handlers import ConnectionManager   # kept out of the spawned workers' imports
+
+    path = str(tmp_path / "broker.sock")
+    brokers = [UnixSocketBroker(path), UnixSocketBroker(path)]
+    managers = [ConnectionManager(), ConnectionManager()]
+    sockets = [_Socket(), _Socket()]
+    for index, (broker, manager) in enumerate(zip(brokers, managers)):
+        await broker.start()
+        await manager.connect_broker(broker)
+        manager.register(f"client-{index}", sockets[index])
+        manager.add_to_conversation("conv-1", f"client-{index}")
+
+    await managers[0].broadcast_to_conversation("conv-1", {"type": "conversation_update", "n": 1})
+    for _ in range(100):
+        if all(s.sent for s in sockets):
+            break
+        await asyncio.sleep(0.02)
+    for index, manager in enumerate(managers):
+        manager.disconnect(f"client-{index}")
+    for broker in reversed(brokers):
+        await broker.close()
+
+    assert [s.sent for s in sockets] == [[{"type": "conversation_update", "n": 1}]] * 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(shutil.which("redis-server") is None, reason="redis-server not installed")
+async def test_redis_backend_round_trip():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"], stdout=subprocess.DEVNULL
+    )
+    publisher, subscriber = RespBroker(f"redis://127.0.0.1:{port}/0"), RespBroker(f"redis://127.0.0.1:{port}/0")
+    try:
+        received: list[str] = []
+
+        async def handler(message: str) -> None:
+            received.append(message)
+
+        await subscriber.start()   # retries until the server accepts connections
+        await subscriber.subscribe("azviz:test", handler)
+        await publisher.publish("azviz:test", "hello")
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.02)
+        assert received == ["hello"]
+    finally:
+        await publisher.close()
+        await subscriber.close()
+        server.terminate()
+        server.wait()
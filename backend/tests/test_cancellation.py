@@ -0,0 +1,102 @@
+"""Tests for run cancellation reaching the team pipeline and model calls."""
+
+import asyncio
+
+import pytest
+from agent_framework import use_chat_middleware
+
+from app.agents.landing_zone_team import LandingZoneTeam
+from app.agents.pipeline import SEQUENTIAL_PIPELINE
+from app.core.cancellation import CancellationToken, RunCancelled, cancel_scope
+from app.core.llm_gateway import LLMGateway
+from app.obs.tracing import tracer
+from app.obs.usage import usage_ledger
+from tests.conftest import FakeChatClient
+
+
+@use_chat_middleware
+class _DisconnectingClient(FakeChatClient):
+    """Cancels the run's token while streaming the `cancel_on_call`-th model call."""
+
+    def __init__(self, token: CancellationToken, cancel_on_call: int) -> None:
+        super().__init__(reply="draft", usage=(120, 40))
+        self.token = token
+        self.cancel_on_call = cancel_on_call
+
+    async def _inner_get_streaming_response(self, **kwargs):
+        async for update in super()._inner_get_streaming_response(**kwargs):
+            if self.model_calls == self.cancel_on_call:
+                self.token.cancel("client disconnected")
+            yield update
+            await asyncio.sleep(0)
+
+
+class _Architect:
+    """Stands in for AzureArchitectAgent so the team would generate IaC."""
+
+    def __init__(self, agent_client) -> None:
+        self.agent_client = agent_client
+        self.chat_agent = None
+        self.iac_calls = 0
+
+    async def generate_bicep_code(self, *args, **kwargs):
+        self.iac_calls += 1
+        return {"bicep_code": "resource x"}
+
+    async def generate_terraform_code(self, *args, **kwargs):
+        self.iac_calls += 1
+        return {"terraform_code": "resource x"}
+
+
+@pytest.mark.asyncio
+async def test_no_model_or_iac_calls_after_cancellation():
+    token = CancellationToken()
+    client = LLMGateway().attach(_DisconnectingClient(token, cancel_on_call=2), model="gpt-test")
+    architect = _Architect(client)
+    team = LandingZoneTeam(architect)
+    run_id = tracer.new_run()
+
+    with pytest.raises(RunCancelled) as raised:
+        async with cancel_scope(token):
+            await team.run_pipeline_traced(SEQUENTIAL_PIPELINE, "design", run_id=run_id)
+    await asyncio.sleep(0.05)   # give any stray stage a chance to call out
+
+    assert raised.value.reason == "client disconnected"
+    assert client.model_calls == 2 and architect.iac_calls == 0
+    # The interrupted stream's tokens are still accounted for.
+    assert usage_ledger.run_totals(run_id)["steps"] == 2
+
+
+@pytest.mark.asyncio
+async def test_swallowed_cancellation_cannot_start_another_model_call():
+    client = LLMGateway().attach(_DisconnectingClient(CancellationToken(), cancel_on_call=0), model="gpt-test")
+    agent = client.create_agent(instructions="be brief")
+    token = CancellationToken()
+
+    with pytest.raises(RunCancelled):
+        async with cancel_scope(token):
+            token.cancel("cancelled by client")
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                pass   # a careless handler carries on
+            await agent.run("one more")
+
+    assert client.model_calls == 0
+    assert asyncio.current_task().cancelling() == 0
+
+
+@pytest.mark.asyncio
+async def test_outer_cancel_is_not_mistaken_for_the_token():
+    token = CancellationToken()
+
+    async def run():
+        async with cancel_scope(token):
+            await asyncio.sleep(1)
+
+    task = asyncio.create_task(run())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError) as raised:
+        await task
+    assert not isinstance(raised.value, RunCancelled) and not token.cancelled
@@ -0,0 +1,101 @@
+"""Tests for checkpointed landing zone team runs and resume_run."""
+
+import pytest
+from agent_framework import use_chat_middleware
+
+from app.agents.checkpoints import CheckpointNotFoundError, SqliteCheckpointStore
+from app.agents.landing_zone_team import LandingZoneTeam, team_instructions
+from app.agents.pipeline import SEQUENTIAL_PIPELINE
+from app.obs.tracing import tracer
+from tests.conftest import FakeChatClient
+
+DRAFT = 'Design\n\nDiagram JSON\n```json\n{"services": [{"id": "web", "title": "Web"}]}\n```'
+
+
+@use_chat_middleware
+class _FlakyClient(FakeChatClient):
+    """Fails the `fail_on_call`-th model call."""
+
+    def __init__(self, fail_on_call: int = 0) -> None:
+        super().__init__(reply=DRAFT, usage=(100, 20))
+        self.fail_on_call = fail_on_call
+
+    async def _inner_get_streaming_response(self, **kwargs):
+        if self.model_calls + 1 == self.fail_on_call:
+            self.model_calls += 1
+            raise RuntimeError("model unavailable")
+        async for update in super()._inner_get_streaming_response(**kwargs):
+            yield update
+
+
+class _Architect:
+    def __init__(self, agent_client) -> None:
+        self.agent_client = agent_client
+        self.chat_agent = None
+        self.iac_calls = 0
+
+    async def generate_bicep_code(self, *args, **kwargs):
+        self.iac_calls += 1
+        return {"bicep_code": "resource web 'Microsoft.Web/sites@2023-01-01' = {}"}
+
+    async def generate_terraform_code(self, *args, **kwargs):
+        self.iac_calls += 1
+        return {"terraform_code": 'resource "azurerm_linux_web_app" "web" {}'}
+
+
+@pytest.mark.asyncio
+async def test_late_failure_resumes_from_the_failed_stage_after_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    client = _FlakyClient(fail_on_call=7)   # reviewer 6 of 7 (compliance) fails
+    run_id = tracer.new_run()
+    with pytest.raises(RuntimeError):
+        await LandingZoneTeam(_Architect(client), checkpoints=SqliteCheckpointStore(path)).run_pipeline_traced(
+            SEQUENTIAL_PIPELINE, "Design a landing zone", run_id=run_id, iac_formats=("bicep", "terraform")
+        )
+    assert client.model_calls == 7
+
+    # A new process: fresh team, fresh connection to the same store.
+    client, store = _FlakyClient(), SqliteCheckpointStore(path)
+    architect = _Architect(client)
+    team = LandingZoneTeam(architect, checkpoints=store)
+    assert (await team.checkpointed_run(run_id))["status"] == "failed"
+    tracer.reopen(run_id)
+    final_text, diagram, _, iac_bundle, _ = await team.resume_run(run_id)
+
+    assert client.model_calls == 2   # compliance and the final editor only
+    # The diagram is read off the generated Bicep.
+    assert [service["title"] for service in diagram["services"]] == ["App Services"]
+    assert iac_bundle["bicep"] and iac_bundle["terraform"]
+    assert architect.iac_calls == 2 and store.restores == 6
+    assert (await team.checkpointed_run(run_id))["status"] == "completed"
+
+    # Resuming a completed run reuses every stage and the generated IaC.
+    again = await team.resume_run(run_id)
+    assert client.model_calls == 2 and architect.iac_calls == 2
+    assert again[0] == final_text and again[3] == iac_bundle
+    store.close()
+
+    with pytest.raises(CheckpointNotFoundError):
+        await team.resume_run("lz-unknown")
+
+
+@pytest.mark.asyncio
+async def test_stages_whose_input_changed_are_rerun(tmp_path):
+    store = SqliteCheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    run_id = tracer.new_run()
+    with pytest.raises(RuntimeError):
+        await LandingZoneTeam(_FlakyClient(fail_on_call=8), checkpoints=store).run_pipeline_traced(
+            SEQUENTIAL_PIPELINE, "Design a landing zone", run_id=run_id
+        )
+
+    instructions = {**team_instructions(), "NamingEnforcer": "Enforce the new naming standard."}
+    client = _FlakyClient()
+    team = LandingZoneTeam(client, instructions=instructions, checkpoints=store)
+    tracer.reopen(run_id)
+    await team.resume_run(run_id)
+
+    # Naming reruns under its new instructions. Its reply is unchanged, so the
+    # stages after it see the same input and stay restored; the final editor
+    # never completed and runs.
+    assert client.model_calls == 2
+    store.close()
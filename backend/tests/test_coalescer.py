@@ -0,0 +1,84 @@
+"""Tests for batching streamed text deltas into frames."""
+
+import asyncio
+import json
+
+import pytest
+from agent_framework import ChatResponseUpdate, Role, TextContent
+
+from app.agents.landing_zone_team import LandingZoneTeamRegistry
+from app.agents.pipeline import SEQUENTIAL_PIPELINE
+from app.obs.coalescer import DeltaCoalescer, stream_stats
+from app.obs.tracing import tracer
+from tests.conftest import FakeChatClient
+
+
+class ChunkedChatClient(FakeChatClient):
+    """Streams its reply a few characters per update, like a token stream."""
+
+    async def _inner_get_streaming_response(self, *, messages, chat_options, **kwargs):
+        self.model_calls += 1
+        for start in range(0, len(self.reply), 3):
+            yield ChatResponseUpdate(role=Role.ASSISTANT, contents=[TextContent(text=self.reply[start:start + 3])])
+
+
+@pytest.mark.asyncio
+async def test_chunks_merge_in_order_and_flush_on_size():
+    frames: list[str] = []
+
+    async def sink(text: str) -> None:
+        frames.append(text)
+
+    deltas = DeltaCoalescer(sink, window_ms=10_000, max_bytes=8)
+    for chunk in ["ab", "cd", "ef", "gh", "ij"]:
+        await deltas.add(chunk)
+    assert frames == ["abcdefgh"]
+    await deltas.aclose()
+
+    assert frames == ["abcdefgh", "ij"]
+    stats = deltas.stats()
+    assert stats["chunks"] == 5 and stats["frames"] == 2 and stats["frame_reduction"] == 0.6
+
+
+@pytest.mark.asyncio
+async def test_window_flushes_a_stalled_stream():
+    frames: list[str] = []
+
+    async def sink(text: str) -> None:
+        frames.append(text)
+
+    deltas = DeltaCoalescer(sink, window_ms=20, max_bytes=2048)
+    await deltas.add("Hel")
+    await deltas.add("lo")
+    await asyncio.sleep(0.1)  # no more chunks: the window alone must flush
+    assert frames == ["Hello"]
+
+    passthrough = DeltaCoalescer(sink, window_ms=0)
+    await passthrough.add("a")
+    await passthrough.add("b")
+    assert frames == ["Hello", "a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_team_run_emits_fewer_delta_frames_than_chunks(monkeypatch):
+    monkeypatch.setattr("app.obs.coalescer.settings.STREAM_COALESCE_WINDOW_MS", 10_000)
+    reply = "Deploy a hub VNet with Azure Firewall and spoke subnets. " * 10
+    team = LandingZoneTeamRegistry().get(ChunkedChatClient(reply=reply))
+    run_id = tracer.new_run()
+    queue = tracer.attach(run_id)
+
+    await team.run_pipeline_traced(SEQUENTIAL_PIPELINE, "design", run_id=run_id)
+
+    events = []
+    while not queue.empty():
+        events.append(json.loads(queue.get_nowait()))
+    tracer.detach(run_id, queue)
+
+    writer = [e for e in events if e["step_id"] == "1"]
+    assert [e["phase"] for e in writer] == ["start", "delta", "end"]
+    assert writer[1]["message_delta"] == reply
+    stream = writer[2]["telemetry"]["stream"]
+    assert stream["chunks"] == len(range(0, len(reply), 3)) and stream["frames"] == 1
+    totals = stream_stats.run(run_id)
+    assert totals["streams"] == len(SEQUENTIAL_PIPELINE.stages)
+    assert totals["frames"] * 100 < totals["chunks"]
@@ -0,0 +1,123 @@
+"""Tests for the patch-based reviewer protocol."""
+
+import pytest
+
+from app.agents.diagram_patch import (
+    PatchError,
+    ReviewState,
+    apply_patch,
+    parse_review,
+    validate_diagram,
+)
+from app.agents.landing_zone_team import LandingZoneTeamRegistry
+from app.agents.pipeline import REVIEW_DAG_PIPELINE
+from tests.conftest import FakeChatClient
+
+
+DIAGRAM = {
+    "services": [{"id": "app", "title": "App Service"}, {"id": "sql", "title": "SQL Database"}],
+    "groups": [{"id": "rg", "label": "Workload"}],
+    "connections": [{"from": "app", "to": "sql"}],
+}
+
+KEY_VAULT_REVIEW = (
+    "- Store secrets in Key Vault\n"
+    "- Disable public network access on SQL\n\n"
+    "Diagram Patch\n```json\n"
+    '[{"op": "add", "path": "/services/-", "value": {"id": "kv", "title": "Key Vault"}},'
+    ' {"op": "add", "path": "/connections/-", "value": {"from": "app", "to": "kv"}}]\n'
+    "```"
+)
+
+
+def test_apply_patch_supports_rfc6902_operations():
+    patched = apply_patch(DIAGRAM, [
+        {"op": "replace", "path": "/services/0/title", "value": "Web App"},
+        {"op": "copy", "from": "/groups/0", "path": "/groups/-"},
+        {"op": "move", "from": "/groups/1/label", "path": "/groups/1/description"},
+        {"op": "remove", "path": "/groups/1"},
+        {"op": "test", "path": "/services/1/id", "value": "sql"},
+    ])
+    assert patched["services"][0]["title"] == "Web App"
+    assert patched["groups"] == DIAGRAM["groups"]
+    assert DIAGRAM["services"][0]["title"] == "App Service"
+
+
+def test_failed_patch_leaves_document_untouched():
+    with pytest.raises(PatchError):
+        apply_patch(DIAGRAM, [
+            {"op": "remove", "path": "/services/1"},
+            {"op": "test", "path": "/services/0/id", "value": "nope"},
+        ])
+    assert len(DIAGRAM["services"]) == 2
+
+
+def test_validation_rejects_patches_that_break_references():
+    state = ReviewState.from_draft("draft", DIAGRAM)
+    changeset = parse_review("- drop sql\n\nDiagram Patch\n```json\n[{\"op\": \"remove\", \"path\": \"/services/1\"}]\n```")
+    result = state.apply("security", "SecurityReviewer", changeset)
+
+    assert result.diagram == DIAGRAM
+    assert result.history[-1].rejected
+    assert validate_diagram(result.diagram) == []
+
+
+def test_parallel_reviews_merge_by_replaying_changes():
+    base = ReviewState.from_draft("draft", DIAGRAM)
+    security = base.apply("security", "SecurityReviewer", parse_review(KEY_VAULT_REVIEW))
+    cost = base.apply("cost", "CostPerfOptimizer", parse_review(
+        "- Use serverless SQL\n\nDiagram Patch\n```json\n"
+        '[{"op": "add", "path": "/services/1/sku", "value": "serverless"}]\n```'
+    ))
+    merged = ReviewState.merge([security, cost])
+
+    assert [s["id"] for s in merged.diagram["services"]] == ["app", "sql", "kv"]
+    assert merged.diagram["services"][1]["sku"] == "serverless"
+    assert "Store secrets in Key Vault" in merged.notes_digest()
+    assert merged.stats()["patches_applied"] == 2
+
+
+def test_parallel_removal_does_not_shift_another_branchs_edits():
+    diagram = {
+        "services": [{"id": "legacy", "title": "VM"}, *DIAGRAM["services"], {"id": "kv", "title": "Key Vault"}],
+        "groups": [], "connections": [{"from": "app", "to": "sql"}],
+    }
+    base = ReviewState.from_draft("draft", diagram)
+    security = base.apply("security", "SecurityReviewer", parse_review(
+        "- Retire the VM\n\nDiagram Patch\n```json\n[{\"op\": \"remove\", \"path\": \"/services/0\"}]\n```"
+    ))
+    cost = base.apply("cost", "CostPerfOptimizer", parse_review(
+        "- Serverless SQL\n\nDiagram Patch\n```json\n"
+        '[{"op": "replace", "path": "/services/2/title", "value": "Serverless SQL"},'
+        ' {"op": "remove", "path": "/services/3"}]\n```'
+    ))
+    merged = ReviewState.merge([security, cost])
+
+    assert merged.diagram["services"] == [{"id": "app", "title": "App Service"}, {"id": "sql", "title": "Serverless SQL"}]
+    assert merged.stats()["patches_applied"] == 2
+
+    # An edit to an element another branch removed is rejected, not applied elsewhere.
+    reliability = base.apply("reliability", "ReliabilityReviewer", parse_review(
+        "- Zone-redundant VM\n\nDiagram Patch\n```json\n"
+        '[{"op": "add", "path": "/services/0/zones", "value": [1, 2, 3]}]\n```'
+    ))
+    merged = ReviewState.merge([security, reliability])
+    assert "legacy" not in [s["id"] for s in merged.diagram["services"]] and merged.history[-1].rejected
+
+
+@pytest.mark.asyncio
+async def test_patch_protocol_team_run_returns_validated_diagram():
+    client = FakeChatClient(reply=(
+        "- Add Key Vault\n\nDiagram Patch\n```json\n"
+        '[{"op": "add", "path": "/services/-", "value": {"id": "kv", "title": "Key Vault"}}]\n```'
+    ))
+    team = LandingZoneTeamRegistry().get(client)
+
+    final_text, diagram, raw_json, _, _ = await team.run_pipeline_traced(
+        REVIEW_DAG_PIPELINE, "design", review_protocol="patch"
+    )
+
+    # Security adds Key Vault; the sibling reviewers' identical adds are rejected as duplicates.
+    assert [s["id"] for s in diagram["services"]] == ["kv"]
+    assert validate_diagram(diagram) == []
+    assert "Diagram JSON" in final_text and raw_json
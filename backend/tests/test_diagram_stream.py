@@ -0,0 +1,73 @@
+"""Tests for incremental Diagram JSON parsing of streamed agent output."""
+
+import json
+
+import pytest
+
+from app.agents.diagram_stream import DiagramStreamParser
+from app.agents.landing_zone_team import LandingZoneTeamRegistry
+from app.agents.pipeline import SEQUENTIAL_PIPELINE
+from app.obs.tracing import tracer
+from tests.conftest import FakeChatClient
+
+
+DIAGRAM = {
+    "services": [
+        {"id": "app", "title": "App Service", "description": "serves {api} traffic"},
+        {"id": "kv", "title": "Key Vault", "description": "quote \" and brace }"},
+    ],
+    "groups": [{"id": "rg", "label": "Workload", "members": ["app", "kv"]}],
+    "connections": [{"from": "app", "to": "kv", "label": "secrets"}],
+    "layout": "grid",
+}
+REPLY = f"Overview with a {{brace}}.\n\nDiagram JSON\n```json\n{json.dumps(DIAGRAM, indent=2)}\n```\nDone."
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, len(REPLY)])
+def test_items_are_emitted_as_they_close(chunk_size):
+    parser = DiagramStreamParser()
+    items = []
+    for i in range(0, len(REPLY), chunk_size):
+        items.extend(parser.feed(REPLY[i:i + chunk_size]))
+
+    assert [(collection, index) for collection, index, _ in items] == [
+        ("services", 0), ("services", 1), ("groups", 0), ("connections", 0),
+    ]
+    assert items[1][2] == DIAGRAM["services"][1]
+    assert parser.result == DIAGRAM
+
+
+def test_item_is_reported_before_the_block_finishes():
+    parser = DiagramStreamParser()
+    cut = REPLY.index('"groups"')
+    first = parser.feed(REPLY[:cut])
+    assert [item["id"] for _, _, item in first] == ["app", "kv"]
+    assert parser.result is None
+
+
+def test_text_without_a_diagram_block_yields_nothing():
+    parser = DiagramStreamParser()
+    assert parser.feed('Here is {"services": [{"id": "x"}]} inline') == []
+    assert parser.result is None
+
+
+@pytest.mark.asyncio
+async def test_team_run_streams_diagram_partials():
+    team = LandingZoneTeamRegistry().get(FakeChatClient(reply=REPLY))
+    run_id = tracer.new_run()
+    queue = tracer.attach(run_id)
+
+    _, diagram, raw_json, _, _ = await team.run_pipeline_traced(SEQUENTIAL_PIPELINE, "design", run_id=run_id)
+
+    partials = []
+    while not queue.empty():
+        event = json.loads(queue.get_nowait())
+        if event["phase"] == "diagram_partial":
+            partials.append(event)
+    tracer.detach(run_id, queue)
+
+    assert diagram == DIAGRAM and json.loads(raw_json) == DIAGRAM
+    # Every stage re-emits its diagram; the first item arrives from the writer.
+    assert len(partials) == 4 * len(SEQUENTIAL_PIPELINE.stages)
+    assert partials[0]["step_id"] == "1"
+    assert partials[0]["payload"] == {"collection": "services", "index": 0, "item": DIAGRAM["services"][0]}
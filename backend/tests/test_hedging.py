@@ -0,0 +1,149 @@
+"""Tests for hedged model calls and request deadlines."""
+
+import asyncio
+
+import pytest
+from agent_framework import ChatContext, ChatMessage, ChatOptions, Role, use_chat_middleware
+
+from app.agents.pipeline import PipelineGraph, Stage, run_pipeline
+from app.core.deadlines import DeadlineExceeded, deadline_scope, remaining
+from app.core.hedging import LatencyTracker, _trial_context, race_with_hedge
+from app.core.llm_gateway import LLMGateway
+from tests.conftest import FakeChatClient
+
+
+@use_chat_middleware
+class SlowFirstChatClient(FakeChatClient):
+    """Answers the first request slowly and every later one immediately."""
+
+    def __init__(self, reply: str, first_delay: float) -> None:
+        super().__init__(reply=reply)
+        self.first_delay = first_delay
+
+    async def _inner_get_streaming_response(self, *, messages, chat_options, **kwargs):
+        self.delay = self.first_delay if self.model_calls == 0 else 0.0
+        async for update in super()._inner_get_streaming_response(messages=messages, chat_options=chat_options, **kwargs):
+            yield update
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_slow_primary_is_cancelled():
+    calls = 0
+    cancelled = asyncio.Event()
+    outcome: list[bool] = []
+
+    async def start() -> str:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "primary"
+        return "hedge"
+
+    assert await race_with_hedge(start, 0.02, outcome.append) == "hedge"
+    assert calls == 2 and outcome == [True]
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_never_hedged():
+    calls = 0
+
+    async def start() -> str:
+        nonlocal calls
+        calls += 1
+        return "primary"
+
+    assert await race_with_hedge(start, 0.5) == "primary"
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_streaming_agent_call_is_hedged_past_observed_latency(monkeypatch):
+    monkeypatch.setattr("app.core.hedging.settings.LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr("app.core.hedging.settings.LLM_HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr("app.core.hedging.settings.LLM_HEDGE_MIN_DELAY_MS", 10)
+    tracker = LatencyTracker()
+    for _ in range(3):
+        tracker.observe("gpt-test:stream", 0.01)
+
+    gateway = LLMGateway()
+    client = SlowFirstChatClient(reply="fast answer", first_delay=1.0)
+    gateway.attach(client, model="gpt-test", hedge=True)
+    client.middleware[0].tracker = tracker  # HedgingChatMiddleware precedes the gateway
+    agent = client.create_agent(instructions="be brief")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    text = "".join([update.text async for update in agent.run_stream("hello")])
+
+    assert text == "fast answer"
+    assert loop.time() - started < 0.5
+    assert client.model_calls == 2
+    assert tracker.hedged == {"gpt-test:stream": 1} and tracker.hedge_wins == {"gpt-test:stream": 1}
+    assert gateway.governor("gpt-test").in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_nested_deadlines_only_tighten():
+    async with deadline_scope(0.5):
+        async with deadline_scope(10):
+            assert remaining() <= 0.5
+    assert remaining() is None
+    with pytest.raises(DeadlineExceeded):
+        async with deadline_scope(0.01, label="slow call"):
+            await asyncio.sleep(1)
+
+
+@pytest.mark.asyncio
+async def test_straggler_stage_cannot_consume_the_whole_run_budget():
+    graph = PipelineGraph("chain", (Stage("a", "x"), Stage("b", "x", ("a",)), Stage("c", "x", ("b",))))
+    budgets: dict[str, float] = {}
+
+    async def run_stage(stage, step, total, stage_input):
+        budgets[stage.name] = remaining()
+        await asyncio.sleep(5)  # straggler
+        return stage.name
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with pytest.raises(DeadlineExceeded, match="stage 'a'"):
+        async with deadline_scope(0.3):
+            await run_pipeline(graph, run_stage, "prompt")
+    assert budgets["a"] <= 0.11  # a third of the run budget
+    assert loop.time() - started < 0.3
+
+
+def test_hedged_attempts_do_not_share_mutable_request_state():
+    tool = lambda city: city  # noqa: E731
+    context = ChatContext(
+        chat_client=None, messages=[ChatMessage(role=Role.USER, text="hello")],
+        chat_options=ChatOptions(tools=[tool], metadata={"lane": "team"}),
+    )
+    trial = _trial_context(context)
+    trial.messages.append(ChatMessage(role=Role.ASSISTANT, text="tool call"))
+    trial.messages[0].contents.clear()
+    trial.chat_options.metadata["lane"] = "hedge"
+
+    assert len(context.messages) == 1 and context.messages[0].text == "hello"
+    assert context.chat_options.metadata == {"lane": "team"}
+    assert trial.chat_options.tools[0] is context.chat_options.tools[0]
+
+
+@pytest.mark.asyncio
+async def test_stage_deadline_degrades_the_stage_and_the_run_continues():
+    graph = PipelineGraph("chain", (Stage("a", "x"), Stage("b", "x", ("a",)), Stage("c", "x", ("b",))))
+
+    async def run_stage(stage, step, total, stage_input):
+        if stage.name == "b":
+            await asyncio.sleep(5)  # straggler
+        return f"{stage_input}>{stage.name}"
+
+    async with deadline_scope(0.6):
+        outputs = await run_pipeline(graph, run_stage, "prompt")
+    # b kept the last good draft and c ran on it.
+    assert outputs == {"a": "prompt>a", "b": "prompt>a", "c": "prompt>a>c"}
@@ -0,0 +1,98 @@
+"""Tests for format-selectable IaC generation and on-demand run artifacts."""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.agents.checkpoints import MemoryCheckpointStore
+from app.agents.landing_zone_team import LandingZoneTeam, parse_iac_formats
+from app.agents.team_runs import TeamRunQueue
+from app.api.endpoints import runs
+from app.obs.usage import model_calls
+from tests.conftest import FakeChatClient
+
+DRAFT = 'Design\n\nDiagram JSON\n```json\n{"services": [{"id": "web", "title": "Web"}]}\n```'
+
+
+class _Architect:
+    def __init__(self, agent_client) -> None:
+        self.agent_client = agent_client
+        self.chat_agent = None
+        self.calls = {"bicep": 0, "terraform": 0}
+
+    async def generate_bicep_code(self, *args, **kwargs):
+        self.calls["bicep"] += 1
+        await asyncio.sleep(0.05)
+        return {"bicep_code": "resource web 'Microsoft.Web/sites@2023-01-01' = {}"}
+
+    async def generate_terraform_code(self, *args, **kwargs):
+        self.calls["terraform"] += 1
+        await asyncio.sleep(0.05)
+        return {"terraform_code": 'resource "azurerm_linux_web_app" "web" {}'}
+
+
+class _AzureClients:
+    def __init__(self, architect) -> None:
+        self.architect = architect
+
+    def get_azure_architect_agent(self):
+        return self.architect
+
+
+@pytest.fixture
+def env(monkeypatch):
+    store = MemoryCheckpointStore()
+    architect = _Architect(FakeChatClient(reply=DRAFT))
+    team = LandingZoneTeam(architect, checkpoints=store)
+    queue = TeamRunQueue(store=store)
+    monkeypatch.setattr(runs, "team_runs", queue)
+    monkeypatch.setattr(runs, "get_landing_zone_team", lambda agent_source: team)
+    app = FastAPI()
+    app.include_router(runs.router)
+    app.state.azure_clients = _AzureClients(architect)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    return queue, team, architect, client
+
+
+def test_parse_iac_formats():
+    assert parse_iac_formats("both") == ("bicep", "terraform")
+    assert parse_iac_formats("none") == () and parse_iac_formats([]) == () and parse_iac_formats(None) == ()
+    assert parse_iac_formats("Terraform, bicep") == ("bicep", "terraform")
+    with pytest.raises(ValueError):
+        parse_iac_formats(["arm"])
+
+
+@pytest.mark.asyncio
+async def test_only_requested_formats_are_generated_and_others_follow_on_first_access(env):
+    queue, team, architect, client = env
+    async with client:
+        run_id = (await client.post("/runs", json={"message": "Design", "iac_formats": ["bicep"]})).json()["run_id"]
+        run = await queue.wait(run_id)
+        assert run.status == "completed" and run.iac_formats == ["bicep"]
+        assert run.result["iac"]["bicep"]["bicep_code"] and run.result["iac"]["terraform"] is None
+        assert architect.calls == {"bicep": 1, "terraform": 0}
+        calls = run.result["model_calls"]
+        assert calls["iac"] == 1 and calls["total"] == calls["stages"] + 1 and calls["all_eager"] == calls["stages"] + 2
+
+        bicep = (await client.get(f"/runs/{run_id}/artifacts/bicep")).json()
+        assert bicep["generated"] is False and bicep["artifact"] == run.result["iac"]["bicep"]
+        first, second = await asyncio.gather(
+            client.get(f"/runs/{run_id}/artifacts/terraform"), client.get(f"/runs/{run_id}/artifacts/terraform")
+        )
+        assert first.json()["artifact"]["terraform_code"] and second.json() == first.json()
+        again = (await client.get(f"/runs/{run_id}/artifacts/terraform")).json()
+        assert again["generated"] is False and architect.calls == {"bicep": 1, "terraform": 1}
+        assert model_calls.run(run_id)["iac_on_demand"] == 1
+
+        assert (await client.get(f"/runs/{run_id}/artifacts/arm")).status_code == 404
+        assert (await client.get("/runs/lz-missing/artifacts/bicep")).status_code == 404
+        assert (await client.post("/runs", json={"message": "Design", "iac_formats": "arm"})).status_code == 400
+
+        # Nothing eager: no IaC calls during the run.
+        run_id = (await client.post("/runs", json={"message": "Design", "iac_formats": "none"})).json()["run_id"]
+        run = await queue.wait(run_id)
+        assert run.result["iac"] == {"bicep": None, "terraform": None} and architect.calls["bicep"] == 1
+        assert run.result["model_calls"]["total"] == run.result["model_calls"]["stages"]
+    await queue.stop()
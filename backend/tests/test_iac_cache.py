@@ -0,0 +1,128 @@
+"""Tests for the content-addressed IaC result cache."""
+
+import asyncio
+
+import pytest
+
+from app.agents.azure_architect_agent import AzureArchitectAgent
+from app.iac_generators import cache as cache_module
+from app.iac_generators.bicep import generate_bicep_code
+from app.iac_generators.cache import IaCResultCache, diagram_fingerprint
+
+
+DIAGRAM = {
+    "nodes": [
+        {"id": "web", "position": {"x": 10, "y": 20}, "data": {"title": "App Service"}},
+        {"id": "db", "position": {"x": 200, "y": 20}, "data": {"title": "SQL Database"}, "selected": True},
+    ],
+    "edges": [{"id": "e1", "source": "web", "target": "db"}],
+    "viewport": {"x": 0, "y": 0, "zoom": 1},
+}
+
+
+def test_fingerprint_ignores_ordering_and_canvas_state():
+    moved = {
+        "nodes": [
+            {"id": "db", "position": {"x": 5, "y": 5}, "data": {"title": "SQL Database"}},
+            {"id": "web", "position": {"x": 99, "y": 99}, "data": {"title": "App Service"}},
+        ],
+        "edges": [{"target": "db", "source": "web", "id": "e1"}],
+        "viewport": {"x": 300, "y": -40, "zoom": 0.5},
+    }
+    assert diagram_fingerprint(DIAGRAM, "bicep") == diagram_fingerprint(moved, "bicep")
+
+
+def test_fingerprint_separates_format_flags_and_model():
+    base = diagram_fingerprint(DIAGRAM, "bicep", {"region": "westeurope"}, "gpt-4o")
+    assert base != diagram_fingerprint(DIAGRAM, "terraform", {"region": "westeurope"}, "gpt-4o")
+    assert base != diagram_fingerprint(DIAGRAM, "bicep", {"region": "northeurope"}, "gpt-4o")
+    assert base != diagram_fingerprint(DIAGRAM, "bicep", {"region": "westeurope"}, "gpt-4o-mini")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_generation():
+    cache = IaCResultCache(max_entries=4)
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"bicep_code": "resource x", "parameters": {}}
+
+    results = await asyncio.gather(*[cache.get_or_generate("k", factory) for _ in range(5)])
+    assert calls == 1
+    assert all(r["bicep_code"] == "resource x" for r in results)
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 4
+
+    await cache.get_or_generate("k", factory)
+    assert calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_generations_are_not_cached():
+    cache = IaCResultCache(max_entries=4)
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        return {"bicep_code": "", "parameters": {"error": "boom"}}
+
+    for _ in range(2):
+        await cache.get_or_generate("k", factory, cacheable=lambda r: bool(r.get("bicep_code")))
+    assert calls == 2
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_disk_tier(tmp_path):
+    cache = IaCResultCache(max_entries=2, disk_dir=str(tmp_path))
+    for key in ("a", "b", "c"):
+        await cache.put(key, {"bicep_code": key})
+    assert cache.stats()["evictions"] == 1
+
+    # "a" fell out of memory but is still served from disk
+    assert await cache.get("a") == {"bicep_code": "a"}
+    assert cache.stats()["disk_hits"] == 1
+
+    fresh = IaCResultCache(max_entries=2, disk_dir=str(tmp_path))
+    assert await fresh.get("c") == {"bicep_code": "c"}
+
+
+@pytest.mark.asyncio
+async def test_cached_results_are_isolated_from_caller_mutation():
+    cache = IaCResultCache()
+
+    async def factory():
+        return {"bicep_code": "x", "parameters": {}}
+
+    first = await cache.get_or_generate("k", factory)
+    first["parameters"]["mcp_enhanced"] = True
+    second = await cache.get_or_generate("k", factory)
+    assert second["parameters"] == {}
+
+
+@pytest.mark.asyncio
+async def test_bicep_generation_is_cached_once(monkeypatch):
+    cache = IaCResultCache()
+    monkeypatch.setattr(cache_module, "iac_cache", cache)
+    agent = AzureArchitectAgent(agent_client=None)
+    agent.chat_agent = object()
+    calls = []
+
+    async def generate(diagram, region):
+        calls.append(region)
+        return {"bicep_code": "resource web", "parameters": {}}
+
+    monkeypatch.setattr(agent, "_generate_bicep_via_mcp_uncached", generate)
+    for _ in range(2):
+        result = await generate_bicep_code(agent, DIAGRAM)
+        assert result["bicep_code"] == "resource web" and result["parameters"]["mcp_enhanced"]
+
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["size"], stats["misses"], stats["hits"]) == (1, 1, 1)
@@ -0,0 +1,143 @@
+"""Tests for the deterministic Bicep/Terraform-to-diagram parser."""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from app.agents.landing_zone_team import LandingZoneTeam
+from app.iac_generators.diagram import diagram_from_iac, parse_bicep, parse_terraform
+from app.obs.usage import model_calls
+from tests.conftest import FakeChatClient
+
+CORPUS = Path(__file__).parent / "iac_corpus"
+
+
+def _load(name: str) -> str:
+    return (CORPUS / name).read_text(encoding="utf-8")
+
+
+def _edges(diagram) -> set:
+    return {(edge["from"], edge["to"]) for edge in diagram["connections"]}
+
+
+def _groups(diagram) -> dict:
+    return {group["id"]: group for group in diagram["groups"]}
+
+
+def _services(diagram) -> dict:
+    return {service["id"]: service for service in diagram["services"]}
+
+
+def test_bicep_web_app_template():
+    diagram = parse_bicep(_load("web_app.bicep"))
+    services, groups = _services(diagram), _groups(diagram)
+
+    assert set(services) == {"law", "appInsights", "identity", "plan", "web", "vault", "sql", "db", "sqlEndpoint"}
+    assert services["web"]["title"] == "App Services" and services["vault"]["category"] == "security"
+    # Nested subnets are groups inside the virtual network; referencing resources sit in them.
+    assert groups["vnet"]["type"] == "virtualNetwork" and groups["vnet"]["members"] == ["appSubnet", "dataSubnet"]
+    assert groups["appSubnet"]["parentId"] == "vnet" and services["web"]["groupIds"] == ["appSubnet"]
+    assert services["sqlEndpoint"]["groupIds"] == ["dataSubnet"]
+    # No resource group is declared, so one holds everything else.
+    assert groups["resource-group"]["type"] == "resourceGroup" and services["law"]["groupIds"] == ["resource-group"]
+    assert {("web", "plan"), ("web", "appInsights"), ("web", "vault"), ("appInsights", "law"),
+            ("db", "sql"), ("sqlEndpoint", "sql")} <= _edges(diagram)
+    # Site config, the role assignment and diagnostic settings fold into the resource they belong to.
+    assert "webLogs" not in services and "vaultReader" not in services and "webDiagnostics" not in services
+    assert {("web", "law"), ("vault", "identity")} <= _edges(diagram)
+
+
+def test_bicep_modules_scopes_and_depends_on():
+    diagram = parse_bicep(_load("hub_spoke.bicep"))
+    services, groups = _services(diagram), _groups(diagram)
+
+    assert services["hub"]["title"] == "hub-network" and services["hub"]["category"] == "module"
+    assert groups["hubRg"]["members"] == ["hub", "firewall"] and services["spoke"]["groupIds"] == ["spokeRg"]
+    assert _edges(diagram) == {("firewall", "hub"), ("spoke", "hub"), ("spoke", "firewall")}
+
+
+def test_bicep_resource_loops_are_referenced_by_index():
+    diagram = parse_bicep(_load("storage_loop.bicep"))
+    services = _services(diagram)
+
+    assert services["sa"]["title"] == "Storage Accounts"
+    assert {("ingest", "plan"), ("ingest", "sa"), ("ingest", "law")} == _edges(diagram)
+    assert "ingestDiagnostics" not in services
+
+
+def test_terraform_aks_configuration():
+    diagram = parse_terraform(_load("aks.tf"))
+    services, groups = _services(diagram), _groups(diagram)
+
+    aks, rg = "azurerm_kubernetes_cluster.main", "azurerm_resource_group.main"
+    assert services[aks]["title"] == "Kubernetes Services" and services[aks]["groupIds"] == ["azurerm_subnet.nodes"]
+    assert groups["azurerm_subnet.nodes"]["parentId"] == "azurerm_virtual_network.main"
+    assert groups["azurerm_virtual_network.main"]["parentId"] == rg
+    assert services["azurerm_key_vault.main"]["groupIds"] == [rg]
+    assert "azurerm_role_assignment.acr_pull" not in services
+    assert {(aks, "azurerm_log_analytics_workspace.main"), ("azurerm_container_registry.main", aks),
+            ("azurerm_key_vault.main", aks)} <= _edges(diagram)
+
+
+def test_terraform_function_app_configuration():
+    diagram = parse_terraform(_load("functions.tf"))
+    services = _services(diagram)
+    app = "azurerm_linux_function_app.orders"
+
+    assert services[app]["title"] == "Function Apps"
+    # No catalog entry: the type still shows up under a readable title.
+    assert services["azurerm_nat_gateway.egress"]["title"] == "Nat Gateway"
+    assert "azurerm_storage_container.orders" not in services and "azurerm_servicebus_queue.orders" not in services
+    assert {target for source, target in _edges(diagram) if source == app} == {
+        "azurerm_service_plan.app", "azurerm_storage_account.app",
+        "azurerm_application_insights.app", "azurerm_servicebus_namespace.app",
+    }
+
+
+def test_terraform_heredocs_are_not_hcl():
+    diagram = parse_terraform(_load("vm_cloud_init.tf"))
+    services, vm = _services(diagram), "azurerm_linux_virtual_machine.jumpbox"
+
+    # The apostrophe inside the cloud-init heredoc does not open a string.
+    assert set(services) == {"azurerm_network_interface.vm", vm, "azurerm_key_vault.ops"}
+    assert (vm, "azurerm_network_interface.vm") in _edges(diagram)
+    assert services["azurerm_network_interface.vm"]["groupIds"] == ["azurerm_subnet.vm"]
+
+
+def test_corpus_parses_in_milliseconds():
+    templates = [(path.suffix, path.read_text(encoding="utf-8")) for path in sorted(CORPUS.iterdir())]
+    started = time.perf_counter()
+    for suffix, text in templates:
+        assert diagram_from_iac(text if suffix == ".bicep" else None, text if suffix == ".tf" else None)
+    assert (time.perf_counter() - started) * 1000 / len(templates) < 50
+
+
+def test_unparseable_templates_return_none():
+    assert diagram_from_iac("param location string", None) is None
+    assert diagram_from_iac("resource web 'Microsoft.Web/sites@2022-09-01' = {", None) is None
+    # Falls through to Terraform when the Bicep yields nothing.
+    assert diagram_from_iac("// empty", 'resource "azurerm_redis_cache" "cache" {}')["services"][0]["title"] == "Cache Redis"
+
+
+class _Cartographer:
+    def __init__(self) -> None:
+        self.prompts = []
+
+    async def run(self, prompt: str):
+        self.prompts.append(prompt)
+        return type("Response", (), {"text": '{"services": [{"id": "web", "title": "Web"}]}'})()
+
+
+@pytest.mark.asyncio
+async def test_team_uses_the_model_only_when_parsing_fails():
+    cartographer = _Cartographer()
+    team = LandingZoneTeam(type("Architect", (), {"agent_client": FakeChatClient(), "chat_agent": cartographer})())
+
+    parsed, raw = await team._diagram_from_iac("", {"bicep": {"bicep_code": _load("web_app.bicep")}}, "lz-parsed")
+    assert parsed["services"] and '"connections"' in raw
+    assert cartographer.prompts == [] and model_calls.run("lz-parsed")["iac_diagram"] == 0
+
+    derived, _ = await team._diagram_from_iac("", {"bicep": {"bicep_code": "param location string"}}, "lz-model")
+    assert derived == {"services": [{"id": "web", "title": "Web"}]}
+    assert len(cartographer.prompts) == 1 and model_calls.run("lz-model")["iac_diagram"] == 1
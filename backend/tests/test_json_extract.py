@@ -0,0 +1,66 @@
+"""Tests for the shared single-pass JSON extractor."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.agents.azure_architect_agent import AzureArchitectAgent
+from app.api.endpoints.diagram_analysis import extract_json_from_text, find_all_balanced_jsons
+from app.core.json_extract import extract_json, find_json_spans, loads_lenient
+
+
+def test_braces_inside_strings_do_not_split_objects():
+    text = 'Result: {"code": "resource x { name: \'}\' }", "n": {"k": 1}} trailing {'
+    spans = find_json_spans(text)
+    assert [text[s:e] for s, e in spans][-1].startswith('{"code"')
+    assert extract_json(text) == {"code": "resource x { name: '}' }", "n": {"k": 1}}
+
+
+def test_fenced_blocks_win_over_prose_objects():
+    text = 'Example {"a": 1} then\n```json\n{"services": [], "b": 2}\n```\n'
+    assert extract_json(text) == {"services": [], "b": 2}
+
+
+def test_repairs_trailing_commas_and_single_quotes():
+    assert loads_lenient('{"a": [1, 2,], "b": "x, ]",}') == {"a": [1, 2], "b": "x, ]"}
+    assert loads_lenient("{'title': 'Key Vault', 'note': \"it's fine\"}") == {"title": "Key Vault", "note": "it's fine"}
+
+
+def test_stray_quote_in_prose_falls_back_to_plain_brace_matching():
+    assert extract_json('Use {placeholder "values} like {"k": 1}') == {"k": 1}
+
+
+def test_predicate_selects_among_candidates():
+    text = '{"bicep_code": "param x string", "parameters": {}} and {"other": {"deep": 1}, "pad": "xxxxxxxxxxxxxxxxxxxx"}'
+    parsed = extract_json(text, lambda v: isinstance(v, dict) and "bicep_code" in v)
+    assert parsed["bicep_code"] == "param x string"
+
+
+def test_diagram_analysis_helpers_keep_their_contract():
+    assert find_all_balanced_jsons('x {"a": {"b": 1}} y') == ['{"b": 1}', '{"a": {"b": 1}}']
+    assert extract_json_from_text("```json\n{'services': [],}\n```") == {"services": []}
+    assert extract_json_from_text("no json here") is None
+
+
+def test_scan_is_linear_on_pathological_input():
+    text = "{" * 200_000 + '{"ok": true}'
+    started = time.perf_counter()
+    assert extract_json(text) == {"ok": True}
+    assert time.perf_counter() - started < 2.0
+
+
+@pytest.mark.asyncio
+async def test_agent_falls_back_to_raw_text_instead_of_a_nested_object():
+    reply = '{"terraform_code": "resource x {}", "parameters": {"provider": "azurerm"} oops}'
+
+    class _ChatAgent:
+        async def run(self, prompt, **kwargs):
+            return type("Response", (), {"result": reply})()
+
+    agent = AzureArchitectAgent(agent_client=None)
+    agent.chat_agent = _ChatAgent()
+    agent._resolve_docs_tool = lambda: asyncio.sleep(0)
+
+    result = await agent.generate_terraform_code("a web app")
+    assert result["terraform_code"] == reply
@@ -0,0 +1,139 @@
+"""Tests for the outbound model gateway."""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+from agent_framework import use_chat_middleware
+
+from app.core.llm_gateway import GatewayChatMiddleware, LLMGateway, ModelGovernor, Priority, retry_after_seconds
+from tests.conftest import FakeChatClient
+
+
+@use_chat_middleware
+class GovernedChatClient(FakeChatClient):
+    """FakeChatClient with agent_framework chat middleware support, like the real clients."""
+
+
+def _rate_limit_error(headers: dict) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://example.invalid/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority_lane():
+    governor = ModelGovernor("m", requests_per_minute=0, burst=1, initial_concurrency=1, max_concurrency=1)
+    await governor.acquire()
+    order: list[str] = []
+
+    async def waiter(name: str, lane: Priority) -> None:
+        await governor.acquire(lane)
+        order.append(name)
+        governor.release()
+
+    tasks = [
+        asyncio.create_task(waiter("iac", Priority.BACKGROUND)),
+        asyncio.create_task(waiter("team", Priority.TEAM)),
+        asyncio.create_task(waiter("chat", Priority.INTERACTIVE)),
+    ]
+    await asyncio.sleep(0)
+    assert governor.stats()["queued"] == {"interactive": 1, "team": 1, "background": 1}
+
+    governor.release()
+    await asyncio.gather(*tasks)
+    assert order == ["chat", "team", "iac"]
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_spaces_requests_beyond_burst():
+    governor = ModelGovernor("m", requests_per_minute=600, burst=1, initial_concurrency=4, max_concurrency=4)
+    await governor.acquire()
+    governor.release()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await governor.acquire()  # bucket is empty: waits ~0.1s for the next token
+    assert loop.time() - started >= 0.05
+    governor.release()
+
+
+def test_throttle_halves_limit_and_success_grows_it_back():
+    governor = ModelGovernor("m", requests_per_minute=0, burst=1, initial_concurrency=8, max_concurrency=8)
+    governor.on_throttle(retry_after=0.5)
+    assert int(governor.limit) == 4
+    assert governor.stats()["paused_for_ms"] > 0
+    for _ in range(20):
+        governor.on_success()
+    assert 4 < governor.limit <= 8
+    assert retry_after_seconds(_rate_limit_error({"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(_rate_limit_error({"retry-after": "3"})) == 3.0
+
+
+@pytest.mark.asyncio
+async def test_call_retries_rate_limited_requests(monkeypatch):
+    monkeypatch.setattr("app.core.llm_gateway.settings.LLM_GATEWAY_BACKOFF_SECONDS", 0.01)
+    gateway = LLMGateway()
+    attempts = 0
+
+    async def flaky() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise _rate_limit_error({"retry-after-ms": "10"})
+        return "done"
+
+    assert await gateway.call("gpt-test", flaky) == "done"
+    stats = gateway.stats()["models"]["gpt-test"]
+    assert attempts == 2
+    assert stats["throttled"] == 1
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_holds_slot_until_stream_is_drained():
+    gateway = LLMGateway()
+    client = gateway.attach(GovernedChatClient(reply="hi"), model="gpt-test")
+    gateway.attach(client, model="gpt-test")  # idempotent
+    agent = client.create_agent(instructions="be brief")
+
+    in_flight_during_stream = []
+    async for _ in agent.run_stream("hello"):
+        in_flight_during_stream.append(gateway.governor("gpt-test").in_flight)
+    response = await agent.run("hello again")
+
+    stats = gateway.stats()["models"]["gpt-test"]
+    assert in_flight_during_stream and set(in_flight_during_stream) == {1}
+    assert response.text == "hi"
+    assert stats["acquired"] == 2
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_gives_its_slot_back_without_finalization():
+    gateway = LLMGateway()
+    governor = gateway.governor("gpt-test")
+
+    async def updates():
+        for chunk in ("a", "b", "c"):
+            yield chunk
+
+    async def next_handler(context):
+        context.result = updates()
+
+    async def open_stream():
+        context = SimpleNamespace(is_streaming=True, result=None)
+        await GatewayChatMiddleware(gateway, "gpt-test").process(context, next_handler)
+        return context.result
+
+    stream = await open_stream()
+    assert governor.in_flight == 0   # nothing is taken until the first pull
+    assert await stream.__anext__() == "a" and governor.in_flight == 1
+    await stream.aclose()
+    assert governor.in_flight == 0
+
+    stream = await open_stream()
+    await stream.__anext__()
+    del stream   # dropped mid-stream: released right away, not when the loop finalizes a generator
+    assert governor.in_flight == 0 and governor.stats()["failures"] == 0
@@ -0,0 +1,71 @@
+"""Tests for the shared async model client."""
+
+import json
+import pathlib
+import re
+
+import httpx
+import pytest
+
+from app.api.endpoints import chat_simple, iac_openai_simple
+from app.core.model_client import build_model_client
+
+APP_DIR = pathlib.Path(__file__).resolve().parent.parent / "app"
+
+
+def _completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-test",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5},
+    }
+
+
+@pytest.fixture
+def model_client(monkeypatch):
+    """Shared client on a mock async transport; any sync httpx request fails the test."""
+
+    def _sync_send(*args, **kwargs):
+        raise AssertionError("synchronous HTTP call made on the event loop")
+
+    monkeypatch.setattr(httpx.Client, "send", _sync_send)
+    requests: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        if "IaC generator" in body["messages"][0]["content"]:
+            reply = json.dumps({"bicep_code": "param location string", "parameters": {}})
+        else:
+            reply = "Use Azure Front Door."
+        return httpx.Response(200, json=_completion(reply))
+
+    client = build_model_client(api_key="test-key", transport=httpx.MockTransport(handler))
+    client.requests = requests
+    return client
+
+
+@pytest.mark.asyncio
+async def test_simple_endpoints_share_the_async_client(model_client):
+    chat = await chat_simple.chat_completion(chat_simple.ChatRequest(message="edge?"), openai_client=model_client)
+    iac = await iac_openai_simple.generate_iac_simple(
+        iac_openai_simple.IaCGenerateRequest(diagram_data={"services": []}), client=model_client
+    )
+
+    assert chat.message.content == "Use Azure Front Door."
+    assert iac.content == "param location string"
+    assert len(model_client.requests) == 2
+    await model_client.close()
+
+
+def test_no_sync_openai_client_in_app_code():
+    sync_client = re.compile(r"\bfrom openai import [^\n]*\bOpenAI\b|\bopenai\.OpenAI\b|(?<!Async)OpenAI\(")
+    offenders = [
+        str(path.relative_to(APP_DIR))
+        for path in APP_DIR.rglob("*.py")
+        if sync_client.search(path.read_text(encoding="utf-8"))
+    ]
+    assert offenders == []
@@ -0,0 +1,100 @@
+"""Tests for the LandingZoneTeam dependency-graph scheduler."""
+
+import asyncio
+import json
+
+import pytest
+
+from app.agents.landing_zone_team import LandingZoneTeamRegistry
+from app.agents.pipeline import (
+    MERGE_SEPARATOR,
+    PARALLEL_PIPELINE,
+    REVIEW_DAG_PIPELINE,
+    SEQUENTIAL_PIPELINE,
+    PipelineGraph,
+    Stage,
+    run_pipeline,
+)
+from app.obs.tracing import tracer
+from tests.conftest import FakeChatClient
+
+
+def test_presets_keep_their_step_order():
+    assert [s.name for s in SEQUENTIAL_PIPELINE.ordered()] == [
+        "writer", "security", "identity", "naming", "reliability", "cost", "compliance", "final",
+    ]
+    assert [s.name for s in PARALLEL_PIPELINE.ordered()][0] == "writer"
+    assert PARALLEL_PIPELINE.final_stage.name == "final"
+    assert REVIEW_DAG_PIPELINE.ordered()[1].name == "security"
+
+
+def test_cycles_and_unknown_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        PipelineGraph("bad", (Stage("a", "writer", ("b",)), Stage("b", "writer", ("a",)))).ordered()
+    with pytest.raises(ValueError):
+        PipelineGraph("bad", (Stage("a", "writer", ("missing",)),)).ordered()
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_concurrently_and_merge_in_order():
+    graph = PipelineGraph("fan", (
+        Stage("draft", "writer"),
+        Stage("a", "x", ("draft",)),
+        Stage("b", "x", ("draft",)),
+        Stage("merge", "final", ("a", "b")),
+    ))
+    started: list[tuple[str, int]] = []
+    finished: list[str] = []
+
+    async def run_stage(stage, step, total, stage_input):
+        started.append((stage.name, step))
+        if stage.name == "a":
+            await asyncio.sleep(0.05)  # finishes after "b" but still merges first
+        elif stage.name == "b":
+            await asyncio.sleep(0.01)
+        finished.append(stage.name)
+        return stage_input if stage.name == "merge" else stage.name
+
+    outputs = await run_pipeline(graph, run_stage, "prompt")
+
+    assert started == [("draft", 1), ("a", 2), ("b", 3), ("merge", 4)]
+    assert outputs["merge"] == f"a{MERGE_SEPARATOR}b"
+    assert finished.index("b") < finished.index("a")  # "b" did not wait for "a"
+
+
+@pytest.mark.asyncio
+async def test_failed_stage_cancels_siblings():
+    graph = PipelineGraph("fail", (Stage("a", "x"), Stage("b", "x"), Stage("c", "x", ("a", "b"))))
+    cancelled = asyncio.Event()
+
+    async def run_stage(stage, step, total, stage_input):
+        if stage.name == "a":
+            raise RuntimeError("boom")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return stage.name
+
+    with pytest.raises(RuntimeError):
+        await run_pipeline(graph, run_stage, "prompt")
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_dag_preset_traces_every_stage_with_stable_progress():
+    team = LandingZoneTeamRegistry().get(FakeChatClient(reply="review notes", delay=0.01))
+    run_id = tracer.new_run()
+    queue = tracer.attach(run_id)
+
+    final_text, _, _, _, _ = await team.run_pipeline_traced(REVIEW_DAG_PIPELINE, "design", run_id=run_id)
+
+    starts = []
+    while not queue.empty():
+        event = json.loads(queue.get_nowait())
+        if event["phase"] == "start":
+            starts.append(event["progress"]["current"])
+    tracer.detach(run_id, queue)
+    assert final_text == "review notes"
+    assert starts == list(range(1, len(REVIEW_DAG_PIPELINE.stages) + 1))
@@ -0,0 +1,121 @@
+"""Tests for the resumable run event stream."""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.endpoints import runs
+from app.core.cancellation import RunCancellations
+from app.obs.tracing import TraceEvent, Tracer
+
+
+def _event(run_id: str, phase: str, delta: str | None = None) -> TraceEvent:
+    return TraceEvent(
+        run_id=run_id, step_id="1", agent="writer", phase=phase, ts=time.time(),
+        meta={}, progress={}, telemetry={}, message_delta=delta,
+    )
+
+
+def _frames(body: str) -> list[dict]:
+    frames = []
+    for block in body.strip().split("\n\n"):
+        fields: dict = {}
+        for line in block.split("\n"):
+            name, _, value = line.partition(": ")
+            fields[name] = value
+        frames.append(fields)
+    return frames
+
+
+@pytest.fixture
+def run_tracer(monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(runs, "tracer", tracer)
+    return tracer
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(runs.router)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_unknown_run_is_404(run_tracer, client):
+    async with client:
+        response = await client.get("/runs/lz-missing/events")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_resume_from_last_event_id_then_end(run_tracer, client):
+    run_id = run_tracer.new_run()
+    await run_tracer.emit(_event(run_id, "start"))
+    for text in ("Hub ", "and ", "spokes"):
+        await run_tracer.emit(_event(run_id, "delta", text))
+    await run_tracer.emit(_event(run_id, "end"))
+    await run_tracer.finish(run_id)
+
+    async with client:
+        full = _frames((await client.get(f"/runs/{run_id}/events")).text)
+        resumed = _frames((await client.get(f"/runs/{run_id}/events", headers={"Last-Event-ID": "2"})).text)
+
+    assert [f["id"] for f in full if "id" in f] == ["1", "2", "3", "4", "5"]
+    assert [f["id"] for f in resumed if "id" in f] == ["3", "4", "5"]
+    assert json.loads(resumed[1]["data"])["message_delta"] == "and "
+    assert resumed[-1]["event"] == "end"
+    assert json.loads(resumed[-1]["data"]) == {"run_id": run_id, "last_event_id": 5}
+
+
+@pytest.mark.asyncio
+async def test_idle_stream_sends_heartbeats(run_tracer, monkeypatch):
+    monkeypatch.setattr(runs.settings, "SSE_HEARTBEAT_SECONDS", 0.01)
+    run_id = run_tracer.new_run()
+    run_tracer.ensure_run(run_id)
+    stream = runs._event_source(run_id, None)
+
+    assert (await anext(stream)).startswith("retry:")
+    assert await anext(stream) == ": keep-alive\n\n"
+    await run_tracer.emit(_event(run_id, "start"))
+    assert (await anext(stream)).startswith("id: 1\n")
+    await run_tracer.finish(run_id)
+    assert (await anext(stream)).startswith("event: end\n")
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+
+
+@pytest.mark.asyncio
+async def test_resume_inside_a_coalesced_delta_skips_seen_text():
+    tracer = Tracer(buffer_size=2, overflow="coalesce")
+    run_id = tracer.new_run()
+    await tracer.emit(_event(run_id, "start"))
+    for text in ("a", "b", "c"):
+        await tracer.emit(_event(run_id, "delta", text))   # seq 2..4, folded into one buffered entry
+
+    queue = tracer.attach(run_id, after=3, with_ids=True)
+    seq, data = await asyncio.wait_for(queue.get(), 1)
+    assert seq == 4 and json.loads(data)["message_delta"] == "c"
+
+
+@pytest.mark.asyncio
+async def test_cancel_endpoint_cancels_a_running_run(run_tracer, client, monkeypatch):
+    registry = RunCancellations()
+    monkeypatch.setattr(runs, "run_cancellations", registry)
+    run_id = run_tracer.new_run()
+    run_tracer.ensure_run(run_id)
+    token = registry.register(run_id, owner="client-1")
+
+    async with client:
+        assert (await client.post("/runs/lz-missing/cancel")).status_code == 404
+        response = await client.post(f"/runs/{run_id}/cancel")
+        await run_tracer.finish(run_id)
+        finished = await client.post(f"/runs/{run_id}/cancel")
+
+    assert response.status_code == 202 and response.json()["local"] is True
+    assert token.reason == "cancelled via API"
+    assert finished.status_code == 409
@@ -0,0 +1,47 @@
+"""Tests for the shared LandingZoneTeam registry."""
+
+import asyncio
+
+import pytest
+
+from app.agents import landing_zone_team
+from app.agents.landing_zone_team import LandingZoneTeamRegistry
+
+
+def test_team_is_built_once_per_client(fake_chat_client):
+    registry = LandingZoneTeamRegistry()
+    first = registry.get(fake_chat_client)
+    created = fake_chat_client.agents_created
+
+    assert registry.get(fake_chat_client) is first
+    assert fake_chat_client.agents_created == created
+    assert registry.stats()["builds"] == 1
+    assert registry.stats()["reuses"] == 1
+
+
+def test_instruction_edits_invalidate_registry(fake_chat_client, monkeypatch):
+    registry = LandingZoneTeamRegistry()
+    first = registry.get(fake_chat_client)
+
+    monkeypatch.setattr(landing_zone_team, "TEAM_INSTRUCTIONS_VERSION", "test-bump")
+    second = registry.get(fake_chat_client)
+
+    assert second is not first
+    assert registry.stats()["teams"] == 1
+
+
+@pytest.mark.asyncio
+async def test_shared_team_serves_concurrent_workflow_runs(fake_chat_client):
+    team = LandingZoneTeamRegistry().get(fake_chat_client)
+    results = await asyncio.gather(*[team.run_sequential("design a landing zone") for _ in range(3)])
+    assert all(result for result in results)
+
+
+def test_teams_are_not_shared_across_architect_agents(fake_chat_client):
+    registry = LandingZoneTeamRegistry()
+    first = type("Architect", (), {"agent_client": fake_chat_client})()
+    second = type("Architect", (), {"agent_client": fake_chat_client})()
+
+    bare, one, two = registry.get(fake_chat_client), registry.get(first), registry.get(second)
+    assert bare.architect_agent is None and one.architect_agent is first and two.architect_agent is second
+    assert registry.get(first) is one and bare.architect_agent is None
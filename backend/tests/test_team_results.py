@@ -0,0 +1,109 @@
+"""Tests for progressive delivery of team results and artifacts."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from app.agents.checkpoints import MemoryCheckpointStore
+from app.agents.landing_zone_team import LandingZoneTeam
+from app.agents.team_runs import TeamRunQueue
+from app.websockets import handlers
+from app.websockets.handlers import ConnectionManager
+from tests.conftest import FakeChatClient
+
+DRAFT = 'Design\n\nDiagram JSON\n```json\n{"services": [{"id": "web", "title": "Web"}]}\n```'
+
+
+class _Socket:
+    headers: dict = {}
+
+    def __init__(self) -> None:
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.frames: list[dict] = []
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        pass
+
+    async def receive_json(self) -> dict:
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_text(self, text: str) -> None:
+        self.frames.append(json.loads(text))
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+class _SlowArchitect:
+    """Bicep is quick, Terraform takes a while and the IaC diagram comes last."""
+
+    def __init__(self, agent_client) -> None:
+        self.agent_client = agent_client
+        self.chat_agent = None
+
+    async def generate_bicep_code(self, *args, **kwargs):
+        await asyncio.sleep(0.05)
+        return {"bicep_code": "resource web 'Microsoft.Web/sites@2023-01-01' = {}"}
+
+    async def generate_terraform_code(self, *args, **kwargs):
+        await asyncio.sleep(0.3)
+        return {"terraform_code": 'resource "azurerm_linux_web_app" "web" {}'}
+
+
+class _AzureClients:
+    def get_azure_architect_agent(self):
+        return type("Agent", (), {"agent_client": None})()
+
+
+@pytest.mark.asyncio
+async def test_design_arrives_before_iac_and_artifacts_arrive_as_they_finish(monkeypatch):
+    store = MemoryCheckpointStore()
+    team = LandingZoneTeam(_SlowArchitect(FakeChatClient(reply=DRAFT)), checkpoints=store)
+    monkeypatch.setattr(handlers, "manager", ConnectionManager())
+    monkeypatch.setattr(handlers, "team_runs", TeamRunQueue(store=store))
+    monkeypatch.setattr(handlers, "get_landing_zone_team", lambda agent_client: team)
+
+    socket = _Socket()
+    connection = asyncio.create_task(handlers.handle_chat_websocket(socket, "c1", _AzureClients()))
+    await socket.inbox.put({"type": "team_stream_chat", "message": "Design a landing zone", "iac_formats": "both"})
+    while not any(frame["type"] == "run_completed" for frame in socket.frames):
+        await asyncio.sleep(0.01)
+    await socket.inbox.put(None)
+    await connection
+
+    results = [frame for frame in socket.frames if frame["type"] in ("team_final", "team_artifact", "run_completed")]
+    assert [frame.get("kind") for frame in results] == [None, "bicep", "terraform", "iac_diagram", None]
+    final, bicep, terraform, derived, completed = results
+    assert final["type"] == "team_final" and final["diagram"] == {"services": [{"id": "web", "title": "Web"}]}
+    assert final["iac"] is None and final["pending"] == ["bicep", "terraform", "iac_diagram"]
+    assert bicep["artifact"]["bicep_code"] and terraform["artifact"]["terraform_code"]
+    assert [(service["id"], service["title"]) for service in derived["diagram"]["services"]] == [("web", "App Services")]
+
+    # The design did not wait for the slowest artifact.
+    assert terraform["elapsed_ms"] - final["elapsed_ms"] >= 250
+    timings = completed["timings"]
+    assert timings["first_result_ms"] == final["elapsed_ms"] and timings["complete_ms"] == derived["elapsed_ms"]
+    assert set(timings["pieces"]) == {"final", "bicep", "terraform", "iac_diagram"}
+
+
+def test_pieces_the_forwarder_missed_are_resent_from_the_result():
+    result = {
+        "message": "Design", "diagram": {"services": []}, "diagram_raw": "{}",
+        "iac": {"bicep": {"bicep_code": "b"}, "terraform": {"terraform_code": "t"}},
+        "timings": {"pieces": {"final": 1.0, "bicep": 2.0, "terraform": 3.0, "iac_diagram": 4.0}},
+    }
+
+    messages = handlers._missing_results(result, {"final", "bicep"}, "conv", "lz-1")
+    assert [(message["type"], message.get("kind")) for message in messages] == [
+        ("team_artifact", "terraform"), ("team_artifact", "iac_diagram"),
+    ]
+    assert messages[0]["artifact"] == {"terraform_code": "t"} and messages[1]["diagram"] == {"services": []}
+
+    cut_off = handlers._missing_results(result, set(), "conv", "lz-1")
+    assert [message.get("kind") for message in cut_off] == [None, "bicep", "terraform", "iac_diagram"]
+    assert handlers._missing_results(result, {"final", "bicep", "terraform", "iac_diagram"}, "conv", "lz-1") == []
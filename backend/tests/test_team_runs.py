@@ -0,0 +1,196 @@
+"""Tests for the background team run queue and the runs registry API."""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, WebSocketDisconnect
+
+from app.agents.checkpoints import MemoryCheckpointStore
+from app.agents.landing_zone_team import LandingZoneTeam
+from app.agents.team_runs import RunQueueFullError, TeamRunQueue
+from app.api.endpoints import runs
+from app.core.cancellation import run_cancellations
+from app.websockets import handlers
+from app.websockets.handlers import ConnectionManager
+from tests.conftest import FakeChatClient
+
+DRAFT = 'Design\n\nDiagram JSON\n```json\n{"services": [{"id": "web", "title": "Web"}]}\n```'
+
+
+class _Socket:
+    headers: dict = {}
+
+    def __init__(self) -> None:
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.frames: list[dict] = []
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        pass
+
+    async def receive_json(self) -> dict:
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_text(self, text: str) -> None:
+        self.frames.append(json.loads(text))
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+class _BlockedTeam:
+    async def run_pipeline_traced(self, *args, **kwargs):
+        await asyncio.sleep(3600)
+
+
+class _AzureClients:
+    def get_azure_architect_agent(self):
+        return type("Agent", (), {"agent_client": None})()
+
+
+def _client() -> httpx.AsyncClient:
+    app = FastAPI()
+    app.include_router(runs.router)
+    app.state.azure_clients = _AzureClients()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_detached_run_outlives_its_socket_and_its_result_is_served(monkeypatch):
+    store = MemoryCheckpointStore()
+    queue = TeamRunQueue(store=store)
+    team = LandingZoneTeam(FakeChatClient(reply=DRAFT, delay=0.01), checkpoints=store)
+    monkeypatch.setattr(handlers, "manager", ConnectionManager())
+    monkeypatch.setattr(handlers, "team_runs", queue)
+    monkeypatch.setattr(handlers, "get_landing_zone_team", lambda agent_client: team)
+    monkeypatch.setattr(runs, "team_runs", queue)
+
+    socket = _Socket()
+    connection = asyncio.create_task(handlers.handle_chat_websocket(socket, "c1", _AzureClients()))
+    await socket.inbox.put({"type": "team_stream_chat", "message": "Design a landing zone", "detach": True})
+    while not any(frame["type"] == "run_started" for frame in socket.frames):
+        await asyncio.sleep(0.01)
+    run_id = socket.frames[-1]["run_id"]
+    await socket.inbox.put(None)   # the tab closes mid-run
+    await connection
+
+    run = await queue.wait(run_id)
+    assert run.status == "completed" and run.result["diagram"] == {"services": [{"id": "web", "title": "Web"}]}
+    async with _client() as client:
+        assert (await client.get(f"/runs/{run_id}")).json()["status"] == "completed"
+        assert (await client.get(f"/runs/{run_id}/result")).json()["message"] == run.result["message"]
+        listed = (await client.get("/runs")).json()["runs"]
+        assert [summary["run_id"] for summary in listed] == [run_id]
+
+        # Another process only has the store to go on.
+        monkeypatch.setattr(runs, "team_runs", TeamRunQueue(store=store))
+        result = (await client.get(f"/runs/{run_id}/result")).json()
+        assert result["status"] == "completed" and result["iac"] == run.result["iac"]
+        assert (await client.get("/runs/lz-missing")).status_code == 404
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_api_stays_responsive_while_twenty_runs_execute(monkeypatch):
+    queue = TeamRunQueue(workers=20, store=MemoryCheckpointStore())
+    team = LandingZoneTeam(FakeChatClient(reply=DRAFT, delay=0.02), checkpoints=queue.store)
+    monkeypatch.setattr(runs, "team_runs", queue)
+    monkeypatch.setattr(runs, "get_landing_zone_team", lambda agent_client: team)
+
+    async with _client() as client:
+        run_ids = [
+            (await client.post("/runs", json={"message": f"Landing zone {i}"})).json()["run_id"] for i in range(20)
+        ]
+        latencies = []
+        while not all(queue.get(run_id).finished for run_id in run_ids):
+            started = time.perf_counter()
+            response = await client.get("/runs", params={"limit": 20})
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+            await asyncio.sleep(0.01)
+
+    assert all(queue.get(run_id).status == "completed" for run_id in run_ids)
+    assert len(latencies) > 5 and max(latencies) < 0.25, f"GET /runs took up to {max(latencies):.3f}s"
+    assert queue.stats()["completed"] == 20
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_runs_and_results_wait_for_the_run(monkeypatch):
+    queue = TeamRunQueue(workers=1, queue_size=1, store=MemoryCheckpointStore())
+    monkeypatch.setattr(runs, "team_runs", queue)
+    monkeypatch.setattr(runs, "get_landing_zone_team", lambda agent_client: _BlockedTeam())
+
+    running = queue.submit(_BlockedTeam(), "first")
+    await asyncio.sleep(0)   # a worker takes it
+    waiting = queue.submit(_BlockedTeam(), "second")
+    with pytest.raises(RunQueueFullError):
+        queue.submit(_BlockedTeam(), "third")
+    async with _client() as client:
+        assert (await client.post("/runs", json={"message": "fourth"})).status_code == 429
+        assert (await client.get(f"/runs/{running.run_id}/result")).status_code == 409
+        assert (await client.get(f"/runs/{waiting.run_id}")).json()["status"] == "queued"
+
+        run_cancellations.cancel(running.run_id, "cancelled via API")
+        assert (await queue.wait(running.run_id)).status == "cancelled"
+        result = (await client.get(f"/runs/{running.run_id}/result")).json()
+        assert result["status"] == "cancelled" and result["error"] == "cancelled via API"
+
+    assert queue.stats()["rejected"] == 2 and queue.get(waiting.run_id).status == "running"
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_only_the_owner_or_its_conversation_may_resume_a_run(monkeypatch):
+    store = MemoryCheckpointStore()
+    queue = TeamRunQueue(store=store)
+    monkeypatch.setattr(handlers, "manager", ConnectionManager())
+    monkeypatch.setattr(handlers, "team_runs", queue)
+    monkeypatch.setattr(handlers, "get_landing_zone_team", lambda agent_client: LandingZoneTeam(FakeChatClient(), checkpoints=store))
+
+    run = queue.submit(_BlockedTeam(), "Design", owner="c1", conversation_id="conv-1")
+    await asyncio.sleep(0)   # a worker takes it and records who started it
+    await store.save(run.run_id, "run", {"pipeline": "sequential", "prompt": "Design", "status": "failed"})
+    run_cancellations.cancel(run.run_id, "interrupted")
+    await queue.wait(run.run_id)
+
+    assert await queue.may_resume(run.run_id, "c1", None)
+    assert await queue.may_resume(run.run_id, "c2", "conv-1")
+    assert not await queue.may_resume(run.run_id, "c2", "conv-2")
+    assert await queue.may_resume("lz-anonymous", "c2", None)
+
+    socket = _Socket()
+    handlers.manager.register("c2", socket)
+    await handlers.handle_team_stream_chat({"type": "resume_run", "run_id": run.run_id, "conversation_id": "conv-2"}, "c2", _AzureClients())
+    await handlers.manager.flush("c2")
+    assert socket.frames == [{"type": "error", "run_id": run.run_id, "message": "No resumable run with that id"}]
+    assert queue.stats()["submitted"] == 1
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_resumed_run_keeps_its_checkpointed_prompt(monkeypatch):
+    store = MemoryCheckpointStore()
+    queue = TeamRunQueue(store=store)
+    monkeypatch.setattr(handlers, "manager", ConnectionManager())
+    monkeypatch.setattr(handlers, "team_runs", queue)
+    monkeypatch.setattr(handlers, "get_landing_zone_team", lambda agent_client: LandingZoneTeam(FakeChatClient(), checkpoints=store))
+
+    run = queue.submit(_BlockedTeam(), "Design a landing zone", owner="c1")
+    await asyncio.sleep(0)
+    await store.save(run.run_id, "run", {"pipeline": "sequential", "prompt": "Design a landing zone", "status": "failed"})
+    run_cancellations.cancel(run.run_id, "interrupted")
+    await queue.wait(run.run_id)
+
+    socket = _Socket()
+    handlers.manager.register("c1", socket)
+    await handlers.handle_team_stream_chat({"type": "resume_run", "run_id": run.run_id, "detach": True}, "c1", _AzureClients())
+    resumed = queue.get(run.run_id)
+    assert resumed is not run and resumed.resume and resumed.prompt == "Design a landing zone"
+    await queue.wait(run.run_id)
+    await queue.stop()
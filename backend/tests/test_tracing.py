@@ -0,0 +1,139 @@
+"""Tests for the bounded, replayable run tracer."""
+
+import gc
+import json
+import time
+import tracemalloc
+
+import pytest
+
+from app.obs.tracing import TraceEvent, Tracer
+
+
+def _event(run_id: str, phase: str, step: str = "s1", delta: str | None = None) -> TraceEvent:
+    return TraceEvent(
+        run_id=run_id, step_id=step, agent="writer", phase=phase, ts=time.time(),
+        meta={}, progress={}, telemetry={}, message_delta=delta,
+    )
+
+
+def _drain(queue) -> list:
+    items = []
+    while not queue.empty():
+        raw = queue.get_nowait()
+        items.append(None if raw is None else json.loads(raw))
+    return items
+
+
+@pytest.mark.asyncio
+async def test_late_subscriber_gets_history_then_live_events():
+    tracer = Tracer()
+    run_id = tracer.new_run()
+    await tracer.emit(_event(run_id, "start"))
+    await tracer.emit(_event(run_id, "delta", delta="Hel"))
+
+    queue = tracer.attach(run_id)
+    await tracer.emit(_event(run_id, "delta", delta="lo"))
+    await tracer.finish(run_id)
+
+    events = _drain(queue)
+    assert [e and e["phase"] for e in events] == ["start", "delta", "delta", None]
+    assert "".join(e["message_delta"] for e in events[1:3]) == "Hello"
+    # A finished run still replays, then ends immediately.
+    assert [e and e["phase"] for e in _drain(tracer.attach(run_id))] == ["start", "delta", "delta", None]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_policy_is_lossless_for_interleaved_steps():
+    tracer = Tracer(queue_size=4, overflow="coalesce")
+    run_id = tracer.new_run()
+    queue = tracer.attach(run_id)
+    await tracer.emit(_event(run_id, "start", "a"))
+    await tracer.emit(_event(run_id, "start", "b"))
+    for i in range(50):
+        await tracer.emit(_event(run_id, "delta", "a", f"a{i} "))
+        await tracer.emit(_event(run_id, "delta", "b", f"b{i} "))
+
+    events = _drain(queue)
+    assert len(events) == 4 and queue.coalesced == 98 and queue.dropped == 0
+    text = {e["step_id"]: e["message_delta"] for e in events if e["phase"] == "delta"}
+    assert text["a"] == "".join(f"a{i} " for i in range(50))
+    assert text["b"] == "".join(f"b{i} " for i in range(50))
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_and_disconnect_policies():
+    dropping = Tracer(queue_size=3, overflow="drop_oldest")
+    run_id = dropping.new_run()
+    queue = dropping.attach(run_id)
+    for i in range(10):
+        await dropping.emit(_event(run_id, "end", step=f"s{i}"))
+    assert [e["step_id"] for e in _drain(queue)] == ["s7", "s8", "s9"]
+
+    strict = Tracer(queue_size=3, overflow="disconnect")
+    run_id = strict.new_run()
+    queue = strict.attach(run_id)
+    for i in range(5):
+        await strict.emit(_event(run_id, "end", step=f"s{i}"))
+    assert _drain(queue) == [None]
+    assert strict.stats()["subscribers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_overflow_never_drops_result_events():
+    tracer = Tracer(buffer_size=4, queue_size=3, overflow="drop_oldest")
+    run_id = tracer.new_run()
+    queue = tracer.attach(run_id)
+    await tracer.emit(_event(run_id, "result", step="final"))
+    await tracer.emit(_event(run_id, "artifact", step="bicep"))
+    for i in range(10):
+        await tracer.emit(_event(run_id, "delta", step=f"s{i}", delta="x"))
+    await tracer.emit(_event(run_id, "artifact", step="terraform"))
+    await tracer.finish(run_id)
+
+    assert [e and e["step_id"] for e in _drain(queue)] == ["final", "bicep", "terraform", None]
+    replayed = tracer.attach(run_id)
+    assert [e and e["phase"] for e in _drain(replayed)] == ["result", "artifact", "delta", "artifact", None]
+
+    streamed = [phase async for phase, _ in tracer.stream(run_id)]
+    assert streamed == ["result", "artifact", "delta", "artifact"]
+
+
+@pytest.mark.asyncio
+async def test_finished_and_idle_runs_are_evicted():
+    tracer = Tracer(run_ttl=10, idle_ttl=100, max_runs=3)
+    done, idle, fresh = tracer.new_run(), tracer.new_run() + "-idle", tracer.new_run() + "-fresh"
+    for run_id in (done, idle, fresh):
+        await tracer.emit(_event(run_id, "start"))
+    await tracer.finish(done)
+
+    assert tracer.evict_expired(now=time.monotonic() + 50) == 1
+    assert not tracer.has_run(done) and tracer.has_run(idle)
+    assert tracer.evict_expired(now=time.monotonic() + 500) == 2
+    assert tracer.stats()["runs"] == 0
+
+
+@pytest.mark.asyncio
+async def test_soak_memory_stays_bounded_with_stalled_listeners(capsys):
+    tracer = Tracer(buffer_size=500, queue_size=200, overflow="drop_oldest")
+    run_id = tracer.new_run()
+    queues = [tracer.attach(run_id) for _ in range(10)]
+    chunk = "x" * 40
+
+    async def burst(count: int) -> None:
+        for i in range(count):
+            await tracer.emit(_event(run_id, "end" if i % 7 == 0 else "delta", f"s{i % 5}", chunk))
+        capsys.readouterr()  # keep captured [TRACE] log lines out of the measurement
+
+    await burst(2_000)
+    tracemalloc.start()
+    gc.collect()   # count what the tracer retains, not cyclic garbage awaiting collection
+    baseline = tracemalloc.get_traced_memory()[0]
+    await burst(8_000)
+    gc.collect()
+    grown = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    assert all(q.qsize() <= 200 for q in queues)
+    assert tracer.stats()["buffered_events"] <= 500
+    assert grown < 512 * 1024, f"tracer grew by {grown} bytes"
@@ -0,0 +1,71 @@
+"""Tests for per-step token accounting and the usage ledger."""
+
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.agents.landing_zone_team import LandingZoneTeamRegistry
+from app.agents.pipeline import PARALLEL_PIPELINE
+from app.api.endpoints import usage as usage_endpoints
+from app.obs import usage as usage_module
+from app.obs.tracing import tracer
+from app.obs.usage import StepMeter, StepUsage, UsageLedger, count_tokens, usage_ledger
+from tests.conftest import FakeChatClient
+
+
+def test_count_tokens_falls_back_to_length_heuristic(monkeypatch):
+    monkeypatch.setattr(usage_module, "_TIKTOKEN_MISSING", True)
+    assert count_tokens("") == 0
+    assert count_tokens("x" * 40) == 10
+
+
+def test_meter_estimates_when_provider_reports_nothing(monkeypatch):
+    monkeypatch.setattr(usage_module, "_TIKTOKEN_MISSING", True)
+    meter = StepMeter("SecurityReviewer", "2", prompt="p" * 80, instructions="i" * 20)
+    meter.observe_text("a" * 200)
+    usage = meter.finish()
+
+    assert (usage.prompt_tokens, usage.completion_tokens) == (26, 50)
+    assert usage.source == "estimated"
+    assert usage.ttft_ms is not None
+
+
+def test_ledger_aggregates_per_run_conversation_and_project():
+    ledger = UsageLedger(max_runs=1)
+    ledger.bind_run("r1", conversation_id="c1", project_id="p1")
+    ledger.record("r1", StepUsage("Architect", "1", prompt_tokens=10, completion_tokens=5))
+    ledger.record("r1", StepUsage("FinalEditor", "2", prompt_tokens=3, completion_tokens=2))
+    ledger.bind_run("r2", conversation_id="c1", project_id="p1")
+    ledger.record("r2", StepUsage("Architect", "1", prompt_tokens=1, completion_tokens=1))
+
+    assert ledger.run_usage("r1") is None  # evicted; aggregates survive
+    assert ledger.conversation_totals("c1")["total_tokens"] == 22
+    assert ledger.project_totals("p1")["by_agent"]["Architect"]["steps"] == 2
+
+
+@pytest.mark.asyncio
+async def test_team_run_reports_provider_usage_per_step():
+    team = LandingZoneTeamRegistry().get(FakeChatClient(reply="done", usage=(120, 30)))
+    run_id = tracer.new_run()
+    usage_ledger.bind_run(run_id, conversation_id="conv-usage", project_id="proj-usage")
+    queue = tracer.attach(run_id)
+
+    await team.run_pipeline_traced(PARALLEL_PIPELINE, "design", run_id=run_id)
+
+    ends = []
+    while not queue.empty():
+        event = json.loads(queue.get_nowait())
+        if event["phase"] == "end":
+            ends.append(event["telemetry"])
+    tracer.detach(run_id, queue)
+
+    assert len(ends) == len(PARALLEL_PIPELINE.stages)
+    assert all(t["tokens_in"] == 120 and t["tokens_out"] == 30 and t["usage_source"] == "reported" for t in ends)
+
+    report = await usage_endpoints.run_usage(run_id)
+    assert report["totals"]["total_tokens"] == 150 * len(PARALLEL_PIPELINE.stages)
+    assert set(report["totals"]["by_agent"]) >= {"Architect", "FinalEditor", "NetworkingReviewer"}
+    assert (await usage_endpoints.project_usage("proj-usage"))["totals"]["steps"] == len(PARALLEL_PIPELINE.stages)
+    with pytest.raises(HTTPException):
+        await usage_endpoints.run_usage("missing-run")
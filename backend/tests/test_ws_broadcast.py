@@ -0,0 +1,179 @@
+"""Tests for conversation broadcast fan-out and per-client outbound queues."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.obs.tracing import TraceEvent, Tracer
+from app.websockets import handlers
+from app.websockets.handlers import ConnectionManager
+from app.websockets.outbound import Outbound
+
+
+class _Socket:
+    def __init__(self, delay: float = 0.0, broken: bool = False) -> None:
+        self.delay = delay
+        self.broken = broken
+        self.frames: list[str] = []
+        self.close_code: int | None = None
+
+    async def send_text(self, text: str) -> None:
+        if self.broken:
+            raise RuntimeError("socket closed")
+        await asyncio.sleep(self.delay)
+        self.frames.append(text)
+
+    async def close(self, code: int = 1000) -> None:
+        self.close_code = code
+
+
+def _join(manager: ConnectionManager, sockets: dict[str, _Socket]) -> None:
+    for client_id, socket in sockets.items():
+        manager.register(client_id, socket)
+        manager.add_to_conversation("conv-1", client_id)
+
+
+async def _drain(manager: ConnectionManager) -> None:
+    await asyncio.gather(*(manager.flush(client_id) for client_id in list(manager.outbound)))
+
+
+@pytest.mark.asyncio
+async def test_trace_events_reach_each_member_once_encoded_once(monkeypatch):
+    manager, tracer = ConnectionManager(), Tracer()
+    monkeypatch.setattr(handlers, "manager", manager)
+    monkeypatch.setattr(handlers, "tracer", tracer)
+    sockets = {"caller": _Socket(), "viewer": _Socket(), "other": _Socket()}
+    _join(manager, sockets)
+
+    run_id = tracer.new_run()
+    for phase in ("start", "end"):
+        await tracer.emit(TraceEvent(
+            run_id=run_id, step_id="1", agent="writer", phase=phase, ts=time.time(),
+            meta={}, progress={}, telemetry={},
+        ))
+    await tracer.finish(run_id)
+    await handlers._forward_trace_events(run_id, "caller", "conv-1")
+    await _drain(manager)
+
+    assert [len(s.frames) for s in sockets.values()] == [2, 2, 2]
+    assert sockets["caller"].frames == sockets["viewer"].frames
+    # The other members were sent the very same encoded frame.
+    assert all(a is b for a, b in zip(sockets["viewer"].frames, sockets["other"].frames))
+    event = json.loads(sockets["viewer"].frames[1])
+    assert event["type"] == "trace_event" and event["phase"] == "end" and event["conversation_id"] == "conv-1"
+    assert manager.stats()["delivered"] == 4
+
+
+@pytest.mark.asyncio
+async def test_slow_caller_does_not_hold_up_the_conversation(monkeypatch):
+    monkeypatch.setattr(handlers.settings, "WS_OUTBOUND_QUEUE_SIZE", 2)
+    manager, tracer = ConnectionManager(), Tracer()
+    monkeypatch.setattr(handlers, "manager", manager)
+    monkeypatch.setattr(handlers, "tracer", tracer)
+    sockets = {"caller": _Socket(delay=0.05), "viewer": _Socket()}
+    _join(manager, sockets)
+
+    run_id = tracer.new_run()
+    forwarder = asyncio.create_task(handlers._forward_trace_events(run_id, "caller", "conv-1"))
+    for i in range(20):
+        await tracer.emit(TraceEvent(
+            run_id=run_id, step_id=f"s{i}", agent="writer", phase="end", ts=time.time(),
+            meta={}, progress={}, telemetry={},
+        ))
+        await asyncio.sleep(0.005)
+    await tracer.finish(run_id)
+
+    # The caller is paced at its own speed, losing nothing; the viewer already has every event.
+    assert len(sockets["viewer"].frames) == 20 and len(sockets["caller"].frames) < 5
+    await forwarder
+    await _drain(manager)
+    assert len(sockets["caller"].frames) == 20
+
+
+@pytest.mark.asyncio
+async def test_subscribing_to_a_run_does_not_rebroadcast_it(monkeypatch):
+    manager, tracer = ConnectionManager(), Tracer()
+    monkeypatch.setattr(handlers, "manager", manager)
+    monkeypatch.setattr(handlers, "tracer", tracer)
+    sockets = {"caller": _Socket(), "viewer": _Socket()}
+    _join(manager, sockets)
+    subscriber = _Socket()
+    manager.register("subscriber", subscriber)   # e.g. a tab reopened on the run page
+
+    run_id = tracer.new_run()
+    forwarder = asyncio.create_task(handlers._forward_trace_events(run_id, "caller", "conv-1"))
+    await handlers.handle_subscribe_run({"run_id": run_id, "conversation_id": "conv-1"}, "subscriber")
+    await asyncio.sleep(0)
+    await tracer.emit(TraceEvent(
+        run_id=run_id, step_id="1", agent="writer", phase="end", ts=time.time(), meta={}, progress={}, telemetry={},
+    ))
+    await tracer.finish(run_id)
+    await asyncio.gather(forwarder, *manager.forwarders["subscriber"])
+    await _drain(manager)
+
+    # The viewer hears the event once, from the run's own forwarder.
+    assert len(sockets["caller"].frames) == 1 and len(sockets["viewer"].frames) == 1
+    assert sorted(json.loads(frame)["type"] for frame in subscriber.frames) == ["subscribed_run", "trace_event"]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_never_waits_on_slow_or_broken_clients(monkeypatch):
+    monkeypatch.setattr(handlers.settings, "WS_SEND_TIMEOUT_SECONDS", 0.05)
+    manager = ConnectionManager()
+    sockets = {f"ok-{i}": _Socket(delay=0.03) for i in range(5)}
+    sockets.update({"slow": _Socket(delay=1.0), "gone": _Socket(broken=True)})
+    _join(manager, sockets)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    counts = await manager.broadcast_to_conversation("conv-1", {"type": "conversation_update"}, exclude="ok-0")
+    assert loop.time() - started < 0.01   # queued, not sent inline
+    assert counts == {"delivered": 6, "dropped": 0}
+
+    await asyncio.sleep(0.15)
+    assert all(len(sockets[f"ok-{i}"].frames) == 1 for i in range(1, 5)) and sockets["ok-0"].frames == []
+    # A send that timed out may have stopped mid-frame: the slow client is cut off, like the broken one.
+    assert manager.stats()["sends_timed_out"] == 1 and sockets["slow"].close_code == 1013
+    assert manager.conversation_connections["conv-1"] == [f"ok-{i}" for i in range(5)]
+    assert "gone" not in manager.outbound and "slow" not in manager.outbound
+    for client_id in list(manager.outbound):
+        manager.disconnect(client_id)
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_deltas_first_then_disconnects():
+    socket = _Socket(delay=10)
+    closed: list[str] = []
+    outbound = Outbound("c1", socket, on_close=lambda q: closed.append(q.client_id), limit=3, policy="drop_deltas")
+
+    assert outbound.offer("final-1")
+    await asyncio.sleep(0)   # the writer takes final-1 and stalls on it
+    for text in ("delta-1", "delta-2", "final-2"):
+        assert outbound.offer(text, droppable=text.startswith("delta"))
+
+    assert outbound.offer("final-3")   # full: evicts delta-1
+    assert outbound.offer("delta-3", droppable=True)   # evicts delta-2
+    assert outbound.offer("final-4")   # evicts delta-3
+    assert outbound.offer("delta-4", droppable=True) is False   # nothing to evict: the delta itself goes
+    assert [text for _, text, _ in outbound._frames] == ["final-2", "final-3", "final-4"]
+    assert outbound.dropped == 4 and not outbound.closed
+
+    assert outbound.offer("final-5") is False   # only final frames queued: cut the client off
+    await asyncio.sleep(0)
+    assert outbound.closed and closed == ["c1"] and socket.close_code == 1013
+
+
+@pytest.mark.asyncio
+async def test_paced_producer_waits_for_room_instead_of_overflowing():
+    socket = _Socket(delay=0.002)
+    outbound = Outbound("c1", socket, limit=3, policy="drop_deltas")
+
+    for i in range(20):   # e.g. a late subscriber's replay of a long run log
+        assert await outbound.put(f"event-{i}")
+    await outbound.drain()
+
+    assert socket.frames == [f"event-{i}" for i in range(20)]
+    assert outbound.dropped == 0 and not outbound.closed
+    outbound.close()
@@ -0,0 +1,92 @@
+"""Tests for negotiated WebSocket frame encodings."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from app.websockets import handlers
+from app.websockets.codec import FIELD_IDS, MSGPACK, decode_msgpack, encode_msgpack
+from app.websockets.handlers import ConnectionManager
+
+pytest.importorskip("msgpack")
+
+DELTA = {
+    "type": "trace_event", "conversation_id": "conv-1", "run_id": "lz-1", "step_id": "3", "agent": "SecurityReviewer",
+    "phase": "delta", "ts": 1760000000.25, "meta": {"waf_pillar": "Security"}, "progress": {"current": 3, "total": 8},
+    "telemetry": {"tokens_in": 812, "tokens_out": 96}, "message_delta": "Private endpoints for Key Vault",
+    "custom_field": [1, 2],
+}
+
+
+def test_msgpack_round_trip_interns_known_keys():
+    frame = encode_msgpack(DELTA)
+    assert decode_msgpack(frame, nested=True) == DELTA
+    assert b"message_delta" not in frame and b"custom_field" in frame
+    assert len(frame) < 0.6 * len(handlers.encode_message(DELTA))
+    assert max(FIELD_IDS.values()) < 128   # every field id packs into a single byte
+
+
+def test_client_messages_expand_only_envelope_keys():
+    import msgpack
+
+    frame = msgpack.packb({0: "team_stream_chat", 5: "Design", "context": {0: "kept", 999: "data"}, 999: "unknown"})
+    assert decode_msgpack(frame) == {
+        "type": "team_stream_chat", "message": "Design", "context": {0: "kept", 999: "data"}, 999: "unknown",
+    }
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(handlers, "manager", ConnectionManager())
+    app = FastAPI()
+
+    @app.websocket("/ws/chat/{client_id}")
+    async def chat(websocket: WebSocket, client_id: str):
+        await handlers.handle_chat_websocket(websocket, client_id, azure_clients=None)
+
+    return app
+
+
+def test_clients_negotiate_binary_frames_json_stays_default(app):
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/chat/bin", subprotocols=["azviz.msgpack.v1"]) as binary:
+            assert binary.accepted_subprotocol == "azviz.msgpack.v1"
+            binary.send_bytes(encode_msgpack({"type": "ping"}))
+            assert decode_msgpack(binary.receive_bytes())["type"] == "pong"
+        with client.websocket_connect("/ws/chat/text") as text:
+            assert text.accepted_subprotocol is None
+            text.send_json({"type": "ping"})
+            assert json.loads(text.receive_text())["type"] == "pong"
+
+
+@pytest.mark.asyncio
+async def test_broadcast_encodes_each_format_once():
+    class _Socket:
+        def __init__(self) -> None:
+            self.frames: list = []
+
+        async def send_text(self, frame: str) -> None:
+            self.frames.append(frame)
+
+        async def send_bytes(self, frame: bytes) -> None:
+            self.frames.append(frame)
+
+    manager = ConnectionManager()
+    sockets = {"json": _Socket(), "bin-1": _Socket(), "bin-2": _Socket()}
+    for client_id, socket in sockets.items():
+        manager.register(client_id, socket, "json" if client_id == "json" else MSGPACK)
+        manager.add_to_conversation("conv-1", client_id)
+
+    await manager.broadcast_to_conversation("conv-1", DELTA)
+    await asyncio.gather(*(manager.flush(client_id) for client_id in sockets))
+
+    assert json.loads(sockets["json"].frames[0]) == DELTA
+    assert sockets["bin-1"].frames[0] is sockets["bin-2"].frames[0]
+    assert decode_msgpack(sockets["bin-1"].frames[0], nested=True) == DELTA
+    encodings = manager.stats()["encodings"]
+    assert encodings[MSGPACK]["clients"] == 2 and encodings[MSGPACK]["bytes_per_frame"] < encodings["json"]["bytes_per_frame"]
+    for client_id in sockets:
+        manager.disconnect(client_id)
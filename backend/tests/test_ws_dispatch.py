@@ -0,0 +1,118 @@
+"""Tests for concurrent request dispatch and cancellation on the chat WebSocket."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from app.agents.team_runs import TeamRunQueue
+from app.obs.tracing import Tracer
+from app.websockets import handlers
+from app.websockets.handlers import ConnectionManager
+
+
+class _Socket:
+    headers: dict = {}
+
+    def __init__(self) -> None:
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.frames: list[dict] = []
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        pass
+
+    async def receive_json(self) -> dict:
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_text(self, text: str) -> None:
+        self.frames.append(json.loads(text))
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+    async def frame(self, message_type: str) -> dict:
+        for _ in range(200):
+            for frame in self.frames:
+                if frame["type"] == message_type:
+                    return frame
+            await asyncio.sleep(0.01)
+        raise AssertionError(f"no {message_type} frame in {self.frames}")
+
+
+class _Team:
+    """A landing zone team whose run never finishes on its own."""
+
+    def __init__(self) -> None:
+        self.cancelled = asyncio.Event()
+
+    async def run_pipeline_traced(self, *args, **kwargs):
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+
+
+class _AzureClients:
+    def get_azure_architect_agent(self):
+        return type("Agent", (), {"agent_client": None})()
+
+
+@pytest.fixture
+def env(monkeypatch):
+    manager, tracer, team = ConnectionManager(), Tracer(), _Team()
+    monkeypatch.setattr(handlers, "manager", manager)
+    monkeypatch.setattr(handlers, "tracer", tracer)
+    monkeypatch.setattr(handlers, "team_runs", TeamRunQueue(run_tracer=tracer))
+    monkeypatch.setattr(handlers, "get_landing_zone_team", lambda agent_client: team)
+    return manager, tracer, team
+
+
+@pytest.mark.asyncio
+async def test_socket_stays_responsive_and_cancel_run_stops_the_team(env):
+    manager, tracer, team = env
+    socket = _Socket()
+    connection = asyncio.create_task(handlers.handle_chat_websocket(socket, "c1", _AzureClients()))
+
+    await socket.inbox.put({"type": "team_stream_chat", "message": "Design a landing zone"})
+    run_id = (await socket.frame("run_started"))["run_id"]
+    await socket.inbox.put({"type": "ping"})
+    await socket.frame("pong")   # answered while the run is still in flight
+    assert manager.stats()["runs_in_flight"] == 1
+
+    await socket.inbox.put({"type": "cancel_run", "run_id": run_id})
+    cancelled = await socket.frame("run_cancelled")
+    assert cancelled["run_id"] == run_id and cancelled["reason"] == "cancelled by client" and team.cancelled.is_set()
+    assert tracer.is_finished(run_id) and manager.stats()["runs_in_flight"] == 0
+
+    await socket.inbox.put(None)
+    await connection
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_tasks_and_forwarders(env, monkeypatch):
+    monkeypatch.setattr(handlers.settings, "WS_MAX_CONCURRENT_TASKS", 1)
+    manager, tracer, team = env
+    socket = _Socket()
+    connection = asyncio.create_task(handlers.handle_chat_websocket(socket, "c1", _AzureClients()))
+
+    await socket.inbox.put({"type": "team_stream_chat", "message": "Design a landing zone"})
+    await socket.frame("run_started")
+    await socket.inbox.put({"type": "team_stream_chat", "message": "And another"})
+    assert (await socket.frame("error"))["request_type"] == "team_stream_chat"   # over the cap
+    other_run = tracer.new_run()
+    tracer.ensure_run(other_run)
+    await socket.inbox.put({"type": "subscribe_run", "run_id": other_run})
+    await socket.frame("subscribed_run")
+    forwarder = next(iter(manager.forwarders["c1"]))
+
+    await socket.inbox.put(None)
+    await connection
+    await asyncio.sleep(0)
+    assert team.cancelled.is_set() and forwarder.done()   # the forwarder exits quietly on cancel
+    stats = manager.stats()
+    assert stats["tasks_in_flight"] == 0 and stats["forwarders"] == 0 and stats["tasks_cancelled"] == 2
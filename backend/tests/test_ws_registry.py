@@ -0,0 +1,105 @@
+"""Tests for WebSocket registry cleanup, heartbeats and idle reaping."""
+
+import asyncio
+import gc
+import json
+import tracemalloc
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from app.websockets import handlers
+from app.websockets.handlers import IDLE_CLOSE_CODE, ConnectionManager
+
+
+class _Socket:
+    headers: dict = {}
+
+    def __init__(self, answers_pings: bool = True) -> None:
+        self.answers_pings = answers_pings
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.pings = 0
+        self.close_code: int | None = None
+
+    async def accept(self, subprotocol: str | None = None) -> None:
+        pass
+
+    async def receive_json(self) -> dict:
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_text(self, text: str) -> None:
+        if json.loads(text)["type"] == "ping":
+            self.pings += 1
+            if self.answers_pings:
+                self.inbox.put_nowait({"type": "pong"})
+
+    async def close(self, code: int = 1000) -> None:
+        self.close_code = code
+
+
+def _registry_sizes(manager: ConnectionManager) -> list[int]:
+    return [
+        len(manager.active_connections), len(manager.outbound), len(manager.codecs), len(manager.last_seen),
+        len(manager.conversation_connections), len(manager.client_conversations), len(manager.tasks),
+        len(manager.forwarders),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_connect_disconnect_churn_leaves_nothing_behind():
+    manager = ConnectionManager()
+
+    async def churn(cycles: int) -> None:
+        for i in range(cycles):
+            client_id = f"c{i}"
+            await manager.connect(_Socket(), client_id)
+            manager.add_to_conversation(f"conv-{i % 50}", client_id)
+            manager.add_to_conversation("lobby", client_id)
+            manager.disconnect(client_id)
+            await asyncio.sleep(0)   # let the closed writer task finish
+
+    await churn(500)   # warm up allocator caches and the logging machinery
+    tracemalloc.start()
+    try:
+        gc.collect()   # an Outbound and its writer task form a cycle; count only what survives collection
+        before = tracemalloc.get_traced_memory()[0]
+        await churn(5000)
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert _registry_sizes(manager) == [0] * 8
+    assert growth < 64 * 1024, f"grew {growth} bytes over 5000 cycles"
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_keeps_live_clients_and_reaps_silent_ones(monkeypatch):
+    monkeypatch.setattr(handlers.settings, "WEBSOCKET_PING_INTERVAL", 0.02)
+    monkeypatch.setattr(handlers.settings, "WS_IDLE_TIMEOUT_SECONDS", 0.1)
+    manager = ConnectionManager()
+    monkeypatch.setattr(handlers, "manager", manager)
+    live, silent = _Socket(), _Socket(answers_pings=False)
+    connections = [
+        asyncio.create_task(handlers.handle_chat_websocket(socket, client_id, None))
+        for client_id, socket in (("live", live), ("silent", silent))
+    ]
+    await asyncio.sleep(0)
+    for client_id in ("live", "silent"):
+        manager.add_to_conversation("conv-1", client_id)
+    manager.start_heartbeat()
+
+    await asyncio.sleep(0.3)
+    assert connections[1].done() and silent.close_code == IDLE_CLOSE_CODE and silent.pings > 0
+    assert not connections[0].done() and live.pings > 5
+    assert manager.conversation_connections == {"conv-1": ["live"]}
+    stats = manager.stats()
+    assert stats["connections"] == 1 and stats["idle_closed"] == 1 and stats["conversation_members"] == 1
+
+    await manager.stop_heartbeat()
+    live.inbox.put_nowait(None)
+    await connections[0]
+    assert _registry_sizes(manager) == [0] * 8
@@ -2,7 +2,7 @@
 import React, { useEffect, useMemo, useState } from "react";
 import { Icon } from "@iconify/react";
 
-type TracePhase = "start" | "delta" | "end" | "error";
+type TracePhase = "start" | "delta" | "end" | "error" | "cancelled";
 
 type TraceEventPayload = {
   run_id: string;
@@ -17,7 +17,7 @@ type TraceEventPayload = {
   error?: string;
 };
 
-type StepStatus = "pending" | "running" | "done" | "error";
+type StepStatus = "pending" | "running" | "done" | "error" | "cancelled";
 
 type StepState = {
   agent: string;
@@ -52,6 +52,12 @@ const STATUS_META: Record<StepStatus, { icon: string; color: string; dot: string
     dot: "bg-red-500",
     label: "error",
   },
+  cancelled: {
+    icon: "mdi:cancel",
+    color: "text-amber-500",
+    dot: "bg-amber-500",
+    label: "cancelled",
+  },
 };
 
 export default function RunProgress({ runId }: { runId: string }) {
@@ -67,6 +73,15 @@ export default function RunProgress({ runId }: { runId: string }) {
       setEvents((prev) => [...prev, payload]);
       setSteps((previous) => {
         const next = { ...previous };
+        if (payload.phase === "cancelled") {
+          // Run-level event: every step that had not finished stops here.
+          for (const [key, step] of Object.entries(next)) {
+            if (step.status === "pending" || step.status === "running") {
+              next[key] = { ...step, status: "cancelled" };
+            }
+          }
+          return next;
+        }
         const key = payload.step_id;
         const existing =
           next[key] ?? { agent: payload.agent, status: "pending" as StepStatus, text: [], summary: undefined };
@@ -90,7 +105,9 @@ export default function RunProgress({ runId }: { runId: string }) {
         return next;
       });
     };
-    es.onerror = () => es.close();
+    // The server sends `end` once the run has finished; otherwise a dropped
+    // connection is retried by EventSource, resuming from Last-Event-ID.
+    es.addEventListener("end", () => es.close());
     return () => es.close();
   }, [runId]);
 
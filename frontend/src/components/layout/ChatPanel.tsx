@@ -24,6 +24,9 @@ import { AzureService } from '@/data/azureServices';
 import { ImageUpload } from '@/components/upload/ImageUpload';
 import { saveProjectDiagramState, type ProjectDiagramState } from '@/services/projectService';
 
+// Both are turned into workspace files as they arrive, so both are asked for when there is a workspace.
+const WORKSPACE_IAC_FORMATS: ('bicep' | 'terraform')[] = ['bicep', 'terraform'];
+
 interface ChatPanelProps {
   isOpen: boolean;
   onToggle: () => void;
@@ -52,6 +55,7 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
   const { addNodesFromArchitecture, replaceDiagram } = useDiagramStore();
   const initialPromptRef = useRef<string | null>(null);
   const processedDiagramMessages = useRef<Set<string>>(new Set());
+  const processedIac = useRef<unknown>(null);
   const { client: supabaseClient } = useSupabase();
   const [isRunProgressOpen, setIsRunProgressOpen] = useState(false);
 
@@ -75,6 +79,7 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
     },
     supabase: supabaseClient ?? undefined,
     projectId,
+    iacFormats: onIacGenerated ? WORKSPACE_IAC_FORMATS : undefined,
   });
   
 
@@ -204,6 +209,14 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
       return;
     }
     processedDiagramMessages.current.add(latestDiagram.messageId);
+    if (latestDiagram.partial) {
+      // Live preview while the team is still writing: draw it, but don't persist or notify.
+      if (latestDiagram.architecture) {
+        const nodes = ArchitectureParser.generateNodes(latestDiagram.architecture);
+        replaceDiagram(nodes, latestDiagram.architecture.connections);
+      }
+      return;
+    }
     try {
       let architecture = latestDiagram.architecture;
       if (
@@ -233,46 +246,51 @@ const ChatPanel: React.FC<ChatPanelProps> = ({
         variant: 'destructive',
       });
     }
+  }, [latestDiagram, persistDiagramState, replaceDiagram, toast]);
 
-    const iac = latestDiagram.iac;
-    if (iac && onIacGenerated) {
-      const { bicep, terraform } = iac;
-      const bicepTemplate =
-        bicep && typeof bicep.bicep_code === 'string' ? bicep.bicep_code : undefined;
-      const terraformTemplate =
-        terraform && typeof terraform.terraform_code === 'string' ? terraform.terraform_code : undefined;
-      if (bicepTemplate || terraformTemplate) {
-        onIacGenerated({
-          bicep: bicepTemplate
-            ? {
-                template: bicepTemplate,
-                parameters:
-                  bicep &&
-                  typeof bicep === 'object' &&
-                  'parameters' in bicep &&
-                  bicep.parameters &&
-                  typeof bicep.parameters === 'object'
-                    ? (bicep.parameters as Record<string, unknown>)
-                    : null,
-              }
-            : undefined,
-          terraform: terraformTemplate
-            ? {
-                template: terraformTemplate,
-                parameters:
-                  terraform &&
-                  typeof terraform === 'object' &&
-                  'parameters' in terraform &&
-                  terraform.parameters &&
-                  typeof terraform.parameters === 'object'
-                    ? (terraform.parameters as Record<string, unknown>)
-                    : null,
-              }
-            : undefined,
-        });
-      }
+  // IaC artifacts arrive after the design, for the same message, so hand them on whenever they change.
+  useEffect(() => {
+    const iac = latestDiagram?.iac;
+    if (!iac || iac === processedIac.current || !onIacGenerated) {
+      return;
+    }
+    processedIac.current = iac;
+    const { bicep, terraform } = iac;
+    const bicepTemplate =
+      bicep && typeof bicep.bicep_code === 'string' ? bicep.bicep_code : undefined;
+    const terraformTemplate =
+      terraform && typeof terraform.terraform_code === 'string' ? terraform.terraform_code : undefined;
+    if (bicepTemplate || terraformTemplate) {
+      onIacGenerated({
+        bicep: bicepTemplate
+          ? {
+              template: bicepTemplate,
+              parameters:
+                bicep &&
+                typeof bicep === 'object' &&
+                'parameters' in bicep &&
+                bicep.parameters &&
+                typeof bicep.parameters === 'object'
+                  ? (bicep.parameters as Record<string, unknown>)
+                  : null,
+            }
+          : undefined,
+        terraform: terraformTemplate
+          ? {
+              template: terraformTemplate,
+              parameters:
+                terraform &&
+                typeof terraform === 'object' &&
+                'parameters' in terraform &&
+                terraform.parameters &&
+                typeof terraform.parameters === 'object'
+                  ? (terraform.parameters as Record<string, unknown>)
+                  : null,
+            }
+          : undefined,
+      });
     }
-  }, [latestDiagram, onIacGenerated, persistDiagramState, replaceDiagram, toast]);
+  }, [latestDiagram, onIacGenerated]);
 
   useEffect(() => {
     if (!runState?.runId) {
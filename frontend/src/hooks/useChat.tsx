@@ -48,6 +48,8 @@ export interface UseChatOptions {
   supabase?: SupabaseClient;
   projectId?: string;
   teamMode?: boolean;
+  /** IaC the team generates with each design (delivered as team_artifact); none unless asked for. */
+  iacFormats?: ('bicep' | 'terraform')[];
 }
 
 type RunStatus = 'running' | 'completed';
@@ -67,8 +69,21 @@ interface DiagramUpdate {
   messageText: string;
   receivedAt: Date;
   iac?: ChatMeta['iac'];
+  /** True while the diagram is still streaming in from a running agent step. */
+  partial?: boolean;
 }
 
+interface PartialDiagram {
+  runId: string;
+  stepId: string;
+  services: Record<string, unknown>[];
+  groups: Record<string, unknown>[];
+  connections: Record<string, unknown>[];
+}
+
+const PARTIAL_COLLECTIONS = ['services', 'groups', 'connections'] as const;
+type PartialCollection = (typeof PARTIAL_COLLECTIONS)[number];
+
 const GREETING_MESSAGE =
   "Hello! I'm your Azure Architect AI assistant. I can help you design cloud architectures, generate Infrastructure as Code, and analyze your diagrams. How can I assist you today?";
 const RECENT_CONTEXT_LIMIT = 8;
@@ -99,6 +114,7 @@ export const useChat = (options: UseChatOptions = {}) => {
     supabase,
     projectId,
     teamMode = true,
+    iacFormats,
   } = options;
 
   const createGreetingMessage = useCallback(
@@ -121,6 +137,12 @@ export const useChat = (options: UseChatOptions = {}) => {
   const [runState, setRunState] = useState<RunState | null>(null);
   const [latestDiagram, setLatestDiagram] = useState<DiagramUpdate | null>(null);
   const lastUserMessageRef = useRef<string | null>(null);
+  // Diagrams streaming in per agent step; parallel steps interleave, so only the latest step is drawn.
+  const partialDiagramsRef = useRef<{ runId: string; activeStepId: string; steps: Record<string, PartialDiagram> } | null>(null);
+  const partialFrameRef = useRef<number | null>(null);
+  // Assistant message showing each run's design; its IaC artifacts are attached as they arrive
+  // and it is persisted once the run ends, with whatever it has by then.
+  const runMessageRef = useRef<Record<string, ChatMessage>>({});
 
   const persistMessage = useCallback(
     async (message: ChatMessage, explicitConversationId?: string | null) => {
@@ -160,12 +182,60 @@ export const useChat = (options: UseChatOptions = {}) => {
     [projectId, supabase]
   );
 
+  // Redraw the streaming diagram at most once per animation frame.
+  const renderPartialDiagram = useCallback(() => {
+    partialFrameRef.current = null;
+    const partials = partialDiagramsRef.current;
+    const partial = partials?.steps[partials.activeStepId];
+    if (!partial) {
+      return;
+    }
+    let architecture: ParsedArchitecture | null = null;
+    try {
+      architecture = ArchitectureParser.parseStructuredDiagram({
+        services: partial.services,
+        groups: partial.groups,
+        connections: partial.connections,
+      }) ?? null;
+    } catch (error) {
+      console.warn('[useChat] Failed to interpret partial diagram', error);
+    }
+    if (architecture && architecture.services.length > 0) {
+      const count = partial.services.length + partial.groups.length + partial.connections.length;
+      setLatestDiagram({
+        messageId: `${partial.runId}:${partial.stepId}:partial:${count}`,
+        runId: partial.runId,
+        architecture,
+        raw: null,
+        messageText: '',
+        receivedAt: new Date(),
+        partial: true,
+      });
+    }
+  }, []);
+
+  const cancelPartialDiagram = useCallback(() => {
+    if (partialFrameRef.current !== null) {
+      window.cancelAnimationFrame(partialFrameRef.current);
+      partialFrameRef.current = null;
+    }
+    partialDiagramsRef.current = null;
+  }, []);
+
+  useEffect(() => cancelPartialDiagram, [cancelPartialDiagram]);
+
   const handleSocketMessage = useCallback(
     (event: MessageEvent<string>) => {
       try {
         const data = JSON.parse(event.data) as Record<string, unknown>;
         const type = typeof data.type === 'string' ? data.type : undefined;
 
+        if (type === 'ping') {
+          // Server heartbeat: sockets that stop answering are closed as idle.
+          wsRef.current?.send(JSON.stringify({ type: 'pong' }));
+          return;
+        }
+
         if (type === 'message') {
           const content = typeof data.content === 'string' ? data.content : '';
           const assistantMessage: ChatMessage = {
@@ -205,10 +275,37 @@ export const useChat = (options: UseChatOptions = {}) => {
               return prev;
             });
           }
+          if (runId && data.phase === 'diagram_partial' && data.payload && typeof data.payload === 'object') {
+            const { collection, item } = data.payload as { collection?: string; item?: unknown };
+            const stepId = typeof data.step_id === 'string' ? data.step_id : '';
+            if (
+              PARTIAL_COLLECTIONS.includes(collection as PartialCollection) &&
+              item &&
+              typeof item === 'object'
+            ) {
+              let partials = partialDiagramsRef.current;
+              if (!partials || partials.runId !== runId) {
+                partials = { runId, activeStepId: stepId, steps: {} };
+                partialDiagramsRef.current = partials;
+              }
+              // Each agent step re-emits the whole diagram; a step that starts later takes over the canvas.
+              let partial = partials.steps[stepId];
+              if (!partial) {
+                partial = { runId, stepId, services: [], groups: [], connections: [] };
+                partials.steps[stepId] = partial;
+                partials.activeStepId = stepId;
+              }
+              partial[collection as PartialCollection].push(item as Record<string, unknown>);
+              if (stepId === partials.activeStepId && partialFrameRef.current === null) {
+                partialFrameRef.current = window.requestAnimationFrame(renderPartialDiagram);
+              }
+            }
+          }
           return;
         }
 
         if (type === 'team_final') {
+          cancelPartialDiagram();
           const messageText = typeof data.message === 'string' ? data.message : '';
           const runId = typeof data.run_id === 'string' ? data.run_id : undefined;
           const rawDiagram = typeof data.diagram_raw === 'string' ? data.diagram_raw : undefined;
@@ -287,13 +384,13 @@ export const useChat = (options: UseChatOptions = {}) => {
             );
             return [...patched, assistantMessage];
           });
-          void persistMessage(assistantMessage);
           lastUserMessageRef.current = null;
           setIsTyping(false);
+          // The run goes on generating IaC (team_artifact) until run_completed.
           if (runId) {
-            setRunState((prev) =>
-              prev && prev.runId === runId ? { ...prev, status: 'completed', completedAt: new Date() } : prev
-            );
+            runMessageRef.current[runId] = assistantMessage;
+          } else {
+            void persistMessage(assistantMessage);
           }
           if (structuredDiagram) {
             console.log('[useChat] Received structured diagram payload', {
@@ -314,9 +411,69 @@ export const useChat = (options: UseChatOptions = {}) => {
           return;
         }
 
-        if (type === 'run_completed') {
+        if (type === 'team_artifact') {
+          const runId = typeof data.run_id === 'string' ? data.run_id : undefined;
+          const runMessage = runId ? runMessageRef.current[runId] : undefined;
+          if (!runId || !runMessage) {
+            return;
+          }
+          const messageId = runMessage.id;
+          const updateRunMessage = (update: (msg: ChatMessage) => ChatMessage) => {
+            const updated = update(runMessageRef.current[runId] ?? runMessage);
+            runMessageRef.current[runId] = updated;
+            setMessages((prev) => prev.map((msg) => (msg.id === messageId ? updated : msg)));
+          };
+          const kind = data.kind;
+          if ((kind === 'bicep' || kind === 'terraform') && data.artifact && typeof data.artifact === 'object') {
+            const withArtifact = (iac: ChatMeta['iac']): ChatMeta['iac'] => ({
+              ...iac,
+              [kind]: data.artifact as Record<string, unknown>,
+            });
+            updateRunMessage((msg) => ({ ...msg, meta: { ...msg.meta, iac: withArtifact(msg.meta?.iac) } }));
+            setLatestDiagram((prev) =>
+              prev && prev.runId === runId ? { ...prev, iac: withArtifact(prev.iac) } : prev
+            );
+            return;
+          }
+          if (kind === 'iac_diagram' && data.diagram && typeof data.diagram === 'object') {
+            let structuredDiagram: ParsedArchitecture | null = null;
+            try {
+              structuredDiagram = ArchitectureParser.parseStructuredDiagram(data.diagram) ?? null;
+            } catch (error) {
+              console.warn('[useChat] Failed to interpret IaC-derived diagram', error);
+            }
+            if (!structuredDiagram) {
+              return;
+            }
+            const rawDiagram = typeof data.diagram_raw === 'string' ? data.diagram_raw : null;
+            const messageText = typeof data.message === 'string' ? data.message : undefined;
+            updateRunMessage((msg) => ({
+              ...msg,
+              content: messageText ?? msg.content,
+              meta: { ...msg.meta, diagram: { structured: structuredDiagram, raw: rawDiagram, runId } },
+            }));
+            // A new id, so the workspace redraws and saves the derived diagram.
+            setLatestDiagram((prev) => ({
+              messageId: `${messageId}:iac_diagram`,
+              runId,
+              architecture: structuredDiagram,
+              raw: rawDiagram,
+              messageText: messageText ?? prev?.messageText ?? '',
+              receivedAt: new Date(),
+              iac: prev && prev.runId === runId ? prev.iac : undefined,
+            }));
+          }
+          return;
+        }
+
+        if (type === 'run_completed' || type === 'run_cancelled') {
           const runId = typeof data.run_id === 'string' ? data.run_id : undefined;
           if (runId) {
+            const runMessage = runMessageRef.current[runId];
+            if (runMessage) {
+              delete runMessageRef.current[runId];
+              void persistMessage(runMessage);
+            }
             setRunState((prev) =>
               prev && prev.runId === runId ? { ...prev, status: 'completed', completedAt: new Date() } : prev
             );
@@ -328,6 +485,12 @@ export const useChat = (options: UseChatOptions = {}) => {
         if (type === 'error') {
           const errorMessage = typeof data.message === 'string' ? data.message : 'Unknown error';
           console.error('WebSocket error message:', errorMessage);
+          const runId = typeof data.run_id === 'string' ? data.run_id : undefined;
+          const runMessage = runId ? runMessageRef.current[runId] : undefined;
+          if (runId && runMessage) {
+            delete runMessageRef.current[runId];
+            void persistMessage(runMessage);
+          }
           setMessages((prev) =>
             prev.map((msg) =>
               msg.id === lastUserMessageRef.current ? { ...msg, status: 'error' as const } : msg
@@ -342,7 +505,7 @@ export const useChat = (options: UseChatOptions = {}) => {
         console.error('Failed to parse WebSocket message:', err);
       }
     },
-    [onError, persistMessage]
+    [cancelPartialDiagram, onError, persistMessage, renderPartialDiagram]
   );
 
   const connectWebSocket = useCallback(async () => {
@@ -414,6 +577,12 @@ export const useChat = (options: UseChatOptions = {}) => {
     setRunState(null);
   }, []);
 
+  const cancelRun = useCallback(() => {
+    if (runState?.status === 'running' && wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'cancel_run', run_id: runState.runId }));
+    }
+  }, [runState]);
+
   const sendMessage = useCallback(
     async (content: string, opts?: { useTeam?: boolean }) => {
       if (!content.trim()) {
@@ -442,7 +611,9 @@ export const useChat = (options: UseChatOptions = {}) => {
             type: 'team_stream_chat',
             message: trimmed,
             conversation_id: azureConversationId ?? undefined,
+            project_id: projectId ?? undefined,
             context: buildSummary([...messages, userMessage]),
+            iac_formats: iacFormats ?? [],
           };
           wsRef.current?.send(JSON.stringify(payload));
           return;
@@ -524,6 +695,7 @@ export const useChat = (options: UseChatOptions = {}) => {
       apiUrl,
       azureConversationId,
       connectWebSocket,
+      iacFormats,
       messages,
       onError,
       persistMessage,
@@ -645,6 +817,7 @@ export const useChat = (options: UseChatOptions = {}) => {
     isConnected,
     isTyping,
     sendMessage,
+    cancelRun,
     connectWebSocket,
     disconnect,
     clearMessages,